@@ -0,0 +1,181 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""A local cache of annotation images and their ``.plom`` data, by edition."""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from pathlib import Path
+import threading
+from typing import Any, NamedTuple
+
+from plom.messenger import Messenger
+from .downloader import MessengerPool
+from .useful_classes import _json_path_to_str
+
+log = logging.getLogger("annot_cache")
+
+
+class Annotations(NamedTuple):
+    """One edition of the annotations of a paper-question."""
+
+    papernum: int
+    question_idx: int
+    edition: int
+    image: Path
+    plom_file: Path
+    plom_data: dict[str, Any]
+
+
+class AnnotationCache:
+    """Keep annotation images and ``.plom`` data on disc, keyed by edition.
+
+    Each time a paper-question is annotated, the server makes a new
+    *edition* of the annotations.  A given edition never changes, so
+    once we have downloaded it we need never do so again.  To check
+    for a newer edition we only need the (small) annotation data; the
+    image is downloaded only if the edition is new to us.
+
+    When we know nothing about a paper-question we need both, so we
+    ask for the data and then the image of that edition.  If the server
+    tells us the edition of the latest image, we can instead ask for
+    both at the same time, using two Messengers from a pool, and check
+    they are of the same edition.  We learn if the server does this from
+    the first image we get.
+
+    Files belong to the cache: callers that want to modify them should
+    make a copy.  Methods can be called from any thread.  To get many
+    annotations ahead of time, without crowding out anything else, run
+    :meth:`get` on the :attr:`background` executor: it has one thread.
+    """
+
+    def __init__(self, msgr: Messenger, basedir: str | Path) -> None:
+        self.basedir = Path(basedir)
+        self.basedir.mkdir(parents=True, exist_ok=True)
+        self._pool = MessengerPool(msgr, max_size=2)
+        self._executor = ThreadPoolExecutor(2, thread_name_prefix="annot_cache")
+        # one at a time: each uses the two above
+        self.background = ThreadPoolExecutor(1, thread_name_prefix="annot_prefetch")
+        self._lock = threading.Lock()
+        self._cache: dict[tuple[int, int, int], Annotations] = {}
+        self._latest: dict[tuple[int, int], int] = {}
+        # does the server tell us the edition of each image?
+        self._image_has_edition = False
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+
+    def _fetch_data(self, papernum: int, question_idx: int) -> dict[str, Any]:
+        with self._pool.messenger() as m:
+            return m.get_annotations(papernum, question_idx, edition=None)
+
+    def _fetch_image(
+        self, papernum: int, question_idx: int, edition: int | None
+    ) -> tuple[dict[str, Any], bytes]:
+        with self._pool.messenger() as m:
+            return m.get_annotations_image(papernum, question_idx, edition=edition)
+
+    def lookup(self, papernum: int, question_idx: int) -> Annotations | None:
+        """The latest annotations we know about, without asking the server."""
+        with self._lock:
+            edition = self._latest.get((papernum, question_idx))
+            if edition is None:
+                return None
+            return self._cache.get((papernum, question_idx, edition))
+
+    def get(self, papernum: int, question_idx: int) -> Annotations:
+        """Get the latest annotations, from the server if we don't already have them.
+
+        Args:
+            papernum: which paper.
+            question_idx: which question.
+
+        Returns:
+            The latest edition of the annotations.
+
+        Raises:
+            PlomNoPaper: no annotations, e.g., not yet marked or reset.
+            PlomTaskChangedError: the task changed on the server.
+            PlomTaskDeletedError: the task was deleted.
+            PlomException: other errors from the server.
+        """
+        if self._image_has_edition and self.lookup(papernum, question_idx) is None:
+            return self._get_both_at_once(papernum, question_idx)
+        try:
+            data = self._fetch_data(papernum, question_idx)
+        except Exception:
+            self.forget(papernum, question_idx)
+            raise
+        edition = data["edition"]
+        with self._lock:
+            hit = self._cache.get((papernum, question_idx, edition))
+            if hit:
+                self.number_of_hits += 1
+                self._latest[(papernum, question_idx)] = edition
+                return hit
+            self.number_of_misses += 1
+        info, img_bytes = self._fetch_image(papernum, question_idx, edition)
+        return self._store(papernum, question_idx, data, info, img_bytes)
+
+    def _get_both_at_once(self, papernum: int, question_idx: int) -> Annotations:
+        """Ask for the data and the latest image together, as neither is cached."""
+        fdata = self._executor.submit(self._fetch_data, papernum, question_idx)
+        fimg = self._executor.submit(self._fetch_image, papernum, question_idx, None)
+        try:
+            data = fdata.result()
+        except Exception:
+            self.forget(papernum, question_idx)
+            fimg.cancel()
+            raise
+        info, img_bytes = fimg.result()
+        if info.get("edition") != data["edition"]:
+            # someone re-marked it as we asked
+            log.info(
+                "annotations of %d q%d changed as we fetched them",
+                papernum,
+                question_idx,
+            )
+            info, img_bytes = self._fetch_image(papernum, question_idx, data["edition"])
+        with self._lock:
+            self.number_of_misses += 1
+        return self._store(papernum, question_idx, data, info, img_bytes)
+
+    def _store(
+        self,
+        papernum: int,
+        question_idx: int,
+        data: dict[str, Any],
+        img_info: dict[str, Any],
+        img_bytes: bytes,
+    ) -> Annotations:
+        if "edition" in img_info:
+            self._image_has_edition = True
+        edition = data["edition"]
+        stem = f"{papernum:04}_{question_idx}_e{edition}"
+        image = self.basedir / f"{stem}.{img_info['extension']}"
+        plom_file = self.basedir / f"{stem}.plom"
+        plom_data = data["user_agent_data"]
+        with open(image, "wb") as f:
+            f.write(img_bytes)
+        with open(plom_file, "w") as f:
+            json.dump(plom_data, f, indent="  ", default=_json_path_to_str)
+            f.write("\n")
+        a = Annotations(papernum, question_idx, edition, image, plom_file, plom_data)
+        with self._lock:
+            self._cache[(papernum, question_idx, edition)] = a
+            self._latest[(papernum, question_idx)] = edition
+        log.debug("cached annotations %s", stem)
+        return a
+
+    def forget(self, papernum: int, question_idx: int) -> None:
+        """Stop treating any edition as the latest, e.g., if the task was reset.
+
+        Files for older editions remain on disc and in the cache.
+        """
+        with self._lock:
+            self._latest.pop((papernum, question_idx), None)
+
+    def close(self) -> None:
+        self.background.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pool.close()
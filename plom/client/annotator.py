@@ -46,7 +46,6 @@ from PyQt6.QtWidgets import (
     QLabel,
     QMenu,
     QMessageBox,
-    QProgressDialog,
     QPushButton,
     QSplitter,
     QToolButton,
@@ -57,6 +56,7 @@ from PyQt6.QtWidgets import (
 from plom.common.misc_utils import pprint_score, unpack_task_code
 from plom.common.rubric_utils import check_for_illadvised
 from . import cursors, icons, ui_files
+from .async_messenger import MessengerCall
 from .rubric_list import RubricWidget
 from .key_wrangler import get_key_bindings
 from .key_help import KeyHelp
@@ -583,6 +583,8 @@ class Annotator(QWidget):
             self.question_idx, self.question_label, self.maxMark
         )
         self.rubric_widget.setVersion(self.version, self.max_version)
+        # we may have used some rubrics more since the last task
+        self.rubric_widget.update_frequent_tab()
         self.rubric_widget.setEnabled(True)
 
         log.debug("Restore mode info = {}".format(self.modeInformation))
@@ -826,14 +828,18 @@ class Annotator(QWidget):
         """Switch backward to the previous minor tool."""
         self.next_minor_tool(dir=-1, always_move=True)
 
-    def viewWholePaper(self) -> None:
-        """Popup a dialog showing the entire paper.
+    def _get_whole_paper_pagedata(self) -> tuple[list[dict[str, Any]], set[int]]:
+        """Get the page data for the whole paper and start downloading any missing images.
 
-        TODO: this has significant duplication with RearrangePages.
+        The downloads are started in the background with high priority,
+        all at once, so callers can show a dialog straight away and fill
+        in the pages as the downloader's ``download_finished`` fires.
+
+        Returns:
+            The page data, with the ``"filename"`` of each row set to the
+            cached image or, if not yet downloaded, to a placeholder.
+            Also a set of the image ids still being downloaded.
         """
-        if not self.task:
-            return
-        log.debug("wholePage: downloading files for papernum %s", self.papernum)
         dl = self.parentMarkerUI.Qapp.downloader
         pagedata = dl.msgr.get_pagedata_context_question(
             self.papernum, self.question_idx
@@ -842,9 +848,35 @@ class Annotator(QWidget):
         pagedata = [
             x for x in pagedata if not x["pagename"].casefold().startswith("id")
         ]
-        pagedata = dl.sync_downloads(pagedata)
+        downloading = set()
+        for row in pagedata:
+            if dl.pagecache.has_page_image(row["id"]):
+                row["filename"] = dl.pagecache.page_image_path(row["id"])
+                continue
+            dl.download_in_background_thread(row, priority=True)
+            row["filename"] = dl.get_placeholder_path()
+            downloading.add(row["id"])
+        log.debug("whole paper: downloading image ids %s", downloading)
+        return pagedata, downloading
+
+    def viewWholePaper(self) -> None:
+        """Popup a dialog showing the entire paper.
+
+        The dialog opens immediately, pages that are not yet downloaded
+        are filled in when they arrive.
+
+        TODO: this has significant duplication with RearrangePages.
+        """
+        if not self.task:
+            return
+        log.debug("wholePage: downloading files for papernum %s", self.papernum)
+        dl = self.parentMarkerUI.Qapp.downloader
+        pagedata, __ = self._get_whole_paper_pagedata()
         labels = [x["pagename"] for x in pagedata]
-        WholeTestView(self.papernum, pagedata, labels, parent=self).exec()
+        d = WholeTestView(self.papernum, pagedata, labels, parent=self)
+        dl.download_finished.connect(d.page_image_arrived)
+        d.exec()
+        dl.download_finished.disconnect(d.page_image_arrived)
 
     def arrangePages(self) -> None:
         """Arrange or rearrange pages in UI."""
@@ -888,32 +920,8 @@ class Annotator(QWidget):
         log.debug("adjustpgs: downloading files for papernum %s", self.papernum)
 
         dl = self.parentMarkerUI.Qapp.downloader
-        pagedata = dl.msgr.get_pagedata_context_question(
-            self.papernum, self.question_idx
-        )
-        # Issue #1553: we filter ID page out, somewhat crudely (Issue #2707)
-        pagedata = [
-            x for x in pagedata if not x["pagename"].casefold().startswith("id")
-        ]
-        # TODO: eventually want dialog to open during loading, Issue #2355
-        N = len(pagedata)
-        pd = QProgressDialog(
-            "Downloading additional images\nStarting up...", None, 0, N, self
-        )
-        pd.setWindowModality(Qt.WindowModality.WindowModal)
-        pd.setMinimumDuration(500)
-        pd.setValue(0)
-        self.pause_to_process_events()
-        for i, row in enumerate(pagedata):
-            # TODO: would be nice to show the size in MiB here!
-            pd.setLabelText(
-                f"Downloading additional images\nFile {i + 1} of {N}: "
-                f"img id {row['id']}"
-            )
-            pd.setValue(i + 1)
-            self.pause_to_process_events()
-            row = dl.sync_download(row)
-        pd.close()
+        # Issue #2355: dialog opens during loading, pages are filled in later
+        pagedata, downloading = self._get_whole_paper_pagedata()
 
         #
         for x in image_md5_list:
@@ -935,15 +943,20 @@ class Annotator(QWidget):
         has_annotations = self.scene.hasAnnotations()
         log.debug("pagedata is\n  {}".format("\n  ".join([str(x) for x in pagedata])))
         rearrangeView = RearrangementViewer(
-            self, self.papernum, src_img_data, pagedata, has_annotations
+            self,
+            self.papernum,
+            src_img_data,
+            pagedata,
+            has_annotations,
+            downloading=downloading,
         )
-        # TODO: have rearrange react to new downloads
-        # PC.download_finished.connect(rearrangeView.shake_things_up)
+        dl.download_finished.connect(rearrangeView.page_image_arrived)
         perm = []
         self.parentMarkerUI.Qapp.restoreOverrideCursor()
         if rearrangeView.exec() == QDialog.DialogCode.Accepted:
             perm = rearrangeView.permute
             log.debug("adjust pages permutation output is: %s", perm)
+        dl.download_finished.disconnect(rearrangeView.page_image_arrived)
         # Workaround for memory leak Issue #1322, TODO better fix
         rearrangeView.listA.clear()
         rearrangeView.listB.clear()
@@ -1819,7 +1832,7 @@ class Annotator(QWidget):
         """
         log.debug("========CLOSE EVENT======: {}".format(self))
 
-        self.saveTabStateToServer(self.rubric_widget.get_tab_rubric_lists())
+        self.rubric_widget.save_tab_state()
 
         # Save the current window settings for next time annotator is launched
         self.saveWindowSettings()
@@ -2050,7 +2063,11 @@ class Annotator(QWidget):
         return result
 
     def view_other_paper(
-        self, paper_number: int, *, _parent: QWidget | None = None
+        self,
+        paper_number: int,
+        *,
+        _parent: QWidget | None = None,
+        cached_ok: bool = False,
     ) -> None:
         """Opens another dialog to view a paper.
 
@@ -2059,6 +2076,8 @@ class Annotator(QWidget):
 
         Keyword:
             _parent: override the default parent which is ourselves.
+            cached_ok: show annotations we already have, if any, without
+                checking for newer ones.
 
         Returns:
             None
@@ -2066,7 +2085,18 @@ class Annotator(QWidget):
         if _parent is None:
             _parent = self
         self.parentMarkerUI.view_other(
-            paper_number=paper_number, question_idx=self.question_idx, _parent=_parent
+            paper_number=paper_number,
+            question_idx=self.question_idx,
+            _parent=_parent,
+            cached_ok=cached_ok,
+        )
+
+    def fetchOtherAnnotationsInBackground(
+        self, paper_number: int
+    ) -> MessengerCall | None:
+        """Have Marker get the annotations of another paper for our question."""
+        return self.parentMarkerUI.fetch_annotations_in_background(
+            paper_number, self.question_idx
         )
 
     def saveTabStateToServer(self, tab_state):
@@ -2077,6 +2107,22 @@ class Annotator(QWidget):
         """Have Marker download the tab state from the server."""
         return self.parentMarkerUI.getTabStateFromServer()
 
+    def getRubricSnapshot(self):
+        """Have Marker give us the rubrics and tab state from last time, if any."""
+        return self.parentMarkerUI.getRubricSnapshot()
+
+    def fetchRubricsInBackground(self):
+        """Have Marker get the rubrics and tab state in the background."""
+        return self.parentMarkerUI.fetchRubricsInBackground()
+
+    def getRubricUsage(self) -> dict[int, int]:
+        """Have Marker tell us how many times we have used each rubric."""
+        return self.parentMarkerUI.getRubricUsage()
+
+    def prerenderLatexInBackground(self, fragments: list[str]) -> None:
+        """Have Marker render some TeX in the background, most wanted first."""
+        self.parentMarkerUI.prerender_latex_in_background(fragments)
+
     def refreshRubrics(self):
         """Ask the rubric widget to refresh rubrics."""
         self.rubric_widget.refreshRubrics()
@@ -0,0 +1,320 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Make messenger calls in the background and get the results as Qt signals."""
+
+from concurrent.futures import Executor, Future
+import logging
+from typing import Any, Callable, Hashable
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+from plom.messenger import Messenger
+from .downloader import MessengerPool
+
+log = logging.getLogger("async_msgr")
+
+
+class MessengerCall(QObject):
+    """A messenger call running in the background, a bit like a future.
+
+    Connect to the signals, or use :meth:`then`.  Either way, the
+    callbacks run on the GUI thread.  A cancelled call emits nothing.
+
+    **Signals**:
+
+      * `succeeded(result: object)`: the call returned a value.
+      * `failed(err: Exception)`: the call raised an exception.
+    """
+
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+    def __init__(self, key: Hashable | None, group: str | None) -> None:
+        super().__init__()
+        self.key = key
+        self.group = group
+        self._cancelled = False
+        self._done = False
+        self._worker: _CallWorker | None = None
+        # if the call runs on some other executor, see AsyncMessenger.submit_to
+        self._future: Future | None = None
+
+    def then(
+        self,
+        on_success: Callable[[Any], None] | None = None,
+        on_failure: Callable[[Exception], None] | None = None,
+    ) -> "MessengerCall":
+        """Connect callbacks for the result and return ourselves."""
+        if on_success:
+            self.succeeded.connect(on_success)
+        if on_failure:
+            self.failed.connect(on_failure)
+        return self
+
+    def cancel(self) -> None:
+        """We are no longer interested in the result.
+
+        If the call has not started it never will.  If it is already
+        talking to the server it will finish, but nothing is emitted.
+        """
+        self._cancelled = True
+        if self._future:
+            self._future.cancel()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def is_done(self) -> bool:
+        return self._done
+
+
+class _CallWorkerSignals(QObject):
+    # the call, whether it raised, and the result or exception
+    finished = pyqtSignal(object, bool, object)
+
+
+class _CallWorker(QRunnable):
+    def __init__(
+        self,
+        pool: MessengerPool,
+        call: MessengerCall,
+        fn: Callable[..., Any],
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> None:
+        super().__init__()
+        self.pool = pool
+        self.call = call
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _CallWorkerSignals()
+
+    @pyqtSlot()
+    def run(self) -> None:
+        if self.call.is_cancelled():
+            self.signals.finished.emit(self.call, False, None)
+            return
+        try:
+            with self.pool.messenger() as msgr:
+                r = self.fn(msgr, *self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.finished.emit(self.call, True, e)
+            return
+        self.signals.finished.emit(self.call, False, r)
+
+
+class AsyncMessenger(QObject):
+    """Make Messenger calls on worker threads so the GUI thread need not wait.
+
+    Each call returns a :class:`MessengerCall`; connect to it for the
+    result.  Identical calls that are already in flight are shared
+    rather than sent again.  Calls can be given a ``group`` (such as
+    ``"preview"``) so that all calls in that group can be cancelled
+    together, e.g., when the user moves on to something else.
+
+    Example::
+
+        amsgr.call("get_marking_progress", q, v).then(self.updateProgress)
+
+    The workers borrow clones of the Messenger from a
+    :class:`MessengerPool`, so the calls run concurrently with each
+    other and with the caller's use of the original Messenger.
+    """
+
+    def __init__(
+        self, msgr: Messenger, *, max_threads: int = 2, parent: QObject | None = None
+    ) -> None:
+        super().__init__(parent)
+        self._pool = MessengerPool(msgr, max_size=max_threads)
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(max_threads)
+        self._in_flight: dict[Hashable, MessengerCall] = {}
+        self._calls: set[MessengerCall] = set()
+        # results of calls run by other executors come back through here
+        self._other_signals = _CallWorkerSignals()
+        self._other_signals.finished.connect(self._worker_finished)
+        self.number_of_calls = 0
+        self.number_of_shared = 0
+
+    def call(
+        self, method: str, *args, group: str | None = None, **kwargs
+    ) -> MessengerCall:
+        """Call a method of the Messenger in the background.
+
+        Args:
+            method: the name of the Messenger method.
+            *args: passed to the method.
+
+        Keyword Args:
+            group: an optional name for use with :meth:`cancel_group`.
+            **kwargs: passed to the method.
+
+        Returns:
+            An object you can connect to for the result.  If an identical
+            call is already in flight, you get that one.
+        """
+        # repr b/c arguments might be unhashable, such as lists of tags
+        key = (method, repr(args), repr(sorted(kwargs.items())))
+        return self.submit(
+            lambda m, *a, **k: getattr(m, method)(*a, **k),
+            *args,
+            key=key,
+            group=group,
+            **kwargs,
+        )
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        key: Hashable | None = None,
+        group: str | None = None,
+        **kwargs,
+    ) -> MessengerCall:
+        """Run a function of a Messenger in the background.
+
+        Use this for a sequence of calls that belong together.  The
+        function runs on a worker thread: it must not touch any widgets.
+
+        Args:
+            fn: called as ``fn(msgr, *args, **kwargs)``.
+            *args: passed to the function.
+
+        Keyword Args:
+            key: if given, and a call with the same key is already in
+                flight, then we return that instead of starting another.
+            group: an optional name for use with :meth:`cancel_group`.
+            **kwargs: passed to the function.
+
+        Returns:
+            An object you can connect to for the result.
+        """
+        if key is not None:
+            existing = self._in_flight.get(key)
+            if existing is not None and not existing.is_cancelled():
+                self.number_of_shared += 1
+                return existing
+        self.number_of_calls += 1
+        call = MessengerCall(key, group)
+        worker = _CallWorker(self._pool, call, fn, args, kwargs)
+        # we keep the worker until its result is delivered: if Qt deleted it
+        # after running, cancel_group could not safely ask about it
+        worker.setAutoDelete(False)
+        worker.signals.finished.connect(self._worker_finished)
+        call._worker = worker
+        if key is not None:
+            self._in_flight[key] = call
+        self._calls.add(call)
+        self.threadpool.start(worker)
+        return call
+
+    def submit_to(
+        self,
+        executor: Executor,
+        fn: Callable[..., Any],
+        *args,
+        key: Hashable | None = None,
+        group: str | None = None,
+    ) -> MessengerCall:
+        """Run a function on some other executor, with the result as a call.
+
+        This is for work that has its own threads and Messengers, so
+        it need not tie up ours, but that callers would like to treat
+        like any other call: connecting to it, cancelling it, and so on.
+        Cancelling the call cancels the work if it has not yet started.
+
+        Args:
+            executor: where to run the function, for example a
+                :class:`concurrent.futures.ThreadPoolExecutor`.
+            fn: called as ``fn(*args)``.  Note: no Messenger is passed.
+            *args: passed to the function.
+
+        Keyword Args:
+            key: as for :meth:`submit`.
+            group: as for :meth:`submit`.
+
+        Returns:
+            An object you can connect to for the result.
+        """
+        if key is not None:
+            existing = self._in_flight.get(key)
+            if existing is not None and not existing.is_cancelled():
+                self.number_of_shared += 1
+                return existing
+        self.number_of_calls += 1
+        call = MessengerCall(key, group)
+        if key is not None:
+            self._in_flight[key] = call
+        self._calls.add(call)
+        future = executor.submit(fn, *args)
+        call._future = future
+
+        def _done(f: Future) -> None:
+            # probably on the executor's thread: the signal takes us home
+            if f.cancelled():
+                self._other_signals.finished.emit(call, True, None)
+                return
+            err = f.exception()
+            if err is not None:
+                self._other_signals.finished.emit(call, True, err)
+            else:
+                self._other_signals.finished.emit(call, False, f.result())
+
+        future.add_done_callback(_done)
+        return call
+
+    def _forget(self, call: MessengerCall) -> None:
+        call._done = True
+        call._worker = None
+        call._future = None
+        self._calls.discard(call)
+        if call.key is not None and self._in_flight.get(call.key) is call:
+            self._in_flight.pop(call.key)
+
+    def _worker_finished(self, call: MessengerCall, raised: bool, value) -> None:
+        self._forget(call)
+        if call.is_cancelled():
+            log.debug("discarding result of cancelled call %s", call.key)
+            return
+        if raised:
+            log.warning("background call %s failed: %s", call.key, value)
+            call.failed.emit(value)
+            return
+        call.succeeded.emit(value)
+
+    def cancel_group(self, group: str) -> int:
+        """Cancel all calls in a group.
+
+        Returns:
+            How many calls were cancelled.
+        """
+        n = 0
+        for call in list(self._calls):
+            if call.group != group:
+                continue
+            call.cancel()
+            n += 1
+            # if it hasn't started, we can drop it now
+            if call._worker and self.threadpool.tryTake(call._worker):
+                self._forget(call)
+        return n
+
+    def num_in_flight(self) -> int:
+        return len(self._calls)
+
+    def stop(self, timeout: int = -1) -> bool:
+        """Cancel all calls and wait for any running ones to finish.
+
+        Returns:
+            True if everything finished, False if we timed out.
+        """
+        for call in list(self._calls):
+            call.cancel()
+        self.threadpool.clear()
+        r = self.threadpool.waitForDone(timeout)
+        for call in list(self._calls):
+            self._forget(call)
+        self._pool.close()
+        return r
@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Get the client started: fetch what we need from the server concurrently, and time it."""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import logging
+import time
+from typing import Any, Callable, Iterator
+
+from plom.messenger import Messenger
+from .downloader import MessengerPool
+
+log = logging.getLogger("bootstrap")
+
+
+class StartupTimer:
+    """Keep track of how long each phase of startup takes.
+
+    Use it like this::
+
+        timer = StartupTimer()
+        with timer.phase("login"):
+            msgr.requestAndSaveToken(...)
+        ...
+        log.info(timer.report())
+
+    Phases that overlap (because they run concurrently) can be added
+    with :meth:`add`; they are reported but not counted in the total.
+    """
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+        self.concurrent: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - t))
+
+    def add(self, name: str, seconds: float, *, concurrent: bool = False) -> None:
+        """Record a phase that was timed elsewhere."""
+        if concurrent:
+            self.concurrent.append((name, seconds))
+        else:
+            self.phases.append((name, seconds))
+
+    def elapsed(self) -> float:
+        """Wall-clock seconds since the timer was made."""
+        return time.perf_counter() - self._start
+
+    def report(self) -> str:
+        """A human-readable multiline breakdown of the startup time."""
+        lines = [f"Startup took {self.elapsed():.3f}s:"]
+        for name, s in self.phases:
+            lines.append(f"  {name:<24} {s:8.3f}s")
+        if self.concurrent:
+            lines.append("  of which concurrent requests:")
+            for name, s in self.concurrent:
+                lines.append(f"    {name:<22} {s:8.3f}s")
+        return "\n".join(lines)
+
+
+class Bootstrap:
+    """Make a batch of independent server requests at the same time, and wait for them all.
+
+    Startup needs many small pieces of information from the server,
+    none of which depend on each other.  Rather than asking for them
+    one after another, add them here and call :meth:`run`: each
+    request is made on a worker thread with its own clone of the
+    Messenger, so the total wait is about that of the slowest request.
+
+    Exceptions raised by a request are kept and re-raised when you ask
+    for its :meth:`result`, so the caller can deal with them in the same
+    way as if it had made the call itself.
+    """
+
+    def __init__(self, msgr: Messenger, *, max_threads: int = 4) -> None:
+        self._msgr = msgr
+        self.max_threads = max_threads
+        self._requests: dict[str, tuple[Callable[..., Any], tuple, dict]] = {}
+        self._results: dict[str, Any] = {}
+        self._errors: dict[str, Exception] = {}
+        self.timings: dict[str, float] = {}
+
+    def add(self, name: str, fn: str | Callable[..., Any], *args, **kwargs) -> None:
+        """Add a request to the batch.
+
+        Args:
+            name: how we will refer to the result.
+            fn: the name of a Messenger method, or a function to be
+                called as ``fn(msgr, *args, **kwargs)``.  In the latter
+                case, it must not touch any widgets.
+            *args: passed to the function.
+            **kwargs: passed to the function.
+        """
+        if name in self._requests:
+            raise ValueError(f'Already have a request called "{name}"')
+        if isinstance(fn, str):
+            method = fn
+            fn = lambda m, *a, **k: getattr(m, method)(*a, **k)  # noqa: E731
+        self._requests[name] = (fn, args, kwargs)
+
+    def _run_one(self, pool: MessengerPool, name: str) -> None:
+        fn, args, kwargs = self._requests[name]
+        t = time.perf_counter()
+        try:
+            with pool.messenger() as m:
+                self._results[name] = fn(m, *args, **kwargs)
+        except Exception as e:
+            self._errors[name] = e
+        self.timings[name] = time.perf_counter() - t
+
+    def run(self) -> None:
+        """Make all the requests and wait until they have all finished."""
+        if not self._requests:
+            return
+        nthreads = min(self.max_threads, len(self._requests))
+        pool = MessengerPool(self._msgr, max_size=nthreads)
+        try:
+            with ThreadPoolExecutor(nthreads, thread_name_prefix="bootstrap") as ex:
+                for name in self._requests:
+                    ex.submit(self._run_one, pool, name)
+        finally:
+            pool.close()
+        for name, e in self._errors.items():
+            log.warning('bootstrap request "%s" failed: %s', name, e)
+
+    def has(self, name: str) -> bool:
+        """Did we make a request with this name."""
+        return name in self._requests
+
+    def failed(self, name: str) -> bool:
+        """Did this request raise an exception."""
+        return name in self._errors
+
+    def result(self, name: str) -> Any:
+        """The result of a request.
+
+        Raises:
+            KeyError: there was no such request, or it hasn't run yet.
+            Exception: whatever the request itself raised.
+        """
+        if name in self._errors:
+            raise self._errors[name]
+        return self._results[name]
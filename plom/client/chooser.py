@@ -50,6 +50,7 @@ from plom.common.exceptions import (
 from . import __version__
 from . import MarkerClient, IDClient
 from . import ui_files
+from .bootstrap import StartupTimer
 from .downloader import Downloader
 from .about_dialog import show_about_dialog
 from .question_labels import get_question_label
@@ -71,6 +72,7 @@ class Chooser(QDialog):
         uic.loadUi(resources.files(ui_files) / "chooser.ui", self)
         self.Qapp = Qapp
         self.messenger = None
+        self._spec: dict[str, Any] | None = None
 
         self.lastTime = self.load_config_file_or_defaults()
 
@@ -173,8 +175,10 @@ class Chooser(QDialog):
         logging.getLogger().setLevel(self.lastTime["LogLevel"].upper())
 
     def _launch_subapp(self, which_subapp: str) -> None:
+        timer = StartupTimer()
         if not self.is_logged_in():
-            self.login()
+            with timer.phase("login"):
+                self.login()
             if not self.is_logged_in():
                 return
 
@@ -185,7 +189,8 @@ class Chooser(QDialog):
         img_cache_dir = self._workdir / "page_img_cache"
         img_cache_dir.mkdir(exist_ok=True)
         self.Qapp.downloader = Downloader(img_cache_dir, msgr=self.messenger)
-        roles = self.messenger.get_user_roles()
+        with timer.phase("get user roles"):
+            roles = self.messenger.get_user_roles()
 
         if which_subapp == "Marker":
             if "marker" not in roles:
@@ -200,7 +205,15 @@ class Chooser(QDialog):
             markerwin = MarkerClient(self.Qapp, tmpdir=self._workdir)
             markerwin.my_shutdown_signal.connect(self.on_marker_window_close)
             markerwin.show()
-            markerwin.setup(self.messenger, question, v, self.lastTime)
+            markerwin.setup(
+                self.messenger,
+                question,
+                v,
+                self.lastTime,
+                spec=self._spec,
+                user_roles=roles,
+                startup_timer=timer,
+            )
             # store ref in Qapp to avoid garbase collection
             self.Qapp.marker = markerwin
         elif which_subapp == "Identifier":
@@ -579,6 +592,7 @@ class Chooser(QDialog):
             pass
         self.messenger.stop()
         self.messenger = None
+        self._spec = None
         self.ui.loginInfoLabel.setText(_("logged out"))
         self.ui.manageButton.setVisible(False)
         self.ui.logoutButton.setVisible(False)
@@ -683,6 +697,8 @@ class Chooser(QDialog):
             return
         if spec:
             self._set_restrictions_from_spec(spec)
+        # keep it so the Marker need not ask again
+        self._spec = spec
         self.ui.loginInfoLabel.setText(
             _("logged in as “{username}”").format(username=user)
         )
@@ -0,0 +1,466 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Claim tasks ahead of time so the next one is ready when the marker is, without fighting over them."""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from plom.common.exceptions import PlomNoPermission, PlomTakenException
+from plom.messenger import Messenger
+from .async_messenger import AsyncMessenger, MessengerCall
+
+log = logging.getLogger("claim_ahead")
+
+
+class ClaimStrategy:
+    """How to ask the server for tasks when many people mark the same question.
+
+    The server hands out the lowest-numbered available task, so when
+    lots of markers ask at once they are all offered the same task and
+    all but one of them lose the race to claim it.  To avoid this:
+
+      * each user looks in their own *shard* of the paper numbers
+        first: the range of papers (or the user's preferred range, if
+        they set one) is split evenly between the markers;
+      * within the shard we start looking at a random paper number
+        (jitter), falling back to the whole shard and then to the whole
+        range, so that no task is left behind;
+      * when we do collide, we wait a little before trying again,
+        doubling the wait each time (with some randomness) up to a
+        limit.  After too many collisions in one range we move on to
+        the next, wider, range.
+
+    Waiting blocks, so it is only for worker threads: on the GUI thread,
+    claim with ``wait=False``.  We keep count of how often we collide.
+    Instances can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_collisions: int = 8,
+        base_delay: float = 0.05,
+        max_delay: float = 1.0,
+        jitter: bool = True,
+        rng: random.Random | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize a strategy for claiming tasks.
+
+        Keyword Args:
+            max_collisions: move on to the next range of paper numbers
+                after losing this many races in one range.
+            base_delay: seconds to wait after the first collision.
+            max_delay: the most seconds to wait after a collision.
+            jitter: start looking at a random paper number in our shard.
+            rng: source of randomness, mostly for testing.
+            sleep: how to wait, mostly for testing.
+        """
+        self.max_collisions = max_collisions
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._rng = rng if rng else random.Random()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.shard_index = 0
+        self.num_shards = 1
+        self.max_papernum: int | None = None
+        self.number_of_claims = 0
+        self.number_of_collisions = 0
+
+    def set_shard(self, index: int, count: int) -> None:
+        """Use the ``index``-th of ``count`` equal parts of the paper numbers."""
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index} of {count}")
+        self.shard_index = index
+        self.num_shards = count
+
+    def set_shard_from_users(self, username: str, markers: list[str]) -> None:
+        """Take our shard from our position in the list of markers."""
+        markers = sorted(set(markers))
+        if username not in markers:
+            self.set_shard(0, 1)
+            return
+        self.set_shard(markers.index(username), len(markers))
+
+    def shard_range(
+        self, min_paper_num: int | None, max_paper_num: int | None
+    ) -> tuple[int, int] | None:
+        """Our part of the range of paper numbers, or None if we can't (or needn't) shard."""
+        lo = min_paper_num if min_paper_num is not None else 1
+        hi = max_paper_num if max_paper_num is not None else self.max_papernum
+        if self.num_shards <= 1 or hi is None or hi < lo:
+            return None
+        size = hi - lo + 1
+        s_lo = lo + (self.shard_index * size) // self.num_shards
+        s_hi = lo + ((self.shard_index + 1) * size) // self.num_shards - 1
+        if s_hi < s_lo:
+            return None
+        return s_lo, s_hi
+
+    def ranges_to_try(
+        self, min_paper_num: int | None, max_paper_num: int | None
+    ) -> list[tuple[int | None, int | None]]:
+        """The ranges of paper numbers to look in, in order."""
+        ranges: list[tuple[int | None, int | None]] = []
+        shard = self.shard_range(min_paper_num, max_paper_num)
+        if shard:
+            if self.jitter:
+                ranges.append((self._rng.randint(*shard), shard[1]))
+            ranges.append(shard)
+        elif self.jitter:
+            lo = min_paper_num if min_paper_num is not None else 1
+            hi = max_paper_num if max_paper_num is not None else self.max_papernum
+            if hi is not None and hi > lo:
+                ranges.append((self._rng.randint(lo, hi), max_paper_num))
+        ranges.append((min_paper_num, max_paper_num))
+        # no need to ask twice about the same range
+        return list(dict.fromkeys(ranges))
+
+    def backoff(self, collisions: int) -> float:
+        """How long to wait after this many collisions in a row."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (collisions - 1))
+        if self.jitter:
+            delay *= self._rng.uniform(0.5, 1.5)
+        return delay
+
+    def collision_rate(self) -> float:
+        """What fraction of our attempts to claim a task lost the race."""
+        with self._lock:
+            attempts = self.number_of_claims + self.number_of_collisions
+            return self.number_of_collisions / attempts if attempts else 0.0
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            claims, collisions = self.number_of_claims, self.number_of_collisions
+        return {
+            "claims": claims,
+            "collisions": collisions,
+            "collision_rate": self.collision_rate(),
+        }
+
+    def claim(
+        self,
+        msgr: Messenger,
+        question_idx: int,
+        version: int,
+        *,
+        tags: list[str],
+        min_paper_num: int | None,
+        max_paper_num: int | None,
+        wait: bool = True,
+        max_attempts: int | None = None,
+    ) -> tuple[str, list[dict[str, Any]], list[str], str] | None:
+        """Ask the server for a task and claim it; see :func:`claim_next_task`.
+
+        With ``max_attempts``, we try to claim at most that many times
+        in all, rather than ``max_collisions`` times in each range.
+        """
+        lost: PlomTakenException | None = None
+        attempts = 0
+        for lo, hi in self.ranges_to_try(min_paper_num, max_paper_num):
+            if max_attempts is not None and attempts >= max_attempts:
+                break
+            collisions = 0
+            while collisions < self.max_collisions:
+                if max_attempts is not None and attempts >= max_attempts:
+                    break
+                task = msgr.MaskNextTask(
+                    question_idx,
+                    version,
+                    tags=tags,
+                    min_paper_num=lo,
+                    max_paper_num=hi,
+                )
+                if not task:
+                    # nothing in this range: widen the search
+                    lost = None
+                    break
+                attempts += 1
+                try:
+                    src_img_data, task_tags, integrity_check = msgr.claim_task(
+                        task, version=version
+                    )
+                except PlomTakenException as err:
+                    lost = err
+                    collisions += 1
+                    with self._lock:
+                        self.number_of_collisions += 1
+                    if not wait:
+                        log.info("task already taken, trying again: %s", err)
+                        continue
+                    delay = self.backoff(collisions)
+                    log.info(
+                        "task already taken, trying again in %.2fs: %s", delay, err
+                    )
+                    self._sleep(delay)
+                    continue
+                with self._lock:
+                    self.number_of_claims += 1
+                return task, src_img_data, task_tags, integrity_check
+        # each range contains the ones before it, so only the last one
+        # tried tells us if there is anything left
+        if lost is not None:
+            raise lost
+        return None
+
+
+def claim_next_task(
+    msgr: Messenger,
+    question_idx: int,
+    version: int,
+    *,
+    tags: list[str],
+    min_paper_num: int | None,
+    max_paper_num: int | None,
+    attempts: int = 5,
+    strategy: ClaimStrategy | None = None,
+    wait: bool = True,
+) -> tuple[str, list[dict[str, Any]], list[str], str] | None:
+    """Ask the server for the next task and claim it, retrying if someone beats us to it.
+
+    This does no GUI work so it can be used from a worker thread.
+
+    Args:
+        msgr: a Messenger, not used by any other thread at the same time.
+        question_idx: which question.
+        version: which version.
+
+    Keyword Args:
+        tags: prefer tasks with these tags.
+        min_paper_num: only papers at least this, or None.
+        max_paper_num: only papers at most this, or None.
+        attempts: how many times to try, if there is no strategy or we
+            are not waiting.
+        strategy: if given, use it to avoid colliding with other markers.
+        wait: whether the strategy may wait between attempts.  Pass
+            False on the GUI thread: then we make at most ``attempts``
+            tries, as without a strategy.
+
+    Returns:
+        None if there are no more tasks (or, without a strategy, we kept
+        losing races), otherwise a tuple of the task code, its source
+        image data, its tags and its integrity check.
+
+    Raises:
+        PlomTakenException: with a strategy, we kept losing races
+            although there are tasks left.
+        PlomNoPermission: not allowed to claim the task.
+        PlomException: various other unexpected errors.
+    """
+    if strategy:
+        return strategy.claim(
+            msgr,
+            question_idx,
+            version,
+            tags=tags,
+            min_paper_num=min_paper_num,
+            max_paper_num=max_paper_num,
+            wait=wait,
+            max_attempts=None if wait else attempts,
+        )
+    for __ in range(attempts):
+        task = msgr.MaskNextTask(
+            question_idx,
+            version,
+            tags=tags,
+            min_paper_num=min_paper_num,
+            max_paper_num=max_paper_num,
+        )
+        if not task:
+            return None
+        try:
+            src_img_data, task_tags, integrity_check = msgr.claim_task(
+                task, version=version
+            )
+        except PlomTakenException as err:
+            log.info("will keep trying as task already taken: %s", err)
+            continue
+        return task, src_img_data, task_tags, integrity_check
+    return None
+
+
+class ClaimAhead(QObject):
+    """Keep a few tasks claimed, so that the marker never waits for the server.
+
+    Whenever :meth:`top_up` is called, if there are fewer than
+    ``target`` tasks ready to mark, we claim another one in the
+    background; when it arrives we hand it to ``on_claimed`` (which
+    should add it to the task list and start downloading its images)
+    and then top up again.  Only one claim is in flight at a time,
+    to be gentle on the server when many people are marking.
+
+    We never claim more than the user's quota allows.  If the server
+    has nothing for us, we wait ``retry_after`` seconds before asking
+    again, unless :meth:`reset` is called, e.g., because the user
+    changed their preferences for which tasks to claim.  If other
+    markers kept beating us to the tasks, we try again after
+    ``retry_taken_after`` seconds.
+
+    **Signals**:
+
+      * `claimed(task: str)`: we claimed a task.
+      * `exhausted()`: the server has nothing more for us, for now.
+      * `failed(err: Exception)`: the server refused a claim.
+    """
+
+    claimed = pyqtSignal(str)
+    exhausted = pyqtSignal()
+    failed = pyqtSignal(object)
+
+    def __init__(
+        self,
+        amsgr: AsyncMessenger,
+        question_idx: int,
+        version: int,
+        *,
+        count_ready: Callable[[], int],
+        quota_remaining: Callable[[], int | None],
+        preferences: Callable[[], dict[str, Any]],
+        on_claimed: Callable[[str, list[dict[str, Any]], list[str], str], None],
+        target: int = 2,
+        retry_after: float = 60.0,
+        retry_taken_after: float = 2.0,
+        claim_fn: Callable[..., Any] = claim_next_task,
+        parent: QObject | None = None,
+    ) -> None:
+        """Initialize a claim-ahead helper.
+
+        Args:
+            amsgr: for making the claims in the background.
+            question_idx: which question we are marking.
+            version: which version we are marking.
+
+        Keyword Args:
+            count_ready: how many claimed tasks we have locally that
+                are not yet marked.
+            quota_remaining: how many more tasks the user may mark, or
+                None if they have no quota.
+            preferences: the keyword arguments ``tags``, ``min_paper_num``
+                and ``max_paper_num`` for :func:`claim_next_task`, read
+                just before each claim.
+            on_claimed: called on the GUI thread with each task we claim,
+                its source image data, tags and integrity check.
+            target: how many tasks to keep ready.  Zero disables claiming
+                ahead.
+            retry_after: how many seconds to wait before asking again
+                after the server had nothing for us.
+            retry_taken_after: how many seconds to wait before trying
+                again after losing too many races for tasks.
+            claim_fn: how to claim a task, mostly for testing.
+            parent: the usual QObject parent.
+        """
+        super().__init__(parent)
+        self._amsgr = amsgr
+        self.question_idx = question_idx
+        self.version = version
+        self._count_ready = count_ready
+        self._quota_remaining = quota_remaining
+        self._preferences = preferences
+        self._on_claimed = on_claimed
+        self.target = target
+        self.retry_after = retry_after
+        self.retry_taken_after = retry_taken_after
+        self._claim_fn = claim_fn
+        self._enabled = True
+        self._call: MessengerCall | None = None
+        # when we last found nothing to claim
+        self._exhausted_at: float | None = None
+        self.number_claimed = 0
+
+    def set_target(self, n: int) -> None:
+        """Change how many tasks to keep ready, and top up if needed."""
+        self.target = max(0, n)
+        self.top_up()
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Stop (or restart) claiming ahead, e.g., while working offline.
+
+        A claim that is already in flight is not cancelled: the server
+        will give us the task, so we had better put it in the list.
+        """
+        self._enabled = enabled
+        if enabled:
+            self.top_up()
+
+    def is_busy(self) -> bool:
+        """Are we waiting for the server to give us a task."""
+        return self._call is not None
+
+    def is_exhausted(self) -> bool:
+        """Did the server recently tell us there was nothing to claim."""
+        if self._exhausted_at is None:
+            return False
+        if time.monotonic() - self._exhausted_at > self.retry_after:
+            self._exhausted_at = None
+            return False
+        return True
+
+    def reset(self) -> None:
+        """Forget that the server had nothing for us, and top up.
+
+        Call this when something changed that might make more tasks
+        available, such as the preferences for which tasks to claim.
+        """
+        self._exhausted_at = None
+        self.top_up()
+
+    def how_many_wanted(self) -> int:
+        """How many more tasks we would like to have ready."""
+        want = self.target
+        remaining = self._quota_remaining()
+        if remaining is not None:
+            want = min(want, remaining)
+        return max(0, want - self._count_ready())
+
+    def top_up(self) -> None:
+        """If we don't have enough tasks ready, claim one more in the background."""
+        if not self._enabled or self._call is not None or self.is_exhausted():
+            return
+        if self.how_many_wanted() <= 0:
+            return
+        prefs = self._preferences()
+        log.debug("Claiming ahead: %s", prefs)
+        self._call = self._amsgr.submit(
+            self._claim_fn,
+            self.question_idx,
+            self.version,
+            key="claim-ahead",
+            **prefs,
+        ).then(self._claimed, self._failed)
+
+    def _claimed(self, r: tuple | None) -> None:
+        self._call = None
+        if r is None:
+            log.info("Claiming ahead: nothing more available")
+            self._exhausted_at = time.monotonic()
+            self.exhausted.emit()
+            return
+        task, src_img_data, tags, integrity_check = r
+        log.info("Claimed task %s ahead of time", task)
+        self.number_claimed += 1
+        self._on_claimed(task, src_img_data, tags, integrity_check)
+        self.claimed.emit(task)
+        self.top_up()
+
+    def _failed(self, err: Exception) -> None:
+        self._call = None
+        if isinstance(err, PlomTakenException):
+            # there are tasks, but others keep getting them first
+            log.info("Claiming ahead: lost too many races, will try again: %s", err)
+            QTimer.singleShot(int(1000 * self.retry_taken_after), self.top_up)
+            return
+        # don't hammer the server: back off as if there was nothing to claim
+        self._exhausted_at = time.monotonic()
+        if isinstance(err, PlomNoPermission):
+            log.warning("Claiming ahead: not permitted: %s", err)
+        else:
+            log.error("Claiming ahead: unexpected error: %s", err)
+        self.failed.emit(err)
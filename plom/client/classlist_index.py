@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Fuzzy search of the classlist, for completing student names and IDs."""
+
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+
+from PyQt6.QtCore import QStringListModel
+from PyQt6.QtWidgets import QCompleter, QWidget
+
+
+def normalise(s: str) -> str:
+    """Casefold, remove accents and replace punctuation with spaces.
+
+    For example, ``"12345678: Côté, Zoë"`` becomes ``"12345678 cote zoe"``.
+    """
+    s = unicodedata.normalize("NFKD", s.casefold())
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(re.split(r"[\W_]+", s)).strip()
+
+
+def _trigrams(word: str, *, pad_right: bool = True) -> list[str]:
+    # pad so that the start of a word, and one or two letters, count
+    w = "  " + word + (" " if pad_right else "")
+    return [w[i : i + 3] for i in range(len(w) - 2)]
+
+
+class ClasslistIndex:
+    """A trigram index of "id: name" strings, for ranked fuzzy matching.
+
+    Text is normalised with :func:`normalise` so that case, accents and
+    punctuation do not matter.  Each word of each entry is split into
+    overlapping three-letter pieces ("trigrams"); a query matches the
+    entries that share the most trigrams with it, so small typos still
+    find the right student.  Entries that contain the query exactly, or
+    whose words start with the query's words, rank first.
+
+    Building the index is linear in the size of the classlist.  A query
+    only looks at entries sharing a trigram with it, ignoring trigrams
+    found in most entries (such as the first digits of student IDs), and
+    at entries with a word starting with the query, found by bisection.
+    Only the few dozen most promising of these are carefully ranked.
+    """
+
+    # how many of the most promising entries to rank
+    _max_candidates = 50
+
+    def __init__(self, entries: list[str] | None = None) -> None:
+        self._entries: list[str] = []
+        # normalised entries, with a leading space so that " " + word
+        # is found in them exactly when one of their words starts with word
+        self._normalised: list[str] = []
+        # the letters in each word of each entry, and how many
+        self._letters: list[list[tuple[frozenset[str], int]]] = []
+        self._grams: dict[str, list[int]] = defaultdict(list)
+        # every word of every entry, sorted on demand, for finding prefixes
+        self._sorted_words: list[tuple[str, int]] = []
+        self._sorted = True
+        self._known: set[str] = set()
+        for e in entries or []:
+            self.add(e)
+
+    def __len__(self) -> int:
+        """The number of entries in the index."""
+        return len(self._entries)
+
+    def add(self, entry: str) -> None:
+        """Add an entry, such as ``"12345678: Doe, Jane"``, to the index."""
+        if entry in self._known:
+            return
+        self._known.add(entry)
+        k = len(self._entries)
+        self._entries.append(entry)
+        norm = normalise(entry)
+        self._normalised.append(" " + norm)
+        letters = [frozenset(w) for w in norm.split()]
+        self._letters.append([(a, len(a)) for a in letters])
+        self._sorted_words.extend((w, k) for w in norm.split())
+        self._sorted = False
+        for g in {g for w in norm.split() for g in _trigrams(w)}:
+            self._grams[g].append(k)
+
+    def _starting_with(self, prefix: str) -> list[int]:
+        """Some entries with a word starting with the prefix, in sorted order."""
+        if not self._sorted:
+            self._sorted_words.sort()
+            self._sorted = True
+        i = bisect.bisect_left(self._sorted_words, (prefix,))
+        ks = []
+        for w, k in self._sorted_words[i : i + self._max_candidates]:
+            if not w.startswith(prefix):
+                break
+            ks.append(k)
+        return ks
+
+    def search(self, query: str, limit: int = 20) -> list[str]:
+        """Find the entries that best match a query.
+
+        Args:
+            query: some of an ID or name, as typed, perhaps with typos.
+            limit: the maximum number of matches to return.
+
+        Returns:
+            The matching entries, best first.
+        """
+        q = normalise(query)
+        if not q:
+            return []
+        words = q.split()
+        # the last word may be incomplete, so don't require it to end
+        grams = {
+            g
+            for i, w in enumerate(words)
+            for g in _trigrams(w, pad_right=(i < len(words) - 1))
+        }
+        postings = sorted((self._grams[g] for g in grams if g in self._grams), key=len)
+        # trigrams in most entries (such as the start of every student ID)
+        # say little but cost a lot: use them only if there's nothing else
+        common = max(64, len(self._entries) // 4)
+        postings = [p for p in postings if len(p) <= common] or postings[:1]
+        shared = Counter(chain.from_iterable(postings))
+        # with only a few trigrams in common, it's probably not a match
+        threshold = max(1, len(postings) // 3)
+        candidates = {
+            k for k, n in shared.most_common(self._max_candidates) if n >= threshold
+        }
+        candidates.update(self._starting_with(max(words, key=len)))
+
+        prefixes = [" " + w for w in words]
+        rough: dict[int, tuple[int, int]] = {}
+        for k in candidates:
+            normalised = self._normalised[k]
+            if q in normalised:
+                exact = 2
+            elif all(p in normalised for p in prefixes):
+                exact = 1
+            else:
+                exact = 0
+            rough[k] = (-exact, -shared[k])
+        best = heapq.nsmallest(2 * limit, candidates, key=rough.__getitem__)
+        # only those tied with the last one shown can change places with it
+        if len(best) > limit:
+            cutoff = rough[best[limit - 1]]
+            best = [k for k in best if rough[k] <= cutoff]
+        ties = Counter(rough[k] for k in best)
+        letters = [(a, len(a)) for a in (frozenset(w) for w in words)]
+
+        def score(k: int) -> tuple[tuple[int, int], float, str]:
+            if ties[rough[k]] == 1:
+                return (rough[k], 0.0, "")
+            # break ties in favour of words with the same letters, which
+            # helps with transposed letters, a common typo
+            similar = 0.0
+            for a, na in letters:
+                best_j = 0.0
+                for b, nb in self._letters[k]:
+                    n = len(a & b)
+                    best_j = max(best_j, n / (na + nb - n))
+                similar += best_j
+            return (rough[k], -similar, self._entries[k])
+
+        return [self._entries[k] for k in sorted(best, key=score)[:limit]]
+
+
+class ClasslistCompleter(QCompleter):
+    """A completer that shows the best fuzzy matches from a :class:`ClasslistIndex`.
+
+    Unlike a plain :class:`QCompleter`, the model holds only the current
+    matches, already ranked, and is refilled as the user types.
+    """
+
+    def __init__(self, index: ClasslistIndex, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.index = index
+        self._model = QStringListModel(self)
+        self.setModel(self._model)
+        self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+
+    def splitPath(self, path: str) -> list[str]:
+        # called by Qt as the user types: refill the model with the matches
+        self._model.setStringList(self.index.search(path, self.maxVisibleItems()))
+        return [""]
@@ -0,0 +1,407 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Confirm many confident ID predictions at once, from a grid of thumbnails."""
+
+import logging
+from typing import Any, NamedTuple
+
+from PyQt6.QtCore import QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor, QIcon, QPixmap
+from PyQt6.QtWidgets import (
+    QDialog,
+    QDoubleSpinBox,
+    QHBoxLayout,
+    QLabel,
+    QListView,
+    QListWidget,
+    QListWidgetItem,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from plom.messenger import Messenger
+from .async_messenger import AsyncMessenger
+from .downloader import Downloader
+from .id_queue import IdentifyQueue, id_page_rows
+from .thumbnails import ThumbnailCache, Thumbnailer
+
+log = logging.getLogger("confirm_pred")
+
+
+class ConfidentPrediction(NamedTuple):
+    """A paper whose predictors agree on a student in the classlist."""
+
+    papernum: int
+    sid: str
+    sname: str
+    certainty: float
+    predictors: str
+
+
+def confident_predictions(
+    predictions: dict[str, list[dict[str, Any]]],
+    sid_to_name: dict[str, str],
+    *,
+    min_certainty: float = 0.3,
+    exclude: set[int] | None = None,
+) -> list[ConfidentPrediction]:
+    """Find the predictions that can be confirmed quickly, in bulk.
+
+    A prediction qualifies if all predictors for that paper agree, the
+    student is in the classlist, and the predictors are sufficiently
+    certain (prenaming is always certain enough).  Students predicted
+    for more than one paper are left out: a human needs to look at those.
+
+    Args:
+        predictions: for each paper number (as a string), a list of
+            predictions with keys ``student_id``, ``certainty`` and
+            ``predictor``, as from ``IDgetPredictions``.
+        sid_to_name: the student name of each student ID in the classlist.
+
+    Keyword Args:
+        min_certainty: the smallest acceptable certainty.
+        exclude: paper numbers to leave out, such as those already
+            identified.
+
+    Returns:
+        The qualifying predictions, by paper number.
+    """
+    exclude = exclude or set()
+    found = []
+    for key, preds in predictions.items():
+        papernum = int(key)
+        if not preds or papernum in exclude:
+            continue
+        sid = preds[0]["student_id"]
+        if any(p["student_id"] != sid for p in preds):
+            continue
+        if sid not in sid_to_name:
+            continue
+        certainty = min(p["certainty"] for p in preds)
+        prenamed = any(p["predictor"].casefold() == "prename" for p in preds)
+        if not prenamed and certainty < min_certainty:
+            continue
+        predictors = ", ".join(p["predictor"] for p in preds)
+        found.append(
+            ConfidentPrediction(papernum, sid, sid_to_name[sid], certainty, predictors)
+        )
+    counts: dict[str, int] = {}
+    for p in predictions.values():
+        for sid in {x["student_id"] for x in p}:
+            counts[sid] = counts.get(sid, 0) + 1
+    found = [x for x in found if counts[x.sid] == 1]
+    found.sort(key=lambda x: x.papernum)
+    return found
+
+
+def _get_id_page(msgr: Messenger, papernum: int) -> dict[str, Any] | None:
+    rows = id_page_rows(msgr.get_pagedata(papernum))
+    return rows[0] if rows else None
+
+
+class ConfirmPredictionsDialog(QDialog):
+    """Review a grid of ID pages with their predicted students, a page at a time.
+
+    Each ID page is shown as a thumbnail with the predicted student.
+    Papers whose thumbnails match are left checked; approving a page
+    claims and identifies all the checked papers, in the background,
+    while the user moves on to the next page.  Unchecked papers are
+    left for identifying one at a time.  So are papers whose thumbnail
+    has not yet arrived: nobody has seen those, so approving the page
+    leaves them, and stays on the page, until they have been shown.
+
+    The ID pages of the current and next page of the grid are fetched
+    ahead of time through the Downloader.
+
+    **Signals**:
+
+      * `approved(papernum: int, sid: str, sname: str)`: sent to the
+        server; the outcome comes from the :class:`IdentifyQueue`.
+    """
+
+    approved = pyqtSignal(int, str, str)
+
+    def __init__(
+        self,
+        parent: QWidget | None,
+        candidates: list[ConfidentPrediction],
+        *,
+        amsgr: AsyncMessenger,
+        downloader: Downloader,
+        idq: IdentifyQueue,
+        min_certainty: float = 0.3,
+        page_size: int = 24,
+        thumbnail_size: int = 240,
+    ) -> None:
+        """Initialize a new dialog.
+
+        Args:
+            parent: the Identifier, or None.
+            candidates: the papers to show, typically from
+                :func:`confident_predictions`.
+
+        Keyword Args:
+            amsgr: for fetching page data in the background.
+            downloader: for downloading the ID pages.
+            idq: for sending the identifications.
+            min_certainty: initially hide less certain predictions
+                (the user can change this).
+            page_size: how many papers to show at once.
+            thumbnail_size: longest side of the thumbnails in pixels.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Confirm predictions")
+        self._all_candidates = candidates
+        self.candidates = candidates
+        self._amsgr = amsgr
+        self._downloader = downloader
+        self._idq = idq
+        self.page_size = page_size
+        self._page = 0
+        # papernum -> ID page row of the page data (None if no ID page)
+        self._id_rows: dict[int, dict[str, Any] | None] = {}
+        # papernum -> "sending", "identified" or an error message
+        self._status: dict[int, str] = {}
+        self._items: dict[int, QListWidgetItem] = {}
+        # papers the user has unchecked
+        self._unchecked: set[int] = set()
+        # papers whose ID page has been shown, rather than the placeholder
+        self._shown: set[int] = set()
+        # small thumbnails, separate from the full-sized ones elsewhere
+        self.thumbnailer = Thumbnailer(
+            self, cache=ThumbnailCache(4 * page_size), size=thumbnail_size
+        )
+        self.thumbnailer.thumbnail_ready.connect(self._thumbnail_arrived)
+        self._downloader.download_finished.connect(self._page_image_arrived)
+        self._idq.submitted.connect(self._submitted)
+        self._idq.failed.connect(self._failed)
+
+        pix = QPixmap(thumbnail_size * 3 // 4, thumbnail_size)
+        pix.fill(QColor("lightGray"))
+        self._placeholder_icon = QIcon(pix)
+
+        vlay = QVBoxLayout()
+        explain = QLabel(
+            "<p>Check that each ID page matches the predicted student.  "
+            "Uncheck any that do not: they are left for identifying one "
+            "at a time.  <b>Approve page</b> identifies all the checked "
+            "papers on this page and moves on.  Papers still waiting for "
+            "their ID page are not identified.</p>"
+        )
+        explain.setWordWrap(True)
+        vlay.addWidget(explain)
+
+        hlay = QHBoxLayout()
+        hlay.addWidget(QLabel("Minimum certainty:"))
+        self.certaintyBox = QDoubleSpinBox()
+        self.certaintyBox.setRange(0.0, 1.0)
+        self.certaintyBox.setSingleStep(0.05)
+        self.certaintyBox.setValue(min_certainty)
+        self.certaintyBox.setToolTip("Prenamed papers are always shown")
+        self.certaintyBox.valueChanged.connect(self._filter)
+        hlay.addWidget(self.certaintyBox)
+        hlay.addStretch()
+        self.pageLabel = QLabel()
+        hlay.addWidget(self.pageLabel)
+        vlay.addLayout(hlay)
+
+        self.grid = QListWidget()
+        self.grid.setViewMode(QListWidget.ViewMode.IconMode)
+        self.grid.setFlow(QListView.Flow.LeftToRight)
+        self.grid.setWrapping(True)
+        self.grid.setResizeMode(QListView.ResizeMode.Adjust)
+        self.grid.setMovement(QListView.Movement.Static)
+        self.grid.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.grid.setSpacing(8)
+        self.grid.setSelectionMode(QListWidget.SelectionMode.NoSelection)
+        self.grid.itemChanged.connect(self._item_changed)
+        vlay.addWidget(self.grid)
+
+        hlay = QHBoxLayout()
+        self.prevButton = QPushButton("&Previous page")
+        self.prevButton.clicked.connect(lambda: self.show_page(self._page - 1))
+        self.nextButton = QPushButton("&Skip page")
+        self.nextButton.setToolTip("Move on without identifying these papers")
+        self.nextButton.clicked.connect(lambda: self.show_page(self._page + 1))
+        self.approveButton = QPushButton("&Approve page")
+        self.approveButton.clicked.connect(self.approve_page)
+        self.approveButton.setDefault(True)
+        closeButton = QPushButton("&Close")
+        closeButton.clicked.connect(self.accept)
+        hlay.addWidget(self.prevButton)
+        hlay.addWidget(self.nextButton)
+        hlay.addStretch()
+        hlay.addWidget(self.approveButton)
+        hlay.addWidget(closeButton)
+        vlay.addLayout(hlay)
+        self.setLayout(vlay)
+        self.resize(1200, 900)
+        self._filter(min_certainty)
+
+    def num_pages(self) -> int:
+        return max(1, -(-len(self.candidates) // self.page_size))
+
+    def _on_page(self, page: int) -> list[ConfidentPrediction]:
+        return self.candidates[page * self.page_size : (page + 1) * self.page_size]
+
+    def _filter(self, min_certainty: float) -> None:
+        self.candidates = [
+            c
+            for c in self._all_candidates
+            if c.certainty >= min_certainty or "prename" in c.predictors.casefold()
+        ]
+        self.show_page(0)
+
+    def show_page(self, page: int) -> None:
+        """Show a page of the grid and start fetching that page and the next."""
+        page = max(0, min(page, self.num_pages() - 1))
+        self._page = page
+        self.grid.blockSignals(True)
+        self.grid.clear()
+        self._items = {}
+        for c in self._on_page(page):
+            it = QListWidgetItem(
+                self._placeholder_icon, f"{c.papernum}\n{c.sid}\n{c.sname}"
+            )
+            it.setToolTip(f"Paper {c.papernum}: {c.predictors} ({c.certainty:.3g})")
+            it.setData(Qt.ItemDataRole.UserRole, c.papernum)
+            if c.papernum in self._unchecked:
+                it.setCheckState(Qt.CheckState.Unchecked)
+            else:
+                it.setCheckState(Qt.CheckState.Checked)
+            self.grid.addItem(it)
+            self._items[c.papernum] = it
+            self._show_icon(c.papernum)
+            self._update_item(c.papernum)
+        self.grid.blockSignals(False)
+        self.pageLabel.setText(
+            f"Page {page + 1} of {self.num_pages()}: {len(self.candidates)} papers"
+        )
+        self.prevButton.setEnabled(page > 0)
+        self.nextButton.setEnabled(page < self.num_pages() - 1)
+        self._fetch(page)
+        self._fetch(page + 1)
+
+    def _update_item(self, papernum: int) -> None:
+        it = self._items.get(papernum)
+        if it is None:
+            return
+        status = self._status.get(papernum)
+        flags = Qt.ItemFlag.ItemIsEnabled
+        if status is None:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+            it.setBackground(QBrush())
+        elif status == "sending":
+            it.setBackground(QBrush(QColor("#89CFF0")))
+        elif status == "identified":
+            it.setBackground(QBrush(QColor("#00FA9A")))
+        else:
+            it.setBackground(QBrush(QColor("#FF7F50")))
+            it.setToolTip(status)
+        it.setFlags(flags)
+
+    def _item_changed(self, it: QListWidgetItem) -> None:
+        papernum = it.data(Qt.ItemDataRole.UserRole)
+        if it.checkState() == Qt.CheckState.Checked:
+            self._unchecked.discard(papernum)
+        else:
+            self._unchecked.add(papernum)
+
+    def approve_page(self) -> None:
+        """Identify all the checked papers on this page, and move on.
+
+        Papers whose ID page has not been shown yet are left alone, and
+        then we stay on this page.
+        """
+        unseen = 0
+        for c in self._on_page(self._page):
+            if self._status.get(c.papernum) is not None:
+                continue
+            if self._items[c.papernum].checkState() != Qt.CheckState.Checked:
+                continue
+            if c.papernum not in self._shown:
+                unseen += 1
+                continue
+            self._status[c.papernum] = "sending"
+            self._update_item(c.papernum)
+            self._idq.enqueue(c.papernum, c.sid, c.sname, claim=True)
+            self.approved.emit(c.papernum, c.sid, c.sname)
+        if unseen:
+            log.info("%d papers not approved: ID page not yet shown", unseen)
+            return
+        if self._page < self.num_pages() - 1:
+            self.show_page(self._page + 1)
+
+    def _submitted(self, papernum: int) -> None:
+        if papernum in self._status:
+            self._status[papernum] = "identified"
+            self._update_item(papernum)
+
+    def _failed(self, papernum: int, err: Exception) -> None:
+        if papernum in self._status:
+            self._status[papernum] = f"Not identified: {err}"
+            self._update_item(papernum)
+
+    def _fetch(self, page: int) -> None:
+        for c in self._on_page(page):
+            n = c.papernum
+            if n in self._id_rows:
+                self._request_image(n)
+                continue
+            self._amsgr.submit(
+                _get_id_page, n, key=("confirm", n), group="confirm"
+            ).then(lambda row, n=n: self._got_id_row(n, row))
+
+    def _got_id_row(self, papernum: int, row: dict[str, Any] | None) -> None:
+        self._id_rows[papernum] = row
+        if row is None:
+            log.warning("paper %d has no ID page", papernum)
+            return
+        self._request_image(papernum)
+
+    def _request_image(self, papernum: int) -> None:
+        row = self._id_rows.get(papernum)
+        if row is None:
+            return
+        pc = self._downloader.pagecache
+        if pc.has_page_image(row["id"]):
+            self._page_image_arrived(
+                row["id"], row["md5"], str(pc.page_image_path(row["id"]))
+            )
+            return
+        self._downloader.download_in_background_thread(
+            row, priority=papernum in self._items
+        )
+
+    def _page_image_arrived(self, img_id: int, md5: str, filename: str) -> None:
+        if not any(r and r["id"] == img_id for r in self._id_rows.values()):
+            return
+        if self.thumbnailer.request(md5, filename):
+            self._thumbnail_arrived(md5)
+
+    def _thumbnail_arrived(self, md5: str) -> None:
+        for n in self._items:
+            row = self._id_rows.get(n)
+            if row and row["md5"] == md5:
+                self._show_icon(n)
+
+    def _show_icon(self, papernum: int) -> None:
+        """Show the thumbnail of a paper's ID page, if we have it yet."""
+        row = self._id_rows.get(papernum)
+        if not row:
+            return
+        img = self.thumbnailer.cache.get(row["md5"], row["orientation"])
+        if img is None:
+            return
+        self._items[papernum].setIcon(QIcon(QPixmap.fromImage(img)))
+        self._shown.add(papernum)
+
+    def done(self, r: int) -> None:
+        self._amsgr.cancel_group("confirm")
+        self.thumbnailer.stop()
+        self._downloader.download_finished.disconnect(self._page_image_arrived)
+        self._idq.submitted.disconnect(self._submitted)
+        self._idq.failed.disconnect(self._failed)
+        super().done(r)
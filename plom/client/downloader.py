@@ -5,26 +5,411 @@
 
 """The background downloader downloads images using threads."""
 
+import hashlib
 import logging
 import random
+from collections import deque
+from contextlib import contextmanager
+import tarfile
 import tempfile
 import threading
 from importlib import resources
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from time import sleep, time
-from typing import Any
+from typing import Any, BinaryIO, Callable, Iterator
 
 # from PyQt6.QtCore import QThread
 from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+import requests
+import urllib3
 
 from plom.messenger import Messenger
-from plom.common.exceptions import PlomConnectionError, PlomException
+from plom.common.exceptions import (
+    PlomAuthenticationException,
+    PlomConflict,
+    PlomConnectionError,
+    PlomException,
+    PlomNoMoreException,
+    PlomSeriousException,
+)
 
 from .pagecache import PageCache
 from . import icons
 
 log = logging.getLogger("Downloader")
 
+# size of the pieces in which we write streamed downloads
+_chunk_size = 64 * 1024
+
+
+def stream_image_to_file(
+    msgr: Messenger,
+    img_id: int,
+    md5: str,
+    f: BinaryIO,
+    *,
+    max_resumes: int = 2,
+) -> int:
+    """Download an image in chunks into a file, checking its md5sum as we go.
+
+    At most one chunk is held in memory, regardless of the size of the
+    image.  If the transfer stops part way through, we ask the server
+    for the rest (an HTTP range request); if the server does not honour
+    that, we start again from the beginning.
+
+    Args:
+        msgr: a Messenger, we will hold its mutex during the download.
+        img_id: the key into the server's database of images.
+        md5: the expected md5sum of the image.
+        f: a file open for binary writing, positioned at its start.
+
+    Keyword Args:
+        max_resumes: how many times to try to resume a partial transfer.
+
+    Returns:
+        The number of bytes written.
+
+    Raises:
+        PlomAuthenticationException: not logged in.
+        PlomConflict: the server disagrees with our md5sum.
+        PlomNoMoreException: no such image.
+        PlomSeriousException: the data we received does not match the
+            md5sum, or other errors from the server.
+        PlomConnectionError: the transfer failed and could not be resumed.
+    """
+    if not msgr.token:
+        raise PlomAuthenticationException("Trying auth'd operation w/o token")
+    assert msgr.session
+    url = f"{msgr.base}/MK/images/{img_id}/{md5}"
+    hasher = hashlib.md5()
+    nbytes = 0
+    resumes = 0
+    while True:
+        # Cannot use msgr.get_auth here as we need an extra header
+        headers = {"Authorization": f"Token {msgr.token['token']}"}
+        if nbytes:
+            headers["Range"] = f"bytes={nbytes}-"
+        with msgr.SRmutex:
+            try:
+                response = msgr.session.get(
+                    url, headers=headers, stream=True, timeout=msgr.default_timeout
+                )
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                if response.status_code == 401:
+                    raise PlomAuthenticationException() from None
+                if response.status_code == 409:
+                    raise PlomConflict("Wrong md5sum provided") from None
+                if response.status_code == 404:
+                    raise PlomNoMoreException("Cannot find image") from None
+                raise PlomSeriousException(f"Some other sort of error {e}") from None
+            except requests.RequestException as e:
+                raise PlomConnectionError(e) from None
+            with response:
+                if nbytes and response.status_code != 206:
+                    log.info("image %d: server cannot resume, restarting", img_id)
+                    f.seek(0)
+                    f.truncate()
+                    hasher = hashlib.md5()
+                    nbytes = 0
+                try:
+                    for chunk in response.iter_content(_chunk_size):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        nbytes += len(chunk)
+                except requests.RequestException as e:
+                    if resumes >= max_resumes:
+                        raise PlomConnectionError(
+                            f"image {img_id}: transfer failed after {nbytes} bytes"
+                            f" and {resumes} resumes: {e}"
+                        ) from None
+                    resumes += 1
+                    log.warning(
+                        "image %d: transfer interrupted after %d bytes, resuming: %s",
+                        img_id,
+                        nbytes,
+                        e,
+                    )
+                    continue
+        break
+    if hasher.hexdigest() != md5:
+        raise PlomSeriousException(
+            f"image {img_id}: downloaded data has md5sum {hasher.hexdigest()}"
+            f" but expected {md5}"
+        )
+    return nbytes
+
+
+def download_image_to_file(
+    msgr: Messenger, img_id: int, md5: str, f: BinaryIO, *, streaming: bool = True
+) -> int:
+    """Download an image into a file, and check its md5sum.
+
+    Args:
+        msgr: a Messenger.
+        img_id: the key into the server's database of images.
+        md5: the expected md5sum of the image.
+        f: a file open for binary writing.
+
+    Keyword Args:
+        streaming: if True (default) write the image in chunks as it
+            arrives, see :func:`stream_image_to_file`.  Otherwise the
+            image is held in memory then written.
+
+    Returns:
+        The number of bytes written.
+
+    Raises:
+        PlomSeriousException: the data does not match the md5sum; and
+        others, see :func:`stream_image_to_file`.
+    """
+    if streaming:
+        return stream_image_to_file(msgr, img_id, md5, f)
+    im_bytes = msgr.get_image(img_id, md5)
+    if hashlib.md5(im_bytes).hexdigest() != md5:
+        raise PlomSeriousException(
+            f"image {img_id}: downloaded data does not match md5sum {md5}"
+        )
+    f.write(im_bytes)
+    return len(im_bytes)
+
+
+def _count_connections(msgr: Messenger) -> int:
+    """How many connections has the HTTP session of this Messenger opened.
+
+    Peeks into the connection pools of ``urllib3``, beneath ``requests``.
+    """
+    session = msgr.session
+    if session is None:
+        return 0
+    n = 0
+    for adapter in session.adapters.values():
+        poolmanager = getattr(adapter, "poolmanager", None)
+        if poolmanager is None:
+            continue
+        for key in poolmanager.pools.keys():
+            pool = poolmanager.pools.get(key)
+            n += getattr(pool, "num_connections", 0)
+    return n
+
+
+class MessengerPool:
+    """A small pool of long-lived Messengers for use by worker threads.
+
+    Making a new Messenger gives a new HTTP session, and thus a new
+    connection (and TLS handshake) to the server.  Instead, workers
+    borrow a Messenger from this pool and give it back when done, so
+    the underlying keep-alive connections are reused between jobs.
+
+    Use it like this, from any thread::
+
+        with pool.messenger() as msgr:
+            msgr.get_image(...)
+
+    When the pool is closed, idle Messengers are stopped immediately,
+    and busy ones are stopped when they are returned.  No logout is
+    performed: the Messengers share the token of the original.
+    """
+
+    def __init__(self, msgr: Messenger, max_size: int = 2) -> None:
+        """Initialize a new pool of clones of a Messenger.
+
+        Args:
+            msgr: we will make clones of this as needed.  The caller
+                should not revoke its token while we're using it.
+            max_size: the most idle Messengers that we'll keep around,
+                typically the number of worker threads.
+        """
+        self._template = msgr
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._idle: list[Messenger] = []
+        self._busy: list[Messenger] = []
+        self._closed = False
+        self.number_of_clones = 0
+        self.number_of_reuses = 0
+        self._retired_connections = 0
+        # recent request latencies in seconds
+        self._latencies: deque[float] = deque(maxlen=100)
+
+    def acquire(self) -> Messenger:
+        """Borrow a Messenger, you must give it back with :meth:`release`.
+
+        Raises:
+            PlomConnectionError: the pool is closed.
+        """
+        with self._lock:
+            if self._closed:
+                raise PlomConnectionError("Messenger pool is closed")
+            if self._idle:
+                m = self._idle.pop()
+                self._busy.append(m)
+                self.number_of_reuses += 1
+                return m
+            self.number_of_clones += 1
+        m = self._template.clone_a_copy()
+        with self._lock:
+            self._busy.append(m)
+        return m
+
+    def release(self, msgr: Messenger) -> None:
+        """Give back a Messenger borrowed from the pool."""
+        with self._lock:
+            self._busy.remove(msgr)
+            if not self._closed and len(self._idle) < self.max_size:
+                self._idle.append(msgr)
+                return
+            self._retired_connections += _count_connections(msgr)
+        msgr.stop()
+
+    @contextmanager
+    def messenger(self) -> Iterator[Messenger]:
+        """Borrow a Messenger for the duration of a with-block."""
+        m = self.acquire()
+        try:
+            yield m
+        finally:
+            self.release(m)
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def close(self) -> None:
+        """Stop idle Messengers; busy ones will be stopped when they come back."""
+        with self._lock:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            for m in idle:
+                self._retired_connections += _count_connections(m)
+        for m in idle:
+            m.stop()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Information about connection reuse and request latency."""
+        with self._lock:
+            connections = self._retired_connections + sum(
+                _count_connections(m) for m in self._idle + self._busy
+            )
+            latencies = list(self._latencies)
+        return {
+            "msgr_clones": self.number_of_clones,
+            "msgr_reuses": self.number_of_reuses,
+            "connections_opened": connections,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_max": max(latencies) if latencies else None,
+        }
+
+
+def fetch_image_batch(
+    msgr: Messenger,
+    rows: list[dict[str, Any]],
+    basedir: Path,
+    deliver: Callable[[int, str], None],
+) -> set[int] | None:
+    """Download several images in one request, delivering each as it arrives.
+
+    The server streams a tar archive, one member per image, named by
+    the image id (possibly with a file extension).  We read the stream
+    incrementally: each image is written to a temporary file in
+    ``basedir`` and passed to the ``deliver`` callback before the next
+    one has finished arriving.
+
+    Args:
+        msgr: a Messenger, we will hold its mutex during the download.
+        rows: dicts of "page data", each with at least ``id`` and ``md5``.
+        basedir: where to put temporary files.
+        deliver: called as ``deliver(img_id, tmpfile)`` for each image
+            received.  It is responsible for moving the temporary file
+            somewhere else (or deleting it).
+
+    Returns:
+        The set of image ids that were delivered, which might not be all
+        of them, e.g., if the connection dropped part way or if an image
+        did not match its md5sum.  Or None if the server does not
+        support batch downloads.
+
+    Raises:
+        PlomAuthenticationException: not logged in.
+        PlomSeriousException: other errors from the server.
+        PlomConnectionError: could not start the download.
+    """
+    by_id = {r["id"]: r for r in rows}
+    payload = {
+        "images": [{"id": r["id"], "md5": r.get("md5") or r["md5sum"]} for r in rows]
+    }
+    delivered: set[int] = set()
+    with msgr.SRmutex:
+        try:
+            response = msgr.post_auth("/MK/images/batch", json=payload, stream=True)
+            if response.status_code in (404, 405, 501):
+                response.close()
+                return None
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            if response.status_code == 401:
+                raise PlomAuthenticationException() from None
+            raise PlomSeriousException(f"Error in batch image download: {e}") from None
+        except requests.RequestException as e:
+            raise PlomConnectionError(e) from None
+        with response:
+            # let urllib3 undo any gzip etc transfer encoding
+            response.raw.decode_content = True
+            try:
+                with tarfile.open(fileobj=response.raw, mode="r|") as tar:
+                    for member in tar:
+                        if not member.isfile():
+                            continue
+                        name = PurePosixPath(member.name)
+                        try:
+                            img_id = int(name.stem)
+                        except ValueError:
+                            log.warning("batch: ignoring unexpected %s", member.name)
+                            continue
+                        if img_id not in by_id or img_id in delivered:
+                            log.warning("batch: ignoring unexpected %s", member.name)
+                            continue
+                        fin = tar.extractfile(member)
+                        assert fin is not None
+                        hasher = hashlib.md5()
+                        with tempfile.NamedTemporaryFile(
+                            "wb",
+                            dir=basedir,
+                            prefix="downloading_",
+                            suffix=name.suffix,
+                            delete=False,
+                        ) as f:
+                            try:
+                                while chunk := fin.read(_chunk_size):
+                                    f.write(chunk)
+                                    hasher.update(chunk)
+                            except BaseException:
+                                # don't leave a partial file behind
+                                f.close()
+                                Path(f.name).unlink(missing_ok=True)
+                                raise
+                        md5 = by_id[img_id].get("md5") or by_id[img_id]["md5sum"]
+                        if hasher.hexdigest() != md5:
+                            log.warning("batch: image %d has wrong md5sum", img_id)
+                            Path(f.name).unlink()
+                            continue
+                        delivered.add(img_id)
+                        deliver(img_id, f.name)
+            except (
+                tarfile.TarError,
+                requests.RequestException,
+                # reading the raw stream can raise these directly
+                urllib3.exceptions.HTTPError,
+                OSError,
+            ) as e:
+                log.warning(
+                    "batch: stream ended early after %d of %d images: %s",
+                    len(delivered),
+                    len(rows),
+                    e,
+                )
+    return delivered
+
 
 class Downloader(QObject):
     """Downloads and maintains a cache of images.
@@ -41,8 +426,14 @@ class Downloader(QObject):
     TODO: document how to check if something is in the queue or/and
     or currently downloading.
 
+    Several images can be enqueued together using
+    :meth:`download_batch_in_background_thread`: if the server supports
+    it these are fetched in a single request, otherwise they fall back
+    to individual downloads.
+
     Synchronous downloads can be performed with :meth:`sync_download`
     and :meth:`sync_downloads`.  These images will also be cached.
+    The latter also uses a single request when the server supports it.
 
     TODO: document how to query the queue size.
     TODO: document how to query the size on disc.
@@ -51,7 +442,10 @@ class Downloader(QObject):
     For shutting down the queue, see :meth:`stop`.
     The Downloader keeps a clone of the messenger: if you logout
     (revoke the token) in another msgr while this is downloading,
-    you'll get a crash.
+    you'll get a crash.  Background workers borrow further clones
+    from a small :class:`MessengerPool`, so that HTTP connections are
+    reused from one download to the next.  Connection reuse and
+    request latency are reported by :meth:`get_stats`.
 
     The Downloader will emit various **signals**.  You can connect
     slots to these:
@@ -78,7 +472,13 @@ class Downloader(QObject):
     # emitted when queue lengths change (i.e., things enqueued)
     download_queue_changed = pyqtSignal(dict)
 
-    def __init__(self, basedir: str | Path, *, msgr: Messenger | None = None) -> None:
+    def __init__(
+        self,
+        basedir: str | Path,
+        *,
+        msgr: Messenger | None = None,
+        streaming: bool = True,
+    ) -> None:
         """Initialize a new Downloader.
 
         Args:
@@ -90,15 +490,16 @@ class Downloader(QObject):
                 Note Messenger is not multithreaded and blocks using
                 mutexes.  Here we make our own private clone so caller
                 can keep using their's.
+            streaming: write images to the cache in chunks as they
+                arrive, rather than holding each in memory.  Either way,
+                the md5sum is checked before the image is put in the
+                cache.
 
         Returns:
             None.
         """
         super().__init__()
         # self.is_download_in_progress = False
-        self.msgr: None | Messenger = None
-        if msgr:
-            self.msgr = msgr.clone_a_copy()
         self.basedir = Path(basedir)
         self.write_lock = threading.Lock()
         self.pagecache = PageCache(basedir)
@@ -107,6 +508,12 @@ class Downloader(QObject):
         self.threadpool = QThreadPool()
         # TODO: will this stop Marker from getting one?  It doesn't seem to...
         self.threadpool.setMaxThreadCount(2)
+        self.streaming = streaming
+        self.msgr: None | Messenger = None
+        # the workers borrow long-lived messengers from here
+        self._msgr_pool: None | MessengerPool = None
+        if msgr:
+            self.attach_messenger(msgr)
         self._tries: dict[int, int] = {}
         self._total_tries: dict[int, int] = {}
         self._in_progress: dict[int, bool] = {}
@@ -123,13 +530,26 @@ class Downloader(QObject):
         # These are ignored unless simulate_failures is True.
         self._simulate_failure_rate = 33.0
         self._simulate_slow_net = (0.5, 3.0)
+        # None until we know whether the server can do batch downloads
+        self._batch_supported: bool | None = None
+        self._batch_rows: dict[int, dict[str, Any]] = {}
+        # image ids that a user is waiting for, these go first
+        self._high_priority: set[int] = set()
 
     def attach_messenger(self, msgr: Messenger) -> None:
         """Add/replace the current messenger."""
+        if self._msgr_pool:
+            self._msgr_pool.close()
         self.msgr = msgr.clone_a_copy()
+        self._msgr_pool = MessengerPool(
+            self.msgr, max_size=self.threadpool.maxThreadCount()
+        )
 
     def detach_messenger(self) -> None:
         """Stop our messenger and forget it (but do not logout)."""
+        if self._msgr_pool:
+            self._msgr_pool.close()
+        self._msgr_pool = None
         if self.msgr:
             self.msgr.stop()
         self.msgr = None
@@ -171,16 +591,30 @@ class Downloader(QObject):
         return str(self._placeholder_image)
 
     def get_stats(self) -> dict[str, Any]:
+        """Information about the queue, cache and connections.
+
+        Returns:
+            A dict with keys including ``"cache_size"``, ``"queued"``,
+            ``"retries"`` and ``"fails"``.  If we have a messenger,
+            then also ``"msgr_clones"`` (how many sessions were made for
+            background workers), ``"msgr_reuses"`` (how many times a
+            worker reused an existing session), ``"connections_opened"``
+            and the ``"latency_mean"`` and ``"latency_max"`` in seconds
+            of recent background downloads (None if no downloads yet).
+        """
         # TODO: would be nice to know the "gave up after 3 tries" failures...
         # TODO: track retries and fails (more positive!)
         in_progress_ids = [k for k, v in self._in_progress.items() if v is True]
-        return {
+        stats = {
             "cache_size": self.pagecache.how_many_cached(),
             "fails": self.number_of_fails,
             "retries": self.number_of_retries,
             "queued": len(in_progress_ids),
             "in_progress_ids": in_progress_ids,
         }
+        if self._msgr_pool:
+            stats.update(self._msgr_pool.get_stats())
+        return stats
 
     def print_queue(self) -> None:
         print("enumerating all jobs to check for in progress...")
@@ -268,32 +702,19 @@ class Downloader(QObject):
             # return early if this image id is already in queue
             # TODO but we should reset retries?
             return
-        # try some things to get a reasonable local filename
-        target_name = row.get("server_path", None)
-        # Note: too dangerous: callers are likely to have put placeholder in these!
-        # if target_name is None:
-        #     target_name = row.get("local_filename", None)
-        # if target_name is None:
-        #     target_name = row.get("filename", None)
-        if target_name is None:
-            raise NotImplementedError("TODO: then use a random value")
-        if str(target_name) == str(self._placeholder_image):
-            raise RuntimeError(
-                f"Unexpectedly detected target image as placeholder: {row}"
-            )
-        target_name = self.basedir / (Path(target_name).name)
+        target_name = self._target_name(row)
 
-        if not self.msgr:
+        if not self.msgr or not self._msgr_pool:
             raise PlomConnectionError(
                 "Cannot download as we don't have an active Messenger"
             )
-        assert self.msgr is not None
         worker = DownloadWorker(
-            self.msgr,
+            self._msgr_pool,
             row["id"],
             row["md5"],
             target_name,
             basedir=self.basedir,
+            streaming=self.streaming,
             simulate_failures=(
                 (self._simulate_failure_rate, self._simulate_slow_net)
                 if self.simulate_failures
@@ -302,12 +723,11 @@ class Downloader(QObject):
         )
         worker.signals.download_succeed.connect(self._worker_delivers)
         worker.signals.download_fail.connect(self._worker_failed)
-        # TODO: Getting TypeError, try on more recent PyQt6...?
-        # (QRunnable, priority: int = 0): argument 2 has unexpected type 'Priority'
+        # Note: this is the queue position, not a QThread.Priority: user-
+        # requested images jump ahead of any enqueued background downloads
         if priority:
-            self.threadpool.start(worker)  # , QThread.Priority.HighPriority)
-        else:
-            self.threadpool.start(worker)  # , QThread.Priority.LowPriority)
+            self._high_priority.add(row["id"])
+        self.threadpool.start(worker, 1 if row["id"] in self._high_priority else 0)
         # keep track of which img_ids are in progress
         # todo: semaphore around this and .start?
         self._in_progress[row["id"]] = True
@@ -328,6 +748,106 @@ class Downloader(QObject):
         # TODO: did it though?  Maybe more when it returns?
         self.download_queue_changed.emit(self.get_stats())
 
+    def _target_name(self, row: dict[str, Any]) -> Path:
+        """Choose a reasonable local filename for a row of page data."""
+        target_name = row.get("server_path", None)
+        # Note: too dangerous: callers are likely to have put placeholder in these!
+        # if target_name is None:
+        #     target_name = row.get("local_filename", None)
+        # if target_name is None:
+        #     target_name = row.get("filename", None)
+        if target_name is None:
+            raise NotImplementedError("TODO: then use a random value")
+        if str(target_name) == str(self._placeholder_image):
+            raise RuntimeError(
+                f"Unexpectedly detected target image as placeholder: {row}"
+            )
+        return self.basedir / (Path(target_name).name)
+
+    def download_batch_in_background_thread(
+        self, rows: list[dict[str, Any]], priority: bool = False
+    ) -> None:
+        """Enqueue the downloading of several rows of the image database.
+
+        If the server supports it, the images are downloaded in a single
+        request, which saves round trips on high-latency connections.
+        The usual ``download_finished`` signal is emitted for each image
+        as it arrives.  Any images that do not arrive (e.g., the
+        connection drops, or the server does not support batches) are
+        automatically enqueued as individual downloads, see
+        :meth:`download_in_background_thread`.
+
+        Args:
+            rows: a list of rows of "page data", see
+                :meth:`download_in_background_thread`.
+
+        Keyword Args:
+            priority: high priority if user requested this (not a
+                background download.
+
+        Returns:
+            None
+
+        Raises:
+            PlomConnectionError: we do not have a valid Messenger.
+        """
+        todo = [
+            row
+            for row in rows
+            if not self.pagecache.has_page_image(row["id"])
+            and not self._in_progress.get(row["id"])
+        ]
+        # dedupe, e.g., shared pages
+        todo = list({row["id"]: row for row in todo}.values())
+        if not todo:
+            return
+        if len(todo) == 1 or self._batch_supported is False or self.simulate_failures:
+            for row in todo:
+                self.download_in_background_thread(row, priority=priority)
+            return
+        if not self.msgr or not self._msgr_pool:
+            raise PlomConnectionError(
+                "Cannot download as we don't have an active Messenger"
+            )
+        targets = {}
+        for row in todo:
+            targets[row["id"]] = self._target_name(row)
+            self._batch_rows[row["id"]] = row
+            self._in_progress[row["id"]] = True
+        worker = BatchDownloadWorker(
+            self._msgr_pool, todo, targets, basedir=self.basedir
+        )
+        worker.signals.download_succeed.connect(self._worker_delivers)
+        worker.signals.batch_finished.connect(self._batch_finished)
+        if priority:
+            self._high_priority.update(targets.keys())
+        self.threadpool.start(worker, 1 if priority else 0)
+        log.info("starting batch download of %d images", len(todo))
+        self.download_queue_changed.emit(self.get_stats())
+
+    def _batch_finished(self, supported: bool | None, undelivered: list[int]) -> None:
+        """A batch worker is done: anything it didn't get we download individually."""
+        if supported is not None:
+            if self._batch_supported is None:
+                log.info("server batch download support: %s", supported)
+            self._batch_supported = supported
+        if undelivered:
+            log.info("batch: %d images to download individually", len(undelivered))
+        for img_id in undelivered:
+            row = self._batch_rows.pop(img_id, None)
+            self._in_progress[img_id] = False
+            if row is None:
+                log.warning("batch: no record of undelivered image %d", img_id)
+                continue
+            if self._stopping or not self.msgr:
+                continue
+            self.download_in_background_thread(row)
+        # the rest were delivered and are no longer needed
+        self._batch_rows = {
+            k: v for k, v in self._batch_rows.items() if self._in_progress.get(k)
+        }
+        self.download_queue_changed.emit(self.get_stats())
+
     def _worker_delivers(self, img_id: int, md5: str, tmpfile, targetfile) -> None:
         """A worker has succeed and delivered a temp file to us.
 
@@ -349,6 +869,7 @@ class Downloader(QObject):
         # TODO: maybe pagecache should have the desired filename?
         # TODO: revisit once PageCache decides None/Exception...
         self._in_progress[img_id] = False
+        self._high_priority.discard(img_id)
         if self.pagecache.has_page_image(img_id):
             cur = self.pagecache.page_image_path(img_id)
         else:
@@ -366,7 +887,7 @@ class Downloader(QObject):
         Path(targetfile).parent.mkdir(exist_ok=True, parents=True)
         with self.write_lock:
             Path(tmpfile).rename(targetfile)
-            self.pagecache.set_page_image_path(img_id, targetfile)
+            self.pagecache.set_page_image_path(img_id, targetfile, md5=md5)
         self.download_finished.emit(img_id, md5, targetfile)
         self.download_queue_changed.emit(self.get_stats())
 
@@ -387,6 +908,7 @@ class Downloader(QObject):
             )
             self.number_of_fails += 1
             self._in_progress[img_id] = False
+            self._high_priority.discard(img_id)
             self.download_queue_changed.emit(self.get_stats())
             return
         if self._stopping:
@@ -394,7 +916,12 @@ class Downloader(QObject):
             self._in_progress[img_id] = False
             self.download_queue_changed.emit(self.get_stats())
             return
-        # TODO: does not respect the original priority: high priority failure becomes ordinary
+        if not self.msgr:
+            log.warning("Not retrying image %d b/c we have no messenger", img_id)
+            self._in_progress[img_id] = False
+            self.download_queue_changed.emit(self.get_stats())
+            return
+        # a retry keeps its original priority, see `_high_priority`
         self.download_in_background_thread(
             {"id": img_id, "md5": md5, "server_path": targetfile},
             _is_retry=True,
@@ -412,11 +939,56 @@ class Downloader(QObject):
         Returns:
             list: a list of dicts which consists of the updated input with
             filenames added/updated for each image.
+
+        If the server supports it, the images not already in the cache
+        are downloaded in a single request.
         """
+        todo = [row for row in pagedata if not self.pagecache.has_page_image(row["id"])]
+        todo = list({row["id"]: row for row in todo}.values())
+        if len(todo) > 1 and self._batch_supported is not False:
+            if not self.simulate_failures:
+                self._sync_download_batch(todo)
         for row in pagedata:
             row = self.sync_download(row)
         return pagedata
 
+    def _sync_download_batch(self, rows: list[dict[str, Any]]) -> None:
+        """Synchronously download several images in one request, into the cache.
+
+        Anything not delivered is silently skipped: the caller should
+        check the cache and download individually as needed.
+        """
+        targets = {row["id"]: self._target_name(row) for row in rows}
+        md5s = {row["id"]: row.get("md5") or row["md5sum"] for row in rows}
+
+        def deliver(img_id: int, tmpfile: str) -> None:
+            f = targets[img_id]
+            f.parent.mkdir(exist_ok=True, parents=True)
+            with self.write_lock:
+                if self.pagecache.has_page_image(img_id):
+                    # someone else (a background worker?) beat us to it
+                    Path(tmpfile).unlink()
+                    return
+                Path(tmpfile).rename(f)
+                self.pagecache.set_page_image_path(img_id, f, md5=md5s[img_id])
+
+        assert self.msgr
+        t0 = time()
+        try:
+            delivered = fetch_image_batch(self.msgr, rows, self.basedir, deliver)
+        except PlomException as e:
+            # individual downloads will be tried, and will raise if appropriate
+            log.warning("batch download failed: %s", e)
+            return
+        self._batch_supported = delivered is not None
+        if delivered is not None:
+            log.debug(
+                "batch: got %d of %d images in %.3gs",
+                len(delivered),
+                len(rows),
+                time() - t0,
+            )
+
     def sync_download(self, row: dict[str, Any]) -> dict[str, Any]:
         """Given a row of "pagedata", download synchronously and return edited row.
 
@@ -468,13 +1040,24 @@ class Downloader(QObject):
         # if self.simulate_failures and fail:
         #     raise NotImplementedError("TODO: how to simulate failure?")
         assert self.msgr
-        im_bytes = self.msgr.get_image(row["id"], md5)
+        # write to a temp file: don't publish until we've checked the md5sum
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=self.basedir, prefix="downloading_", delete=False
+        ) as fh:
+            try:
+                download_image_to_file(
+                    self.msgr, row["id"], md5, fh, streaming=self.streaming
+                )
+            except Exception:
+                fh.close()
+                Path(fh.name).unlink()
+                raise
         if self.simulate_failures:
             sleep(wait2)
-        with open(f, "wb") as fh:
-            fh.write(im_bytes)
-        row["filename"] = str(f)
-        self.pagecache.set_page_image_path(row["id"], row["filename"])
+        with self.write_lock:
+            Path(fh.name).rename(f)
+            row["filename"] = str(f)
+            self.pagecache.set_page_image_path(row["id"], row["filename"], md5=md5)
         return row
 
 
@@ -492,6 +1075,11 @@ class WorkerSignals(QObject):
     download_fail:
         `(img_id (int), md5 (str), targetfile (str), err_stuff_tuple (tuple)`
         where the tuple is `(exctype, value, traceback.format_exc()`.
+
+    batch_finished:
+        `(supported (bool | None), undelivered (list))` where the list
+        contains the image ids that were not downloaded by a batch worker.
+        `supported` is None if we could not tell (e.g., connection error).
     """
 
     finished = pyqtSignal()
@@ -499,21 +1087,25 @@ class WorkerSignals(QObject):
     # result = pyqtSignal(object)
     download_succeed = pyqtSignal(int, str, str, str)
     download_fail = pyqtSignal(int, str, str, tuple)
+    batch_finished = pyqtSignal(object, list)
 
 
 class DownloadWorker(QRunnable):
     def __init__(
         self,
-        msgr: Messenger,
+        msgr_pool: MessengerPool,
         img_id: int,
         md5: str,
         target_name: Path,
         *,
         basedir: Path,
+        streaming: bool = True,
         simulate_failures: bool | tuple[float, tuple[float, float]] = False,
     ):
         super().__init__()
-        self._msgr = msgr.clone_a_copy()
+        self.streaming = streaming
+        # we borrow a messenger only while running
+        self._msgr_pool = msgr_pool
         self.img_id = img_id
         self.md5 = md5
         self.target_name = Path(target_name)
@@ -541,10 +1133,23 @@ class DownloadWorker(QRunnable):
             wait1 = random.random() * wait2
             wait2 -= wait1
             sleep(wait1)
+        # the image goes to a temp file; the md5sum is checked before we
+        # hand it back, so the Downloader can publish it in the PageCache
+        f = tempfile.NamedTemporaryFile(
+            "wb",
+            dir=self.basedir,
+            prefix="downloading_",
+            suffix=self.target_name.suffix,
+            delete=False,
+        )
         try:
             t0 = time()
             try:
-                im_bytes = self._msgr.get_image(self.img_id, self.md5)
+                with f, self._msgr_pool.messenger() as msgr:
+                    nbytes = download_image_to_file(
+                        msgr, self.img_id, self.md5, f, streaming=self.streaming
+                    )
+                self._msgr_pool.record_latency(time() - t0)
                 if self.simulate_failures and simfail:
                     # TODO: can get PlomNotAuthorized if the pre-clone msgr is logged out
                     raise NotImplementedError(
@@ -552,24 +1157,17 @@ class DownloadWorker(QRunnable):
                     )
             except PlomException as e:
                 log.warning(f"vaguely expected failure! {str(e)}")
+                Path(f.name).unlink()
                 self.signals.download_fail.emit(
                     self.img_id, self.md5, str(self.target_name), (str(e), "whut else?")
                 )
                 self.signals.finished.emit()
                 return
             t1 = time()
-            with tempfile.NamedTemporaryFile(
-                "wb",
-                dir=self.basedir,
-                prefix="downloading_",
-                suffix=self.target_name.suffix,
-                delete=False,
-            ) as f:
-                f.write(im_bytes)
-            t2 = time()
         except Exception as e:
             # TODO: generic catch-all bad, beer good
             log.error(f"unexpected failure, wtf we do here?! {str(e)}")
+            Path(f.name).unlink(missing_ok=True)
             self.signals.download_fail.emit(
                 self.img_id, self.md5, str(self.target_name), (str(e), "whut else?")
             )
@@ -579,14 +1177,69 @@ class DownloadWorker(QRunnable):
             sleep(wait2)
         if self.simulate_failures:
             log.debug(
-                "worker time: %.3gs download, %.3gs write, %.3gs debuggery",
+                "worker time: %.3gs download of %d bytes, %.3gs debuggery",
                 t1 - t0,
-                t2 - t1,
+                nbytes,
                 wait1 + wait2,
             )
         else:
-            log.debug("worker time: %.3gs download, %.3gs write", t1 - t0, t2 - t1)
+            log.debug("worker time: %.3gs download of %d bytes", t1 - t0, nbytes)
         self.signals.download_succeed.emit(
             self.img_id, self.md5, f.name, str(self.target_name)
         )
         self.signals.finished.emit()
+
+
+class BatchDownloadWorker(QRunnable):
+    """Download several images in one request, see :func:`fetch_image_batch`."""
+
+    def __init__(
+        self,
+        msgr_pool: MessengerPool,
+        rows: list[dict[str, Any]],
+        targets: dict[int, Path],
+        *,
+        basedir: Path,
+    ):
+        super().__init__()
+        self._msgr_pool = msgr_pool
+        self.rows = rows
+        self._row_by_id = {r["id"]: r for r in rows}
+        self.targets = targets
+        self.basedir = Path(basedir)
+        self.signals = WorkerSignals()
+
+    def _deliver(self, img_id: int, tmpfile: str) -> None:
+        row = self._row_by_id[img_id]
+        md5 = row.get("md5") or row["md5sum"]
+        self.signals.download_succeed.emit(
+            img_id, md5, tmpfile, str(self.targets[img_id])
+        )
+
+    @pyqtSlot()
+    def run(self):
+        t0 = time()
+        supported: bool | None = None
+        delivered: set[int] | None = set()
+        try:
+            with self._msgr_pool.messenger() as msgr:
+                delivered = fetch_image_batch(
+                    msgr, self.rows, self.basedir, self._deliver
+                )
+            supported = delivered is not None
+        except PlomException as e:
+            log.warning("batch download failed: %s", e)
+        except Exception as e:
+            # TODO: generic catch-all, but our caller will retry individually
+            log.error("unexpected batch failure: %s", e)
+        if delivered is None:
+            delivered = set()
+        log.debug(
+            "batch worker: %d of %d images in %.3gs",
+            len(delivered),
+            len(self.rows),
+            time() - t0,
+        )
+        undelivered = [r["id"] for r in self.rows if r["id"] not in delivered]
+        self.signals.batch_finished.emit(supported, undelivered)
+        self.signals.finished.emit()
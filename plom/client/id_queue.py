@@ -0,0 +1,234 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Claim ID tasks ahead of time and return identifications in the background."""
+
+import logging
+import time
+from typing import Any
+
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+
+from plom.common.exceptions import (
+    PlomConnectionError,
+    PlomSeriousException,
+    PlomTakenException,
+)
+from plom.messenger import Messenger
+from .async_messenger import AsyncMessenger
+
+log = logging.getLogger("id_queue")
+
+
+def id_page_rows(pagedata: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Just the rows of some page data that are ID pages."""
+    # Issue #2707: better use a image-type key
+    return [row for row in pagedata if row["pagename"].casefold().startswith("id")]
+
+
+def claim_next_id_paper(
+    msgr: Messenger, *, attempts: int = 5
+) -> tuple[int, list[dict[str, Any]]] | None:
+    """Claim the next paper that needs identifying, and get its ID page data.
+
+    Args:
+        msgr: a Messenger.
+
+    Keyword Args:
+        attempts: how many times to try if someone else claims the
+            paper we are offered before we do.
+
+    Returns:
+        The paper number and the page data of its ID page(s), or None if
+        there are no more papers, or we lost too many races for them.
+
+    Raises:
+        PlomNoPermission: user is not allowed to identify papers.
+        PlomSeriousException: something unexpected went wrong.
+    """
+    for __ in range(attempts):
+        papernum = msgr.IDaskNextTask()
+        if papernum is None:
+            return None
+        try:
+            msgr.claim_id_task(papernum)
+        except PlomTakenException as err:
+            log.info("will keep trying as task already taken: %s", err)
+            continue
+        return papernum, id_page_rows(msgr.get_pagedata(papernum))
+    return None
+
+
+def _claim_id(msgr: Messenger, papernum: int) -> None:
+    msgr.claim_id_task(papernum)
+
+
+def _return_id(msgr: Messenger, papernum: int, sid: str | None, sname: str) -> None:
+    msgr.IDreturnIDdTask(papernum, sid, sname)
+
+
+class IdentifyQueue(QObject):
+    """Send identifications to the server in the background, retrying as needed.
+
+    The user need not wait for the server after identifying each paper.
+    If the same paper is identified again while the first is still
+    being sent, the newer identification is sent afterwards and only
+    its outcome is reported.
+
+    Papers not yet claimed can be claimed first, for example when
+    confirming many predictions at once.  Several identifications are
+    sent at the same time, as many as the :class:`AsyncMessenger` has
+    threads.
+
+    Network trouble is retried a few times, with increasing delays.
+    Refusals from the server, such as a :class:`PlomConflict` when the
+    student ID is already used on another paper, are not retried.
+
+    **Signals**:
+
+      * `submitted(papernum: int)`: the server accepted the identification.
+      * `claimed(papernum: int)`: we claimed a paper we were asked to
+        claim first.  It is ours now even if identifying it then fails.
+      * `failed(papernum: int, err: Exception)`: the server refused, or
+        we gave up trying to reach it.
+      * `queue_changed(num_pending: int)`
+    """
+
+    submitted = pyqtSignal(int)
+    claimed = pyqtSignal(int)
+    failed = pyqtSignal(int, object)
+    queue_changed = pyqtSignal(int)
+
+    def __init__(
+        self,
+        amsgr: AsyncMessenger,
+        *,
+        max_tries: int = 4,
+        retry_delay: int = 1000,
+        parent: QObject | None = None,
+    ) -> None:
+        """Initialize a new queue.
+
+        Args:
+            amsgr: makes the messenger calls on worker threads.
+
+        Keyword Args:
+            max_tries: how many times to try each identification.
+            retry_delay: milliseconds before the first retry, doubling
+                each time thereafter.
+            parent: the Qt parent.
+        """
+        super().__init__(parent)
+        self._amsgr = amsgr
+        self.max_tries = max_tries
+        self.retry_delay = retry_delay
+        # papernum -> (sid, sname, tries, claim) of the one being sent
+        self._sending: dict[int, tuple[str | None, str, int, bool]] = {}
+        # papernum -> (sid, sname, claim) to send once the current one is done
+        self._waiting: dict[int, tuple[str | None, str, bool]] = {}
+        self.number_submitted = 0
+        self.number_failed = 0
+        self.number_of_retries = 0
+
+    def enqueue(
+        self, papernum: int, sid: str | None, sname: str, *, claim: bool = False
+    ) -> None:
+        """Send an identification to the server, eventually.
+
+        Args:
+            papernum: which paper.
+            sid: the student ID, or None for blank papers, etc.
+            sname: the student name or a placeholder.
+
+        Keyword Args:
+            claim: claim the paper first: if someone else has it, the
+                identification fails with :class:`PlomTakenException`.
+        """
+        log.info("queuing id=%s, name='%s' for paper %d", sid, sname, papernum)
+        if papernum in self._sending:
+            self._waiting[papernum] = (sid, sname, claim)
+        else:
+            self._send(papernum, sid, sname, 1, claim)
+        self.queue_changed.emit(self.num_pending())
+
+    def _send(
+        self, papernum: int, sid: str | None, sname: str, tries: int, claim: bool
+    ) -> None:
+        self._sending[papernum] = (sid, sname, tries, claim)
+        if claim:
+            call = self._amsgr.submit(_claim_id, papernum)
+            call.then(lambda __: self._claimed(papernum))
+        else:
+            call = self._amsgr.submit(_return_id, papernum, sid, sname)
+            call.then(lambda __: self._done(papernum, None))
+        call.then(None, lambda err: self._done(papernum, err))
+
+    def _send_waiting(self, papernum: int, *, claimed: bool) -> None:
+        # superseded: the outcome of the current one no longer matters
+        sid, sname, claim = self._waiting.pop(papernum)
+        self._send(papernum, sid, sname, 1, claim and not claimed)
+
+    def _claimed(self, papernum: int) -> None:
+        sid, sname, tries, __ = self._sending[papernum]
+        self.claimed.emit(papernum)
+        if papernum in self._waiting:
+            self._send_waiting(papernum, claimed=True)
+            return
+        self._send(papernum, sid, sname, tries, False)
+
+    def _done(self, papernum: int, err: Exception | None) -> None:
+        sid, sname, tries, claim = self._sending[papernum]
+        if papernum in self._waiting:
+            # if we were trying to claim it, we failed; otherwise it's ours
+            self._send_waiting(papernum, claimed=not claim)
+            return
+        if err is not None and self._should_retry(err) and tries < self.max_tries:
+            delay = self.retry_delay * 2 ** (tries - 1)
+            log.warning(
+                "paper %d: try %d failed, retrying in %dms: %s",
+                papernum,
+                tries,
+                delay,
+                err,
+            )
+            self.number_of_retries += 1
+            QTimer.singleShot(
+                delay, lambda: self._send(papernum, sid, sname, tries + 1, claim)
+            )
+            return
+        self._sending.pop(papernum)
+        if err is None:
+            self.number_submitted += 1
+            self.submitted.emit(papernum)
+        else:
+            log.warning("paper %d: identification failed: %s", papernum, err)
+            self.number_failed += 1
+            self.failed.emit(papernum, err)
+        self.queue_changed.emit(self.num_pending())
+
+    @staticmethod
+    def _should_retry(err: Exception) -> bool:
+        # requests' exceptions are OSErrors
+        return isinstance(err, (PlomConnectionError, PlomSeriousException, OSError))
+
+    def is_pending(self, papernum: int) -> bool:
+        """Is this paper waiting to be sent, being sent, or waiting to retry?"""
+        return papernum in self._sending
+
+    def num_pending(self) -> int:
+        return len(self._sending)
+
+    def wait(self, timeout: float = 10.0) -> bool:
+        """Process events until everything is sent (or refused).
+
+        Args:
+            timeout: seconds to wait.
+
+        Returns:
+            True if nothing is pending, False if we timed out.
+        """
+        deadline = time.monotonic() + timeout
+        while self._sending and time.monotonic() < deadline:
+            QCoreApplication.processEvents()
+            time.sleep(0.01)
+        return not self._sending
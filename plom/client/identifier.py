@@ -11,19 +11,18 @@ import logging
 import tempfile
 from importlib import resources
 from pathlib import Path
+from typing import Any
 
 from PyQt6 import QtGui, uic
 from PyQt6.QtCore import (
     QAbstractTableModel,
     QModelIndex,
-    QStringListModel,
     Qt,
     QTimer,
     QVariant,
     pyqtSignal,
 )
 from PyQt6.QtWidgets import (
-    QCompleter,
     QDialog,
     QLabel,
     QMenu,
@@ -49,6 +48,10 @@ from plom.common.rules import censorStudentName as censorName
 
 from . import ui_files
 from .about_dialog import show_about_dialog
+from .async_messenger import AsyncMessenger
+from .classlist_index import ClasslistCompleter, ClasslistIndex
+from .confirm_predictions import ConfirmPredictionsDialog, confident_predictions
+from .id_queue import IdentifyQueue, claim_next_id_paper, id_page_rows
 from .image_view_widget import ImageViewWidget
 from .useful_classes import (
     BlankIDBox,
@@ -91,6 +94,7 @@ class Paper:
         stat="unidentified",
         id="",
         name="",
+        id_pages=None,
     ) -> None:
         # The test number
         self.test = papernum
@@ -101,6 +105,12 @@ class Paper:
         self.sid = id
         self.originalFile = fname
         self.orientation = orientation
+        # page data of the ID page(s), if we already have it
+        self.id_pages = id_pages
+        # identification not yet accepted by the server
+        self.pending = False
+        # why the server did not accept the last identification
+        self.problem = ""
 
     def setStatus(self, st):
         self.status = st
@@ -150,6 +160,27 @@ class ExamModel(QAbstractTableModel):
         self.setData(index[2], "")
         self.setData(index[3], "")
 
+    def rowOfPaper(self, papernum: int) -> int | None:
+        for r, paper in enumerate(self.paperList):
+            if int(paper.test) == papernum:
+                return r
+        return None
+
+    def setPending(self, r: int, pending: bool) -> None:
+        # The server has not yet accepted the identification
+        paper = self.paperList[r]
+        paper.pending = pending
+        if pending:
+            paper.problem = ""
+        self.dataChanged.emit(self.index(r, 0), self.index(r, 3))
+
+    def setProblem(self, r: int, problem: str) -> None:
+        # The server refused the identification: revert and say why
+        self.revertStudent([self.index(r, c) for c in range(4)])
+        self.paperList[r].pending = False
+        self.paperList[r].problem = problem
+        self.dataChanged.emit(self.index(r, 0), self.index(r, 3))
+
     def addPaper(self, rho):
         # Append paper to list and update last row of table
         r = self.rowCount()
@@ -167,6 +198,23 @@ class ExamModel(QAbstractTableModel):
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         # Columns are [code, status, ID and Name]
         # Get data from appropriate box when called.
+        paper = self.paperList[index.row()]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if paper.problem:
+                return paper.problem
+            if paper.pending:
+                return _("Sending to server...")
+            return QVariant()
+        if role == Qt.ItemDataRole.BackgroundRole:
+            if paper.problem:
+                return QtGui.QBrush(QtGui.QColor("#FF7F50"))
+            return QVariant()
+        if role == Qt.ItemDataRole.FontRole:
+            if paper.pending:
+                fnt = QtGui.QFont()
+                fnt.setItalic(True)
+                return fnt
+            return QVariant()
         if role != Qt.ItemDataRole.DisplayRole:
             return QVariant()
         elif index.column() == 0:
@@ -215,6 +263,15 @@ class IDClient(QWidget):
             tmpdir = tempfile.mkdtemp(prefix="plom_")
         self.workdir = Path(tmpdir)
         self.msgr = None
+        self._amsgr: AsyncMessenger | None = None
+        self._idq: IdentifyQueue | None = None
+        # how many papers to claim, and download, ahead of the current one
+        self.prefetch_target = 3
+        self._no_more_papers = False
+        # papers identified from the confirm predictions dialog
+        self._bulk_ids: dict[int, tuple[str, str]] = {}
+        # ...and of those, the ones we have claimed
+        self._bulk_claimed: set[int] = set()
 
         self._store_QShortcuts = []
 
@@ -230,6 +287,12 @@ class IDClient(QWidget):
         TODO: move all this into init?
         """
         self.msgr = messenger
+        # several threads so that bulk identifications are pipelined
+        self._amsgr = AsyncMessenger(self.msgr, max_threads=4, parent=self)
+        self._idq = IdentifyQueue(self._amsgr, parent=self)
+        self._idq.submitted.connect(self._id_submitted)
+        self._idq.claimed.connect(self._id_claimed)
+        self._idq.failed.connect(self._id_failed)
         # List of papers we have to ID.
         self.paperList = []
         self.ui.userLabel.setText("logged in as " + self.msgr.username)
@@ -303,6 +366,7 @@ class IDClient(QWidget):
         # TODO: use \N{CLOCKWISE OPEN CIRCLE ARROW} as the icon
         # m.addAction("Refresh task list", self.refresh_server_data)
         m.addAction("View whole paper...", self.viewWholePaper)
+        m.addAction("Confirm predictions in bulk...", self.confirm_predictions_in_bulk)
         m.addSeparator()
 
         # m.addAction("Help", self.show_help)
@@ -361,6 +425,8 @@ class IDClient(QWidget):
         `snid_to_student_name`
         `student_id_to_snid`
 
+        and `classlist_index`, for fuzzy searching of the snids.
+
         Raises:
             PlomNoClasslist
         """
@@ -383,6 +449,7 @@ class IDClient(QWidget):
                     'Just FYI: multiple students with name "%s"', censorName(sname)
                 )
             name_list.append(sname)
+        self.classlist_index = ClasslistIndex(list(self.snid_to_student_id.keys()))
 
     def getPredictions(self):
         """Send request for prediction list to server."""
@@ -406,16 +473,11 @@ class IDClient(QWidget):
 
         Means that user can enter the first few numbers (or letters) and
         be prompted with little pop-up with list of possible completions.
+        Matching ignores case and accents, and tolerates small typos;
+        the best matches are listed first.
         """
-        # Build stringlistmodels - one for combined student_name_and_id = snid
-        snidlist = QStringListModel()
-        # Feed in the numbers and names.
-        snidlist.setStringList(list(self.snid_to_student_id.keys()))
-        # Build the snid-completer = substring matching and case insensitive
-        snidcompleter = QCompleter()
-        snidcompleter.setModel(snidlist)
-        snidcompleter.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        snidcompleter.setFilterMode(Qt.MatchFlag.MatchContains)
+        # the snid-completer searches the index as the user types
+        snidcompleter = ClasslistCompleter(self.classlist_index, self)
         # Link the ID-completer to the ID-lineedit in the gui.
         self.ui.idEdit.setCompleter(snidcompleter)
         # Make sure lineedit has little "Clear this" button.
@@ -428,6 +490,15 @@ class IDClient(QWidget):
 
     def closeEvent(self, event: None | QtGui.QCloseEvent) -> None:
         log.debug("Something has triggered a shutdown event")
+        if self._idq and not self._idq.wait():
+            log.error("Gave up waiting to send %d IDs", self._idq.num_pending())
+            WarnMsg(
+                self,
+                f"{self._idq.num_pending()} identifications could not be "
+                "sent to the server: you may need to redo those papers.",
+            ).exec()
+        if self._amsgr:
+            self._amsgr.stop(5000)
         log.debug("Revoking login token")
         self.msgr.closeUser(revoke_token=True)
         log.debug("Emitting Identifier shutdown signal")
@@ -460,42 +531,28 @@ class IDClient(QWidget):
         self.ui.idEdit.setText(self.exM.data(selnew.indexes()[2]))
         self.updateImage(selnew.indexes()[0].row())
         self.ui.idEdit.setFocus()
+        self._prefetch_more_papers()
 
     def checkFiles(self, r):
         # grab the selected tgv
-        test = self.exM.paperList[r].test
+        paper = self.exM.paperList[r]
         # check if we have a copy
-        if self.exM.paperList[r].originalFile is not None:
+        if paper.originalFile is not None:
             return
-        # else try to grab it from server
-        pagedata = self.msgr.get_pagedata(test)
-        id_pages = []
-        for row in pagedata:
-            # Issue #2707: better use a image-type key
-            if not row["pagename"].casefold().startswith("id"):
-                continue
-            img_bytes = self.msgr.get_image(row["id"], row["md5"])
-            ext = Path(row["server_path"]).suffix
-            filename = self.workdir / f'img_{int(test):04}_{row["pagename"]}{ext}'
-            with open(filename, "wb") as fh:
-                fh.write(img_bytes)
-            angle = row["orientation"]
-            id_pages.append([filename, angle])
-        if not id_pages:
+        # else get it from the cache or the server
+        if paper.id_pages is None:
+            paper.id_pages = id_page_rows(self.msgr.get_pagedata(paper.test))
+        if not paper.id_pages:
             InfoMsg(
                 self,
                 "Unexpectedly no ID page: see Issue #2722 and related.  "
                 "Could happen if someone is mucking around in the management tool.",
             ).exec()
             return
-        assert len(id_pages) == 1, "Expected exactly one ID page"
-        (
-            imageName,
-            angle,
-        ) = id_pages[0]
-
-        self.exM.paperList[r].originalFile = imageName
-        self.exM.paperList[r].orientation = angle
+        assert len(paper.id_pages) == 1, "Expected exactly one ID page"
+        (row,) = self.Qapp.downloader.sync_downloads(paper.id_pages)
+        paper.originalFile = row["filename"]
+        paper.orientation = row["orientation"]
 
     def updateImage(self, r=0):
         # Here the system should check if imagefile exist and grab if needed.
@@ -763,11 +820,16 @@ class IDClient(QWidget):
     def updateProgress(self):
         """Update progressbars by calling the server and asking about progress."""
         v, m = self.msgr.IDprogressCount()
+        self._show_progress((v, m))
+        if m == 0:
+            InfoMsg(self, _("No papers to identify.")).exec()
+
+    def _show_progress(self, counts: tuple[int, int]) -> None:
+        v, m = counts
         if m == 0:
             # v, m = (0, 1)  # avoid (0, 0) indeterminate animation
             self.ui.progressLabel.setText(_("No papers to identify"))
             self.ui.idProgressBar.setVisible(False)
-            InfoMsg(self, _("No papers to identify.")).exec()
         else:
             self.ui.progressLabel.setText(_("Confirmed:"))
             self.ui.idProgressBar.setVisible(True)
@@ -780,58 +842,31 @@ class IDClient(QWidget):
     def requestNext(self):
         """Ask the server for an unID'd paper, get file, add to list, update image."""
         self.updateProgress()
+        self._no_more_papers = False
 
-        attempts = 0
-        while True:
-            # TODO - remove this little sanity check else replace with a pop-up warning thingy.
-            if attempts >= 5:
-                return False
-            else:
-                attempts += 1
-            # ask server for ID of next task
-            try:
-                test = self.msgr.IDaskNextTask()
-                if test is None:
-                    InfoMsg(self, "No more tasks left on server.").exec()
-                    return False
-            except PlomSeriousException as err:
-                log.exception("Unexpected error getting next task: %s", err)
-                ErrorMsg(
-                    self,
-                    "Unexpected error getting next task:\n"
-                    f"{err}\nClient will now crash!",
-                ).exec()
-                raise
-
-            try:
-                self.msgr.claim_id_task(test)
-                break
-            except PlomTakenException as err:
-                log.info("will keep trying as task already taken: {}".format(err))
-                continue
-            except PlomNoPermission as err:
-                InfoMsg(
-                    self,
-                    "Your account does not have permission to identify papers. "
-                    "You may need to change account settings on the server, "
-                    "or ask your instructor/manager for access.",
-                    info=f"{err}",
-                ).exec()
-                return False
-
-        pagedata = self.msgr.get_pagedata(test)
-        id_pages = []
-        for row in pagedata:
-            # Issue #2707: better use a image-type key
-            if not row["pagename"].casefold().startswith("id"):
-                continue
-            img_bytes = self.msgr.get_image(row["id"], row["md5"])
-            ext = Path(row["server_path"]).suffix
-            filename = self.workdir / f'img_{int(test):04}_{row["pagename"]}{ext}'
-            with open(filename, "wb") as fh:
-                fh.write(img_bytes)
-            angle = row["orientation"]
-            id_pages.append([filename, angle])
+        try:
+            r = claim_next_id_paper(self.msgr)
+        except PlomNoPermission as err:
+            InfoMsg(
+                self,
+                "Your account does not have permission to identify papers. "
+                "You may need to change account settings on the server, "
+                "or ask your instructor/manager for access.",
+                info=f"{err}",
+            ).exec()
+            return False
+        except PlomSeriousException as err:
+            log.exception("Unexpected error getting next task: %s", err)
+            ErrorMsg(
+                self,
+                "Unexpected error getting next task:\n"
+                f"{err}\nClient will now crash!",
+            ).exec()
+            raise
+        if r is None:
+            InfoMsg(self, "No more tasks left on server.").exec()
+            return False
+        test, id_pages = r
         if not id_pages:
             InfoMsg(
                 self,
@@ -839,14 +874,9 @@ class IDClient(QWidget):
                 "Could happen if someone is mucking around in the management tool.",
             ).exec()
             return False
-        assert len(id_pages) == 1, "Expected exactly one ID page"
-        (
-            filename,
-            angle,
-        ) = id_pages[0]
 
         # Add the paper [code, filename, etc] to the list
-        self.addPaperToList(Paper(test, filename, orientation=angle))
+        self.addPaperToList(Paper(test, id_pages=id_pages))
 
         # Clean up table - and set focus on the ID-lineedit so user can
         # just start typing in the next ID-number.
@@ -854,6 +884,47 @@ class IDClient(QWidget):
         self.ui.idEdit.setFocus()
         return True
 
+    def _num_papers_ahead(self) -> int:
+        """How many unidentified papers are below the selected one in the table."""
+        index = self.ui.tableView.selectedIndexes()
+        r = index[0].row() if index else -1
+        return sum(
+            1 for paper in self.exM.paperList[r + 1 :] if paper.status == "unidentified"
+        )
+
+    def _prefetch_more_papers(self) -> None:
+        """Claim papers ahead of time in the background and start downloading their ID pages.
+
+        The prefetched papers are added to the bottom of the table, so
+        that moving to the next paper usually needs no round trips to
+        the server.
+        """
+        if not self._amsgr or self._no_more_papers:
+            return
+        if self._num_papers_ahead() >= self.prefetch_target:
+            return
+        self._amsgr.submit(claim_next_id_paper, key="id-prefetch").then(
+            self._got_prefetched_paper, self._prefetch_failed
+        )
+
+    def _got_prefetched_paper(self, r: tuple[int, list[dict[str, Any]]] | None) -> None:
+        if r is None:
+            log.info("prefetch: no more papers to identify")
+            self._no_more_papers = True
+            return
+        test, id_pages = r
+        log.info("prefetch: claimed paper %d", test)
+        self.addPaperToList(Paper(test, id_pages=id_pages), update=False)
+        self.ui.tableView.resizeColumnsToContents()
+        for row in id_pages:
+            self.Qapp.downloader.download_in_background_thread(row)
+        self._prefetch_more_papers()
+
+    def _prefetch_failed(self, err: Exception) -> None:
+        # not fatal: we will ask again when the user gets to the end of the table
+        log.warning("prefetch: could not claim a paper: %s", err)
+        self._no_more_papers = True
+
     def acceptPrediction0(self):
         sname = self.ui.pNameLabel0.text()
         sid = self.ui.pSIDLabel0.text()
@@ -877,8 +948,8 @@ class IDClient(QWidget):
         if index[0].row() == self.exM.rowCount() - 1:  # at bottom of table.
             self.requestNext()  # updates progressbars.
         else:  # else move to the next unidentified paper.
-            self.moveToNextUnID()  # doesn't
-            self.updateProgress()
+            # progressbars are updated once the server accepts the ID
+            self.moveToNextUnID()
 
     def identifyStudent(
         self,
@@ -895,6 +966,11 @@ class IDClient(QWidget):
         or not the paper was ID'd previously. Not called directly - instead
         is called by "enterID" or "accept_prediction" when user hits return on the line-edit.
 
+        The identification is sent to the server in the background.  If
+        the server does not accept it, for example because the student
+        ID is already used on another paper, the row is reverted and
+        highlighted in the table, with the reason in its tooltip.
+
         Args:
             index: an index into the UI table of the currently
                 highlighted row.
@@ -912,7 +988,8 @@ class IDClient(QWidget):
                 `"No ID given"`.
 
         Returns:
-            True/False/None: True on success, False/None on failure.
+            True/False/None: True once queued for the server, False/None
+            on failure.
         """
         log.info(
             "Identifying id=%s, name='%s', blank=%s, no_id=%s...",
@@ -943,43 +1020,72 @@ class IDClient(QWidget):
         # Pass the info to the exam model to put data into the table.
         self.exM.identifyStudent(index, sid, sname)
         code = self.exM.data(index[0])
-        # Return paper to server with the code, ID, name.
+        # Return paper to server with the code, ID, name: in the background
+        # so the user can move on; problems will show up in the table.
         log.info(
-            "Sending identity to server for code=%s: id=%s, name='%s', blank=%s, no_id=%s",
+            "Queuing identity for code=%s: id=%s, name='%s', blank=%s, no_id=%s",
             code,
             sid,
             sname,
             blank,
             no_id,
         )
-        try:
-            self.msgr.IDreturnIDdTask(code, sid, sname)
-        except PlomConflict as err:
-            log.warning("Conflict when returning paper %s: %s", code, err)
-            hints = """
-                <p>If you are unable to resolve this conflict, you may need
-                to use the Manager tool to "Un-ID" the other paper.</p>
-            """
-            WarnMsg(self, str(err), info=hints, info_pre=False).exec()
-            self.exM.revertStudent(index)
-            return False
-        except PlomTakenException as err:
-            log.error("Not allowed to submit ID for %s: %s", code, err)
-            WarnMsg(self, f'Not allowed to submit ID for {code}:\n"{err}"').exec()
-            self.exM.revertStudent(index)
-            return False
-        except PlomBenignException as err:
-            log.error("Somewhat unexpected error when returning %s: %s", code, err)
-            WarnMsg(self, f'Unexpected but benign exception:\n"{err}"').exec()
-            self.exM.revertStudent(index)
-            return False
-        # successful ID
+        self.exM.setPending(index[0].row(), True)
+        assert self._idq
+        self._idq.enqueue(int(code), sid, sname)
         # Issue #23: Use timer to avoid macOS conflict between completer and
         # clearing the line-edit. Very annoying but this fixes it.
         QTimer.singleShot(0, self.ui.idEdit.clear)
-        self.updateProgress()
         return True
 
+    def _id_claimed(self, papernum: int) -> None:
+        if papernum in self._bulk_ids:
+            self._bulk_claimed.add(papernum)
+
+    def _id_submitted(self, papernum: int) -> None:
+        self._bulk_claimed.discard(papernum)
+        r = self.exM.rowOfPaper(papernum)
+        if r is not None:
+            self.exM.setPending(r, False)
+        elif papernum in self._bulk_ids:
+            sid, sname = self._bulk_ids.pop(papernum)
+            self.addPaperToList(
+                Paper(papernum, stat="identified", id=sid, name=sname), update=False
+            )
+        if self._amsgr:
+            self._amsgr.call("IDprogressCount").then(self._show_progress)
+
+    def _id_failed(self, papernum: int, err: Exception) -> None:
+        """The server did not accept an identification: mark it in the table."""
+        if isinstance(err, PlomConflict):
+            log.warning("Conflict when returning paper %s: %s", papernum, err)
+            problem = (
+                f"{err}\nIf you are unable to resolve this conflict, you may "
+                'need to use the Manager tool to "Un-ID" the other paper.'
+            )
+        elif isinstance(err, PlomTakenException):
+            log.error("Not allowed to submit ID for %s: %s", papernum, err)
+            problem = f'Not allowed to submit ID for {papernum}:\n"{err}"'
+        elif isinstance(err, PlomBenignException):
+            log.error("Somewhat unexpected error when returning %s: %s", papernum, err)
+            problem = f'Unexpected but benign exception:\n"{err}"'
+        else:
+            log.error("Could not send ID of %s: %s", papernum, err)
+            problem = f'Could not send the identification to the server:\n"{err}"'
+        self._bulk_ids.pop(papernum, None)
+        r = self.exM.rowOfPaper(papernum)
+        if r is None:
+            if papernum not in self._bulk_claimed:
+                # the confirm predictions dialog shows its own failures
+                return
+            # claimed in bulk but not identified: it's ours, so it goes
+            # in the table for the user to sort out
+            self.addPaperToList(Paper(papernum), update=False)
+            r = self.exM.rowOfPaper(papernum)
+            assert r is not None
+        self._bulk_claimed.discard(papernum)
+        self.exM.setProblem(r, problem)
+
     def moveToNextUnID(self):
         # Move to the next test in table which is not ID'd.
         rt = self.exM.rowCount()
@@ -1090,6 +1196,7 @@ class IDClient(QWidget):
             self.snid_to_student_id[snid] = sid
             self.snid_to_student_name[snid] = sname
             self.student_id_to_snid[sid] = snid
+            self.classlist_index.add(snid)
             # finally update the line-edit.  TODO: remove? used to be for identifyStudent call below but not needed anymore?
             self.ui.idEdit.setText(snid)
 
@@ -1103,6 +1210,40 @@ class IDClient(QWidget):
                     return
             self.moveToNextUnID()
 
+    def confirm_predictions_in_bulk(self) -> None:
+        """Review and confirm confident predictions many at a time."""
+        sid_to_name = {
+            sid: self.snid_to_student_name[snid]
+            for sid, snid in self.student_id_to_snid.items()
+        }
+        # including any we've claimed: those are handled one at a time
+        exclude = {int(p.test) for p in self.exM.paperList}
+        candidates = confident_predictions(
+            self.predictions, sid_to_name, min_certainty=0.0, exclude=exclude
+        )
+        if not candidates:
+            InfoMsg(
+                self,
+                "No predictions to confirm in bulk: predictors must agree "
+                "on a student in the classlist who is not predicted for "
+                "any other paper.",
+            ).exec()
+            return
+        assert self._amsgr and self._idq
+        d = ConfirmPredictionsDialog(
+            self,
+            candidates,
+            amsgr=self._amsgr,
+            downloader=self.Qapp.downloader,
+            idq=self._idq,
+        )
+        d.approved.connect(self._bulk_approved)
+        d.exec()
+
+    def _bulk_approved(self, papernum: int, sid: str, sname: str) -> None:
+        # once the server accepts it, we'll add it to the table
+        self._bulk_ids[papernum] = (sid, sname)
+
     def viewWholePaper(self):
         index = self.ui.tableView.selectedIndexes()
         if len(index) == 0:
@@ -1136,8 +1277,8 @@ class IDClient(QWidget):
         if index[0].row() == self.exM.rowCount() - 1:  # at bottom of table.
             self.requestNext()  # updates progressbars.
         else:  # else move to the next unidentified paper.
-            self.moveToNextUnID()  # doesn't
-            self.updateProgress()
+            # progressbars are updated once the server accepts the ID
+            self.moveToNextUnID()
         return
 
     def confirm_prenamed_help(self) -> None:
@@ -11,12 +11,14 @@
 """The Plom Marker client."""
 
 from collections import defaultdict
+import copy
 import html
 import json
 import logging
 from math import ceil
 from pathlib import Path
 import platform
+import shutil
 import tempfile
 from textwrap import shorten
 import time
@@ -26,6 +28,7 @@ from typing import Any
 
 
 from packaging.version import Version
+import platformdirs
 from PyQt6 import QtGui, uic
 from PyQt6.QtCore import (
     Qt,
@@ -67,8 +70,10 @@ from plom.common.exceptions import (
     PlomTaskChangedError,
     PlomTaskDeletedError,
     PlomConflict,
+    PlomException,
     PlomNoPaper,
     PlomNoPermission,
+    PlomNoRubric,
     PlomNoServerSupportException,
     PlomNoSolutionException,
 )
@@ -80,6 +85,10 @@ from .question_labels import (
 )
 from .about_dialog import show_about_dialog
 from .annotator import Annotator
+from .annotation_cache import AnnotationCache, Annotations
+from .async_messenger import AsyncMessenger, MessengerCall
+from .bootstrap import Bootstrap, StartupTimer
+from .claim_ahead import ClaimAhead, ClaimStrategy, claim_next_task
 from .image_view_widget import ImageViewWidget
 from .key_wrangler import get_key_bindings
 from .viewers import QuestionViewDialog, SelectPaperQuestion, SolutionViewer
@@ -89,6 +98,11 @@ from .useful_classes import _json_path_to_str
 from .tagging_range_dialog import TaggingAndRangeOptions
 from .quota_dialogs import ExplainQuotaDialog, ReachedQuotaLimitDialog
 from .task_model import MarkerExamModel, ProxyModel
+from .offline import OfflineStore, offline_store_path
+from .rubric_render import rubric_tex_fragments
+from .rubric_snapshot import RubricSnapshot, fetch_rubrics_and_tab_state
+from .rubric_usage import RubricUsage
+from .spelling import get_speller
 from .uploader import BackgroundUploader, synchronous_upload
 from .translations import translate as _
 from . import icons, ui_files
@@ -102,6 +116,13 @@ if platform.system() == "Darwin":
 
 log = logging.getLogger("marker")
 
+# where we keep rubric snapshots and usage counts between sessions
+rubric_snapshot_dir = (
+    platformdirs.user_cache_path("plom", "PlomGrading.org") / "rubrics"
+)
+# marking done offline must survive quitting before it is uploaded
+offline_dir = platformdirs.user_data_path("plom", "PlomGrading.org") / "offline"
+
 
 def paper_question_index_to_task_id_str(papernum: int, question_idx: int) -> str:
     """Helper function to convert between paper/question and task string."""
@@ -189,6 +210,10 @@ class MarkerClient(QWidget):
 
         self.allowBackgroundOps = True
 
+        # offline mode: marking from prefetched data, results queued in the store
+        self._offline = False
+        self._offline_store: OfflineStore | None = None
+
         # instance vars that get initialized later
         self.question_idx = None
         self.version = None
@@ -197,9 +222,36 @@ class MarkerClient(QWidget):
         self._user_reached_quota_limit = False
 
         self.msgr = None
+        # for server calls that the GUI need not wait for
+        self._amsgr: AsyncMessenger | None = None
+        # annotations of completed tasks, by edition
+        self._annot_cache: AnnotationCache | None = None
+        # rubrics and tab state from last time, so Annotator can start quickly
+        self._rubric_snapshot: RubricSnapshot | None = None
+        # how often we have used each rubric, from our saved annotations
+        self._rubric_usage: RubricUsage | None = None
+        # keeps a few tasks claimed ahead of time, created in setup
+        self._claim_ahead: ClaimAhead | None = None
+        self._claim_ahead_target = 2
+        self._cached_quota_remaining: int | None = None
+        # how to avoid fighting with other markers over the same tasks
+        self._claim_strategy = ClaimStrategy()
+        # things fetched at startup for later use: name -> (time, data)
+        self._prefetched: dict[str, tuple[float, Any]] = {}
+        self._prefetch_max_age = 60.0
+        self.startup_timer: StartupTimer | None = None
         # history contains all the tgv in order of being marked except the current one.
         self.marking_history = []
 
+        # Original scans of completed tasks are only downloaded on demand,
+        # or if the user lingers on one, as they might be about to re-mark it.
+        self._remark_prefetch_delay_ms = 2000
+        self._dwell_timer = QTimer(self)
+        self._dwell_timer.setSingleShot(True)
+        self._dwell_timer.timeout.connect(self._dwelt_on_selected_task)
+        self._dwell_task: str | None = None
+        self._dwelt_task: str | None = None
+
         self._cached_user_list_lead_markers = []
         self._cached_user_list_other_markers = []
         self._last_time_defer_to_users = []
@@ -212,6 +264,10 @@ class MarkerClient(QWidget):
         question_idx: int,
         version: int,
         lastTime: dict[str, Any],
+        *,
+        spec: dict[str, Any] | None = None,
+        user_roles: list[str] | None = None,
+        startup_timer: StartupTimer | None = None,
     ) -> None:
         """Performs setup procedure for MarkerClient.
 
@@ -229,35 +285,121 @@ class MarkerClient(QWidget):
                    {
                      "FOREGROUND"
                      "KeyBinding"
+                     "ClaimAhead"
                    }
 
                 and potentially others
 
+        Keyword Args:
+            spec: the assessment specification, if the caller already
+                has it.  Otherwise we ask the server.
+            user_roles: the user's roles, if the caller already has them.
+                Otherwise we ask the server.
+            startup_timer: for reporting how long startup took, if the
+                caller started timing before us.
+
         Returns:
             None
         """
+        timer = startup_timer if startup_timer else StartupTimer()
         self.msgr = messenger
+        self._amsgr = AsyncMessenger(self.msgr, parent=self)
+        self._annot_cache = AnnotationCache(
+            self.msgr, self.workingDirectory / "annotations"
+        )
         self.question_idx = question_idx
         self.version = version
+        self._rubric_snapshot = RubricSnapshot(
+            rubric_snapshot_dir,
+            server=self.msgr.server,
+            question_idx=question_idx,
+            version=version,
+            username=self.msgr.username,
+        )
+        self._rubric_usage = RubricUsage(
+            rubric_snapshot_dir,
+            server=self.msgr.server,
+            question_idx=question_idx,
+            username=self.msgr.username,
+        )
+        self._offline_store_dir = offline_store_path(
+            offline_dir,
+            server=self.msgr.server,
+            question_idx=question_idx,
+            username=self.msgr.username,
+        )
 
         # Get the number of Tests, Pages, Questions and Versions
         # Note: if this fails UI is not yet in a usable state
-        self.exam_spec = self.msgr.get_spec()
+        if spec is None:
+            with timer.phase("get spec"):
+                spec = self.msgr.get_spec()
+        self.exam_spec = spec
+
+        with timer.phase("build UI"):
+            self.UIInitialization()
+            self.applyLastTimeOptions(lastTime)
+            self._connectGuiButtons()
+
+        self._claim_ahead = ClaimAhead(
+            self._amsgr,
+            question_idx,
+            version,
+            count_ready=self.examModel.count_local_ready_to_mark,
+            quota_remaining=self._quota_remaining,
+            preferences=self._claim_preferences,
+            on_claimed=self._add_claimed_task,
+            target=self._claim_ahead_target,
+            parent=self,
+        )
 
-        self.UIInitialization()
-        self.applyLastTimeOptions(lastTime)
-        self._connectGuiButtons()
+        # None of these depend on each other: ask for them all at once
+        with timer.phase("concurrent requests"):
+            boot = self._bootstrap_requests(user_roles is None)
+            boot.run()
+        for name, s in boot.timings.items():
+            timer.add(name, s, concurrent=True)
 
-        # self.maxMark = self.exam_spec["question"][str(question_idx)]["mark"]
-        try:
-            self.maxMark = self.msgr.getMaxMark(self.question_idx)
-        except PlomRangeException as err:
-            ErrorMsg(self, str(err)).exec()
-            return
+        with timer.phase("apply server data"):
+            # self.maxMark = self.exam_spec["question"][str(question_idx)]["mark"]
+            try:
+                self.maxMark = boot.result("max_mark")
+            except PlomRangeException as err:
+                ErrorMsg(self, str(err)).exec()
+                # we won't mark it, so don't keep the task we claimed
+                r = None if boot.failed("next_task") else boot.result("next_task")
+                if r is not None:
+                    task = r[0]
+                    try:
+                        self.msgr.surrender_task(task)
+                    except (PlomSeriousException, PlomBenignException) as e:
+                        log.warning("Could not surrender %s: %s", task, e)
+                return
 
-        self.update_get_next_button()
+            self.update_get_next_button()
 
-        self.refresh_server_data()
+            if user_roles is None:
+                user_roles = boot.result("user_roles")
+            assert user_roles is not None
+            try:
+                tasks = boot.result("tasks")
+            except PlomNoServerSupportException as e:
+                WarnMsg(self, str(e)).exec()
+                tasks = []
+            self._apply_server_data(boot.result("exam_info"), user_roles, tasks=tasks)
+            try:
+                self._update_user_lists(boot.result("user_list"))
+            except PlomNoServerSupportException as e:
+                log.warning(f"server does not support user lists: {e}")
+            try:
+                self.updateProgress(info=boot.result("progress"))
+            except PlomRangeException as e:
+                ErrorMsg(self, str(e)).exec()
+            self._prefetched = {
+                k: (time.monotonic(), boot.result(k))
+                for k in ("rubrics", "tab_state")
+                if not boot.failed(k)
+            }
 
         # Connect the view **after** list updated.
         # Connect the table-model's selection change to Marker functions
@@ -274,8 +416,30 @@ class MarkerClient(QWidget):
             self.update_window_title
         )
 
-        # Get a question to mark from the server
-        self._requestNext(enter_annotate_mode_if_possible=True)
+        # We already asked the server for a question to mark
+        with timer.phase("first task"):
+            try:
+                r = boot.result("next_task")
+            except PlomNoPermission as err:
+                WarnMsg(self, "Cannot get next task.", info=err).exec()
+                r = None
+            except PlomTakenException as err:
+                # claiming ahead will try again shortly
+                log.info("Others claimed all the tasks we tried: %s", err)
+                r = None
+            except PlomSeriousException as err:
+                log.exception("Unexpected error getting next task: %s", err)
+                ErrorMsg(
+                    self,
+                    "Unexpected error getting next task. Client will now crash!",
+                    info=str(err),
+                ).exec()
+                raise
+            if r is not None:
+                task, src_img_data, tags, integrity_check = r
+                self._add_claimed_task(task, src_img_data, tags, integrity_check)
+                self._moveSelectionToTask(task)
+                self.annotate_task()
         # reset the view so whole exam shown.
         self.testImg.resetView()
 
@@ -284,6 +448,8 @@ class MarkerClient(QWidget):
         # QTimer.singleShot(2000, self.ui.tableView.resizeRowsToContents)
 
         log.debug("Marker main thread: " + str(threading.get_ident()))
+        # load the dictionary now, rather than when someone first edits a rubric
+        get_speller().start_loading()
 
         if self.allowBackgroundOps:
             self.backgroundUploader = BackgroundUploader(self.msgr)
@@ -293,10 +459,70 @@ class MarkerClient(QWidget):
                 self.update_technical_stats_upload
             )
             self.backgroundUploader.start()
+        if self.allowBackgroundOps:
+            self._claim_ahead.top_up()
+        else:
+            self._claim_ahead.set_enabled(False)
         self.cacheLatexComments()  # Now cache latex for comments:
+        self.startup_timer = timer
+        log.info(timer.report())
         s = check_for_shared_pages(self.exam_spec, self.question_idx)
         if s:
             InfoMsg(self, s).exec()
+        self._offer_to_upload_offline_results()
+
+    def _offer_to_upload_offline_results(self) -> None:
+        """Offer to upload any marking left over from working offline in an earlier session."""
+        if not self._offline_store_dir.exists():
+            return
+        store = OfflineStore(self._offline_store_dir)
+        self._offline_store = store
+        n = store.num_pending()
+        if n == 0 and not store.is_tab_state_dirty():
+            return
+        log.info("Found %d results marked offline in an earlier session", n)
+        msg = SimpleQuestion(
+            self,
+            f"You have marking done offline that was not uploaded: {n} tasks.",
+            question="Upload it now?  If not, we will ask again next time.",
+        )
+        if msg.exec() != QMessageBox.StandardButton.Yes:
+            return
+        self._upload_offline_results()
+        self.updateProgress()
+
+    def _bootstrap_requests(self, want_user_roles: bool) -> Bootstrap:
+        """Gather up the independent requests we need to make at startup.
+
+        This includes claiming the first task, and the rubrics and tab
+        state that the Annotator will want as soon as it opens.
+        """
+        boot = Bootstrap(self.msgr)
+        q, v = self.question_idx, self.version
+        # claiming takes a few steps, so start it first
+        boot.add("next_task", claim_next_task, q, v, **self._claim_preferences())
+        boot.add("max_mark", "getMaxMark", q)
+        boot.add("exam_info", "get_exam_info")
+        if want_user_roles:
+            boot.add("user_roles", "get_user_roles")
+        # on startup, the task list shows only our tasks
+        boot.add("tasks", "get_tasks", q, v, username=self.msgr.username)
+        boot.add("progress", "get_marking_progress", q, v)
+        boot.add("user_list", "get_user_list")
+        boot.add("rubrics", "MgetRubrics", q)
+        boot.add("tab_state", "MgetUserRubricTabs", q)
+        return boot
+
+    def _take_prefetched(self, name: str) -> Any:
+        """Use something we fetched at startup, if it is still fresh, but only once.
+
+        Returns:
+            The data or None if we don't have it (anymore).
+        """
+        t, data = self._prefetched.pop(name, (None, None))
+        if t is None or time.monotonic() - t > self._prefetch_max_age:
+            return None
+        return data
 
     def applyLastTimeOptions(self, lastTime: dict[str, Any]) -> None:
         """Applies all settings from previous client.
@@ -314,6 +540,8 @@ class MarkerClient(QWidget):
 
         if lastTime.get("FOREGROUND", False):
             self.allowBackgroundOps = False
+        # how many tasks to keep claimed ahead of time
+        self._claim_ahead_target = int(lastTime.get("ClaimAhead", 2))
 
     def is_experimental(self) -> bool:
         return self.annotatorSettings["experimental"]
@@ -381,6 +609,8 @@ class MarkerClient(QWidget):
                 assessment_name=assessment_name,
             )
         window_title = "Plom"
+        if self._offline:
+            window_title += " (offline)"
         if task_title_str:
             window_title = task_title_str + " \N{EM DASH} " + window_title
         # note this [*] is used by Qt to know here to put an * to indicate unsaved results
@@ -645,6 +875,11 @@ class MarkerClient(QWidget):
         # x.triggered.connect(self.meh)
         self._save_and_next_moves_to_unmarked_task = x
 
+        x = m.addAction("Work offline")
+        x.setCheckable(True)
+        x.triggered.connect(self.toggle_offline)
+        self._offline_action = x
+
         m.addSeparator()
 
         m.addAction("Help", self.show_help)
@@ -779,6 +1014,9 @@ class MarkerClient(QWidget):
         self.annotatorSettings["nextTaskMinPaperNum"] = r[0]
         self.annotatorSettings["nextTaskMaxPaperNum"] = r[1]
         self.annotatorSettings["nextTaskPreferTagged"] = tag
+        if self._claim_ahead:
+            # maybe there are tasks now that there weren't before
+            self._claim_ahead.reset()
         self.update_get_next_button()
 
     def update_get_next_button(self):
@@ -807,10 +1045,13 @@ class MarkerClient(QWidget):
         self.getMoreButton.setToolTip("\n".join(tips))
 
     def get_files_for_previously_annotated(self, task: str) -> bool:
-        """Downloads the annotated image, the plom file, and the original source images.
+        """Downloads the annotated image and the plom file.
 
-        TODO: maybe it could not aggressively download the src images: sometimes
-        people just want to look at the annotated image.
+        The original source images are not downloaded, unless we think
+        the user is likely to re-mark the task (see
+        :meth:`_remark_likely`): sometimes people just want to look at
+        the annotated image.  They are downloaded on demand when the
+        Annotator opens.
 
         Note that any local source image data will be replaced by data
         extracted from the Plom file.
@@ -845,16 +1086,55 @@ class MarkerClient(QWidget):
         num, question_idx = unpack_task_code(task)
         assert question_idx == self.question_idx, f"wrong qidx={question_idx}"
 
+        assert self._annot_cache is not None
         try:
-            _data = self.msgr.get_annotations(num, question_idx, edition=None)
-            annot_img_info, annot_img_bytes = self.msgr.get_annotations_image(
-                num, question_idx, edition=_data["edition"]
-            )
-            plomdata = _data["user_agent_data"]
-        except PlomNoPaper as e:
-            ErrorMsg(None, f"no annotations for task {task}: {e}").exec()
+            a = self._annot_cache.get(num, question_idx)
+        except (PlomNoPaper, PlomTaskChangedError, PlomTaskDeletedError) as e:
+            self._previously_annotated_failed(task, e)
             return False
-        except (PlomTaskChangedError, PlomTaskDeletedError) as ex:
+        self._store_previously_annotated(task, a)
+        return True
+
+    def _fetch_previously_annotated_in_background(self, task: str) -> None:
+        """Like :meth:`get_files_for_previously_annotated` but without waiting.
+
+        When the files arrive, the preview is updated if the task is
+        still selected.  The request is cancelled if the selection
+        changes before then.
+        """
+        num, question_idx = unpack_task_code(task)
+        assert self._amsgr is not None
+        assert self._annot_cache is not None
+        cache = self._annot_cache
+        self._amsgr.submit(
+            lambda __, n, q: cache.get(n, q),
+            num,
+            question_idx,
+            key=("annotations", num, question_idx),
+            group="preview",
+        ).then(
+            lambda r: self._previously_annotated_arrived(task, r),
+            lambda e: self._previously_annotated_failed(task, e),
+        )
+
+    def _previously_annotated_arrived(self, task: str, a: Annotations) -> None:
+        if not self.examModel.has_task(task):
+            # e.g., refreshed in the meantime
+            return
+        self._store_previously_annotated(task, a)
+        if self.get_current_task_id_or_none() == task:
+            self._updateCurrentlySelectedRow()
+
+    def _previously_annotated_failed(self, task: str, ex: Exception) -> None:
+        """Tell the user we could not get the annotations for a task.
+
+        Raises:
+            PlomForceLogoutException: the task changed on the server.
+        """
+        if isinstance(ex, PlomNoPaper):
+            ErrorMsg(None, f"no annotations for task {task}: {ex}").exec()
+            return
+        if isinstance(ex, (PlomTaskChangedError, PlomTaskDeletedError)):
             # TODO: better action we can take here?
             # TODO: the real problem here is that the full_pagedata is potentially out of date!
             # TODO: we also need (and maybe already have) a mechanism to invalidate existing annotations
@@ -878,7 +1158,13 @@ class MarkerClient(QWidget):
             self.Qapp.exit(57)
             log.critical("Qapp.exit() may not exit immediately; force quitting...")
             raise PlomForceLogoutException("Manager changed task") from ex
+        # e.g., network trouble in the background: just leave the placeholder
+        log.error("Could not get annotations for task %s: %s", task, ex)
 
+    def _store_previously_annotated(self, task: str, a: Annotations) -> None:
+        """Copy cached annotations for a task to its own directory and record them in the task table."""
+        # we're going to modify it, and the cache's copy is shared
+        plomdata = copy.deepcopy(a.plom_data)
         log.info("importing source image data (orientations etc) from .plom file")
         # filenames likely stale: could have restarted client in meantime
         src_img_data = plomdata["base_images"]
@@ -889,7 +1175,10 @@ class MarkerClient(QWidget):
                 # E.g., Reannotator used to lose "server_path", keep workaround
                 # just in case, by using previous session's filename
                 row["server_path"] = f
-        self.get_downloads_for_src_img_data(src_img_data)
+        # view-only: fill in filenames of what we have, but only download if needed
+        self.get_downloads_for_src_img_data(
+            src_img_data, trigger=self._remark_likely(task)
+        )
 
         self.examModel.set_source_image_data(task, src_img_data)
 
@@ -897,15 +1186,13 @@ class MarkerClient(QWidget):
         paperdir = Path(tempfile.mkdtemp(prefix=task + "_", dir=self.workingDirectory))
         log.debug("create paperdir %s for already-graded download", paperdir)
         self.examModel.setPaperDirByTask(task, paperdir)
-        aname = paperdir / f"G{task}.{annot_img_info['extension']}"
+        aname = paperdir / f"G{task}{a.image.suffix}"
         pname = paperdir / f"G{task}.plom"
-        with open(aname, "wb") as fh:
-            fh.write(annot_img_bytes)
+        shutil.copyfile(a.image, aname)
         with open(pname, "w") as f:
             json.dump(plomdata, f, indent="  ", default=_json_path_to_str)
             f.write("\n")
         self.examModel.setAnnotatedFile(task, aname, pname)
-        return True
 
     def _updateImage(self, pr: int) -> None:
         """Updates the preview image for a particular row of the table.
@@ -941,10 +1228,15 @@ class MarkerClient(QWidget):
 
         # next we try to download annotated image for certain hardcoded states
         if status.casefold() == "complete":
-            r = self.get_files_for_previously_annotated(task)
-            if not r:
+            if self._amsgr is None:
+                r = self.get_files_for_previously_annotated(task)
+                if not r:
+                    return
+                self._updateImage(pr)  # recurse
                 return
-            self._updateImage(pr)  # recurse
+            # we'll be called again when it arrives
+            self.testImg.updateImage(self.downloader.get_placeholder_path())
+            self._fetch_previously_annotated_in_background(task)
             return
 
         # try the raw page images instead from the cached src_img_data
@@ -1027,6 +1319,10 @@ class MarkerClient(QWidget):
 
         May open dialogs in some circumstances.
         """
+        if info is None and self._offline:
+            n = self._offline_store.num_pending() if self._offline_store else 0
+            self.ui.labelProgress.setText(f"Working offline: {n} waiting to upload")
+            return
         if info is None:
             # ask server for progress update
             try:
@@ -1035,6 +1331,13 @@ class MarkerClient(QWidget):
                 ErrorMsg(self, str(e)).exec()
                 return
 
+        if info["user_quota_limit"] is None:
+            self._cached_quota_remaining = None
+        else:
+            self._cached_quota_remaining = (
+                info["user_quota_limit"] - info["user_tasks_marked"]
+            )
+
         if info["total_tasks"] == 0:
             self.ui.labelProgress.setText("Progress: no papers to mark")
             self.ui.mProgressBar.setVisible(False)
@@ -1080,6 +1383,15 @@ class MarkerClient(QWidget):
         self.ui.mProgressBar.setMaximum(info["total_tasks"])
         self.ui.mProgressBar.setValue(info["total_tasks_marked"])
 
+    def refresh_progress_in_background(self) -> None:
+        """Update the progress display when the server gets back to us, without waiting."""
+        if self._amsgr is None or self._offline:
+            self.updateProgress()
+            return
+        self._amsgr.call("get_marking_progress", self.question_idx, self.version).then(
+            lambda info: self.updateProgress(info=info)
+        )
+
     def claim_task_interactive(self) -> None:
         """Ask user for paper number and then ask server for that paper.
 
@@ -1098,8 +1410,58 @@ class MarkerClient(QWidget):
         self._claim_task(task)
 
     def request_one_more(self) -> None:
-        """Ask server for an unmarked paper, get file, add to list, update view, but don't automatically select."""
-        self._requestNext(update_select=False)
+        """Ask server for an unmarked paper, get file, add to list, update view, but don't automatically select.
+
+        This happens in the background, unless background operations
+        are disabled.
+        """
+        if self._offline:
+            log.info("Working offline: not asking for another task")
+            return
+        if self._amsgr is None or not self.allowBackgroundOps:
+            self._requestNext(update_select=False)
+            return
+        self._amsgr.submit(
+            claim_next_task,
+            self.question_idx,
+            self.version,
+            key="claim-next-task",
+            **self._claim_preferences(),
+        ).then(self._claimed_in_background, self._claim_in_background_failed)
+
+    def _claim_preferences(self) -> dict[str, Any]:
+        """The user's preferences for claiming tasks, as keyword arguments for :func:`claim_next_task`."""
+        tag = self.annotatorSettings["nextTaskPreferTagged"]
+        return {
+            "tags": [tag] if tag else [],
+            "min_paper_num": self.annotatorSettings["nextTaskMinPaperNum"],
+            "max_paper_num": self.annotatorSettings["nextTaskMaxPaperNum"],
+            "strategy": self._claim_strategy,
+        }
+
+    def _quota_remaining(self) -> int | None:
+        """How many more tasks the user can mark, or None if they have no quota."""
+        if self.marker_has_reached_task_limit():
+            return 0
+        return self._cached_quota_remaining
+
+    def _claimed_in_background(self, r: tuple | None) -> None:
+        if r is None:
+            log.info("No more tasks available to claim")
+            return
+        task, src_img_data, tags, integrity_check = r
+        log.info("Claimed task %s in the background", task)
+        self._add_claimed_task(task, src_img_data, tags, integrity_check)
+
+    def _claim_in_background_failed(self, err: Exception) -> None:
+        if isinstance(err, PlomTakenException):
+            log.info("Others claimed all the tasks we tried: %s", err)
+            return
+        if isinstance(err, PlomNoPermission):
+            WarnMsg(self, "Cannot get another task.", info=err).exec()
+            return
+        log.error("Unexpected error getting next task: %s", err)
+        WarnMsg(self, "Unexpected error getting next task.", info=f"{err}").exec()
 
     def _requestNext(
         self,
@@ -1109,7 +1471,9 @@ class MarkerClient(QWidget):
     ) -> None:
         """Ask server for an unmarked paper, get file, add to list, update view.
 
-        Retry a few times in case two clients are asking for same.
+        If another client beats us to a paper, we try again, following
+        our :class:`ClaimStrategy` but without waiting in between, as
+        this blocks the GUI.
 
         Keyword Args:
             update_select (bool): default True, send False if you don't
@@ -1120,55 +1484,45 @@ class MarkerClient(QWidget):
                 may not want to aggressively enter annotate mode, except
                 on marker init.
         """
-        attempts = 0
-        tag = self.annotatorSettings["nextTaskPreferTagged"]
-        paper_range = (
-            self.annotatorSettings["nextTaskMinPaperNum"],
-            self.annotatorSettings["nextTaskMaxPaperNum"],
-        )
-        if tag and (paper_range[0] or paper_range[1]):
-            log.info('Next available?  Range %s, prefer tagged "%s"', paper_range, tag)
-        elif tag:
-            log.info('Next available?  Prefer tagged "%s"', tag)
+        if self._offline:
+            log.info("Working offline: not asking for another task")
+            return
+        prefs = self._claim_preferences()
+        tags = prefs["tags"]
+        paper_range = (prefs["min_paper_num"], prefs["max_paper_num"])
+        if tags and (paper_range[0] or paper_range[1]):
+            log.info('Next available?  Range %s, prefer tagged "%s"', paper_range, tags)
+        elif tags:
+            log.info('Next available?  Prefer tagged "%s"', tags)
         elif paper_range[0] or paper_range[1]:
             log.info("Next available?  Range %s", paper_range)
-        if tag:
-            tags = [tag]
-        else:
-            tags = []
-        while True:
-            attempts += 1
-            # little sanity check - shouldn't be needed.
-            # TODO remove.
-            if attempts > 5:
-                return
-            try:
-                task = self.msgr.MaskNextTask(
-                    self.question_idx,
-                    self.version,
-                    tags=tags,
-                    min_paper_num=paper_range[0],
-                    max_paper_num=paper_range[1],
-                )
-                if not task:
-                    return
-            except PlomSeriousException as err:
-                log.exception("Unexpected error getting next task: %s", err)
-                ErrorMsg(
-                    self,
-                    "Unexpected error getting next task. Client will now crash!",
-                    info=str(err),
-                ).exec()
-                raise
-            try:
-                self.claim_task_and_trigger_downloads(task)
-                break
-            except PlomTakenException as err:
-                log.info("will keep trying as task already taken: {}".format(err))
-                continue
-            except PlomNoPermission as err:
-                WarnMsg(self, f"Cannot get task {task}.", info=err).exec()
-                return
+        try:
+            r = claim_next_task(
+                self.msgr, self.question_idx, self.version, **prefs, wait=False
+            )
+        except PlomNoPermission as err:
+            WarnMsg(self, "Cannot get next task.", info=err).exec()
+            return
+        except PlomTakenException as err:
+            log.info("Others claimed all the tasks we tried: %s", err)
+            InfoMsg(
+                self,
+                "Could not get another task: other markers took each one"
+                " we tried.  Please try again in a moment.",
+            ).exec()
+            return
+        except PlomSeriousException as err:
+            log.exception("Unexpected error getting next task: %s", err)
+            ErrorMsg(
+                self,
+                "Unexpected error getting next task. Client will now crash!",
+                info=str(err),
+            ).exec()
+            raise
+        if r is None:
+            return
+        task, src_img_data, tags, integrity_check = r
+        self._add_claimed_task(task, src_img_data, tags, integrity_check)
         if update_select:
             self._moveSelectionToTask(task)
         if enter_annotate_mode_if_possible:
@@ -1197,16 +1551,20 @@ class MarkerClient(QWidget):
             been triggered; wait; process events; then call back if you
             want.
         """
-        all_present = True
         PC = self.downloader.pagecache
+        missing = []
         for row in src_img_data:
             if PC.has_page_image(row["id"]):
                 row["filename"] = PC.page_image_path(row["id"])
                 continue
-            all_present = False
-            log.info("triggering download for image id %d", row["id"])
+            missing.append(row)
+        if not missing:
+            return True
+        log.info("triggering download for image ids %s", [row["id"] for row in missing])
+        if trigger:
             try:
-                self.downloader.download_in_background_thread(row)
+                # one request for all of them, if the server supports that
+                self.downloader.download_batch_in_background_thread(missing)
             except PlomConnectionError as e:
                 # Issue #3427: it seems some kind of race can happen, presumably
                 # when we call downloader.detach_messenger, but somehow one of
@@ -1214,8 +1572,9 @@ class MarkerClient(QWidget):
                 # In this happens, don't crash, log that it happened.  Worst case
                 # we're left staring at the placeholder.
                 log.error(f"{e}")
+        for row in missing:
             row["filename"] = self.downloader.get_placeholder_path()
-        return all_present
+        return False
 
     def claim_task_and_trigger_downloads(self, task: str) -> None:
         """Claim a particular task for the current user and start image downloads.
@@ -1238,7 +1597,16 @@ class MarkerClient(QWidget):
         src_img_data, tags, integrity_check = self.msgr.claim_task(
             task, version=self.version
         )
+        self._add_claimed_task(task, src_img_data, tags, integrity_check)
 
+    def _add_claimed_task(
+        self,
+        task: str,
+        src_img_data: list[dict[str, Any]],
+        tags: list[str],
+        integrity_check: str,
+    ) -> None:
+        """We have claimed a task: put it in the table and start downloading its images."""
         self.get_downloads_for_src_img_data(src_img_data)
 
         # TODO: do we really want to just hardcode "untouched" here?
@@ -1303,12 +1671,15 @@ class MarkerClient(QWidget):
         self.update_technical_stats(stats)
 
     def update_technical_stats(self, d):
-        self.ui.labelTech1.setText(
-            "<p>"
+        txt = (
             f"d/l: {d['queued']} queued, {d['cache_size']} cached,"
             f" {d['retries']} retried, {d['fails']} failed"
-            "</p>"
         )
+        if d.get("connections_opened") is not None:
+            txt += f"; {d['connections_opened']} conn"
+        if d.get("latency_mean") is not None:
+            txt += f", {d['latency_mean']:.2g}s avg"
+        self.ui.labelTech1.setText(f"<p>{txt}</p>")
 
     def update_technical_stats_upload(self, n, m, numup, failed):
         if n == 0 and m == 0:
@@ -1441,16 +1812,300 @@ class MarkerClient(QWidget):
             self.ui.tasksComboBox.setCurrentIndex(0)
             self._show_only_my_tasks()
 
+    def is_offline(self) -> bool:
+        """Are we marking from prefetched data without contacting the server?"""
+        return self._offline
+
+    def toggle_offline(self, checked: bool) -> None:
+        """Go offline or come back online in response to the menu checkbox."""
+        if checked:
+            self.go_offline()
+        else:
+            self.go_online()
+        self._offline_action.setChecked(self._offline)
+
+    def go_offline(self, num_tasks: int | None = None) -> bool:
+        """Claim and download a batch of tasks so we can mark without a connection.
+
+        We claim tasks (respecting the quota and the tag and paper-range
+        preferences) until we have ``num_tasks`` untouched tasks locally,
+        download all their page images and keep copies of the rubrics,
+        the user's rubric tabs, the solution and any rendered LaTeX.
+
+        Args:
+            num_tasks: how many untouched tasks we want in hand.  If
+                omitted, ask the user.
+
+        Returns:
+            True if we are now offline, False if the user cancelled or
+            something went wrong (in which case they have seen a dialog).
+        """
+        if self._offline:
+            return True
+        if num_tasks is None:
+            num_tasks, ok = QInputDialog.getInt(
+                self,
+                "Prepare to work offline",
+                "<p>How many tasks would you like to take with you?</p>"
+                "<p>We will claim tasks and download everything needed to"
+                " mark them.  Your marking will be uploaded when you go"
+                " back online.</p>",
+                10,
+                1,
+                200,
+            )
+            if not ok:
+                return False
+        if self._offline_store is None:
+            self._offline_store = OfflineStore(self._offline_store_dir)
+        store = self._offline_store
+
+        self.Qapp.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self._claim_tasks_for_offline(num_tasks)
+            for task in self.examModel.get_all_tasks():
+                if self.examModel.getStatusByTask(task) != "untouched":
+                    continue
+                if not self.examModel.is_our_task(task, self.msgr.username):
+                    continue
+                src_img_data = self.examModel.get_source_image_data(task)
+                self.downloader.sync_downloads(src_img_data)
+            rubrics = self.msgr.MgetRubrics(self.question_idx)
+            store.put_rubrics(rubrics)
+            if not store.is_tab_state_dirty():
+                store.put_tab_state(
+                    self.msgr.MgetUserRubricTabs(self.question_idx), dirty=False
+                )
+            self.refreshSolutionImage()
+        except PlomException as e:
+            WarnMsg(
+                self,
+                "Could not prepare to work offline.",
+                info=f"{e}",
+            ).exec()
+            return False
+        finally:
+            self.Qapp.restoreOverrideCursor()
+        # in the cache, ready for when we are offline
+        self._prerender_latex_for_rubrics(rubrics)
+
+        n = self.examModel.count_local_ready_to_mark()
+        log.info("Going offline with %d tasks to mark", n)
+        self._offline = True
+        if self._claim_ahead:
+            self._claim_ahead.set_enabled(False)
+        self.ui.getMoreButton.setEnabled(False)
+        self.ui.refreshTaskListButton.setEnabled(False)
+        self.update_window_title()
+        self.updateProgress()
+        if n < num_tasks:
+            InfoMsg(
+                self,
+                f"Working offline with {n} tasks to mark:"
+                f" could not claim {num_tasks - n} more.",
+            ).exec()
+        return True
+
+    def _claim_tasks_for_offline(self, num_tasks: int) -> None:
+        """Claim tasks until we have enough untouched ones locally.
+
+        Raises:
+            PlomException: something other than another marker taking
+                a task first.
+        """
+        prefs = self._claim_preferences()
+        while self.examModel.count_local_ready_to_mark() < num_tasks:
+            if self.marker_has_reached_task_limit(use_cached=False):
+                return
+            # the strategy deals with other markers getting there first,
+            # but mustn't wait between tries on the GUI thread
+            try:
+                r = claim_next_task(
+                    self.msgr, self.question_idx, self.version, **prefs, wait=False
+                )
+            except PlomTakenException as err:
+                log.info("Others claimed all the tasks we tried: %s", err)
+                return
+            if r is None:
+                return
+            self._add_claimed_task(*r)
+
+    def _prerender_latex_for_rubrics(self, rubrics: list[dict[str, Any]]) -> None:
+        """Render the TeX of rubrics so it is in the cache if we go offline.
+
+        We render the fragments the same way the text tool does: in the
+        default colour and in the blue and gray used for "ghosts".  The
+        server renders them in the background while we show progress;
+        the user can skip the rest, leaving those rubrics as plain text
+        while offline.
+        """
+        fragments = [f for r in rubrics for f in rubric_tex_fragments(r["text"])]
+        calls = self._render_latex_in_background(fragments)
+        if not calls:
+            return
+        pd = QProgressDialog(
+            "Rendering rubrics for working offline", "Skip", 0, len(calls), self
+        )
+        pd.setWindowModality(Qt.WindowModality.WindowModal)
+        pd.setMinimumDuration(500)
+        while True:
+            done = sum(c.is_done() for c in calls)
+            pd.setValue(done)
+            if done == len(calls):
+                break
+            if pd.wasCanceled():
+                assert self._amsgr
+                self._amsgr.cancel_group("latex")
+                break
+            self.Qapp.processEvents()
+            time.sleep(0.02)
+        pd.close()
+
+    def prerender_latex_in_background(self, fragments: list[str]) -> int:
+        """Render TeX fragments in the background, in order, ready for when we need them.
+
+        Any fragments from an earlier call that have not yet started are
+        dropped: the latest call knows best what is wanted.  Fragments
+        that are already in the cache, including those we know to be
+        bad TeX, are skipped.
+
+        Args:
+            fragments: the TeX to render, most wanted first.
+
+        Returns:
+            How many fragments we asked the server to render.
+        """
+        return len(self._render_latex_in_background(fragments))
+
+    def _render_latex_in_background(self, fragments: list[str]) -> list[MessengerCall]:
+        """Like :meth:`prerender_latex_in_background` but returning the calls."""
+        if self._offline or self._amsgr is None:
+            return []
+        self._amsgr.cancel_group("latex")
+        calls = []
+        for txt in dict.fromkeys(f.strip() for f in fragments):
+            if txt in self.commentCache:
+                continue
+            call = self._amsgr.call("MlatexFragment", txt, group="latex")
+            call.then(lambda r, txt=txt: self._latex_rendered(txt, *r))
+            calls.append(call)
+        log.debug("tex: %d fragments to render in the background", len(calls))
+        return calls
+
+    def _latex_rendered(self, txt: str, ok: bool, fragment: bytes | str) -> None:
+        if txt in self.commentCache:
+            # rendered in the foreground while we waited
+            return
+        if not ok:
+            log.debug("tex: bad TeX in background render: %s", shorten(txt, 60))
+            self.commentCache[txt] = None
+            return
+        self._cache_latex_image(txt, fragment)
+
+    def go_online(self) -> bool:
+        """Reconnect to the server and upload any marking done offline.
+
+        The queued results are handed to the uploader in the order they
+        were marked.  The server compares the integrity check of each
+        with the task's current state: if someone changed the task while
+        we were away, the upload fails and the user is told in the
+        usual way.
+
+        Returns:
+            True if we are back online, False if we could not reach the
+            server (the user has seen a dialog and we stay offline).
+        """
+        if not self._offline:
+            return True
+        try:
+            info = self.msgr.get_marking_progress(self.question_idx, self.version)
+        except PlomException as e:
+            WarnMsg(
+                self,
+                "Cannot reach the server: still working offline.",
+                info=f"{e}",
+            ).exec()
+            return False
+        self._offline = False
+        self.ui.getMoreButton.setEnabled(True)
+        self.ui.refreshTaskListButton.setEnabled(True)
+        self.update_window_title()
+        if self._claim_ahead:
+            self._claim_ahead.set_enabled(self.allowBackgroundOps)
+
+        self._upload_offline_results()
+        self.updateProgress(info=info)
+        return True
+
+    def _upload_offline_results(self) -> None:
+        """Send the tab state and results queued while offline to the server."""
+        store = self._offline_store
+        assert store is not None
+        if store.is_tab_state_dirty():
+            tab_state = store.get_tab_state()
+            self.saveTabStateToServer(tab_state)
+            store.put_tab_state(tab_state, dirty=False)
+
+        pending = store.pending_results()
+        log.info("Back online: uploading %d results", len(pending))
+        for data in pending:
+            task = data[0]
+            store.discard_result(task)
+            if self.examModel.has_task(task):
+                self.examModel.setStatusByTask(task, "uploading...")
+            if self.allowBackgroundOps:
+                self.backgroundUploader.enqueueNewUpload(*data)
+            else:
+                synchronous_upload(
+                    self.msgr,
+                    *data,
+                    failCallback=self.backgroundUploadFailed,
+                    successCallback=self.backgroundUploadFinished,
+                )
+
     def refresh_server_data(self):
         """Refresh various server data including the current task list from the server."""
-        info = self.msgr.get_exam_info()
+        if self._offline:
+            InfoMsg(self, "Cannot refresh while working offline.").exec()
+            return
+        self._apply_server_data(self.msgr.get_exam_info(), self.msgr.get_user_roles())
+
+        # TODO: re-queue any failed uploads, Issue #3497
+
+        # Note: Issue #5098, we had problems with this happening between dblclicks,
+        # but calling after an explicit server refresh probably ok... (?)
+        # self.ui.tableView.resizeRowsToContents
+
+        self.refresh_progress_in_background()
+        self._update_user_lists()
+        if self._claim_ahead:
+            self._claim_ahead.reset()
+
+    def _apply_server_data(
+        self,
+        info: dict[str, Any],
+        user_roles: list[str],
+        *,
+        tasks: list[dict[str, Any]] | None = None,
+    ) -> None:
+        """Update our settings and the task list from data we got from the server.
+
+        Args:
+            info: the exam info.
+            user_roles: the roles of the current user.
+
+        Keyword Args:
+            tasks: our tasks, if we already have them, otherwise we
+                download the appropriate tasks according to the UI.
+        """
         self.max_papernum = info["current_largest_paper_num"]
+        self._claim_strategy.max_papernum = self.max_papernum
         self.annotatorSettings["feedback_rules"] = info["feedback_rules"]
         # TODO: in future, I think I prefer a rules-based framework
         # Not "you are lead marker" but "you can view all tasks".
         # To my mind, "lead_marker" etc is some server detail that
         # could stay on the server.
-        if "lead_marker" in self.msgr.get_user_roles():
+        if "lead_marker" in user_roles:
             self.annotatorSettings["user_can_view_all_tasks"] = True
         else:
             self.annotatorSettings["user_can_view_all_tasks"] = False
@@ -1459,29 +2114,23 @@ class MarkerClient(QWidget):
             self.ui.tasksComboBox.setCurrentIndex(0)
             self._show_only_my_tasks()
 
-        if self.ui.tasksComboBox.currentIndex() == 0:
+        if tasks is not None:
+            self.download_task_list(tasks=tasks)
+        elif self.ui.tasksComboBox.currentIndex() == 0:
             assert self.msgr.username is not None
             self.download_task_list(username=self.msgr.username)
         else:
             self.download_task_list()
 
-        # TODO: re-queue any failed uploads, Issue #3497
-
-        # Note: Issue #5098, we had problems with this happening between dblclicks,
-        # but calling after an explicit server refresh probably ok... (?)
-        # self.ui.tableView.resizeRowsToContents
-
-        self.updateProgress()
-        self._update_user_lists()
-
-    def _update_user_lists(self) -> None:
-        try:
-            users = self.msgr.get_user_list()
-        except PlomNoServerSupportException as e:
-            # no server support for api < 115; just leave them empty as per
-            # init (exception handler to be removed when we drop 114 support)
-            log.warning(f"server does not support user lists: {e}")
-            return
+    def _update_user_lists(self, users: list[dict[str, Any]] | None = None) -> None:
+        if users is None:
+            try:
+                users = self.msgr.get_user_list()
+            except PlomNoServerSupportException as e:
+                # no server support for api < 115; just leave them empty as per
+                # init (exception handler to be removed when we drop 114 support)
+                log.warning(f"server does not support user lists: {e}")
+                return
         lead_markers = []
         other_markers = []
         for u in users:
@@ -1493,8 +2142,14 @@ class MarkerClient(QWidget):
         other_markers.sort()
         self._cached_user_list_lead_markers = lead_markers
         self._cached_user_list_other_markers = other_markers
+        # look first in our own part of the papers, to avoid collisions
+        self._claim_strategy.set_shard_from_users(
+            self.msgr.username, lead_markers + other_markers
+        )
 
-    def download_task_list(self, *, username: str = "") -> bool:
+    def download_task_list(
+        self, *, username: str = "", tasks: list[dict[str, Any]] | None = None
+    ) -> bool:
         """Download and fill/update the task list.
 
         Danger: there is quite a bit of subtly here about how to update
@@ -1504,18 +2159,21 @@ class MarkerClient(QWidget):
         Keyword Args:
             username: find tasks assigned to this user, or all tasks if
                 omitted.
+            tasks: use this list of tasks instead of downloading it,
+                for example if it was prefetched.
 
         Returns:
             True if the donload was successful, False if the server
             does not support this.
         """
-        try:
-            tasks = self.msgr.get_tasks(
-                self.question_idx, self.version, username=username
-            )
-        except PlomNoServerSupportException as e:
-            WarnMsg(self, str(e)).exec()
-            return False
+        if tasks is None:
+            try:
+                tasks = self.msgr.get_tasks(
+                    self.question_idx, self.version, username=username
+                )
+            except PlomNoServerSupportException as e:
+                WarnMsg(self, str(e)).exec()
+                return False
         our_username = self.msgr.username
         task_ids_seen = []
         for t in tasks:
@@ -1550,7 +2208,11 @@ class MarkerClient(QWidget):
                 # Be careful b/c we don't want to stomp local state during
                 # in-progress uploads or situations we might want to retry
                 local_status = self.examModel.getStatusByTask(task_id_str)
-                if local_status.casefold() in ("uploading...", "failed upload"):
+                if local_status.casefold() in (
+                    "uploading...",
+                    "failed upload",
+                    "waiting to upload",
+                ):
                     log.info(
                         'Refreshing but task %s has status "%s": not touching local data',
                         task_id_str,
@@ -1591,7 +2253,11 @@ class MarkerClient(QWidget):
         # any that might not be saved yet (even if not seen in previous loop).
         for task_id_str in self.examModel.get_all_tasks():
             local_status = self.examModel.getStatusByTask(task_id_str)
-            if local_status.casefold() in ("uploading...", "failed upload"):
+            if local_status.casefold() in (
+                "uploading...",
+                "failed upload",
+                "waiting to upload",
+            ):
                 continue
             if task_id_str in task_ids_seen:
                 continue
@@ -1713,6 +2379,7 @@ class MarkerClient(QWidget):
             "marked",
             "uploading...",
             "failed upload",
+            "waiting to upload",
         ):
             InfoMsg(self, "Cannot defer a marked test.").exec()
             return
@@ -1762,13 +2429,25 @@ class MarkerClient(QWidget):
         """If there are not a minimum of claimed task, get some more.
 
         Keyword Args:
-            background: its not urgent; we can hand off to the background
-                downloader.  Currently not implemented; always happens in
-                foreground.
+            background: its not urgent, claim without waiting for the
+                server (the default).  If False, wait.
         """
+        if self._offline:
+            return
+        if (
+            background
+            and self.allowBackgroundOps
+            and self._claim_ahead
+            and self._claim_ahead.target > 0
+        ):
+            self._claim_ahead.top_up()
+            return
         # TODO: should we loop and keep trying?  subtle near the end of marking
         if self.examModel.count_local_ready_to_mark() < 2:
-            self.request_one_more()
+            if background:
+                self.request_one_more()
+            else:
+                self._requestNext(update_select=False)
 
     def _defer_task_to_users(self, task: str, user_list: list[str]) -> None:
         """Tag some users, and surrender a task.
@@ -1983,9 +2662,8 @@ class MarkerClient(QWidget):
             return
 
         if self.allowBackgroundOps:
-            # If just one in the queue (which we are grading) then ask for more
-            if self.examModel.count_local_ready_to_mark() < 2:
-                self.request_one_more()
+            # keep some tasks ready after the one we are grading
+            self.request_more_tasks_if_necessary()
 
         if self._annotator:
             self._annotator.load_new_task(*inidata)
@@ -2057,7 +2735,13 @@ class MarkerClient(QWidget):
             )
             if not msg.exec() == QMessageBox.StandardButton.Yes:
                 return None
-        if status.casefold() in ("complete", "marked", "uploading...", "failed upload"):
+        if status.casefold() in (
+            "complete",
+            "marked",
+            "uploading...",
+            "failed upload",
+            "waiting to upload",
+        ):
             # If it was our task, we probably already have an plom file (and annotated image, etc)
             oldpname = self.examModel.getPlomFileByTask(task)
             if str(oldpname) == ".":
@@ -2145,7 +2829,58 @@ class MarkerClient(QWidget):
         Returns:
             A list of the dictionary objects.
         """
-        return self.msgr.MgetRubrics(question)
+        if self._offline:
+            assert self._offline_store is not None
+            return self._offline_store.get_rubrics()
+        rubrics = None
+        if question == self.question_idx:
+            rubrics = self._take_prefetched("rubrics")
+        if rubrics is None:
+            rubrics = self.msgr.MgetRubrics(question)
+        if question == self.question_idx and self._rubric_snapshot:
+            self._rubric_snapshot.put_rubrics(rubrics)
+        return rubrics
+
+    def getRubricSnapshot(
+        self,
+    ) -> tuple[list[dict[str, Any]], dict[str, Any] | None] | None:
+        """The rubrics and tab state we had last time, if we need them.
+
+        Returns:
+            None if we have no snapshot, or if we have fresher data
+            anyway, for example from startup or because we are offline.
+            Otherwise the list of rubrics and the tab state.
+        """
+        if self._offline or not self._rubric_snapshot:
+            return None
+        if "rubrics" in self._prefetched:
+            return None
+        return self._rubric_snapshot.load()
+
+    def getRubricUsage(self) -> dict[int, int]:
+        """How many times we have used each rubric on our question, by rubric id."""
+        if not self._rubric_usage:
+            return {}
+        return self._rubric_usage.counts()
+
+    def fetchRubricsInBackground(self) -> MessengerCall | None:
+        """Get the rubrics and tab state from the server in the background.
+
+        Returns:
+            A call whose result is the list of rubrics and the tab state,
+            or None if we cannot contact the server.
+        """
+        if self._offline or self._amsgr is None:
+            return None
+
+        def _got(result):
+            if self._rubric_snapshot:
+                rubrics, tab_state = result
+                self._rubric_snapshot.put_rubrics(rubrics)
+                self._rubric_snapshot.put_tab_state(tab_state)
+
+        call = self._amsgr.submit(fetch_rubrics_and_tab_state, self.question_idx)
+        return call.then(_got)
 
     def getOneRubricFromServer(self, key: int) -> dict[str, Any]:
         """Get one rubric from server.
@@ -2159,6 +2894,12 @@ class MarkerClient(QWidget):
         Raises:
             PlomNoRubric
         """
+        if self._offline:
+            assert self._offline_store is not None
+            for r in self._offline_store.get_rubrics():
+                if r["rid"] == key:
+                    return r
+            raise PlomNoRubric(f"No rubric {key} in our offline copy")
         return self.msgr.get_one_rubric(key)
 
     def getOtherRubricUsagesFromServer(self, key: str) -> list[int]:
@@ -2171,11 +2912,44 @@ class MarkerClient(QWidget):
             List of paper numbers using the rubric.
 
         Raises:
-            PlomNoServerSupportException
+            PlomNoServerSupportException: including when working offline.
         """
+        if self._offline:
+            raise PlomNoServerSupportException("Not available while working offline")
         return self.msgr.get_other_rubric_usages(key)
 
+    def fetch_annotations_in_background(
+        self, paper_number: int, question_idx: int
+    ) -> MessengerCall | None:
+        """Get the latest annotations of a paper into the annotation cache.
+
+        These are fetched one at a time, by the annotation cache's own
+        threads, so that asking for many does not hold up our other
+        background calls.
+
+        Args:
+            paper_number: which paper.
+            question_idx: which question.
+
+        Returns:
+            A call whose result is the :class:`Annotations`, or None if
+            we cannot contact the server.
+        """
+        cache = self._annot_cache
+        if self._offline or self._amsgr is None or cache is None:
+            return None
+        return self._amsgr.submit_to(
+            cache.background,
+            cache.get,
+            paper_number,
+            question_idx,
+            key=("annotations", paper_number, question_idx),
+            group="annotations",
+        )
+
     def sendNewRubricToServer(self, new_rubric) -> dict[str, Any]:
+        if self._offline:
+            raise PlomNoPermission("cannot change rubrics while working offline")
         return self.msgr.McreateRubric(new_rubric)
 
     def modifyRubricOnServer(
@@ -2190,6 +2964,8 @@ class MarkerClient(QWidget):
 
         See the messenger method for detailed docs.
         """
+        if self._offline:
+            raise PlomNoPermission("cannot change rubrics while working offline")
         return self.msgr.MmodifyRubric(
             rid, updated_rubric, minor_change=minor_change, tag_tasks=tag_tasks
         )
@@ -2204,6 +2980,8 @@ class MarkerClient(QWidget):
     def refreshSolutionImage(self) -> Path | None:
         """Get solution image and save it to working dir."""
         f = self.workingDirectory / f"solution.{self.question_idx}.{self.version}.png"
+        if self._offline:
+            return f if f.is_file() else None
         try:
             im_bytes = self.msgr.getSolutionImage(self.question_idx, self.version)
             with open(f, "wb") as fh:
@@ -2236,14 +3014,29 @@ class MarkerClient(QWidget):
         # TODO: test on other desktops and OSes
 
     def saveTabStateToServer(self, tab_state):
-        """Upload a tab state to the server."""
+        """Upload a tab state to the server, or keep it until we are back online."""
+        if self._offline:
+            assert self._offline_store is not None
+            self._offline_store.put_tab_state(tab_state, dirty=True)
+            return
+        self._prefetched.pop("tab_state", None)
         log.info("Saving user's rubric tab configuration to server")
         self.msgr.MsaveUserRubricTabs(self.question_idx, tab_state)
+        if self._rubric_snapshot:
+            self._rubric_snapshot.put_tab_state(tab_state)
 
     def getTabStateFromServer(self):
-        """Download the state from the server."""
-        log.info("Pulling user's rubric tab configuration from server")
-        return self.msgr.MgetUserRubricTabs(self.question_idx)
+        """Download the state from the server, or use our copy when offline."""
+        if self._offline:
+            assert self._offline_store is not None
+            return self._offline_store.get_tab_state()
+        tab_state = self._take_prefetched("tab_state")
+        if tab_state is None:
+            log.info("Pulling user's rubric tab configuration from server")
+            tab_state = self.msgr.MgetUserRubricTabs(self.question_idx)
+        if self._rubric_snapshot:
+            self._rubric_snapshot.put_tab_state(tab_state)
+        return tab_state
 
     # when Annotator done, we come back to one of these callbackAnnDone* fcns
     @pyqtSlot(str)
@@ -2319,6 +3112,8 @@ class MarkerClient(QWidget):
         self.examModel.markPaperByTask(
             task, grade, aname, plomFileName, markingTime, paperDir
         )
+        if self._rubric_usage:
+            self._rubric_usage.record_plom_file(task, plomFileName)
         # update the markingTime to be the total marking time
         totmtime = self.examModel.get_marking_time_by_task(task)
 
@@ -2332,7 +3127,13 @@ class MarkerClient(QWidget):
             self.version,
             integrity_check,
         )
-        if self.allowBackgroundOps:
+        if self._offline:
+            # keep it until we are back online, see :meth:`go_online`
+            assert self._offline_store is not None
+            self._offline_store.enqueue_result(*_data)
+            self.examModel.setStatusByTask(task, "waiting to upload")
+            self.updateProgress()
+        elif self.allowBackgroundOps:
             # the actual upload will happen in another thread
             self.backgroundUploader.enqueueNewUpload(*_data)
         else:
@@ -2368,6 +3169,8 @@ class MarkerClient(QWidget):
             self.moveToNextUnmarkedTask(old_task if old_task else None)
         else:
             self._next_task_in_list()
+        if self.allowBackgroundOps:
+            self.request_more_tasks_if_necessary()
 
     def backgroundUploadFinished(
         self, task: str, progress_info: dict[str, Any]
@@ -2381,11 +3184,15 @@ class MarkerClient(QWidget):
         Returns:
             None
         """
+        if self._offline_store:
+            # if it was marked offline, we no longer need our copy
+            self._offline_store.remove_result_files(task)
         stat = self.examModel.getStatusByTask(task)
         # maybe it changed while we waited for the upload
         if stat == "uploading...":
             self.examModel.setStatusByTask(task, "Complete")
         self.updateProgress(info=progress_info)
+        self.request_more_tasks_if_necessary()
 
     def backgroundUploadFailed(
         self, task: str, errmsg: str, server_changed: bool, unexpected: bool
@@ -2433,6 +3240,9 @@ class MarkerClient(QWidget):
         Returns:
             None
         """
+        if self._amsgr:
+            # no longer interested in whatever we were fetching for the old row
+            self._amsgr.cancel_group("preview")
         idx = new.indexes()
         if len(idx) == 0:
             # Remove preview when user unselects row (e.g., ctrl-click)
@@ -2496,8 +3306,46 @@ class MarkerClient(QWidget):
         # Note: a single selection should have length 11 all with same row: could assert
         pr = idx[0].row()
         task = self.prxM.getPrefix(pr)
+        self._dwell_timer.stop()
+        if self.prxM.getStatus(pr).casefold() == "complete":
+            # the preview shows the annotated image; scans are only needed to re-mark
+            if self._remark_likely(task):
+                self._download_sources_for(task)
+            else:
+                self._dwell_task = task
+                self._dwell_timer.start(self._remark_prefetch_delay_ms)
+            return
+        self._download_sources_for(task)
+
+    def _download_sources_for(self, task: str) -> None:
         src_img_data = self.examModel.get_source_image_data(task)
-        self.get_downloads_for_src_img_data(src_img_data)
+        if src_img_data:
+            self.get_downloads_for_src_img_data(src_img_data)
+
+    def _dwelt_on_selected_task(self) -> None:
+        """The user has been looking at a completed task for a while: get ready to re-mark it."""
+        task = self._dwell_task
+        if task is None or task != self.get_current_task_id_or_none():
+            return
+        log.debug("Lingering on %s: prefetching its scans", task)
+        self._dwelt_task = task
+        self._download_sources_for(task)
+
+    def _remark_likely(self, task: str) -> bool:
+        """Predict whether the user will want to re-mark a completed task.
+
+        This is our policy for prefetching the original scans of tasks
+        that are otherwise only being looked at.
+        """
+        if task == self._dwelt_task:
+            return True
+        # recently marked by us, maybe they want another go
+        if task in self.marking_history[-3:]:
+            return True
+        # someone has tagged it for our attention
+        if self.msgr and f"@{self.msgr.username}" in self.examModel.getTagsByTask(task):
+            return True
+        return False
 
     def get_upload_queue_length(self):
         """How long is the upload queue?
@@ -2507,11 +3355,13 @@ class MarkerClient(QWidget):
         Returns:
             int: The number of papers waiting to upload, possibly but
             not certainly including the current upload-in-progress.
-            Value might also be approximate.
+            Value might also be approximate.  Includes any marking
+            done offline and not yet uploaded.
         """
+        n = self._offline_store.num_pending() if self._offline_store else 0
         if not self.backgroundUploader:
-            return 0
-        return self.backgroundUploader.queue_size()
+            return n
+        return n + self.backgroundUploader.queue_size()
 
     def wait_for_bguploader(self, timeout=0):
         """Wait for the uploader queue to empty.
@@ -2582,6 +3432,9 @@ class MarkerClient(QWidget):
                 # TODO: do we have a force quit?
                 break
         N = self.get_upload_queue_length()
+        if self._offline_store:
+            # these are kept on disc: we offer to upload them next time
+            N -= self._offline_store.num_pending()
         if N > 0:
             msg = QMessageBox()
             s = "<p>There is 1 paper" if N == 1 else f"<p>There are {N} papers"
@@ -2614,14 +3467,26 @@ class MarkerClient(QWidget):
             if self.backgroundUploader.isRunning():
                 self.backgroundUploader.terminate()
 
+        # we can no longer cancel closing, so stop the background work
+        if self._claim_ahead:
+            self._claim_ahead.set_enabled(False)
+        if self._amsgr:
+            self._amsgr.stop(2000)
+        if self._annot_cache:
+            self._annot_cache.close()
+
         log.debug("Revoking login token")
         # after revoking, Downloader's msgr will be invalid
         self.Qapp.downloader.detach_messenger()
-        try:
-            self.msgr.closeUser(revoke_token=True)
-        except PlomAuthenticationException:
-            log.warning("User tried to logout but was already logged out.")
-            pass
+        if self._offline:
+            log.info("Working offline: not revoking the login token")
+        else:
+            try:
+                self.msgr.closeUser(revoke_token=True)
+            except PlomAuthenticationException:
+                log.warning("User tried to logout but was already logged out.")
+            except (PlomConnectionError, PlomSeriousException) as e:
+                log.warning("Could not log out: %s", e)
         log.debug("Emitting Marker shutdown signal")
         retval = 2 if self._hack_prevent_shutdown else 1
         self.my_shutdown_signal.emit(
@@ -2725,6 +3590,9 @@ class MarkerClient(QWidget):
                 return None
         if r:
             return r
+        if self._offline:
+            log.info("tex: offline, cannot render: %s", shorten(txt, 60))
+            return None
         log.debug("tex: request image for: %s", shorten(txt, 80, placeholder="..."))
         r, fragment = self.msgr.MlatexFragment(txt)
         if not r:
@@ -2757,10 +3625,14 @@ class MarkerClient(QWidget):
             if cache_invalid:
                 self.commentCache[txt] = None
             return None
+        return self._cache_latex_image(txt, fragment)
+
+    def _cache_latex_image(self, txt: str, png: bytes) -> str:
+        """Save the rendered image of some TeX and add it to the cache."""
         with tempfile.NamedTemporaryFile(
             "wb", dir=self.workingDirectory, suffix=".png", delete=False
         ) as f:
-            f.write(fragment)
+            f.write(png)
             fragFile = f.name
         # add it to the cache
         self.commentCache[txt] = fragFile
@@ -2899,6 +3771,7 @@ class MarkerClient(QWidget):
         *,
         _parent: QWidget | None = None,
         get_annotated: bool = True,
+        cached_ok: bool = False,
     ) -> None:
         """Shows a particular paper number and question.
 
@@ -2910,6 +3783,8 @@ class MarkerClient(QWidget):
             get_annotated: whether to try to get the latest annotated
                 image before falling back on the original scanned images.
                 True by default.
+            cached_ok: if we already have annotations in the cache, show
+                those without asking the server if there are newer ones.
 
         Returns:
             None
@@ -2923,8 +3798,11 @@ class MarkerClient(QWidget):
             _parent = self
 
         if get_annotated:
+            assert self._annot_cache is not None
             try:
-                annot_img_info, annot_img_bytes = self.msgr.get_annotations_image(tn, q)
+                a = self._annot_cache.lookup(tn, q) if cached_ok else None
+                if a is None:
+                    a = self._annot_cache.get(tn, q)
             except PlomNoPaper:
                 pass
             except PlomBenignException as e:
@@ -2932,12 +3810,7 @@ class MarkerClient(QWidget):
                 s += "\nWill try to get the original images next..."
                 WarnMsg(self, s).exec()
             else:
-                # TODO: nonunique if we ask again: no caching here
-                im_type = annot_img_info["extension"]
-                aname = self.workingDirectory / f"annot_{tn}_{q}.{im_type}"
-                with open(aname, "wb") as fh:
-                    fh.write(annot_img_bytes)
-                stuff = [aname]
+                stuff = [a.image]
                 s = f"Annotations for paper {tn:04} question index {q}"
 
         if stuff is None:
@@ -0,0 +1,177 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Local storage for marking while disconnected from the server."""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+import shutil
+from typing import Any
+
+log = logging.getLogger("offline")
+
+
+def offline_store_path(
+    basedir: str | Path, *, server: str, question_idx: int, username: str
+) -> Path:
+    """Where to keep the offline store of a server, question and user.
+
+    This should be somewhere that outlives the session, so that marking
+    done offline survives quitting (or crashing) before it is uploaded.
+    """
+    key = [server, question_idx, username]
+    h = hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+    return Path(basedir) / h
+
+
+class OfflineStore:
+    """Keep enough on disc to mark a batch of claimed tasks without a server.
+
+    Marker fills this in while it still has a connection: the rubrics
+    and the user's tab state.  The claimed tasks stay in Marker's table,
+    their page images in the usual cache and any rendered LaTeX in
+    Marker's cache.  While offline, Marker reads from here instead of
+    the server and finished marking is appended to a queue of pending
+    results.  When the connection returns, those results are uploaded
+    as usual and the server checks each one against the integrity check
+    recorded when the task was claimed.
+
+    Everything is stored as json in ``basedir``; the annotated images
+    and ``.plom`` files of pending results are copied in as well so
+    the queue does not depend on any other temporary directories.
+    Use a persistent ``basedir``, see :func:`offline_store_path`: the
+    pending results are still there in the next session if we quit
+    before uploading them.
+
+    This class is not thread safe: it should only be used from the
+    GUI thread.
+    """
+
+    def __init__(self, basedir: str | Path) -> None:
+        self.basedir = Path(basedir)
+        self.basedir.mkdir(parents=True, exist_ok=True)
+        (self.basedir / "results").mkdir(exist_ok=True)
+        log.info("Offline store in %s", self.basedir)
+
+    def _read(self, name: str, default: Any = None) -> Any:
+        try:
+            with open(self.basedir / f"{name}.json", "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _write(self, name: str, data: Any) -> None:
+        # write then rename so a crash doesn't leave a truncated file
+        tmp = self.basedir / f"{name}.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        tmp.replace(self.basedir / f"{name}.json")
+
+    def put_rubrics(self, rubrics: list[dict[str, Any]]) -> None:
+        self._write("rubrics", rubrics)
+
+    def get_rubrics(self) -> list[dict[str, Any]]:
+        return self._read("rubrics", [])
+
+    def put_tab_state(self, tab_state: dict[str, Any] | None, *, dirty: bool) -> None:
+        """Store the user's rubric tab state.
+
+        Args:
+            tab_state: the state, as it would be sent to the server.
+
+        Keyword Args:
+            dirty: True if this was changed locally and still needs to be
+                sent to the server.
+        """
+        self._write("tab_state", {"state": tab_state, "dirty": dirty})
+
+    def get_tab_state(self) -> dict[str, Any] | None:
+        return self._read("tab_state", {}).get("state")
+
+    def is_tab_state_dirty(self) -> bool:
+        return self._read("tab_state", {}).get("dirty", False)
+
+    def enqueue_result(
+        self,
+        task: str,
+        grade: float | int,
+        aname: Path,
+        pname: Path,
+        marking_time: float | int,
+        question_idx: int,
+        version: int,
+        integrity_check: str,
+    ) -> None:
+        """Put marking on the queue to be uploaded later.
+
+        The arguments are the same as those of
+        :func:`plom.client.uploader.synchronous_upload`.  If the task
+        is already in the queue (the user revised their marking) the
+        older result is replaced.
+        """
+        resdir = self.basedir / "results" / task
+        resdir.mkdir(exist_ok=True)
+        aname = Path(aname)
+        pname = Path(pname)
+        a = resdir / aname.name
+        p = resdir / pname.name
+        if aname.resolve() != a.resolve():
+            shutil.copyfile(aname, a)
+        if pname.resolve() != p.resolve():
+            shutil.copyfile(pname, p)
+        pending = [r for r in self._read("pending", []) if r["task"] != task]
+        pending.append(
+            {
+                "task": task,
+                "grade": grade,
+                "aname": str(a),
+                "pname": str(p),
+                "marking_time": marking_time,
+                "question_idx": question_idx,
+                "version": version,
+                "integrity_check": integrity_check,
+            }
+        )
+        self._write("pending", pending)
+
+    def pending_results(self) -> list[tuple]:
+        """The queued results, oldest first.
+
+        Returns:
+            A list of tuples, each suitable for passing to
+            :func:`plom.client.uploader.synchronous_upload` or
+            to the ``enqueueNewUpload`` method of the background uploader.
+        """
+        return [
+            (
+                r["task"],
+                r["grade"],
+                Path(r["aname"]),
+                Path(r["pname"]),
+                r["marking_time"],
+                r["question_idx"],
+                r["version"],
+                r["integrity_check"],
+            )
+            for r in self._read("pending", [])
+        ]
+
+    def num_pending(self) -> int:
+        return len(self._read("pending", []))
+
+    def discard_result(self, task: str) -> None:
+        """Remove a result from the queue, typically once it is handed to an uploader.
+
+        The copied files are left on disc: the uploader still needs them.
+        """
+        pending = self._read("pending", [])
+        self._write("pending", [r for r in pending if r["task"] != task])
+
+    def remove_result_files(self, task: str) -> None:
+        """Delete the copied files of a result, once it has been uploaded."""
+        if any(r["task"] == task for r in self._read("pending", [])):
+            # marked again since: those files are the new ones
+            return
+        shutil.rmtree(self.basedir / "results" / task, ignore_errors=True)
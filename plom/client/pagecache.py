@@ -13,13 +13,16 @@ log = logging.getLogger("PageCache")
 class PageCache:
     """Manage a local on-disc cache of page images.
 
+    Where known, we also record the md5sum of each image; the
+    :class:`Downloader` checks these before putting images here.
+
     TODO: record the time of caching
     """
 
     def __init__(self, basedir: str | Path):
         super().__init__()
         self._image_paths: dict[int, Path] = {}
-        # self._image_md5 = {}
+        self._image_md5: dict[int, str] = {}
         self.basedir = Path(basedir)
         log.info("Starting a new pagecache: %s", self.basedir)
 
@@ -29,6 +32,7 @@ class PageCache:
         # carefully erase dict without iterating over it
         for img_id in img_ids:
             p = self._image_paths.pop(img_id)
+            self._image_md5.pop(img_id, None)
             log.debug("Erasing image id %d: %s", img_id, p)
             p.unlink()
 
@@ -43,15 +47,33 @@ class PageCache:
         # TODO: document what happens if it doesn't exist?  Exception or None?
         return self._image_paths[img_id]
 
-    def set_page_image_path(self, img_id: int, f: str | Path) -> None:
+    def page_image_md5(self, img_id: int) -> str | None:
+        """The md5sum of a cached image, or None if we don't know it."""
+        return self._image_md5.get(img_id)
+
+    def set_page_image_path(
+        self, img_id: int, f: str | Path, *, md5: str | None = None
+    ) -> None:
+        """Record the location of a cached image.
+
+        Args:
+            img_id: the key of the image.
+            f: where it is on disc.
+
+        Keyword Args:
+            md5: the md5sum of the image, if known (and checked).
+        """
         # TODO: require Path only?
         self._image_paths[img_id] = Path(f)
+        if md5 is not None:
+            self._image_md5[img_id] = md5
 
     def update_from_someone_elses_downloads(
         self, pagedata: list[dict[str, Any]]
     ) -> None:
         # hopefully temporary!
-        # TODO: maybe check the md5sums since we didn't get it ourselves
+        # TODO: maybe check the md5sums since we didn't get it ourselves;
+        # for now we don't record them
         for r in pagedata:
             if r["filename"]:
                 cur = self._image_paths.get(r["id"], None)
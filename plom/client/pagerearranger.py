@@ -8,7 +8,7 @@ from copy import deepcopy
 import logging
 
 from PyQt6.QtCore import QSize, Qt
-from PyQt6.QtGui import QBrush, QColor, QIcon, QImageReader, QPixmap, QTransform
+from PyQt6.QtGui import QBrush, QColor, QIcon, QPixmap
 from PyQt6.QtWidgets import (
     QAbstractItemView,
     QDialog,
@@ -28,6 +28,7 @@ from PyQt6.QtWidgets import (
     QVBoxLayout,
 )
 
+from .thumbnails import Thumbnailer, ThumbnailSize
 from .useful_classes import SimpleQuestion, WarnMsg
 from .viewers import GroupView
 
@@ -58,8 +59,13 @@ class SourceList(QListWidget):
         self.item_positions = {}
         self.item_files = {}
         self.item_orientation = {}
+        self.item_md5 = {}
         # self.setSelectionMode(QListView.SelectionMode.SingleSelection)
 
+    def clear(self):
+        super().clear()
+        self.item_positions = {}
+
     def resizeEvent(self, whatev):
         A = self.size()
         x = min(A.width(), A.height())
@@ -68,27 +74,26 @@ class SourceList(QListWidget):
         B = QSize(x - 50, x - 50)
         self.setIconSize(B)
 
-    def addImageItem(self, p, pfile, angle, belongs):
+    def addImageItem(self, p, pfile, angle, belongs, *, md5):
         current_row = self.count()
         name = str(p)
-        qir = QImageReader(str(pfile))
-        # deal with jpeg exif rotations
-        qir.setAutoTransform(True)
-        pix = QPixmap(qir.read())
-        if pix.isNull():
-            raise RuntimeError(f"Could not read an image from {pfile}")
-        rot = QTransform()
-        # 90 means CCW, but we have a minus sign b/c of a y-downward coordsys
-        rot.rotate(-angle)
-        if angle != 0:
-            pix = pix.transformed(rot)
-        it = QListWidgetItem(QIcon(pix), name)
+        it = QListWidgetItem(self._parent.icon_for(md5, angle), name)
         if belongs:
             it.setBackground(QBrush(QColor("darkGreen")))
         self.addItem(it)  # item is added at current_row
         self.item_positions[name] = current_row
         self.item_files[name] = pfile
         self.item_orientation[name] = angle
+        self.item_md5[name] = md5
+
+    def refreshIcon(self, name: str) -> None:
+        """Update the icon of an item, e.g., b/c its thumbnail is now available."""
+        ci = self.item(self.item_positions[name])
+        if ci is None:
+            return
+        ci.setIcon(
+            self._parent.icon_for(self.item_md5[name], self.item_orientation[name])
+        )
 
     def hideItemByName(self, name=None):
         """Removes (hides) a single named item from source-list.
@@ -163,9 +168,16 @@ class SinkList(QListWidget):
         self.item_files = {}
         self.item_orientation = {}
         self.item_id = {}
+        self.item_md5 = {}
+        # the items currently in the list: these move around but are not copied
+        self._items_by_name = {}
         self.itemDoubleClicked.connect(self.viewImage)
         # self.setSelectionMode(QListView.SelectionMode.SingleSelection)
 
+    def clear(self):
+        super().clear()
+        self._items_by_name = {}
+
     def resizeEvent(self, whatev):
         A = self.size()
         x = min(A.width(), A.height())
@@ -173,12 +185,13 @@ class SinkList(QListWidget):
         B = QSize(x - 50, x - 50)
         self.setIconSize(B)
 
-    def addPotentialItem(self, p, pfile, angle, belongs, db_id=None):
+    def addPotentialItem(self, p, pfile, angle, belongs, db_id=None, *, md5):
         name = str(p)
         self.item_files[name] = pfile
         self.item_orientation[name] = angle
         self.item_id[name] = db_id
         self.item_belongs[name] = belongs
+        self.item_md5[name] = md5
 
     def removeSelectedItems(self):
         """Remove the selected items and pass back a name list."""
@@ -188,6 +201,7 @@ class SinkList(QListWidget):
         for cr in reversed(sorted(sel_rows)):
             ci = self.takeItem(cr)
             name_list.append(ci.text())
+            self._items_by_name.pop(ci.text(), None)
 
         self.setCurrentItem(None)
         return name_list
@@ -204,18 +218,14 @@ class SinkList(QListWidget):
     def appendItem(self, name):
         if name is None:
             return
-        qir = QImageReader(str(self.item_files[name]))
-        # deal with jpeg exif rotations
-        qir.setAutoTransform(True)
-        pix = QPixmap(qir.read())
-        if pix.isNull():
-            raise RuntimeError(f"Could not read an image from {self.item_files[name]}")
-        ci = QListWidgetItem(QIcon(pix), name)
+        ci = QListWidgetItem(
+            self._parent.icon_for(self.item_md5[name], self.item_orientation[name]),
+            name,
+        )
         if self.item_belongs[name]:
             ci.setBackground(QBrush(QColor("darkGreen")))
         self.addItem(ci)
-        # TODO: workaround to force re-orientation on entry to Sink list
-        self.rotateForceRefresh(name)
+        self._items_by_name[name] = ci
         self.setCurrentItem(ci)
 
     def appendItems(self, name_list):
@@ -257,18 +267,6 @@ class SinkList(QListWidget):
         # Issue #1164 workaround: https://www.qtcentre.org/threads/25867-Problem-with-QListWidget-Updating
         self.setFlow(QListView.Flow.LeftToRight)
 
-    def rotateForceRefresh(self, name):
-        """Force an item to visually update its rotate.
-
-        TODO: make this unnecessary and remove it!  Icons should know
-        how to display themselves properly.
-        """
-        angle = self.item_orientation[name]
-        if angle == 0:
-            return
-        log.info("Forcing orientation to %s", format(angle))
-        self.rotateItemTo(name, angle)
-
     def rotateItemBy(self, name: str, delta_angle: int):
         """Rotate image by an angle relative to its current state.
 
@@ -288,30 +286,20 @@ class SinkList(QListWidget):
             angle: rotate to this angle.
         """
         self.item_orientation[name] = angle
-        # TODO: instead of loading pixmap again, can we transform the QIcon?
-        # Also, docs warned QPixmap.transformed() is slow
-        qir = QImageReader(str(self.item_files[name]))
-        # deal with jpeg exif rotations
-        qir.setAutoTransform(True)
-        pix = QPixmap(qir.read())
-        if pix.isNull():
-            raise RuntimeError(f"Could not read an image from {self.item_files[name]}")
-        rot = QTransform()
-        # 90 means CCW, but we have a minus sign b/c of a y-downward coordsys
-        rot.rotate(-angle)
-        if angle != 0:
-            pix = pix.transformed(rot)
-        # ci = self.item(self.item_positions[name])
-        # TODO: instead we get `ci` with a dumb loop
-        for i in range(self.count()):
-            ci = self.item(i)
-            assert ci is not None
-            if ci.text() == name:
-                break
-        assert ci is not None
-        ci.setIcon(QIcon(pix))
-        # rotpixmap = ci.getIcon().pixmap().transformed(rot)
-        # ci.setIcon(QIcon(rotpixmap))
+        self.refreshIcon(name)
+
+    def refreshIcon(self, name: str) -> None:
+        """Update the icon of an item, if its in the list.
+
+        The rotation is applied to the (small) thumbnail, not to the
+        full-sized image.
+        """
+        ci = self._items_by_name.get(name)
+        if ci is None:
+            return
+        ci.setIcon(
+            self._parent.icon_for(self.item_md5[name], self.item_orientation[name])
+        )
 
     def viewImage(self, qi):
         """Shows a larger view of the currently selected page."""
@@ -333,15 +321,48 @@ class SinkList(QListWidget):
 
 class RearrangementViewer(QDialog):
     def __init__(
-        self, parent, testNumber, current_pages, page_data, need_to_confirm=False
+        self,
+        parent,
+        testNumber,
+        current_pages,
+        page_data,
+        need_to_confirm=False,
+        *,
+        downloading: set[int] | None = None,
     ):
+        """Initialize a new dialog for adjusting the pages of a question.
+
+        Args:
+            parent: the parent of this dialog.
+            testNumber: which paper.
+            current_pages: list of dicts of the pages currently in the
+                question with keys ``"md5"`` and ``"orientation"``.
+                If empty, use the server's original pages instead.
+            page_data: a list of dicts, one for each page of the paper,
+                see :meth:`dedupe_by_md5sum`.
+            need_to_confirm: if True, ask before accepting, e.g., b/c
+                we'll erase annotations.
+
+        Keyword Args:
+            downloading: image ids of pages that are still downloading;
+                their ``"filename"`` is a placeholder for now.  Connect
+                the downloader's ``download_finished`` signal to
+                :meth:`page_image_arrived` to fill them in.
+        """
         super().__init__(parent)
         self.testNumber = testNumber
         self.need_to_confirm = need_to_confirm
+        self._downloading = set(downloading) if downloading else set()
+        # thumbnails are made in the background and filled in as they arrive
+        self.thumbnailer = Thumbnailer(self)
+        self.thumbnailer.thumbnail_ready.connect(self._thumbnail_arrived)
+        self._placeholder_icon = None
         self._setupUI()
         page_data = self.dedupe_by_md5sum(page_data)
         # stored in an instance variable but only used on reset (and initial setup)
         self.initial_page_data = page_data
+        # after deduping, each md5sum corresponds to exactly one name
+        self._md5_to_name = {row["md5"]: row["pagename"] for row in page_data}
         self.nameToIrefNFile = {}
         if current_pages:
             self.populateListWithCurrent(deepcopy(current_pages))
@@ -545,7 +566,8 @@ class RearrangementViewer(QDialog):
             lambda sel, unsel: self.singleSelect(self.listB, allPageWidgets)
         )
 
-    def dedupe_by_md5sum(self, page_data):
+    @staticmethod
+    def dedupe_by_md5sum(page_data):
         """Collapse entries in the pagedata with duplicated md5sums.
 
         Pages are shared between questions but we only want to show one
@@ -586,15 +608,11 @@ class RearrangementViewer(QDialog):
               that is, before the parenthetical?  Probably by re-ordering
               the list.
         """
-        # List of lists, preserving original order within each list
-        tmp_data = []
+        # Dict of lists, preserving original order within each list;
+        # dicts are ordered by first insertion, i.e., first occurrence
+        tmp_data = {}
         for row in page_data:
-            md5s_so_far = [y[0]["md5"] for y in tmp_data]
-            if row["md5"] in md5s_so_far:
-                i = md5s_so_far.index(row["md5"])
-                tmp_data[i].append(row.copy())
-            else:
-                tmp_data.append([row.copy()])
+            tmp_data.setdefault(row["md5"], []).append(row.copy())
 
         def pack_names(names):
             """List of names, abbreviated if list is long."""
@@ -608,7 +626,7 @@ class RearrangementViewer(QDialog):
         # Compress each list down to a single item, packing the names
         new_page_data = []
         # warn/log if True not in first?
-        for y in tmp_data:
+        for y in tmp_data.values():
             z = y[0].copy()
             other_names = [_["pagename"] for _ in y[1:]]
             if other_names:
@@ -620,6 +638,54 @@ class RearrangementViewer(QDialog):
 
         return new_page_data
 
+    def icon_for(self, md5: str, angle: int) -> QIcon:
+        """An icon for a page, or a placeholder if the thumbnail isn't ready yet."""
+        img = self.thumbnailer.cache.get(md5, angle)
+        if img is None:
+            if self._placeholder_icon is None:
+                pix = QPixmap(ThumbnailSize * 3 // 4, ThumbnailSize)
+                pix.fill(QColor("lightGray"))
+                self._placeholder_icon = QIcon(pix)
+            return self._placeholder_icon
+        return QIcon(QPixmap.fromImage(img))
+
+    def _request_thumbnails(self) -> None:
+        # pages for this question first, as they are most relevant
+        names = set(self.listB.getNameList())
+        rows = sorted(self.initial_page_data, key=lambda r: r["pagename"] not in names)
+        for row in rows:
+            if row["id"] in self._downloading:
+                # we'll ask when it arrives
+                continue
+            self.thumbnailer.request(row["md5"], row["filename"])
+
+    def page_image_arrived(self, img_id: int, md5: str, filename: str) -> None:
+        """A page image has been downloaded: use it instead of the placeholder."""
+        if img_id not in self._downloading:
+            return
+        self._downloading.discard(img_id)
+        name = self._md5_to_name.get(md5)
+        if name is None:
+            return
+        # this row dict is shared with initial_page_data
+        self.nameToIrefNFile[name]["filename"] = filename
+        self.listA.item_files[name] = filename
+        self.listB.item_files[name] = filename
+        if self.thumbnailer.request(md5, filename):
+            self._thumbnail_arrived(md5)
+
+    def _thumbnail_arrived(self, md5: str) -> None:
+        name = self._md5_to_name.get(md5)
+        if name is None:
+            return
+        self.listA.refreshIcon(name)
+        self.listB.refreshIcon(name)
+
+    def done(self, r):
+        # cancel any thumbnails that have not yet been made
+        self.thumbnailer.stop()
+        super().done(r)
+
     def show_relevant_tools(self):
         """Hide/show tools based on current selections."""
         if self.listB.selectionModel().hasSelection():
@@ -651,6 +717,7 @@ class RearrangementViewer(QDialog):
                 row["filename"],
                 row["orientation"],
                 row["included"],
+                md5=row["md5"],
             )
             # add the potential for every page to listB
             self.listB.addPotentialItem(
@@ -659,12 +726,14 @@ class RearrangementViewer(QDialog):
                 row["orientation"],
                 row["included"],
                 db_id=row["id"],
+                md5=row["md5"],
             )
             # if position in current annot is non-null then add to list of pages to move between lists.
             if row["included"] and row["order"]:
                 move_order[row["order"]] = row["pagename"]
         for k in sorted(move_order.keys()):
             self.listB.appendItem(self.listA.hideItemByName(name=move_order[k]))
+        self._request_thumbnails()
 
     def populateListWithCurrent(self, current):
         """Populates the QListWidgets with pages, with current state highlighted.
@@ -686,6 +755,7 @@ class RearrangementViewer(QDialog):
                 row["filename"],
                 row["orientation"],
                 row["included"],
+                md5=row["md5"],
             )
             # add the potential for every page to listB
             self.listB.addPotentialItem(
@@ -694,17 +764,14 @@ class RearrangementViewer(QDialog):
                 row["orientation"],
                 row["included"],
                 db_id=row["id"],
+                md5=row["md5"],
             )
         for kv in current:
-            match = [
-                row["pagename"]
-                for row in self.initial_page_data
-                if row["md5"] == kv["md5"]
-            ]
-            assert len(match) == 1, "Oops, expected unique md5s in filtered pagedata"
-            (match,) = match
+            match = self._md5_to_name.get(kv["md5"])
+            assert match is not None, "Oops, expected md5 in filtered pagedata"
+            self.listB.item_orientation[match] = kv["orientation"]
             self.listB.appendItem(self.listA.hideItemByName(match))
-            self.listB.rotateItemTo(match, kv["orientation"])
+        self._request_thumbnails()
 
     def sourceToSink(self):
         """Adds the currently selected page to the list for the current question.
@@ -809,6 +876,14 @@ class RearrangementViewer(QDialog):
             if msg.exec() == QMessageBox.StandardButton.No:
                 return
 
+        if any(
+            self.nameToIrefNFile[n]["id"] in self._downloading
+            for n in self.listB.getNameList()
+        ):
+            msg = "Some of the pages you chose are still downloading: please wait."
+            WarnMsg(self, msg).exec()
+            return
+
         self.permute = []
         for n in self.listB.getNameList():
             row = self.nameToIrefNFile[n]
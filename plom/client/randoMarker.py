@@ -25,11 +25,13 @@ from stdiomask import getpass
 from .random_marking_utils import (
     build_random_rubrics,
     do_rando_marking,
+    simulate_marking_contention,
 )
 
 __all__ = [
     "do_rando_marking",
     "build_random_rubrics",
+    "simulate_marking_contention",
 ]
 
 
@@ -102,6 +104,26 @@ def get_parser():
         default=False,
         help="Make use of half-mark rubrics if present",
     )
+    parser.add_argument(
+        "--simulate",
+        metavar="N",
+        type=int,
+        action="store",
+        help="""
+            Don't contact a server: instead simulate N markers claiming
+            tasks at the same time from a local stand-in server, with
+            and without our strategy for avoiding collisions, and
+            report the throughput.
+        """,
+    )
+    parser.add_argument(
+        "--papers",
+        metavar="M",
+        type=int,
+        default=500,
+        action="store",
+        help="How many papers for --simulate, default %(default)s.",
+    )
     return parser
 
 
@@ -109,6 +131,18 @@ if __name__ == "__main__":
     parser = get_parser()
     args = parser.parse_args()
 
+    if args.simulate:
+        for use_strategy in (False, True):
+            r = simulate_marking_contention(
+                args.simulate, args.papers, use_strategy=use_strategy
+            )
+            print("With" if use_strategy else "Without", "collision avoidance:")
+            print(f"  {r['tasks_marked']} tasks marked in {r['seconds']:.2f}s")
+            print(f"  throughput: {r['throughput']:.1f} tasks/s")
+            print(f"  collisions: {r['collisions']} ({r['collision_rate']:.1%})")
+            print(f"  tasks left behind: {r['tasks_left_behind']}")
+        sys.exit(0)
+
     args.server = args.server or os.environ.get("PLOM_SERVER")
 
     if not args.user:
@@ -8,9 +8,10 @@
 import random
 import sys
 import tempfile
+import threading
 import time
 from pathlib import Path
-from typing import Union, Iterable
+from typing import Any, Union, Iterable
 
 # Yuck, replace this below when we drop Python 3.8 support
 from typing import Dict, List
@@ -20,7 +21,11 @@ from PyQt6.QtGui import QColor, QPainterPath, QPen
 from PyQt6.QtWidgets import QApplication, QWidget
 
 from plom.messenger import Messenger
-from plom.common.exceptions import PlomTakenException, PlomExistingLoginException
+from plom.common.exceptions import (
+    PlomExistingLoginException,
+    PlomNoServerSupportException,
+    PlomTakenException,
+)
 
 from .pageview import PageView
 from .pagescene import PageScene
@@ -39,6 +44,7 @@ from .tools import (
     CommandRubric,
     CommandText,
 )
+from .claim_ahead import ClaimStrategy, claim_next_task
 from .downloader import Downloader
 
 # comments which will be made into rubrics by pushing them to server and getting back keys
@@ -241,19 +247,36 @@ def do_random_marking_backend(
     maxMark = messenger.getMaxMark(question)
     remarking_counter = 0
 
+    # other randomarkers might be running: try not to collide with them
+    strategy = ClaimStrategy()
+    strategy.max_papernum = messenger.get_exam_info()["current_largest_paper_num"]
+    try:
+        users = messenger.get_user_list()
+    except PlomNoServerSupportException:
+        users = []
+    markers = [u["username"] for u in users if "marker" in u["groups"]]
+    strategy.set_shard_from_users(messenger.username, markers)
+
     while True:
-        task = messenger.MaskNextTask(question, version)
-        if task is None:
-            print("No more tasks.")
-            break
-        # print("Trying to claim next ask = ", task)
         try:
-            src_img_data, tags, integrity_check = messenger.claim_task(
-                task, version=version
+            r = claim_next_task(
+                messenger,
+                question,
+                version,
+                tags=[],
+                min_paper_num=None,
+                max_paper_num=None,
+                strategy=strategy,
             )
-        except PlomTakenException:
-            print("Another user got task {}. Trying again...".format(task))
+        except PlomTakenException as err:
+            # lots of other markers: there are tasks left, so keep trying
+            print(f"Lost too many races, trying again: {err}")
             continue
+        if r is None:
+            print("No more tasks.")
+            print("Claiming stats: {}".format(strategy.get_stats()))
+            break
+        task, src_img_data, tags, integrity_check = r
 
         # tag one in three papers
         if random.randrange(3) == 0:
@@ -316,6 +339,128 @@ def do_random_marking_backend(
         remarking_counter += 1
 
 
+class StandInTaskServer:
+    """An in-process stand-in for how the server hands out tasks, for simulations.
+
+    It offers the lowest-numbered available task in the requested
+    range, like the real server.  Each request waits ``latency``
+    seconds first, during which other markers may claim the task.
+    Only the methods used to claim tasks are provided.
+    """
+
+    def __init__(self, num_papers: int, *, latency: float = 0.005) -> None:
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._available = set(range(1, num_papers + 1))
+        self.number_of_claims = 0
+        self.number_of_collisions = 0
+
+    def num_available(self) -> int:
+        with self._lock:
+            return len(self._available)
+
+    def MaskNextTask(
+        self,
+        question_idx: int,
+        version: int,
+        *,
+        tags: list[str],
+        min_paper_num: int | None,
+        max_paper_num: int | None,
+    ) -> str | None:
+        time.sleep(self.latency)
+        lo = min_paper_num if min_paper_num is not None else 0
+        hi = max_paper_num if max_paper_num is not None else sys.maxsize
+        with self._lock:
+            candidates = [n for n in self._available if lo <= n <= hi]
+        if not candidates:
+            return None
+        return f"{min(candidates):04}g{question_idx}"
+
+    def claim_task(self, task: str, *, version: int) -> tuple[list, list, str]:
+        time.sleep(self.latency)
+        n = int(task[:4])
+        with self._lock:
+            if n not in self._available:
+                self.number_of_collisions += 1
+                raise PlomTakenException(f"Task {task} taken by another user")
+            self._available.remove(n)
+            self.number_of_claims += 1
+        return [], [], "integrity"
+
+
+def simulate_marking_contention(
+    num_markers: int = 50,
+    num_papers: int = 500,
+    *,
+    use_strategy: bool = True,
+    latency: float = 0.005,
+    marking_time: float = 0.02,
+) -> dict[str, Any]:
+    """Simulate many markers claiming tasks at once from a stand-in server.
+
+    Each marker is a thread that claims a task, "marks" it by waiting
+    ``marking_time`` seconds, and repeats until it can't get any more.
+
+    Args:
+        num_markers: how many markers to simulate.
+        num_papers: how many papers to mark.
+
+    Keyword Args:
+        use_strategy: use our :class:`ClaimStrategy` to avoid
+            collisions, or if False, retry naively like older clients.
+        latency: seconds per request to the stand-in server.
+        marking_time: seconds to mark each task.
+
+    Returns:
+        Key-value pairs about throughput and collisions.
+    """
+    server = StandInTaskServer(num_papers, latency=latency)
+    users = [f"marker{k:03}" for k in range(num_markers)]
+
+    def _marker(username: str) -> None:
+        strategy = None
+        if use_strategy:
+            strategy = ClaimStrategy()
+            strategy.max_papernum = num_papers
+            strategy.set_shard_from_users(username, users)
+        while True:
+            try:
+                r = claim_next_task(
+                    server,  # type: ignore[arg-type]
+                    1,
+                    1,
+                    tags=[],
+                    min_paper_num=None,
+                    max_paper_num=None,
+                    strategy=strategy,
+                )
+            except PlomTakenException:
+                # there are tasks left, others just keep getting them first
+                continue
+            if r is None:
+                return
+            time.sleep(marking_time)
+
+    threads = [threading.Thread(target=_marker, args=(u,)) for u in users]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+    attempts = server.number_of_claims + server.number_of_collisions
+    return {
+        "markers": num_markers,
+        "tasks_marked": server.number_of_claims,
+        "tasks_left_behind": server.num_available(),
+        "seconds": seconds,
+        "throughput": server.number_of_claims / seconds,
+        "collisions": server.number_of_collisions,
+        "collision_rate": server.number_of_collisions / attempts if attempts else 0.0,
+    }
+
+
 def build_rubrics_from_server_info(
     question_idx: int,
     *,
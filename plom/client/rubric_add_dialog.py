@@ -14,7 +14,6 @@ from textwrap import shorten
 from typing import Any, Sequence
 
 import arrow
-from spellchecker import SpellChecker
 
 from PyQt6.QtCore import Qt, QRegularExpression
 from PyQt6 import QtGui
@@ -57,6 +56,7 @@ from PyQt6.QtWidgets import (
 from plom.common.exceptions import PlomNoServerSupportException
 from plom.common.misc_utils import next_in_longest_subsequence
 from . import icons
+from .spelling import get_speller
 from .useful_classes import InfoMsg, WarnMsg, SimpleQuestion
 
 
@@ -121,14 +121,21 @@ class SubstitutionsHighlighter(QSyntaxHighlighter):
         # TODO: initial value of subs?
         self.subs = []
         super().__init__(*args, **kwargs)
-        # TODO: see dynamic spellchecker, future work
-        # self.wordRegEx = re.compile(r"\b([A-Za-z]{2,})\b")
-        self.speller = SpellChecker(distance=1)
+        self.wordRegEx = re.compile(r"\b([A-Za-z]{2,})\b")
+        self.misspelledFormat = QTextCharFormat()
+        self.misspelledFormat.setUnderlineStyle(
+            QTextCharFormat.UnderlineStyle.SpellCheckUnderline
+        )  # Platform and theme dependent
+        self.misspelledFormat.setUnderlineColor(QColor("red"))
+        self.speller = get_speller()
+        if not self.speller.is_ready():
+            # usually already loaded in the background, but if not...
+            self.speller.loaded.connect(self.rehighlight)
+            self.speller.start_loading()
 
     def highlightBlock(self, text: str | None) -> None:
         self._highlight_prefix(text)
-        # TODO: new MR for dynamic spellchecker
-        # self._highlight_spelling(text)
+        self._highlight_spelling(text)
 
     def _highlight_prefix(self, text: str | None):
         """Highlight tex prefix and matches in our substitution list.
@@ -156,33 +163,25 @@ class SubstitutionsHighlighter(QSyntaxHighlighter):
                 # frmt.setToolTip('v2 subs: "TODO"')
                 self.setFormat(match.start(), match.end() - match.start(), frmt)
 
-    # def _highlight_spelling(self, text: str | None):
-    #     """Highlight spelling mistakes with red squiggle line.
-    #
-    #     TODO: Currently unused, pending testing and review in new MR.
-    #
-    #     Args:
-    #         text: the text to be highlighted.
-    #     """
-    #     if text is None:
-    #         return
-    #
-    #     self.misspelledFormat = QTextCharFormat()
-    #     self.misspelledFormat.setUnderlineStyle(
-    #         QTextCharFormat.UnderlineStyle.SpellCheckUnderline
-    #     )  # Platform and theme dependent
-    #     self.misspelledFormat.setUnderlineColor(QColor("red"))
-    #
-    #     for word_object in self.wordRegEx.finditer(text):
-    #         if word_object.group() != "tex" and word_object.group().isalpha():
-    #             most_likely_word = self.speller.correction(word_object.group())
-    #
-    #             if most_likely_word and most_likely_word != word_object.group():
-    #                 self.setFormat(
-    #                     word_object.start(),
-    #                     word_object.end() - word_object.start(),
-    #                     self.misspelledFormat,
-    #                 )
+    def _highlight_spelling(self, text: str | None):
+        """Highlight spelling mistakes with red squiggle line.
+
+        Qt calls this for each block (paragraph) as it changes, and the
+        shared spellchecker caches each word, so this is cheap enough
+        to do on every keystroke.  Nothing is highlighted until the
+        spellchecker has loaded.
+
+        Args:
+            text: the text to be highlighted.
+        """
+        if text is None:
+            return
+        for word_object in self.wordRegEx.finditer(text):
+            if self.speller.is_misspelt(word_object.group(), wait=False):
+                start = word_object.start()
+                frmt = self.format(start)
+                frmt.merge(self.misspelledFormat)
+                self.setFormat(start, word_object.end() - start, frmt)
 
     def setSubs(self, subs):
         self.subs = subs
@@ -193,7 +192,7 @@ class CorrectionWidget(QFrame):
     def __init__(self):
         """Constructor of the QFrame showing spelling correction suggestions."""
         super().__init__()
-        self.speller = SpellChecker(distance=1)
+        self.speller = get_speller()
         self.list_widget = QListWidget()
         self.setFrameShape(QFrame.Shape.StyledPanel)
         self.list_widget.doubleClicked.connect(self.replace_word_from_correction_list)
@@ -302,7 +301,7 @@ class WideTextEdit(QTextEdit):
 
     def __init__(self):
         super().__init__()
-        self.speller = SpellChecker(distance=1)
+        self.speller = get_speller()
 
     def mouseDoubleClickEvent(self, event: QMouseEvent | None) -> None:
         """Handle double left-click event.
@@ -321,14 +320,7 @@ class WideTextEdit(QTextEdit):
         if event.button() == Qt.MouseButton.LeftButton:
             super().mouseDoubleClickEvent(event)
             selected_text = self.textCursor().selectedText()
-            best_correction = self.speller.correction(selected_text)
-            if (
-                selected_text.isalpha()
-                and selected_text != "tex"
-                and len(selected_text)
-                and best_correction
-                and best_correction != selected_text
-            ):
+            if self.speller.is_misspelt(selected_text):
                 # The first parent is QSplitter
                 splitter = self.parentWidget()
                 if splitter:
@@ -398,13 +390,7 @@ class WideTextEdit(QTextEdit):
                 QTextCursor.MoveMode.KeepAnchor,
             )
             selected_text = cursor.selectedText()
-            best_correction = self.speller.correction(selected_text)
-            if (
-                selected_text.isalpha()
-                and selected_text != "tex"
-                and best_correction
-                and best_correction != selected_text
-            ):
+            if self.speller.is_misspelt(selected_text):
                 cursor.mergeCharFormat(format)
             cursor.movePosition(
                 QTextCursor.MoveOperation.NextWord, QTextCursor.MoveMode.MoveAnchor
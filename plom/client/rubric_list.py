@@ -12,9 +12,16 @@ from datetime import datetime
 import logging
 import random  # optionally used for debugging
 from copy import deepcopy
-from typing import Any, Sequence
-
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from typing import Any, Callable
+
+from PyQt6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QModelIndex,
+    QSortFilterProxyModel,
+    QTimer,
+    pyqtSignal,
+)
 from PyQt6 import QtGui
 from PyQt6.QtGui import QAction, QColor, QCursor, QPalette
 from PyQt6.QtWidgets import (
@@ -23,6 +30,7 @@ from PyQt6.QtWidgets import (
     QInputDialog,
     QGridLayout,
     QHBoxLayout,
+    QLineEdit,
     QMenu,
     QMessageBox,
     QPushButton,
@@ -32,13 +40,12 @@ from PyQt6.QtWidgets import (
     QSpacerItem,
     QTabBar,
     QTabWidget,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QWidget,
 )
 
 from plom.common.misc_utils import next_in_longest_subsequence
-from plom.common.rubric_utils import compute_score, diff_rubric, render_rubric_as_html
+from plom.common.rubric_utils import compute_score, diff_rubric
 from plom.common.exceptions import (
     PlomConflict,
     PlomInconsistentRubric,
@@ -51,6 +58,9 @@ from .useful_classes import BigMessageDialog
 from .rubric_add_dialog import AddRubricDialog
 from .rubric_other_usage_dialog import RubricOtherUsageDialog
 from .rubric_conflict_dialog import RubricConflictDialog
+from .rubric_render import RenderedRubric, RubricRenderCache, rubric_tex_fragments
+from .rubric_search import RubricSearchIndex
+from .rubric_store import RubricChanges, RubricStore
 
 log = logging.getLogger("annotr")
 
@@ -61,6 +71,39 @@ def rubric_is_naked_delta(r: dict[str, Any]) -> bool:
     return False
 
 
+def tab_layout(current: list[str], target: list[str]) -> list[str]:
+    """The order tabs should be in, as close as we can get to a target.
+
+    Args:
+        current: the names of the tabs, in their current order.  The
+            names must be unique.
+        target: the order of names we would like to see.  Duplicates
+            and names that are not current tabs are ignored.
+
+    Returns:
+        The names in ``current``, ordered as in ``target``.  Any not in
+        the target keep their place after the tab they currently follow,
+        or at the start if they are currently first.  This takes time
+        linear in the number of tabs.
+    """
+    have = set(current)
+    wanted = [name for name in dict.fromkeys(target) if name in have]
+    placed = set(wanted)
+    # each tab that is not in the target follows the tab before it
+    follower: dict[str | None, str] = {}
+    for i, name in enumerate(current):
+        if name not in placed:
+            follower[current[i - 1] if i > 0 else None] = name
+    order = []
+    for name in [None, *wanted]:
+        if name is not None:
+            order.append(name)
+        while name in follower:
+            name = follower[name]
+            order.append(name)
+    return order
+
+
 def isLegalRubric(rubric: dict[str, Any], *, scene, version: int, max_mark: int) -> int:
     """Checks the 'legality' of a particular rubric - returning one of several possible indicators.
 
@@ -109,21 +152,300 @@ def isLegalRubric(rubric: dict[str, Any], *, scene, version: int, max_mark: int)
         return 0
 
 
-def render_params(
-    template: str,
-    params: Sequence[tuple[str, Sequence[str]]] | None,
-    ver: int,
-) -> str:
-    """Perform version-dependent substitutions on a template text."""
-    s = template
-    if not params:
-        return s
-    for param, values in params:
-        s = s.replace(param, values[ver - 1])
-    return s
+# Roles for the rubric id, and its legality as from :func:`isLegalRubric`
+RidRole = Qt.ItemDataRole.UserRole
+LegalityRole = Qt.ItemDataRole.UserRole + 1
+
+
+class RubricModel(QAbstractTableModel):
+    """All the rubrics, one per row, shared by all the rubric tabs.
+
+    Each tab shows some of these rows, in its own order, through a
+    :class:`RubricTabModel`.  The rows are in no particular order:
+    rubrics that are new to us are added at the end.
+
+    The legality of each rubric, as from :func:`isLegalRubric`, is
+    stored here so it need only be computed once for all the tabs.
+    Likewise the rendered text and tooltips are in :attr:`rendered`,
+    which others can share too.
+    """
+
+    _col_headers = ("RID", "Username", "Delta", "Text")
+
+    def __init__(self, rubrics: RubricStore, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.rubrics = rubrics
+        self._rids = [r["rid"] for r in rubrics]
+        self._row_of_rid = {rid: n for n, rid in enumerate(self._rids)}
+        self._legality: dict[int, int] = {}
+        self.rendered = RubricRenderCache()
+        self.version = 1
+        self._colour_illegal = QPalette().color(
+            QPalette.ColorGroup.Disabled, QPalette.ColorRole.Text
+        )
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rids)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._col_headers)
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._col_headers[section]
+        return str(section + 1)
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return (
+            Qt.ItemFlag.ItemIsEnabled
+            | Qt.ItemFlag.ItemIsSelectable
+            | Qt.ItemFlag.ItemIsDragEnabled
+            | Qt.ItemFlag.ItemIsDropEnabled
+        )
+
+    def rid_at(self, row: int) -> int:
+        """The rubric id in a row."""
+        return self._rids[row]
+
+    def row_of(self, rid: int) -> int | None:
+        """The row of a rubric, or None if there is no such rubric."""
+        return self._row_of_rid.get(rid)
+
+    def legality(self, rid: int) -> int:
+        """The legality of a rubric, as last computed by :meth:`update_legality`."""
+        return self._legality.get(rid, 2)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        rid = self._rids[index.row()]
+        col = index.column()
+        if role == RidRole:
+            return rid
+        if role == LegalityRole:
+            return self.legality(rid)
+        rubric = self.rubrics[rid]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                # rubric-ids as string to avoid overflow on legacy servers with long rids
+                return str(rid)
+            if col == 1:
+                return rubric["username"]
+            if col == 2:
+                return rubric["display_delta"]
+            render = self.rendered.get(rubric, self.version).text
+            # Does anyone like this special dot sentinel?  Can we just use empty?
+            if render == ".":
+                render = ""
+            return render
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if col == 2:
+                # tell user the type of rubric
+                return "{}-rubric".format(rubric["kind"])
+            if col == 3:
+                # tags and meta info
+                return self.rendered.get(rubric, self.version).tooltip
+            return None
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if col in (2, 3) and self.legality(rid) == 1:
+                return self._colour_illegal
+        return None
+
+    @staticmethod
+    def _runs(rows: list[int]) -> list[tuple[int, int]]:
+        """Split some row numbers into runs of consecutive rows, (first, last)."""
+        rows = sorted(rows)
+        runs = []
+        i = 0
+        while i < len(rows):
+            j = i
+            while j + 1 < len(rows) and rows[j + 1] == rows[j] + 1:
+                j += 1
+            runs.append((rows[i], rows[j]))
+            i = j + 1
+        return runs
+
+    def _emit_changed_rows(self, rows: list[int], roles: list[int]) -> None:
+        last = self.columnCount() - 1
+        for first, final in self._runs(rows):
+            self.dataChanged.emit(self.index(first, 0), self.index(final, last), roles)
+
+    def set_rubrics(self, rubrics: list[dict[str, Any]]) -> RubricChanges:
+        """Replace all the rubrics, changing only the rows that need it.
+
+        Rows of rubrics that have gone are removed, those of changed
+        rubrics (that is, with a new revision) are updated and new
+        rubrics are added at the end.  Views and selections of
+        unchanged rubrics are undisturbed.
+
+        Returns:
+            Which rubrics were added, changed and deleted.
+        """
+        changes = self.rubrics.diff(rubrics)
+        for rid in changes.changed + changes.deleted:
+            self.rendered.forget(rid)
+        gone = [self._row_of_rid[rid] for rid in changes.deleted]
+        for first, last in reversed(self._runs(gone)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for rid in self._rids[first : last + 1]:
+                self._legality.pop(rid, None)
+            del self._rids[first : last + 1]
+            self.endRemoveRows()
+        if gone:
+            self._row_of_rid = {rid: n for n, rid in enumerate(self._rids)}
+        self.rubrics.replace_all(rubrics)
+        self._emit_changed_rows([self._row_of_rid[rid] for rid in changes.changed], [])
+        added = changes.added
+        if added:
+            n = len(self._rids)
+            self.beginInsertRows(QModelIndex(), n, n + len(added) - 1)
+            for rid in added:
+                self._row_of_rid[rid] = len(self._rids)
+                self._rids.append(rid)
+            self.endInsertRows()
+        return changes
+
+    def put(self, rubric: dict[str, Any]) -> None:
+        """Add a new rubric, or replace an existing one."""
+        rid = rubric["rid"]
+        self.rubrics.put(rubric)
+        self.rendered.forget(rid)
+        n = self._row_of_rid.get(rid)
+        if n is not None:
+            self._emit_changed_rows([n], [])
+            return
+        n = len(self._rids)
+        self.beginInsertRows(QModelIndex(), n, n)
+        self._row_of_rid[rid] = n
+        self._rids.append(rid)
+        self.endInsertRows()
+
+    def set_version(self, version: int) -> None:
+        """Change the version used to render parameterized rubrics."""
+        if version == self.version:
+            return
+        self.version = version
+        self._emit_changed_rows(
+            list(range(len(self._rids))), [Qt.ItemDataRole.DisplayRole]
+        )
+
+    def update_legality(self, is_legal: Callable[[dict[str, Any]], int]) -> None:
+        """Recompute the legality of each rubric, updating rows that change.
+
+        Args:
+            is_legal: a function giving the legality of a rubric, as
+                from :func:`isLegalRubric`.
+        """
+        changed = []
+        for n, rid in enumerate(self._rids):
+            legal = is_legal(self.rubrics[rid])
+            if self._legality.get(rid, 2) != legal:
+                changed.append(n)
+            self._legality[rid] = legal
+        self._emit_changed_rows(changed, [Qt.ItemDataRole.ForegroundRole, LegalityRole])
+
+
+class RubricTabModel(QSortFilterProxyModel):
+    """The rubrics in one tab, in that tab's order.
 
+    Rubrics that are illegal (see :func:`isLegalRubric`) in the current
+    context are not shown, but are still part of the tab, unless we are
+    asked to show them anyway.
+    """
+
+    def __init__(
+        self, parent: QWidget | None = None, *, show_illegal: bool = False
+    ) -> None:
+        """Make an empty tab model.
+
+        Args:
+            parent: the parent widget.
+
+        Keyword Args:
+            show_illegal: show illegal rubrics too, for example so that
+                hidden rubrics can always be found and unhidden.
+        """
+        super().__init__(parent)
+        self._show_illegal = show_illegal
+        self._rids: list[int] = []
+        self._position: dict[int, int] = {}
+        self._source: RubricModel | None = None
+        self.setFilterRole(LegalityRole)
+        self.setSortRole(RidRole)
+        self.setDynamicSortFilter(True)
 
-class RubricTable(QTableWidget):
+    def rids(self) -> list[int]:
+        """All the rubric ids in this tab, in order, including illegal ones."""
+        return self._rids.copy()
+
+    def __contains__(self, rid: object) -> bool:
+        """Is this rubric id in this tab?"""
+        return rid in self._position
+
+    def set_rids(self, rids: list[int]) -> bool:
+        """Change which rubrics are in this tab, and their order.
+
+        Duplicates are dropped.
+
+        Returns:
+            True if anything changed.
+        """
+        position: dict[int, int] = {}
+        for rid in rids:
+            position.setdefault(rid, len(position))
+        if list(position) == self._rids:
+            return False
+        self._rids = list(position)
+        self._position = position
+        self.invalidate()
+        return True
+
+    def setSourceModel(self, model: RubricModel) -> None:  # type: ignore[override]
+        # keep our own reference: this is called for every row of every
+        # tab, so we avoid going through sourceModel() each time
+        self._source = model
+        super().setSourceModel(model)
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        src = self._source
+        assert src is not None
+        rid = src.rid_at(source_row)
+        if rid not in self._position:
+            return False
+        return self._show_illegal or src.legality(rid) in (1, 2)
+
+    def lessThan(self, left: QModelIndex, right: QModelIndex) -> bool:
+        src = self._source
+        assert src is not None
+        return (
+            self._position[src.rid_at(left.row())]
+            < self._position[src.rid_at(right.row())]
+        )
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        if orientation == Qt.Orientation.Vertical:
+            # our own row numbers, not those of the source
+            if role == Qt.ItemDataRole.DisplayRole:
+                return str(section + 1)
+            return None
+        return super().headerData(section, orientation, role)
+
+
+class RubricTable(QTableView):
     """A RubricTable is presents a table of rubrics.
 
     There are different types of tabs.  In theory this could be
@@ -149,10 +471,12 @@ class RubricTable(QTableWidget):
 
         Keyword Args:
             tabType: controls what type of tab this is:
-                "show", "hide", "group", "delta", `None`.
-                Here `"show"` is used for the "All" tab, `None` is used
-                for custom "user tabs".
-            sort: is the tab sorted.
+                "show", "hide", "group", "delta", "search", "frequent",
+                `None`.  Here `"show"` is used for the "All" tab, `None`
+                is used for custom "user tabs", `"search"` for the
+                results of searching the rubrics and `"frequent"` for
+                the rubrics we use most.
+            sort: is the tab sorted by rubric id.
 
         Returns:
             None
@@ -160,6 +484,13 @@ class RubricTable(QTableWidget):
         super().__init__(parent)
         self._parent = parent
         self.tabType = tabType  # to help set menu
+        self._sort = sort
+        self._resize_pending = False
+        # hidden rubrics must stay findable, to be unhidden
+        self._proxy = RubricTabModel(self, show_illegal=self.is_hidden_tab())
+        self._proxy.setSourceModel(parent.rubric_model)
+        self._proxy.sort(0)
+        self.setModel(self._proxy)
         self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
@@ -194,22 +525,20 @@ class RubricTable(QTableWidget):
             f.setPointSizeF(0.67 * f.pointSizeF())
             head.setFont(f)
         self.setDragEnabled(True)
-        self.setAcceptDrops(True)
-        _col_headers = ("RID", "Username", "Delta", "Text")
-        self.setColumnCount(len(_col_headers))
-        self.setHorizontalHeaderLabels(_col_headers)
+        # search results and frequent rubrics are in order of relevance and
+        # use, not to be rearranged
+        self.setAcceptDrops(not (self.is_search_tab() or self.is_frequent_tab()))
         self.hideColumn(0)
         self.hideColumn(1)
-        if sort:
-            self.setSortingEnabled(True)
         self.shortname = shortname
         self.pressed.connect(self.handleClick)
         # self.itemChanged.connect(self.handleClick)
         self.doubleClicked.connect(self.editRow)
 
     def set_name(self, newname: str) -> None:
-        if self.shortname != newname:
-            log.debug("tab %s changing name to %s", self.shortname, newname)
+        if self.shortname == newname:
+            return
+        log.debug("tab %s changing name to %s", self.shortname, newname)
         self.shortname = newname
         # TODO: assumes parent is TabWidget, can we do with signals/slots?
         # More like "If anybody cares, I just changed my name!"
@@ -233,6 +562,14 @@ class RubricTable(QTableWidget):
     def is_shared_tab(self) -> bool:
         return self.tabType == "show"
 
+    def is_frequent_tab(self) -> bool:
+        """Is this the tab of our most used rubrics."""
+        return self.tabType == "frequent"
+
+    def is_search_tab(self) -> bool:
+        """Is this the results of searching the rubrics."""
+        return self.tabType == "search"
+
     def contextMenuEvent(self, event: QtGui.QContextMenuEvent | None) -> None:
         """Delegate the context menu to appropriate function."""
         if event is None:
@@ -247,6 +584,10 @@ class RubricTable(QTableWidget):
             self._contextMenuEvent(event, show_rubric_edit=False)
         elif self.is_group_tab():
             self._contextMenuEvent(event)
+        elif self.is_search_tab():
+            self._contextMenuEvent(event)
+        elif self.is_frequent_tab():
+            self._contextMenuEvent(event)
         else:
             event.ignore()
 
@@ -369,19 +710,20 @@ class RubricTable(QTableWidget):
         menu.popup(QCursor.pos())
         event.accept()
 
+    def rowCount(self) -> int:
+        """The number of rubrics shown in this table."""
+        return self._proxy.rowCount()
+
     def removeCurrentRubric(self) -> None:
         row = self.getCurrentRubricRow()
         if row is None:
             return
-        self.removeRow(row)
-        self.selectFirstVisibleRubric()
-        self.handleClick()
+        self.remove_rubric_by_rid(self._get_rid_from_row(row))
 
     def remove_rubric_by_rid(self, rid: int) -> None:
-        row = self._get_row_from_rid(rid)
-        if row is None:
+        if rid not in self._proxy:
             return
-        self.removeRow(row)
+        self._proxy.set_rids([x for x in self._proxy.rids() if x != rid])
         self.selectFirstVisibleRubric()
         self.handleClick()
 
@@ -410,24 +752,27 @@ class RubricTable(QTableWidget):
             event.setDropAction(Qt.DropAction.CopyAction)
             sourceRow = self.selectedIndexes()[0].row()
             targetRow = self.indexAt(event.position().toPoint()).row()
-            if targetRow == -1:  # no row, so drop at end
-                targetRow = self.rowCount()
-            # Careful about sorting during setItem calls: Issue #2065
-            _sorting_enabled = self.isSortingEnabled()
-            self.setSortingEnabled(False)
-            # insert a new row at position targetRow
-            self.insertRow(targetRow)
-            # but now - if sourceRow after target row, sourceRow has moved by 1.
-            if targetRow < sourceRow:
-                sourceRow += 1
-            # move items from the sourceRow to the new targetRow
-            for col in range(0, self.columnCount()):
-                self.setItem(targetRow, col, self.takeItem(sourceRow, col))
-            self.selectRow(targetRow)
-            self.removeRow(sourceRow)
-            self.setSortingEnabled(_sorting_enabled)
+            target = None if targetRow == -1 else self._get_rid_from_row(targetRow)
+            self.move_rubric(self._get_rid_from_row(sourceRow), before=target)
             event.accept()
 
+    def move_rubric(self, rid: int, *, before: int | None = None) -> None:
+        """Move a rubric to another place in this table, and select it.
+
+        Args:
+            rid: which rubric to move.
+
+        Keyword Args:
+            before: put it before this rubric, or at the end if None.
+        """
+        if self._sort:
+            return
+        rids = [x for x in self._proxy.rids() if x != rid]
+        n = len(rids) if before is None or before == rid else rids.index(before)
+        rids.insert(n, rid)
+        self._proxy.set_rids(rids)
+        self.selectRubricById(rid)
+
     def append_by_rid(self, rid: int) -> None:
         """Append a rubric to the end of the list.
 
@@ -437,57 +782,23 @@ class RubricTable(QTableWidget):
             rid: the rubric-id, a key associated with a rubric.
 
         Raises:
-            what happens on invalid rid?
+            KeyError: no such rubric.
         """
-        # ensure there is exactly one matching rubric in the list and grab it
-        # TODO: should the local storage be a dict to make this easy?
-        (rubric,) = [x for x in self._parent.rubrics if x["rid"] == rid]
-        self.appendNewRubric(rubric)
+        self.appendNewRubric(self._parent.rubrics[rid])
 
     def appendNewRubric(self, rubric: dict[str, Any]) -> None:
-        rc = self.rowCount()
-        # do sanity check for duplications
-        for r in range(rc):
-            if self._get_rid_from_row(r) == rubric["rid"]:
-                return  # rubric already present
-        # is a new rubric, so append it
-        # Careful about sorting during setItem calls: Issue #2065
-        _sorting_enabled = self.isSortingEnabled()
-        self.setSortingEnabled(False)
-        self.insertRow(rc)
-        # rubric-ids as string to avoid overflow on legacy servers with long rids
-        self.setItem(rc, 0, QTableWidgetItem(str(rubric["rid"])))
-        self.setItem(rc, 1, QTableWidgetItem(rubric["username"]))
-        self.setItem(rc, 2, QTableWidgetItem(rubric["display_delta"]))
-
-        render = render_params(
-            rubric["text"], rubric["parameters"], self._parent.version
-        )
-        # Does anyone like this special dot sentinel?  Can we just use empty?
-        if render == ".":
-            render = ""
-        self.setItem(rc, 3, QTableWidgetItem(render))
-        # set row header
-        self.setVerticalHeaderItem(rc, QTableWidgetItem("{}".format(rc + 1)))
-        self.colourLegalRubric(rc)
-        # set a tooltip over delta that tells user the type of rubric
-        item = self.item(rc, 2)
-        assert item
-        item.setToolTip("{}-rubric".format(rubric["kind"]))
-        # set a tooltip that contains tags and meta info when someone hovers over text
-        hoverText = ""
-        if rubric["tags"] != "":
-            hoverText += "Tagged as {}\n".format(rubric["tags"])
-        if rubric["meta"] != "":
-            hoverText += "{}\n".format(rubric["meta"])
-        item = self.item(rc, 3)
-        assert item
-        item.setToolTip(hoverText.strip())
-        self.setSortingEnabled(_sorting_enabled)
+        if rubric["rid"] in self._proxy:
+            return  # rubric already present
+        self._set_rids(self._proxy.rids() + [rubric["rid"]])
+
+    def _set_rids(self, rids: list[int]) -> bool:
+        if self._sort:
+            rids = sorted(rids)
+        return self._proxy.set_rids(rids)
 
     def set_rubrics_by_rids(
         self,
-        rubric_list: list[dict[str, Any]],
+        rubrics: RubricStore,
         rid_list: list[int],
         *,
         alt_order: list[int] | None = None,
@@ -495,10 +806,9 @@ class RubricTable(QTableWidget):
         """Clear table and re-populate rubrics, keep selection if possible.
 
         Args:
-            rubric_list: all the rubrics, which are dicts with
-                various keys, most notably for us, ``rid``.
+            rubrics: all the rubrics, indexed by ``rid``.
             rid_list: which ``rid``s should insert into the table.
-                Any ids that missing in `rubric_list` will simply be
+                Any ids that missing in `rubrics` will simply be
                 skipped.
 
         Keyword Args:
@@ -514,41 +824,25 @@ class RubricTable(QTableWidget):
         """
         if alt_order:
             # construct a new list from alt_order and rid_list
-            new_list = []
-            for x in alt_order:
-                if x in rid_list:
-                    new_list.append(x)
-            for x in rid_list:
-                if x not in new_list:
-                    new_list.append(x)
+            wanted = set(rid_list)
+            new_list = [x for x in alt_order if x in wanted]
+            seen = set(new_list)
+            new_list.extend(x for x in rid_list if x not in seen)
             rid_list = new_list
-        self._set_rubrics_by_rids(rubric_list, rid_list)
+        self._set_rubrics_by_rids(rubrics, rid_list)
 
-    def _set_rubrics_by_rids(
-        self, rubric_list: list[dict[str, Any]], rid_list: list[int]
-    ) -> None:
+    def _set_rubrics_by_rids(self, rubrics: RubricStore, rid_list: list[int]) -> None:
         prev_selected_rid = self.getCurrentRubricId()
-        # remove everything
-        for r in range(self.rowCount()):
-            self.removeRow(0)
-        # since populating in order of rid_list, build all rid from rubric_list
-        rkl = [X["rid"] for X in rubric_list]
-        for i in rid_list:
-            try:  # guard against mysterious rid
-                rb = rubric_list[rkl.index(i)]
-            except (ValueError, KeyError, IndexError):
-                continue
-            self.appendNewRubric(rb)
+        # guard against mysterious rid
+        changed = self._set_rids([i for i in rid_list if i in rubrics])
         if not self.selectRubricById(prev_selected_rid):
             self.selectFirstVisibleRubric()
-        self.resizeColumnsToContents()
+        if changed:
+            self._resize_delta_column()
 
-    def setDeltaRubrics(self, rubrics: list[dict[str, Any]], *, positive=True) -> None:
+    def setDeltaRubrics(self, rubrics: RubricStore, *, positive=True) -> None:
         """Clear table and repopulate with delta-rubrics, keep selection if possible."""
         prev_selected_rubric_id = self.getCurrentRubricId()
-        # remove everything
-        for r in range(self.rowCount()):
-            self.removeRow(0)
         # grab the delta-rubrics from the rubricslist
         delta_rubrics = []
         for rb in rubrics:
@@ -557,33 +851,49 @@ class RubricTable(QTableWidget):
                     delta_rubrics.append(rb)
 
         # now sort in numerical order away from 0 and add
-        for rb in sorted(delta_rubrics, key=lambda r: abs(r["value"])):
-            self.appendNewRubric(rb)
+        rids = [
+            rb["rid"] for rb in sorted(delta_rubrics, key=lambda r: abs(r["value"]))
+        ]
         # finally append the manager-created absolute rubrics
         # TODO: bit fragile, but roughly we want the "0 of 10" etc
         for rb in rubrics:
             if rb["system_rubric"] and rb["kind"] == "absolute":
-                self.appendNewRubric(rb)
+                rids.append(rb["rid"])
+        changed = self._set_rids(rids)
         if not self.selectRubricById(prev_selected_rubric_id):
             self.selectFirstVisibleRubric()
-        self.resizeColumnsToContents()
+        if changed:
+            self._resize_delta_column()
+
+    def _resize_delta_column(self) -> None:
+        # only the delta column: the text column stretches to fit.  Measuring
+        # every row is not cheap, so tabs not on screen wait until they are.
+        self._resize_pending = not self.isVisible()
+        if not self._resize_pending:
+            self.resizeColumnToContents(2)
+
+    def showEvent(self, event: QtGui.QShowEvent | None) -> None:
+        super().showEvent(event)
+        if self._resize_pending:
+            self._resize_delta_column()
 
     def get_rid_list(self) -> list[int]:
-        """Get the list of all rubric-id in this table."""
-        return [self._get_rid_from_row(r) for r in range(self.rowCount())]
+        """Get the list of all rubric-id in this table, including any not shown."""
+        return self._proxy.rids()
 
     def _get_rid_from_row(self, r: int) -> int:
-        item = self.item(r, 0)
+        rid = self._proxy.index(r, 0).data(RidRole)
         # TODO: is an assertion error what we want here?
-        assert item, f"Could not find row {r}"
-        return int(item.text())
+        assert rid is not None, f"Could not find row {r}"
+        return rid
 
     def _get_row_from_rid(self, rid: int) -> int | None:
-        for r in range(self.rowCount()):
-            if self._get_rid_from_row(r) == rid:
-                return r
-        else:
+        src = self._parent.rubric_model
+        n = src.row_of(rid)
+        if n is None:
             return None
+        idx = self._proxy.mapFromSource(src.index(n, 0))
+        return idx.row() if idx.isValid() else None
 
     def getCurrentRubricRow(self) -> int | None:
         if not self.selectedIndexes():
@@ -646,11 +956,11 @@ class RubricTable(QTableWidget):
         """Select row with given rubric-id, returning True if works, else False."""
         if rid is None:
             return False
-        for r in range(self.rowCount()):
-            if self._get_rid_from_row(r) == rid:
-                self.selectRow(r)
-                return True
-        return False
+        r = self._get_row_from_rid(rid)
+        if r is None:
+            return False
+        self.selectRow(r)
+        return True
 
     def nextRubric(self) -> None:
         """Move selection to the next row, wrapping around if needed."""
@@ -693,20 +1003,16 @@ class RubricTable(QTableWidget):
             self.selectRubricByRow(r)
 
         rubric = self.get_row_as_rubric(r).copy()
-        rubric["text"] = render_params(
-            rubric["text"], rubric["parameters"], self._parent.version
-        )
+        rubric["text"] = self._parent.render(rubric).text
         self._parent.rubricSignal.emit(rubric)
 
     def get_row_as_rubric(self, r: int) -> dict[str, Any]:
         """Get the rth row of the rubric table."""
-        item = self.item(r, 0)
-        assert item
-        rid = int(item.text())
-        for rubric in self._parent.rubrics:
-            if rubric["rid"] == rid:
-                return rubric
-        raise RuntimeError(f"Cannot find rubric {rid}. Corrupted rubric lists?")
+        rid = self._get_rid_from_row(r)
+        rubric = self._parent.rubrics.get(rid)
+        if rubric is None:
+            raise RuntimeError(f"Cannot find rubric {rid}. Corrupted rubric lists?")
+        return rubric
 
     def firstUnhiddenRow(self) -> int | None:
         for r in range(self.rowCount()):
@@ -720,41 +1026,6 @@ class RubricTable(QTableWidget):
                 return r
         return None
 
-    def colourLegalRubric(self, r: int) -> None:
-        legal = isLegalRubric(
-            self.get_row_as_rubric(r),
-            scene=self._parent._parent.scene,
-            version=self._parent.version,
-            max_mark=self._parent.max_mark,
-        )
-        colour_legal = self.palette().color(
-            QPalette.ColorGroup.Active, QPalette.ColorRole.Text
-        )
-        colour_illegal = self.palette().color(
-            QPalette.ColorGroup.Disabled, QPalette.ColorRole.Text
-        )
-        # colour_hide = self.palette().color(QPalette.ColorGroup.Disabled, QPalette.ColorRole.Text)
-        if legal == 2:
-            self.showRow(r)
-            for item in (self.item(r, 2), self.item(r, 3)):
-                assert item is not None
-                item.setForeground(colour_legal)
-        elif legal == 1:
-            self.showRow(r)
-            for item in (self.item(r, 2), self.item(r, 3)):
-                assert item is not None
-                item.setForeground(colour_illegal)
-        else:
-            self.hideRow(r)
-            # self.showRow(r)
-            # self.item(r, 2).setForeground(colour_hide)
-            # self.item(r, 3).setForeground(colour_hide)
-
-    def updateLegality(self) -> None:
-        """Style items according to their legality."""
-        for r in range(self.rowCount()):
-            self.colourLegalRubric(r)
-
     def editRow(self, tableIndex) -> None:
         rid = self._get_rid_from_row(tableIndex.row())
         self._parent.edit_rubric(rid)
@@ -849,6 +1120,8 @@ class RubricTabWidget(QTabWidget):
         """Loop over the tabs and update their displayed names."""
         tb = self.tabBar()
         assert tb
+        # changing the colour relayouts the tab bar: avoid when we can
+        teal = QColor("teal")
         for n in range(self.count()):
             tab = self.widget(n)
             assert tab
@@ -858,9 +1131,12 @@ class RubricTabWidget(QTabWidget):
             if tab.is_user_tab():
                 self.setTabToolTip(n, "custom tab")
                 # TODO: blend green with palette color?
-                tb.setTabTextColor(n, QColor("teal"))
+                if tb.tabTextColor(n) != teal:
+                    tb.setTabTextColor(n, teal)
             elif tab.is_group_tab():
                 self.setTabToolTip(n, "shared group")
+            elif tab.is_frequent_tab():
+                self.setTabToolTip(n, "your most used rubrics")
                 # maybe no need to highlight shared tabs?
                 # tb.setTabTextColor(n, QColor("olive"))
             # elif tab.is_shared_tab():
@@ -875,6 +1151,9 @@ class RubricWidget(QWidget):
     # This is picked up by the annotator to tell the scene the current rubric
     rubricSignal = pyqtSignal(dict)
 
+    # how many rubrics to show in the "Frequent" tab
+    num_frequent = 20
+
     def __init__(self, parent) -> None:
         """Initialize the class.
 
@@ -891,9 +1170,27 @@ class RubricWidget(QWidget):
         self.max_mark = 1
         self._parent = parent
         self.username = parent.username
-        self.rubrics: list[dict[str, Any]] = []
+        self.rubrics = RubricStore()
+        # all the tabs show rows of this one model
+        self.rubric_model = RubricModel(self.rubrics, self)
         # stores the most recently created/edited
         self._recently_created_rubric = None
+        # the tab state the server has, as far as we know
+        self._saved_tab_state: dict[str, Any] | None = None
+        # the tab state as we first set it from a snapshot, if we did
+        self._tab_state_from_snapshot: dict[str, Any] | None = None
+        # searching: the index is brought up-to-date lazily, when we search
+        self._search_index = RubricSearchIndex(lambda r: self.render(r).text)
+        self._search_index_version: int | None = None
+        self._rids_to_reindex: set[int] = set()
+        self._page_before_search = 0
+        self.rubric_model.rowsInserted.connect(
+            lambda parent, first, last: self._reindex_rows(first, last)
+        )
+        self.rubric_model.rowsAboutToBeRemoved.connect(
+            lambda parent, first, last: self._reindex_rows(first, last)
+        )
+        self.rubric_model.dataChanged.connect(self._reindex_changed_rows)
 
         grid = QGridLayout()
         # assume our container will deal with margins
@@ -901,12 +1198,14 @@ class RubricWidget(QWidget):
         deltaP_label = "+\N{GREEK SMALL LETTER DELTA}"
         deltaN_label = "\N{MINUS SIGN}\N{GREEK SMALL LETTER DELTA}"
         self.tabS = RubricTable(self, shortname="All", tabType="show")
+        self.tabFrequent = RubricTable(self, shortname="Frequent", tabType="frequent")
         self.tabDeltaP = RubricTable(self, shortname=deltaP_label, tabType="delta")
         self.tabDeltaN = RubricTable(self, shortname=deltaN_label, tabType="delta")
         self.RTW = RubricTabWidget(self.add_new_tab, self.rename_tab, self.remove_tab)
         self.RTW.insert_rubric_tab(0, self.tabS)
-        self.RTW.insert_rubric_tab(1, self.tabDeltaP)
-        self.RTW.insert_rubric_tab(2, self.tabDeltaN)
+        self.RTW.insert_rubric_tab(1, self.tabFrequent)
+        self.RTW.insert_rubric_tab(2, self.tabDeltaP)
+        self.RTW.insert_rubric_tab(3, self.tabDeltaN)
         b = QToolButton()
         b.setText("+")
         b.setAutoRaise(True)  # flat until hover, but not on macOS?
@@ -930,7 +1229,19 @@ class RubricWidget(QWidget):
         self.showHideW = QStackedWidget()
         self.showHideW.addWidget(self.RTW)
         self.showHideW.addWidget(self.groupHide)
+        self.tabSearch = RubricTable(self, shortname="Search", tabType="search")
+        self.groupSearch = QTabWidget()
+        self.groupSearch.addTab(self.tabSearch, "Search results")
+        self.showHideW.addWidget(self.groupSearch)
         grid.addWidget(self.showHideW, 1, 1, 2, 4)
+        self.searchE = QLineEdit()
+        self.searchE.setPlaceholderText("Search all rubrics")
+        self.searchE.setToolTip(
+            "Search the text, delta, tags and meta of all rubrics; "
+            "press Enter to use the selected result"
+        )
+        self.searchE.setClearButtonEnabled(True)
+        grid.addWidget(self.searchE, 0, 1, 1, 4)
         self.addB = QPushButton("&Add")  # faster debugging, could remove?
         self.hideB = QPushButton("Shown/Hidden")
         self.syncB = QPushButton()
@@ -953,9 +1264,14 @@ class RubricWidget(QWidget):
         self.addB.clicked.connect(self.add_new_rubric)
         self.syncB.clicked.connect(self.refreshRubrics)
         self.hideB.clicked.connect(self.toggleShowHide)
+        self.searchE.textChanged.connect(self.show_search_results)
+        self.searchE.returnPressed.connect(self.tabSearch.handleClick)
         self.update_tab_names()
 
     def toggleShowHide(self) -> None:
+        if self.showHideW.currentIndex() == 2:
+            # leave the search results for wherever we were before
+            self.searchE.clear()
         if self.showHideW.currentIndex() == 0:  # on main lists
             # move to hidden list
             self.showHideW.setCurrentIndex(1)
@@ -973,6 +1289,69 @@ class RubricWidget(QWidget):
             # reselect the current rubric
             self.handleClick()
 
+    def render(self, rubric: dict[str, Any]) -> RenderedRubric:
+        """The text, HTML and tooltip of a rubric, as for the current version."""
+        return self.rubric_model.rendered.get(rubric, self.version)
+
+    def _reindex_rows(self, first: int, last: int) -> None:
+        for n in range(first, last + 1):
+            self._rids_to_reindex.add(self.rubric_model.rid_at(n))
+
+    def _reindex_changed_rows(
+        self, top_left: QModelIndex, bottom_right: QModelIndex, roles: list[int]
+    ) -> None:
+        # legality changes often, but the text does not
+        if roles and Qt.ItemDataRole.DisplayRole not in roles:
+            return
+        self._reindex_rows(top_left.row(), bottom_right.row())
+
+    def _update_search_index(self) -> None:
+        if self._search_index_version != self.version:
+            # all the parameterized text changes
+            self._search_index.rebuild(self.rubrics)
+            self._search_index_version = self.version
+        else:
+            for rid in self._rids_to_reindex:
+                rubric = self.rubrics.get(rid)
+                if rubric is None:
+                    self._search_index.remove(rid)
+                else:
+                    self._search_index.update(rubric)
+        self._rids_to_reindex.clear()
+
+    def search_rubrics(self, query: str, *, limit: int = 50) -> list[int]:
+        """Search the text, delta, tags and meta of all rubrics.
+
+        Args:
+            query: words, or the starts of words, to look for.
+
+        Keyword Args:
+            limit: the maximum number of rubrics to return.
+
+        Returns:
+            The rids of the best matching rubrics, best first.  Hidden
+            rubrics are not included.
+        """
+        self._update_search_index()
+        hidden = set(self.tabHide.get_rid_list())
+        rids = self._search_index.search(query, limit=limit + len(hidden))
+        return [rid for rid in rids if rid not in hidden][:limit]
+
+    def show_search_results(self, query: str) -> None:
+        """Show the rubrics best matching a query, selecting the best one.
+
+        If the query is empty, go back to the tabs we showed before.
+        """
+        if not query.strip():
+            if self.showHideW.currentIndex() == 2:
+                self.showHideW.setCurrentIndex(self._page_before_search)
+            return
+        if self.showHideW.currentIndex() != 2:
+            self._page_before_search = self.showHideW.currentIndex()
+            self.showHideW.setCurrentIndex(2)
+        self.tabSearch.set_rubrics_by_rids(self.rubrics, self.search_rubrics(query))
+        self.tabSearch.selectFirstVisibleRubric()
+
     @property
     def user_tabs(self):
         """Dynamically construct the ordered list of user-defined tabs."""
@@ -1125,7 +1504,6 @@ class RubricWidget(QWidget):
         if SimpleQuestion(self, msg).exec() == QMessageBox.StandardButton.No:
             return
         self.RTW.removeTab(n)
-        tab.clear()
         tab.deleteLater()
 
     def rename_current_tab(self) -> None:
@@ -1179,24 +1557,18 @@ class RubricWidget(QWidget):
         TODO: consider splitting this in two: trigger a refresh elsewhere
         and react to a refresh.
         """
-        old_rubrics = self.rubrics
-        self.rubrics = self._parent.getRubricsFromServer()
-        self.setRubricTabsFromState(self.get_tab_rubric_lists())
-        self._parent.saveTabStateToServer(self.get_tab_rubric_lists())
-        old = {r["rid"]: r for r in old_rubrics}
-        new = {r["rid"]: r for r in self.rubrics}
-        added = []
+        old = self.rubrics.as_dict()
+        # only rows of rubrics with new revisions are updated
+        changes = self.rubric_model.set_rubrics(self._parent.getRubricsFromServer())
+        if changes:
+            self.setRubricTabsFromState(self.get_tab_rubric_lists())
+        saved = self.save_tab_state()
+        new = self.rubrics
+        added = changes.added
+        deleted = changes.deleted
         changed = []
-        deleted = []
-        for rid in old.keys():
-            if rid not in new.keys():
-                deleted.append(rid)
-        for rid, r in new.items():
-            rold = old.get(rid)
-            if rold is None:
-                added.append(rid)
-                continue
-            same, out = diff_rubric(rold, r)
+        for rid in changes.changed:
+            same, out = diff_rubric(old[rid], new[rid])
             if not same:
                 changed.append((rid, out))
         last_sync_time = datetime.now().strftime("%H:%M")
@@ -1207,7 +1579,10 @@ class RubricWidget(QWidget):
             # then remove the checkmark a few seconds later
             timer = QTimer()
             timer.singleShot(2000, self._sync_button_temporary_change_text)
-        msg = "<p>\N{CHECK MARK} Your tabs have been synced to the server.</p>\n"
+        if saved:
+            msg = "<p>\N{CHECK MARK} Your tabs have been synced to the server.</p>\n"
+        else:
+            msg = "<p>\N{CHECK MARK} Your tabs are unchanged.</p>\n"
         # msg += "<p>No changes to server rubrics.</p>"
         msg += "<p>\N{CHECK MARK} server: "
         msg += f"<b>{len(added)} new</b>, "
@@ -1222,10 +1597,10 @@ class RubricWidget(QWidget):
         if added or deleted:
             d += "<ul>\n"
             for rid in added:
-                d += "<li>\n" + render_rubric_as_html(new[rid]) + "</li>\n"
+                d += "<li>\n" + self.render(new[rid]).html + "</li>\n"
             for rid in deleted:
                 d += "<li><b>Deleted: </b>\n"
-                d += render_rubric_as_html(old[rid])
+                d += self.render(old[rid]).html
                 d += "</li>\n"
             d += "</ul>\n"
         msg += "<p>\N{CHECK MARK} server: "
@@ -1249,19 +1624,67 @@ class RubricWidget(QWidget):
         refactor would have the caller (which is probably `_parent`)
         get the server rubrics list and pass in as an argument.
 
+        If we have a snapshot of the rubrics and tab state from last
+        time, we use that straight away rather than waiting for the
+        server, and check it against the server in the background.
+
         Keyword Args:
             user_tab_state (dict/None): a representation of the state of
                 the user's tabs, or None.  If None then pull from server.
                 If server also has none, initialize with some empty tabs.
                 Note: currently caller always passes None.
         """
-        self.rubrics = self._parent.getRubricsFromServer()
-        if not user_tab_state:
-            user_tab_state = self._parent.getTabStateFromServer()
+        snapshot = None if user_tab_state else self._parent.getRubricSnapshot()
+        if snapshot is not None:
+            rubrics, user_tab_state = snapshot
+            log.info("Starting from a snapshot of %d rubrics", len(rubrics))
+            self.rubric_model.set_rubrics(rubrics)
+        else:
+            self.rubric_model.set_rubrics(self._parent.getRubricsFromServer())
+            if not user_tab_state:
+                user_tab_state = self._parent.getTabStateFromServer()
+        # remember what the server has, before we change it
+        self._saved_tab_state = deepcopy(user_tab_state)
         if not user_tab_state:
             # no user-state: start with single empty tab
             self.add_new_tab()
         self.setRubricTabsFromState(user_tab_state)
+        if snapshot is None:
+            return
+        self._tab_state_from_snapshot = self.get_tab_rubric_lists()
+        call = self._parent.fetchRubricsInBackground()
+        if call is not None:
+            call.then(self._check_snapshot, self._check_snapshot_failed)
+            # if we're gone by the time the server answers, we don't care
+            self.destroyed.connect(call.cancel)
+
+    def _check_snapshot(
+        self, fresh: tuple[list[dict[str, Any]], dict[str, Any] | None]
+    ) -> None:
+        """Update the rubrics and tabs we got from a snapshot with those from the server."""
+        rubrics, server_tab_state = fresh
+        changes = self.rubric_model.set_rubrics(rubrics)
+        log.info("Snapshot checked with server: %s", changes)
+        state = self.get_tab_rubric_lists()
+        tabs_changed = False
+        if (
+            server_tab_state
+            and server_tab_state != self._saved_tab_state
+            and state == self._tab_state_from_snapshot
+        ):
+            # changed elsewhere but not (yet) here: use the server's
+            log.info("Tab state has changed on server since our snapshot")
+            state = deepcopy(server_tab_state)
+            tabs_changed = True
+        self._saved_tab_state = deepcopy(server_tab_state)
+        if changes or tabs_changed:
+            self.setRubricTabsFromState(state)
+        if changes:
+            self.updateLegalityOfRubrics()
+
+    def _check_snapshot_failed(self, err: Exception) -> None:
+        # not fatal: we'll try again on the next sync
+        log.warning("Could not check rubric snapshot with server: %s", err)
 
     def setRubricTabsFromState(self, wranglerState: dict | None = None) -> None:
         """Set rubric tabs (but not rubrics themselves) from saved data.
@@ -1301,6 +1724,10 @@ class RubricWidget(QWidget):
                 "group_tabs": [],
             }
 
+        # sets for quick membership tests: the lists are still needed for order
+        hidden = set(wranglerState["hidden"])
+        shown = set(wranglerState["shown"])
+
         # Update the wranglerState for any new rubrics not in shown/hidden (Issue #1493)
         for rubric in self.rubrics:
             # don't add HAL system rubrics: TODO: are there any of these now?
@@ -1309,49 +1736,42 @@ class RubricWidget(QWidget):
             # exclude manager-delta rubrics, see also Issue #1494
             if rubric_is_naked_delta(rubric):
                 continue
-            if (
-                rubric["rid"] not in wranglerState["hidden"]
-                and rubric["rid"] not in wranglerState["shown"]
-            ):
+            if rubric["rid"] not in hidden and rubric["rid"] not in shown:
                 log.info("Appending new rubric with id {}".format(rubric["rid"]))
                 wranglerState["shown"].append(rubric["rid"])
+                shown.add(rubric["rid"])
 
         group_tab_data: dict[str, list[int]] = {}
         for rubric in self.rubrics:
-            tags = rubric.get("tags", "").split()
             # TODO: share pack/unpack from tag w/ dialog & compute_score
-            for t in tags:
-                g = None
-                if t.startswith("group:"):
-                    tags.remove(t)
-                    g = t.removeprefix("group:")
+            for t in rubric.get("tags", "").split():
+                g = t.removeprefix("group:") if t.startswith("group:") else None
                 if not g:
                     continue
-                if not group_tab_data.get(g):
-                    group_tab_data[g] = []
-                group_tab_data[g].append(rubric["rid"])
+                group_tab_data.setdefault(g, []).append(rubric["rid"])
 
         # Filter any "hidden" rubrics out of "shown", group and user tabs
-        for rubric in self.rubrics:
-            rid = rubric["rid"]
-            if rid not in wranglerState["hidden"]:
-                continue
-            if rid in wranglerState["shown"]:
-                log.debug(f'filtering hidden rubric id {rid} from "all"')
-                wranglerState["shown"].remove(rid)
+        hidden.intersection_update(r["rid"] for r in self.rubrics)
+        if hidden:
+
+            def unhidden(ids: list[int], where: str) -> list[int]:
+                for rid in hidden.intersection(ids):
+                    log.debug(f"filtering hidden rubric id {rid} from {where}")
+                return [rid for rid in ids if rid not in hidden]
+
+            wranglerState["shown"] = unhidden(wranglerState["shown"], '"all"')
             for n, user_tab in enumerate(wranglerState["user_tabs"]):
-                if rid in user_tab["ids"]:
-                    log.debug(f"filtering hidden rubric id {rid} from user tab {n}")
-                    # Issue #2474, filter anything in the hidden list
-                    user_tab["ids"].remove(rid)
+                # Issue #2474, filter anything in the hidden list
+                user_tab["ids"] = unhidden(user_tab["ids"], f"user tab {n}")
             for g, lst in group_tab_data.items():
-                if rid in lst:
-                    log.debug(f"filtering hidden rubric id {rid} from group {g}")
-                    lst.remove(rid)
+                group_tab_data[g] = unhidden(lst, f"group {g}")
 
         # Issue #3006: delete groups with empty lists due to hiding
         group_tab_data = {k: v for k, v in group_tab_data.items() if v}
 
+        # Tabs come, go and move: rather than the current tab changing
+        # (and reselecting a rubric) each time, we do it once at the end
+        blocked = self.RTW.blockSignals(True)
         current_group_tabs = self.get_group_tabs_dict()
         _group_tabs = wranglerState.get("group_tabs", {})
         prev_group_tabs = {x["name"]: x["ids"] for x in _group_tabs}
@@ -1359,6 +1779,7 @@ class RubricWidget(QWidget):
             if name not in group_tab_data.keys():
                 log.info("Removing now-empty tab: group %s is now empty", name)
                 self.RTW.removeTab(self.RTW.indexOf(tab))
+                tab.deleteLater()
 
         for g in sorted(group_tab_data.keys()):
             idlist = group_tab_data[g]
@@ -1368,8 +1789,8 @@ class RubricWidget(QWidget):
             prev_order = prev_group_tabs.get(g)
             gtab.set_rubrics_by_rids(self.rubrics, idlist, alt_order=prev_order)
 
-        # TODO: if we later deleting rubrics, this will need to deal with rubrics that
-        # have disappeared from self.rubrics but still appear in some tab
+        # Rubrics that have disappeared from self.rubrics but still appear in
+        # some tab are skipped by set_rubrics_by_rids
 
         # Nicer code than below but zip truncates shorter list during length mismatch
         # for tab, name in zip(self.user_tabs, wranglerState["user_tab_names"]):
@@ -1379,7 +1800,8 @@ class RubricWidget(QWidget):
 
         # prime any names that overlap with group names or are duplicates
         # we want unique tab names; group names could've changed while logged out
-        s = set()
+        # (and older clients had no "Frequent" tab)
+        s = {self.tabFrequent.shortname}
         for i, name in enumerate(newnames):
             while name in group_tab_data.keys() or name in s:
                 log.warning("renaming user tab %s to %s for conflict", name, name + "'")
@@ -1408,88 +1830,73 @@ class RubricWidget(QWidget):
         self.tabDeltaP.setDeltaRubrics(self.rubrics, positive=True)
         self.tabDeltaN.setDeltaRubrics(self.rubrics, positive=False)
         self.tabHide.set_rubrics_by_rids(self.rubrics, wranglerState["hidden"])
+        self.update_frequent_tab()
         try:
             self.reorder_tabs(wranglerState["tab_order"])
         except AssertionError as e:
             # its not critical to re-order: if it fails just log
             log.error("Unexpected failure sorting tabs: %s", str(e))
+        self.RTW.blockSignals(blocked)
 
         self.update_tab_names()
 
         # force a blue ghost update
         self.handleClick()
 
+    def update_frequent_tab(self) -> None:
+        """Fill the "Frequent" tab with our most used rubrics, and get them ready.
+
+        The counts come from the annotations we have saved, see
+        :class:`plom.client.rubric_usage.RubricUsage`.  Hidden rubrics
+        are left out.  The TeX of these rubrics, as for the current
+        version, is rendered in the background, most used first, so
+        that choosing and placing them need not wait for the server.
+        """
+        counts = self._parent.getRubricUsage()
+        hidden = set(self.tabHide.get_rid_list())
+        ranked = sorted(
+            (rid for rid in counts if rid in self.rubrics and rid not in hidden),
+            key=lambda rid: (-counts[rid], rid),
+        )[: self.num_frequent]
+        self.tabFrequent.set_rubrics_by_rids(self.rubrics, ranked)
+        fragments = []
+        for rid in ranked:
+            fragments.extend(rubric_tex_fragments(self.render(self.rubrics[rid]).text))
+        if fragments:
+            self._parent.prerenderLatexInBackground(fragments)
+
     def reorder_tabs(self, target_order: list[str]) -> None:
         """Change the order of the tabs to match a target order.
 
         Args:
             target_order: a list of strings for the order we would
-                like to see.  We will copy and then dedupe this input.
+                like to see.  Duplicates and names of tabs we do not
+                have are ignored; see :func:`tab_layout` for where tabs
+                that are not in the target go.
 
         Returns:
             None, but modifies the tab order.
 
-        Algorithm probably relies on the tabs having unique names.
+        Algorithm relies on the tabs having unique names.
         """
-
-        def order_preserving_dedupe(L):
-            s = set()
-            for i, name in enumerate(L):
-                if name in s:
-                    L.pop(i)
-                else:
-                    s.add(name)
-            return L
-
-        target_order = target_order.copy()
-        target_order = order_preserving_dedupe(target_order)
-
-        # Re-order the tabs in three steps
-        # First, introduce anything new into target order, preserving current order
         current = [
             self.RTW.widget(n).shortname  # type: ignore[union-attr]
             for n in range(0, self.RTW.count())
         ]
         assert len(set(current)) == len(current), "Non-unique tab names"
-        # debugging: target_order = ["−δ", "(a)", "nosuch", "★", "+δ", "All"]
-        # print(f"order: {current}\ntarget order: {target_order}")
-        for i, name in enumerate(current):
-            if name in target_order:
-                continue
-            if i == 0:
-                target_order.insert(0, name)
-                continue
-            previous_name = current[i - 1]
-            j = target_order.index(previous_name)
-            target_order.insert(j + 1, name)
-        # Second, prune anything in target no longer in tabs
-        for i, name in enumerate(target_order):
-            if name not in current:
-                target_order.pop(i)
-        # print(f"updated target: {target_order}")
+        target_order = tab_layout(current, target_order)
         assert len(target_order) == len(current), "Length mismatch"
 
-        # Third, sort according to the target
-        i = 0
-        iter = 0
-        maxiter = (self.RTW.count()) ** 2
-        while i < self.RTW.count():
-            iter += 1
-            assert iter < maxiter, "quadratic iteration cap exceeded"
-            current = [
-                self.RTW.widget(n).shortname  # type: ignore[union-attr]
-                for n in range(0, self.RTW.count())
-            ]
-            # print((i, current))
-            # we know we can find it b/c we just updated target
-            j = target_order.index(current[i])
-            if i == j:
-                # all indices before this are now in the correct order
-                i += 1
-                continue
-            tb = self.RTW.tabBar()
-            assert tb
-            tb.moveTab(i, j)
+        # Move each tab into place, left to right: at most one move per tab
+        tb = self.RTW.tabBar()
+        assert tb
+        blocked = self.RTW.blockSignals(True)
+        for j, name in enumerate(target_order):
+            i = current.index(name, j)
+            if i != j:
+                tb.moveTab(i, j)
+                current.insert(j, current.pop(i))
+        self.RTW.blockSignals(blocked)
         check = [
             self.RTW.widget(n).shortname  # type: ignore[union-attr]
             for n in range(0, self.RTW.count())
@@ -1557,33 +1964,38 @@ class RubricWidget(QWidget):
         """
         self.version = version
         self.max_version = maxver
+        self.rubric_model.set_version(version)
 
     def updateLegalityOfRubrics(self) -> None:
         """Redo the colour highlight/deemphasis in each tab."""
-        self.tabS.updateLegality()
-        for tab in self.get_user_tabs():
-            tab.updateLegality()
-        for tab in self.get_group_tabs():
-            tab.updateLegality()
-        self.tabDeltaP.updateLegality()
-        self.tabDeltaN.updateLegality()
+        scene = self._parent.scene
+        self.rubric_model.update_legality(
+            lambda rubric: isLegalRubric(
+                rubric, scene=scene, version=self.version, max_mark=self.max_mark
+            )
+        )
         # TODO: port to slots and signals instead
         if self._parent.scene:
-            self._parent.scene.react_to_rubric_list_changes(self.rubrics)
+            self._parent.scene.react_to_rubric_list_changes(self.rubrics.as_list())
+
+    def _current_table(self) -> RubricTable:
+        if self.showHideW.currentIndex() == 2:
+            return self.tabSearch
+        return self.RTW.currentWidget()
 
     def handleClick(self) -> None:
-        self.RTW.currentWidget().handleClick()
+        self._current_table().handleClick()
 
     def reselectCurrentRubric(self) -> None:
-        self.RTW.currentWidget().reselectCurrentRubric()
+        self._current_table().reselectCurrentRubric()
         self.handleClick()
 
     def selectRubricByRow(self, rowNumber: int) -> None:
-        self.RTW.currentWidget().selectRubricByRow(rowNumber)
+        self._current_table().selectRubricByRow(rowNumber)
         self.handleClick()
 
     def selectRubricByVisibleRow(self, rowNumber: int) -> None:
-        self.RTW.currentWidget().selectRubricByVisibleRow(rowNumber)
+        self._current_table().selectRubricByVisibleRow(rowNumber)
         self.handleClick()
 
     def getCurrentTabName(self) -> str:
@@ -1591,17 +2003,17 @@ class RubricWidget(QWidget):
 
     def nextRubric(self) -> None:
         # change rubrics in the correct tab
-        if self.showHideW.currentIndex() == 0:
-            self.RTW.currentWidget().nextRubric()
-        else:
+        if self.showHideW.currentIndex() == 1:
             self.tabHide.nextRubric()
+        else:
+            self._current_table().nextRubric()
 
     def previousRubric(self) -> None:
         # change rubrics in the correct tab
-        if self.showHideW.currentIndex() == 0:
-            self.RTW.currentWidget().previousRubric()
-        else:
+        if self.showHideW.currentIndex() == 1:
             self.tabHide.previousRubric()
+        else:
+            self._current_table().previousRubric()
 
     def next_tab(self) -> None:
         """Move to next tab, only if tabs are shown."""
@@ -1686,8 +2098,7 @@ class RubricWidget(QWidget):
         rlist = w.get_rid_list()
         if not rlist:
             return {}
-        dict_of_rubrics = {rub["rid"]: rub for rub in self.rubrics}
-        w_rubrics = [dict_of_rubrics[r] for r in rlist]
+        w_rubrics = [self.rubrics[r] for r in rlist]
         # is legographic sort of ok?  need to make datetime for compare?
         w_rubrics.sort(key=lambda x: x["last_modified"])
         # for r in w_rubrics:
@@ -1705,9 +2116,11 @@ class RubricWidget(QWidget):
         except PlomNoServerSupportException as e:
             WarnMsg(self, str(e)).exec()
             return
-        (rubric,) = [r for r in self.rubrics if r["rid"] == rid]
+        rubric = self.rubrics[rid]
         # dialog's parent is set to Annotator.
-        RubricOtherUsageDialog(self._parent, task_list, rubric=rubric).exec()
+        RubricOtherUsageDialog(
+            self._parent, task_list, rubric=rubric, rubric_html=self.render(rubric).html
+        ).exec()
 
     def view_other_paper(self, paper_number: int) -> None:
         """Opens another dialog to view a paper.
@@ -1720,15 +2133,13 @@ class RubricWidget(QWidget):
     def edit_rubric(self, key: int) -> None:
         """Open a dialog to edit a rubric - from the id-key of that rubric."""
         # first grab the rubric from that key
-        try:
-            index = [x["rid"] for x in self.rubrics].index(key)
-        except ValueError:
+        com = self.rubrics.get(key)
+        if com is None:
             # no such rubric - this should not happen
             return
-        com = self.rubrics[index]
 
         if com["username"] == self.username:
-            self._new_or_edit_rubric(com, edit=True, index=index)
+            self._new_or_edit_rubric(com, edit=True)
             return
         if com["system_rubric"]:
             msg = (
@@ -1766,7 +2177,7 @@ class RubricWidget(QWidget):
             newmeta = [com["meta"]] if com["meta"] else []
             newmeta.append(f'Modified by "{self.username}"')
             com["meta"] = "\n".join(newmeta)
-            self._new_or_edit_rubric(com, edit=True, index=index)
+            self._new_or_edit_rubric(com, edit=True)
             return
 
         com = com.copy()  # don't muck-up the original
@@ -1786,7 +2197,6 @@ class RubricWidget(QWidget):
         rubric_data: dict[str, Any] | None,
         *,
         edit: bool = False,
-        index: int | None = None,
         add_to_group: str | None = None,
         add_to_user_tab: str | None = None,
     ) -> None:
@@ -1800,11 +2210,9 @@ class RubricWidget(QWidget):
         Keyword Args:
             edit: True if we are modifying an existing rubric.  If False, use
                 ``rubric_data`` as a template for a new (duplicated) rubric.
-            index: the index of the comment inside the current rubric list
-                used for updating the data in the rubric list after edit (only)
             add_to_group: if set to a string, the user might be trying to add
                 to a group with this name.  For example, a UI could preselect
-                that option.  Mutually exclusive with `edit`, `index`, or
+                that option.  Mutually exclusive with `edit`, or
                 at least ill-defined what happens if you pass those as well.
             add_to_user_tab: if set to a string, the user might be adding
                 to a custom tab.  This is a bit different from `add_to_group`
@@ -1866,18 +2274,14 @@ class RubricWidget(QWidget):
                 return
             except PlomConflict as e:
                 theirs = self._parent.getOneRubricFromServer(new_rubric["rid"])
-                # ensure there is exactly one matching rubric in each list and grab it
-                (old_rubric,) = [
-                    r for r in self.rubrics if r["rid"] == new_rubric["rid"]
-                ]
+                old_rubric = self.rubrics[new_rubric["rid"]]
                 RubricConflictDialog(
                     self, str(e), theirs, new_rubric, old_rubric
                 ).exec()
                 return
 
             # update the rubric in the current internal rubric list
-            assert index is not None
-            self.rubrics[index] = new_rubric
+            self.rubric_model.put(new_rubric)
             # TODO: possibly a good time to do full refresh (?)
 
             # Debugging: change to True to slip in an unexpected change by another client
@@ -1898,7 +2302,7 @@ class RubricWidget(QWidget):
             except PlomInconsistentRubric as e:
                 WarnMsg(self, f"Inconsistent Rubric: {e}").exec()
                 return
-            self.rubrics.append(new_rubric)
+            self.rubric_model.put(new_rubric)
 
         # keep a copy of the rubric we last created
         self._recently_created_rubric = deepcopy(new_rubric)
@@ -1909,6 +2313,24 @@ class RubricWidget(QWidget):
                 if tab.shortname == add_to_user_tab:
                     tab.append_by_rid(new_rubric["rid"])
         self.setRubricTabsFromState(self.get_tab_rubric_lists())
+        self.updateLegalityOfRubrics()
+
+    def save_tab_state(self, *, force: bool = False) -> bool:
+        """Upload the state of the tabs to the server, if it has changed.
+
+        Keyword Args:
+            force: upload even if we think the server already has it.
+
+        Returns:
+            True if we uploaded the tab state, False if there was no need.
+        """
+        state = self.get_tab_rubric_lists()
+        if not force and state == self._saved_tab_state:
+            log.debug("Tab state unchanged, not saving to server")
+            return False
+        self._parent.saveTabStateToServer(state)
+        self._saved_tab_state = state
+        return True
 
     def get_tab_rubric_lists(self) -> dict[str, list[Any]]:
         """Returns a dict of lists of the current rubrics."""
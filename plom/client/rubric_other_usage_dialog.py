@@ -3,12 +3,15 @@
 # Copyright (C) 2024, 2026 Colin B. Macdonald
 # Copyright (C) 2025 Andrew Rechnitzer
 
-import re
 from typing import Any
 
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QColor, QIcon, QPixmap
 from PyQt6.QtWidgets import (
     QDialog,
+    QListView,
     QListWidget,
+    QListWidgetItem,
     QVBoxLayout,
     QHBoxLayout,
     QLabel,
@@ -16,16 +19,31 @@ from PyQt6.QtWidgets import (
     QDialogButtonBox,
 )
 
+from plom.common.misc_utils import unpack_task_code
 from plom.common.rubric_utils import render_rubric_as_html
+from .annotation_cache import Annotations
+from .async_messenger import MessengerCall
+from .thumbnails import ThumbnailCache, Thumbnailer
 
 
 class RubricOtherUsageDialog(QDialog):
+    """A grid of the annotations of other tasks that use a rubric.
+
+    The annotations of all the tasks are fetched into the annotation
+    cache in the background as soon as the dialog opens, and shown as
+    thumbnails as they arrive.  Viewing a task then uses the cached
+    annotations, so looking through them one after another involves
+    no waiting for each paper.
+    """
+
     def __init__(
         self,
         parent,
         tasks: list[dict[str, Any]],
         *,
         rubric: dict[str, Any] | None = None,
+        rubric_html: str | None = None,
+        thumbnail_size: int = 200,
     ) -> None:
         """Constructor of the dialog to view papers using a rubric.
 
@@ -39,6 +57,9 @@ class RubricOtherUsageDialog(QDialog):
 
         Keyword Args:
             rubric: the key-value description of the rubric we're discussing.
+            rubric_html: the rubric already rendered as HTML, for example
+                by a :class:`RubricRenderCache`.  If omitted, we render it.
+            thumbnail_size: longest side of the thumbnails in pixels.
 
         Returns:
             None
@@ -46,6 +67,17 @@ class RubricOtherUsageDialog(QDialog):
         super().__init__(parent)
         self._annotr = parent
         self.setModal(True)
+        self._items: dict[int, QListWidgetItem] = {}
+        # thumbnail key -> paper number
+        self._thumb_keys: dict[str, int] = {}
+        self._calls: list[MessengerCall] = []
+        self.thumbnailer = Thumbnailer(
+            self, cache=ThumbnailCache(max(1, len(tasks))), size=thumbnail_size
+        )
+        self.thumbnailer.thumbnail_ready.connect(self._thumbnail_arrived)
+        pix = QPixmap(thumbnail_size * 3 // 4, thumbnail_size)
+        pix.fill(QColor("lightGray"))
+        placeholder = QIcon(pix)
 
         if rubric:
             self.setWindowTitle(f'Other tasks that use Rubric-ID {rubric["rid"]}')
@@ -53,21 +85,47 @@ class RubricOtherUsageDialog(QDialog):
             self.setWindowTitle("Other tasks that use the rubric")
 
         if rubric:
-            label1 = QLabel(render_rubric_as_html(rubric))
+            if rubric_html is None:
+                rubric_html = render_rubric_as_html(rubric)
+            label1 = QLabel(rubric_html)
 
         label2 = QLabel("Tasks that used this rubric:")
         self.list_widget = QListWidget()
+        self.list_widget.setViewMode(QListWidget.ViewMode.IconMode)
+        self.list_widget.setFlow(QListView.Flow.LeftToRight)
+        self.list_widget.setWrapping(True)
+        self.list_widget.setResizeMode(QListView.ResizeMode.Adjust)
+        self.list_widget.setMovement(QListView.Movement.Static)
+        self.list_widget.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.list_widget.setSpacing(8)
         # Connect double click to view paper
         self.list_widget.itemDoubleClicked.connect(self._handle_double_click)
 
         # TODO: easy to put "by Jose, 10 minutes ago" here...?
         # TODO: only note version if this is a multiversion test?
-        list_of_strings = [
-            f'{t["code"]} by {t["assigned_user"]} (version {t["question_version"]})'
-            for t in tasks
-        ]
-        list_of_strings.sort()
-        self.list_widget.addItems(list_of_strings)
+        for t in sorted(tasks, key=lambda t: t["code"]):
+            paper_number, __ = unpack_task_code(t["code"])
+            if paper_number in self._items:
+                continue
+            it = QListWidgetItem(
+                placeholder,
+                f'{t["code"]} by {t["assigned_user"]}\n'
+                f'(version {t["question_version"]})',
+            )
+            it.setData(Qt.ItemDataRole.UserRole, paper_number)
+            self.list_widget.addItem(it)
+            self._items[paper_number] = it
+        # in order, so the first ones shown are the first ready
+        for paper_number in self._items:
+            call = self._annotr.fetchOtherAnnotationsInBackground(paper_number)
+            if call is None:
+                # offline, perhaps: just the list then
+                continue
+            call.then(
+                lambda a, n=paper_number: self._annotations_arrived(n, a),
+                lambda err, n=paper_number: self._annotations_failed(n, err),
+            )
+            self._calls.append(call)
 
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
@@ -95,6 +153,29 @@ class RubricOtherUsageDialog(QDialog):
         self.setLayout(v_layout)
 
         h_layout.addWidget(buttons)
+        self.resize(900, 700)
+
+    def _annotations_arrived(self, paper_number: int, a: Annotations) -> None:
+        key = f"{paper_number}_e{a.edition}"
+        self._thumb_keys[key] = paper_number
+        if self.thumbnailer.request(key, a.image):
+            self._thumbnail_arrived(key)
+
+    def _annotations_failed(self, paper_number: int, err: Exception) -> None:
+        self._items[paper_number].setToolTip(f"Could not get annotations: {err}")
+
+    def _thumbnail_arrived(self, key: str) -> None:
+        img = self.thumbnailer.cache.get(key)
+        paper_number = self._thumb_keys.get(key)
+        if img is None or paper_number is None:
+            return
+        self._items[paper_number].setIcon(QIcon(QPixmap.fromImage(img)))
+
+    def done(self, r: int) -> None:
+        for call in self._calls:
+            call.cancel()
+        self.thumbnailer.stop()
+        super().done(r)
 
     def _handle_double_click(self, item):
         self.view_paper()
@@ -106,10 +187,8 @@ class RubricOtherUsageDialog(QDialog):
                 self, "No Selection", "Please select a paper number to view."
             )
             return
-        s = selected_items[0].text()
-        # extract digits from beginning of string, roughly s[0:4]
-        (s,) = re.findall(r"^(\d+)\D", s)
-        paper_number = int(s)
+        paper_number = selected_items[0].data(Qt.ItemDataRole.UserRole)
         # TODO: by default, the new popup would parent to Annotator
         # self._annotr.view_other_paper(paper_number)
-        self._annotr.view_other_paper(paper_number, _parent=self)
+        # most likely we prefetched these annotations
+        self._annotr.view_other_paper(paper_number, _parent=self, cached_ok=True)
@@ -0,0 +1,97 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2019-2026 Colin B. Macdonald
+
+"""Rendering rubrics for display, with a cache shared by all the rubric tabs."""
+
+from typing import Any, NamedTuple, Sequence
+
+from plom.common.rubric_utils import render_rubric_as_html
+
+
+def render_params(
+    template: str,
+    params: Sequence[tuple[str, Sequence[str]]] | None,
+    ver: int,
+) -> str:
+    """Perform version-dependent substitutions on a template text."""
+    s = template
+    if not params:
+        return s
+    for param, values in params:
+        s = s.replace(param, values[ver - 1])
+    return s
+
+
+def rubric_tooltip(rubric: dict[str, Any]) -> str:
+    """The tags and meta of a rubric, to show when hovering over it."""
+    hoverText = ""
+    if rubric["tags"] != "":
+        hoverText += "Tagged as {}\n".format(rubric["tags"])
+    if rubric["meta"] != "":
+        hoverText += "{}\n".format(rubric["meta"])
+    return hoverText.strip()
+
+
+def rubric_tex_fragments(text: str) -> list[str]:
+    """The TeX we render for a rubric: as stamped, and for its ghosts.
+
+    The ghost is blue, or gray if the rubric is not legal, see
+    :class:`plom.client.tools.text.GhostText`.
+
+    Args:
+        text: the rubric text.  Unless it starts with "tex:" there is
+            nothing to render.
+
+    Returns:
+        The fragments, in the order they are usually needed: ghost
+        first.  Empty if the rubric is not TeX.
+    """
+    if not text.casefold().startswith("tex:"):
+        return []
+    txt = text[4:].strip()
+    return ["\\color{blue}\n" + txt, txt, "\\color{gray}\n" + txt]
+
+
+class RenderedRubric(NamedTuple):
+    """A rubric rendered for one version."""
+
+    text: str
+    html: str
+    tooltip: str
+
+
+class RubricRenderCache:
+    """The rendered text, HTML and tooltip of rubrics, computed once each.
+
+    Entries are keyed by rubric id, ``revision`` and version, so a new
+    revision of a rubric is rendered afresh.  Rubrics from legacy
+    servers have no revision: call :meth:`forget` when such a rubric
+    changes.  It is also worth doing so for rubrics that are changed
+    or deleted anyway, to free their old entries.
+    """
+
+    def __init__(self) -> None:
+        self._by_rid: dict[int, dict[tuple[Any, int], RenderedRubric]] = {}
+
+    def get(self, rubric: dict[str, Any], version: int) -> RenderedRubric:
+        """Render a rubric for a version, or reuse it if we already did."""
+        entries = self._by_rid.setdefault(rubric["rid"], {})
+        key = (rubric.get("revision"), version)
+        r = entries.get(key)
+        if r is None:
+            text = render_params(rubric["text"], rubric["parameters"], version)
+            r = RenderedRubric(
+                text,
+                render_rubric_as_html({**rubric, "text": text}),
+                rubric_tooltip(rubric),
+            )
+            entries[key] = r
+        return r
+
+    def forget(self, rid: int) -> None:
+        """Drop anything rendered for this rubric."""
+        self._by_rid.pop(rid, None)
+
+    def clear(self) -> None:
+        """Drop everything."""
+        self._by_rid.clear()
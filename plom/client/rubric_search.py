@@ -0,0 +1,143 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Search the text, tags, meta and delta of rubrics as the user types."""
+
+import bisect
+import heapq
+from collections import defaultdict
+from typing import Any, Callable, Iterable
+
+from .classlist_index import normalise
+
+
+class RubricSearchIndex:
+    """An inverted index of the words in rubrics, for ranked prefix search.
+
+    Words are normalised with :func:`normalise` so that case, accents
+    and punctuation do not matter.  Each query word matches the words
+    of a rubric that start with it; a rubric must match all the query
+    words.  Matches in the rendered text count most, then the delta,
+    tags and lastly the meta.  Whole-word matches count double.
+
+    The text of parameterized rubrics depends on the version, so the
+    caller supplies a function to render it.  Rubrics can be added,
+    changed or removed one at a time with :meth:`update` and
+    :meth:`remove`, or all at once with :meth:`rebuild`, for example
+    after a change of version.  A search only looks at the rubrics
+    containing words that start with the query words; those words are
+    found by bisection of the sorted vocabulary.
+    """
+
+    # how much a match in each field counts
+    _weights = {"text": 4, "delta": 3, "tags": 2, "meta": 1}
+
+    def __init__(self, render: Callable[[dict[str, Any]], str]) -> None:
+        """Make an empty index.
+
+        Args:
+            render: a function giving the text of a rubric as it would
+                be shown, with any parameters substituted.
+        """
+        self._render = render
+        # word -> rid -> weight of the best field with that word
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._words_of: dict[int, set[str]] = {}
+        self._text_len: dict[int, int] = {}
+        # all the words, sorted on demand, for finding prefixes
+        self._vocab: list[str] = []
+        self._vocab_sorted = True
+
+    def __len__(self) -> int:
+        """The number of rubrics in the index."""
+        return len(self._words_of)
+
+    def __contains__(self, rid: object) -> bool:
+        """Is this rubric in the index?"""
+        return rid in self._words_of
+
+    def rebuild(self, rubrics: Iterable[dict[str, Any]]) -> None:
+        """Forget everything, and index these rubrics instead."""
+        self._postings.clear()
+        self._words_of.clear()
+        self._text_len.clear()
+        self._vocab = []
+        self._vocab_sorted = True
+        for r in rubrics:
+            self.update(r)
+
+    def update(self, rubric: dict[str, Any]) -> None:
+        """Add a rubric to the index, or reindex a changed rubric."""
+        rid = rubric["rid"]
+        self.remove(rid)
+        text = self._render(rubric)
+        fields = {
+            "text": text,
+            "delta": rubric.get("display_delta", ""),
+            "tags": rubric.get("tags", ""),
+            "meta": rubric.get("meta", ""),
+        }
+        words = set()
+        for field, s in fields.items():
+            w = self._weights[field]
+            for word in normalise(s).split():
+                p = self._postings[word]
+                if not p:
+                    self._vocab_sorted = False
+                if p.get(rid, 0) < w:
+                    p[rid] = w
+                words.add(word)
+        self._words_of[rid] = words
+        self._text_len[rid] = len(text)
+
+    def remove(self, rid: int) -> None:
+        """Remove a rubric from the index, if it is there."""
+        for word in self._words_of.pop(rid, ()):
+            p = self._postings[word]
+            p.pop(rid, None)
+            if not p:
+                del self._postings[word]
+                self._vocab_sorted = False
+        self._text_len.pop(rid, None)
+
+    def _words_starting_with(self, prefix: str) -> list[str]:
+        if not self._vocab_sorted:
+            self._vocab = sorted(self._postings)
+            self._vocab_sorted = True
+        i = bisect.bisect_left(self._vocab, prefix)
+        j = bisect.bisect_left(self._vocab, prefix + "\U0010ffff")
+        return self._vocab[i:j]
+
+    def search(self, query: str, limit: int = 50) -> list[int]:
+        """Find the rubrics that best match a query.
+
+        Args:
+            query: some words, or the starts of words, as typed.
+            limit: the maximum number of rubrics to return.
+
+        Returns:
+            The rids of the matching rubrics, best first.
+        """
+        scores: dict[int, int] | None = None
+        for qword in sorted(set(normalise(query).split()), key=len, reverse=True):
+            found: dict[int, int] = {}
+            for word in self._words_starting_with(qword):
+                exact = 2 if word == qword else 1
+                for rid, w in self._postings[word].items():
+                    if scores is not None and rid not in scores:
+                        continue
+                    if found.get(rid, 0) < exact * w:
+                        found[rid] = exact * w
+            if scores is None:
+                scores = found
+            else:
+                scores = {
+                    rid: s + found[rid] for rid, s in scores.items() if rid in found
+                }
+            if not scores:
+                return []
+        if not scores:
+            return []
+        return heapq.nsmallest(
+            limit, scores, key=lambda rid: (-scores[rid], self._text_len[rid], rid)
+        )
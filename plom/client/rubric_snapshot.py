@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""A copy on disc of the rubrics and tab state, for starting the Annotator quickly."""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from plom.messenger import Messenger
+
+log = logging.getLogger("rubric_snap")
+
+
+def fetch_rubrics_and_tab_state(
+    msgr: Messenger, question_idx: int
+) -> tuple[list[dict[str, Any]], dict[str, Any] | None]:
+    """Get the rubrics for a question and the user's tab state from the server."""
+    return msgr.MgetRubrics(question_idx), msgr.MgetUserRubricTabs(question_idx)
+
+
+class RubricSnapshot:
+    """The rubrics and tab state we last saw, kept on disc between sessions.
+
+    There is one snapshot for each server, question, version and user.
+    The Annotator can start from the snapshot straight away, rather than
+    waiting for the server, and then check it against the server in the
+    background.  Marker updates the snapshot whenever it gets rubrics
+    or tab state from the server, or sends tab state to it.
+
+    The rubrics and the tab state are in separate files, so that the
+    (small) tab state can be saved often.  A missing or unreadable file
+    just means we have no snapshot.
+    """
+
+    def __init__(
+        self,
+        basedir: str | Path,
+        *,
+        server: str,
+        question_idx: int,
+        version: int,
+        username: str,
+    ) -> None:
+        self.basedir = Path(basedir)
+        self._key = [server, question_idx, version, username]
+        h = hashlib.sha256(json.dumps(self._key).encode()).hexdigest()[:16]
+        self._rubrics_file = self.basedir / f"{h}.rubrics.json"
+        self._tab_state_file = self.basedir / f"{h}.tabs.json"
+
+    def _read(self, f: Path) -> Any:
+        try:
+            with open(f, "r") as fh:
+                d = json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable rubric snapshot %s: %s", f, e)
+            return None
+        # guard against the (unlikely) hash collision
+        if not isinstance(d, dict) or d.get("key") != self._key:
+            return None
+        return d
+
+    def _write(self, f: Path, data: dict[str, Any]) -> None:
+        try:
+            self.basedir.mkdir(parents=True, exist_ok=True)
+            # write then rename so a crash doesn't leave a truncated file
+            tmp = f.with_suffix(".tmp")
+            with open(tmp, "w") as fh:
+                json.dump({"key": self._key, **data}, fh)
+            tmp.replace(f)
+        except OSError as e:
+            # only a cache: not worth bothering anyone about
+            log.warning("Could not save rubric snapshot %s: %s", f, e)
+
+    def load(self) -> tuple[list[dict[str, Any]], dict[str, Any] | None] | None:
+        """The rubrics and tab state in the snapshot, or None if we have no snapshot."""
+        d = self._read(self._rubrics_file)
+        if d is None:
+            return None
+        t = self._read(self._tab_state_file)
+        return d["rubrics"], (t["tab_state"] if t else None)
+
+    def put_rubrics(self, rubrics: list[dict[str, Any]]) -> None:
+        self._write(self._rubrics_file, {"rubrics": rubrics})
+
+    def put_tab_state(self, tab_state: dict[str, Any] | None) -> None:
+        self._write(self._tab_state_file, {"tab_state": tab_state})
@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""The rubrics known to a client, indexed by rubric id."""
+
+from typing import Any, Iterable, Iterator, NamedTuple
+
+
+class RubricChanges(NamedTuple):
+    """The rids of rubrics that are new, changed or gone."""
+
+    added: list[int]
+    changed: list[int]
+    deleted: list[int]
+
+    def __bool__(self) -> bool:
+        """Is there any change at all?"""
+        return bool(self.added or self.changed or self.deleted)
+
+
+def is_same_rubric(a: dict[str, Any], b: dict[str, Any]) -> bool:
+    """Are these the same edition of a rubric?
+
+    The server increases the ``revision`` of a rubric each time it
+    changes, so comparing revisions (and whether it is published, in
+    case that does not count as a change) is enough.  Legacy servers
+    do not have revisions, in which case we compare everything.
+    """
+    rev_a, rev_b = a.get("revision"), b.get("revision")
+    if rev_a is None or rev_b is None:
+        return a == b
+    return rev_a == rev_b and a.get("published") == b.get("published")
+
+
+class RubricStore:
+    """The rubrics known to a client, indexed by their ``rid``.
+
+    Looking up, replacing or adding a rubric takes constant time.
+    Iterating gives the rubrics in the order they were first added,
+    which is generally the order the server sent them.
+    """
+
+    def __init__(self, rubrics: Iterable[dict[str, Any]] = ()) -> None:
+        self._by_rid: dict[int, dict[str, Any]] = {}
+        self.replace_all(rubrics)
+
+    def replace_all(self, rubrics: Iterable[dict[str, Any]]) -> None:
+        """Forget all current rubrics and store these instead."""
+        self._by_rid = {r["rid"]: r for r in rubrics}
+
+    def put(self, rubric: dict[str, Any]) -> None:
+        """Add a new rubric, or replace an existing one keeping its position."""
+        self._by_rid[rubric["rid"]] = rubric
+
+    def get(self, rid: int) -> dict[str, Any] | None:
+        """The rubric with this rid, or None if we have no such rubric."""
+        return self._by_rid.get(rid)
+
+    def __getitem__(self, rid: int) -> dict[str, Any]:
+        """The rubric with this rid, raising KeyError if there is none."""
+        return self._by_rid[rid]
+
+    def __contains__(self, rid: object) -> bool:
+        """Do we have a rubric with this rid?"""
+        return rid in self._by_rid
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        """Iterate over the rubrics, in order."""
+        return iter(self._by_rid.values())
+
+    def __len__(self) -> int:
+        """The number of rubrics."""
+        return len(self._by_rid)
+
+    def as_list(self) -> list[dict[str, Any]]:
+        """A list of all the rubrics, in order."""
+        return list(self._by_rid.values())
+
+    def as_dict(self) -> dict[int, dict[str, Any]]:
+        """A new dict of all the rubrics, keyed by rid."""
+        return dict(self._by_rid)
+
+    def diff(self, rubrics: Iterable[dict[str, Any]]) -> RubricChanges:
+        """How is a newer list of rubrics different from ours?
+
+        Only the revisions of rubrics are compared, when available, so
+        this is quick even for many rubrics.
+        """
+        new = {r["rid"]: r for r in rubrics}
+        added = []
+        changed = []
+        for rid, r in new.items():
+            old = self._by_rid.get(rid)
+            if old is None:
+                added.append(rid)
+            elif not is_same_rubric(old, r):
+                changed.append(rid)
+        deleted = [rid for rid in self._by_rid if rid not in new]
+        return RubricChanges(added, changed, deleted)
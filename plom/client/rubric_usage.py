@@ -0,0 +1,115 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Counting how often we use each rubric, from the annotations we save."""
+
+import hashlib
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+log = logging.getLogger("rubric_usage")
+
+
+def rubric_ids_in_plom_data(plom_data: dict[str, Any]) -> Counter[int]:
+    """How many times each rubric appears in the scene items of a ``.plom`` file."""
+    c: Counter[int] = Counter()
+    for item in plom_data.get("sceneItems", []):
+        if item and item[0] == "Rubric":
+            rid = item[3].get("rid")
+            if rid is not None:
+                c[rid] += 1
+    return c
+
+
+class RubricUsage:
+    """How often we have used each rubric on a question, kept on disc between sessions.
+
+    There is one counter for each server, question and user: rubrics
+    are shared by all the versions of a question.  It is updated from
+    each ``.plom`` file we save.  We keep the counts per task, so that
+    re-marking a task replaces what it counted before rather than
+    adding to it.  A missing or unreadable file just means no counts.
+    """
+
+    def __init__(
+        self,
+        basedir: str | Path,
+        *,
+        server: str,
+        question_idx: int,
+        username: str,
+    ) -> None:
+        self.basedir = Path(basedir)
+        self._key = [server, question_idx, username]
+        h = hashlib.sha256(json.dumps(self._key).encode()).hexdigest()[:16]
+        self._file = self.basedir / f"{h}.usage.json"
+        self._by_task: dict[str, Counter[int]] = {}
+        self._totals: Counter[int] = Counter()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._file, "r") as fh:
+                d = json.load(fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable rubric usage %s: %s", self._file, e)
+            return
+        # guard against the (unlikely) hash collision
+        if not isinstance(d, dict) or d.get("key") != self._key:
+            return
+        for task, counts in d.get("tasks", {}).items():
+            # json keys are strings
+            c = Counter({int(rid): n for rid, n in counts.items()})
+            self._by_task[task] = c
+            self._totals.update(c)
+
+    def _save(self) -> None:
+        tasks = {task: dict(c) for task, c in self._by_task.items()}
+        try:
+            self.basedir.mkdir(parents=True, exist_ok=True)
+            # write then rename so a crash doesn't leave a truncated file
+            tmp = self._file.with_suffix(".tmp")
+            with open(tmp, "w") as fh:
+                json.dump({"key": self._key, "tasks": tasks}, fh)
+            tmp.replace(self._file)
+        except OSError as e:
+            # only statistics: not worth bothering anyone about
+            log.warning("Could not save rubric usage %s: %s", self._file, e)
+
+    def record(self, task: str, plom_data: dict[str, Any]) -> None:
+        """Count the rubrics used in the annotations of a task.
+
+        Args:
+            task: the task code, such as "0123g13".
+            plom_data: the contents of the task's ``.plom`` file.
+        """
+        c = rubric_ids_in_plom_data(plom_data)
+        old = self._by_task.pop(task, None)
+        if old:
+            self._totals.subtract(old)
+            # drop anything that is now unused
+            self._totals = +self._totals
+        if c:
+            self._by_task[task] = c
+            self._totals.update(c)
+        if c or old:
+            self._save()
+
+    def record_plom_file(self, task: str, plom_file: str | Path) -> None:
+        """Count the rubrics used in the annotations of a task, from its ``.plom`` file."""
+        try:
+            with open(plom_file, "r") as fh:
+                plom_data = json.load(fh)
+        except (OSError, ValueError) as e:
+            log.warning("Cannot count rubrics in %s: %s", plom_file, e)
+            return
+        self.record(task, plom_data)
+
+    def counts(self) -> dict[int, int]:
+        """How many times each rubric has been used, by rubric id."""
+        return dict(self._totals)
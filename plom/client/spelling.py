@@ -0,0 +1,110 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""A spellchecker shared by the whole client, loaded in the background."""
+
+import logging
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from spellchecker import SpellChecker
+
+log = logging.getLogger("spelling")
+
+
+class SharedSpeller(QObject):
+    """A spellchecker whose dictionary is loaded once, on a background thread.
+
+    Loading the word frequency dictionary takes a noticeable fraction
+    of a second, so we do it once, early, and off the GUI thread: see
+    :meth:`start_loading`.  The ``loaded`` signal is emitted when it is
+    ready.  Until then, :meth:`is_misspelt` can be asked not to wait,
+    which is what live highlighting wants; other methods wait.
+
+    Corrections are cached per word, so checking text as it is typed
+    only does real work for words we have not seen before.
+    """
+
+    loaded = pyqtSignal()
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._speller: SpellChecker | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        # lowercase word -> its most likely correction, if any
+        self._corrections: dict[str, str | None] = {}
+
+    def start_loading(self) -> None:
+        """Start loading the dictionary in the background, unless we already did."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, name="speller", daemon=True).start()
+
+    def _load(self) -> None:
+        try:
+            self._speller = SpellChecker(distance=1)
+        except Exception as e:
+            # spelling is a nicety: carry on without it
+            log.error("Could not load the spellchecker: %s", e)
+        self._ready.set()
+        # we are not on the GUI thread, so this is queued
+        self.loaded.emit()
+
+    def is_ready(self) -> bool:
+        """Has the dictionary finished loading (or failed to)?"""
+        return self._ready.is_set()
+
+    def _wait(self) -> SpellChecker | None:
+        self.start_loading()
+        self._ready.wait()
+        return self._speller
+
+    def correction(self, word: str) -> str | None:
+        """The most likely correction of a word, or None if we have no idea."""
+        w = word.lower()
+        try:
+            return self._corrections[w]
+        except KeyError:
+            pass
+        speller = self._wait()
+        c = speller.correction(w) if speller else None
+        self._corrections[w] = c
+        return c
+
+    def candidates(self, word: str) -> set[str] | None:
+        """Possible corrections of a word, or None if we have no idea."""
+        speller = self._wait()
+        return speller.candidates(word) if speller else None
+
+    def is_misspelt(self, word: str, *, wait: bool = True) -> bool:
+        """Is this a misspelt word, that is, one with a likely correction?
+
+        Args:
+            word: the word to check.  We ignore the "tex" prefix and
+                anything that isn't alphabetical.
+
+        Keyword Args:
+            wait: if False and we are still loading, say it is not
+                misspelt rather than waiting.
+        """
+        if not word.isalpha() or word == "tex":
+            return False
+        if not wait and not self.is_ready():
+            return False
+        c = self.correction(word)
+        return bool(c) and c != word.lower()
+
+
+_shared_speller: SharedSpeller | None = None
+
+
+def get_speller() -> SharedSpeller:
+    """The spellchecker shared by everything in this process."""
+    global _shared_speller
+    if _shared_speller is None:
+        _shared_speller = SharedSpeller()
+    return _shared_speller
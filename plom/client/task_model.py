@@ -54,6 +54,7 @@ local_possible_statuses = (
     "complete",
     "uploading...",
     "failed upload",
+    "waiting to upload",
 )
 
 # there is some overlap with the servers's status strings
@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pytest import raises
+
+from plom.common.exceptions import PlomNoPaper
+from plom.messenger import Messenger
+
+from .annotation_cache import AnnotationCache
+
+
+class _StandInServer:
+    """A tiny local stand-in for the annotation endpoints of a Plom server."""
+
+    def __init__(self) -> None:
+        # (papernum, question_idx) -> latest edition
+        self.editions: dict[tuple[int, int], int] = {}
+        self.requests: list[str] = []
+        # someone re-marks just after we next get the annotation data,
+        # while our request for the image is slow to arrive
+        self.remark_after_next_data = False
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                outer.requests.append(self.path)
+                # /annotations/{n}/{q} or /annotations_image/{n}/{q}[/{e}]
+                what, n, q, *e = self.path.strip("/").split("/")
+                if what != "annotations" and outer.remark_after_next_data:
+                    time.sleep(0.2)
+                edition = outer.editions.get((int(n), int(q)))
+                if edition is None:
+                    self.send_error(404)
+                    return
+                if e:
+                    edition = int(e[0])
+                if what == "annotations":
+                    body = json.dumps(
+                        {
+                            "edition": edition,
+                            "user_agent_data": {"base_images": [], "edition": edition},
+                        }
+                    ).encode()
+                    ctype = "application/json"
+                    if outer.remark_after_next_data:
+                        outer.remark_after_next_data = False
+                        outer.editions[(int(n), int(q))] = edition + 1
+                else:
+                    body = f"image of {n} {q} edition {edition}".encode()
+                    ctype = "image/png"
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def messenger(self) -> Messenger:
+        host, port = self.httpd.server_address[:2]
+        m = Messenger(f"http://{host}:{port}")
+        m._start_session()
+        m.user = "someone"
+        m.token = {"token": "1234"}
+        return m
+
+
+def test_annotation_cache_fetches_once_per_edition(tmp_path) -> None:
+    with _StandInServer() as server:
+        server.editions[(7, 2)] = 1
+        cache = AnnotationCache(server.messenger(), tmp_path)
+        try:
+            a = cache.get(7, 2)
+            assert a.edition == 1
+            assert a.image.read_bytes() == b"image of 7 2 edition 1"
+            assert json.loads(a.plom_file.read_text())["edition"] == 1
+            # the data, then the image of that edition
+            assert server.requests == ["/annotations/7/2", "/annotations_image/7/2/1"]
+            assert cache.lookup(7, 2) == a
+
+            # asking again only checks the edition
+            server.requests.clear()
+            assert cache.get(7, 2) == a
+            assert server.requests == ["/annotations/7/2"]
+            assert cache.number_of_hits == 1
+
+            # someone remarks it: we get exactly that edition's image
+            server.editions[(7, 2)] = 2
+            server.requests.clear()
+            b = cache.get(7, 2)
+            assert b.edition == 2
+            assert b.image != a.image
+            assert b.image.read_bytes() == b"image of 7 2 edition 2"
+            assert server.requests == ["/annotations/7/2", "/annotations_image/7/2/2"]
+        finally:
+            cache.close()
+
+
+def test_annotation_cache_no_annotations(tmp_path) -> None:
+    with _StandInServer() as server:
+        server.editions[(7, 2)] = 3
+        cache = AnnotationCache(server.messenger(), tmp_path)
+        try:
+            cache.get(7, 2)
+            with raises(PlomNoPaper):
+                cache.get(8, 2)
+            # the task is reset on the server
+            del server.editions[(7, 2)]
+            with raises(PlomNoPaper):
+                cache.get(7, 2)
+            assert cache.lookup(7, 2) is None
+        finally:
+            cache.close()
+
+
+def test_annotation_cache_remarked_while_fetching(tmp_path) -> None:
+    with _StandInServer() as server:
+        server.editions[(7, 2)] = 1
+        server.remark_after_next_data = True
+        cache = AnnotationCache(server.messenger(), tmp_path)
+        try:
+            a = cache.get(7, 2)
+            # the image matches the data, not the newer edition
+            assert a.edition == 1
+            assert a.image.read_bytes() == b"image of 7 2 edition 1"
+            assert "/annotations_image/7/2/1" in server.requests
+            b = cache.get(7, 2)
+            assert b.edition == 2
+            assert b.image.read_bytes() == b"image of 7 2 edition 2"
+        finally:
+            cache.close()
+
+
+def test_annotation_cache_both_at_once_if_image_has_edition(tmp_path) -> None:
+    with _StandInServer() as server:
+        server.editions[(7, 2)] = 1
+        server.editions[(8, 2)] = 1
+        cache = AnnotationCache(server.messenger(), tmp_path)
+        fetch_image = cache._fetch_image
+
+        # as if the server told us the edition of each image
+        def _fetch_image_with_edition(*args):
+            info, img_bytes = fetch_image(*args)
+            info["edition"] = int(img_bytes.split()[-1])
+            return info, img_bytes
+
+        cache._fetch_image = _fetch_image_with_edition  # type: ignore[method-assign]
+        try:
+            cache.get(7, 2)
+            # now we know the images have editions
+            server.requests.clear()
+            server.remark_after_next_data = True
+            a = cache.get(8, 2)
+            assert sorted(server.requests[:2]) == [
+                "/annotations/8/2",
+                "/annotations_image/8/2",
+            ]
+            assert a.edition == 1
+            assert a.image.read_bytes() == b"image of 8 2 edition 1"
+        finally:
+            cache.close()
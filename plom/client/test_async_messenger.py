@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from plom.common.exceptions import PlomNoPaper
+from plom.messenger import Messenger
+
+from .async_messenger import AsyncMessenger
+
+
+def _msgr() -> Messenger:
+    m = Messenger("http://127.0.0.1:1")
+    m._start_session()
+    return m
+
+
+def test_async_messenger_result(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    results = []
+    call = am.submit(lambda m, x: 2 * x, 21).then(results.append)
+    with qtbot.waitSignal(call.succeeded, timeout=5000):
+        pass
+    assert results == [42]
+    assert call.is_done()
+    assert am.num_in_flight() == 0
+    assert am.stop(5000)
+
+
+def test_async_messenger_failure(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+
+    def _fail(m):
+        raise PlomNoPaper("nope")
+
+    errors = []
+    call = am.submit(_fail).then(None, errors.append)
+    with qtbot.waitSignal(call.failed, timeout=5000):
+        pass
+    assert isinstance(errors[0], PlomNoPaper)
+    assert am.stop(5000)
+
+
+def test_async_messenger_dedupes_in_flight(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    go = threading.Event()
+    ran = []
+
+    def _slow(m):
+        go.wait(5)
+        ran.append(1)
+        return "done"
+
+    c1 = am.submit(_slow, key="k")
+    c2 = am.submit(_slow, key="k")
+    assert c1 is c2
+    c3 = am.submit(_slow, key="other")
+    assert c3 is not c1
+    assert am.number_of_shared == 1
+    with qtbot.waitSignals([c1.succeeded, c3.succeeded], timeout=5000):
+        go.set()
+    assert len(ran) == 2
+    # once finished, the same key makes a new call
+    c4 = am.submit(lambda m: "again", key="k")
+    assert c4 is not c1
+    with qtbot.waitSignal(c4.succeeded, timeout=5000):
+        pass
+    assert am.stop(5000)
+
+
+def test_async_messenger_cancel_group(qtbot) -> None:
+    am = AsyncMessenger(_msgr(), max_threads=1)
+    go = threading.Event()
+    results = []
+
+    def _slow(m, x):
+        go.wait(5)
+        return x
+
+    running = am.submit(_slow, "running", group="preview").then(results.append)
+    queued = am.submit(_slow, "queued", group="preview").then(results.append)
+    other = am.submit(_slow, "other", group="other").then(results.append)
+    qtbot.waitUntil(lambda: am.threadpool.activeThreadCount() == 1)
+    assert am.cancel_group("preview") == 2
+    assert running.is_cancelled() and queued.is_cancelled()
+    with qtbot.waitSignal(other.succeeded, timeout=5000):
+        go.set()
+    assert results == ["other"]
+    assert am.stop(5000)
+    assert am.num_in_flight() == 0
+
+
+def test_async_messenger_submit_to_other_executor(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    ex = ThreadPoolExecutor(1)
+    go = threading.Event()
+    results = []
+    first = am.submit_to(ex, lambda x: go.wait(5) and x, 1, key="a")
+    first.then(results.append)
+    second = am.submit_to(ex, lambda x: x, 2).then(results.append)
+    assert am.submit_to(ex, lambda x: x, 3, key="a") is first
+    # none of our own threads are tied up
+    assert am.threadpool.activeThreadCount() == 0
+    second.cancel()
+    with qtbot.waitSignal(first.succeeded, timeout=5000):
+        go.set()
+    assert results == [1]
+    assert am.num_in_flight() == 0
+    ex.shutdown()
+    assert am.stop(5000)
@@ -0,0 +1,73 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import threading
+
+from pytest import raises
+
+from plom.common.exceptions import PlomRangeException
+from plom.messenger import Messenger
+
+from .bootstrap import Bootstrap, StartupTimer
+
+
+def _msgr() -> Messenger:
+    m = Messenger("http://127.0.0.1:1")
+    m._start_session()
+    return m
+
+
+def test_bootstrap_requests_are_concurrent() -> None:
+    # each request waits for all the others: would deadlock if run in series
+    barrier = threading.Barrier(3, timeout=5)
+
+    def _wait(m, x):
+        barrier.wait()
+        return x
+
+    boot = Bootstrap(_msgr(), max_threads=3)
+    for k in ("a", "b", "c"):
+        boot.add(k, _wait, k.upper())
+    boot.run()
+    assert [boot.result(k) for k in "abc"] == ["A", "B", "C"]
+    assert set(boot.timings.keys()) == {"a", "b", "c"}
+
+
+def test_bootstrap_errors_reraised_on_result() -> None:
+    def _fail(m):
+        raise PlomRangeException("no such question")
+
+    boot = Bootstrap(_msgr())
+    boot.add("ok", lambda m: 42)
+    boot.add("bad", _fail)
+    boot.run()
+    assert boot.result("ok") == 42
+    assert not boot.failed("ok")
+    assert boot.failed("bad")
+    with raises(PlomRangeException, match="no such"):
+        boot.result("bad")
+
+
+def test_bootstrap_messenger_method_by_name() -> None:
+    boot = Bootstrap(_msgr())
+    boot.add("ssl", "is_ssl_verified")
+    boot.add("same", lambda m: isinstance(m, Messenger))
+    boot.run()
+    assert boot.result("ssl") in (True, False)
+    assert boot.result("same")
+    with raises(ValueError):
+        boot.add("same", lambda m: None)
+
+
+def test_startup_timer_report() -> None:
+    t = StartupTimer()
+    with t.phase("login"):
+        pass
+    t.add("get_tasks", 0.25, concurrent=True)
+    t.add("first task", 0.5)
+    assert [name for name, __ in t.phases] == ["login", "first task"]
+    r = t.report()
+    assert r.startswith("Startup took")
+    assert "login" in r
+    assert "concurrent" in r
+    assert "get_tasks" in r
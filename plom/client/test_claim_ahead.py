@@ -0,0 +1,265 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from typing import Any
+
+import pytest
+
+from plom.common.exceptions import PlomNoPermission, PlomTakenException
+from plom.messenger import Messenger
+
+from .async_messenger import AsyncMessenger
+from .claim_ahead import ClaimAhead, ClaimStrategy, claim_next_task
+from .random_marking_utils import StandInTaskServer, simulate_marking_contention
+
+
+def _msgr() -> Messenger:
+    m = Messenger("http://127.0.0.1:1")
+    m._start_session()
+    return m
+
+
+class _FakeMarker:
+    """Enough of the Marker for claiming ahead, with a queue of tasks on the "server"."""
+
+    def __init__(self, available: list[str], quota: int | None = None) -> None:
+        self.available = available
+        self.quota = quota
+        self.ready: list[str] = []
+        self.prefs: dict[str, Any] = {
+            "tags": [],
+            "min_paper_num": None,
+            "max_paper_num": None,
+        }
+        self.seen_prefs: list[dict[str, Any]] = []
+
+    def claim(self, m, question_idx, version, **prefs):
+        self.seen_prefs.append(prefs)
+        if not self.available:
+            return None
+        return self.available.pop(0), [], [], "ic"
+
+    def on_claimed(self, task, src_img_data, tags, integrity_check) -> None:
+        self.ready.append(task)
+
+    def make(self, amsgr: AsyncMessenger, **kwargs) -> ClaimAhead:
+        return ClaimAhead(
+            amsgr,
+            2,
+            1,
+            count_ready=lambda: len(self.ready),
+            quota_remaining=lambda: self.quota,
+            preferences=lambda: self.prefs,
+            on_claimed=self.on_claimed,
+            claim_fn=self.claim,
+            **kwargs,
+        )
+
+
+def test_claim_ahead_fills_to_target(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    fake = _FakeMarker(["0001g2", "0002g2", "0003g2", "0004g2"])
+    ca = fake.make(am, target=3)
+    ca.top_up()
+    qtbot.waitUntil(lambda: len(fake.ready) == 3 and not ca.is_busy())
+    assert fake.ready == ["0001g2", "0002g2", "0003g2"]
+    # marking one makes room for another
+    fake.ready.pop(0)
+    ca.top_up()
+    qtbot.waitUntil(lambda: fake.ready[-1] == "0004g2")
+    assert ca.number_claimed == 4
+    assert am.stop(5000)
+
+
+def test_claim_ahead_respects_quota(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    fake = _FakeMarker(["0001g2", "0002g2", "0003g2"], quota=1)
+    ca = fake.make(am, target=3)
+    assert ca.how_many_wanted() == 1
+    with qtbot.waitSignal(ca.claimed, timeout=5000):
+        ca.top_up()
+    assert not ca.is_busy()
+    assert fake.ready == ["0001g2"]
+    fake.quota = 0
+    fake.ready = []
+    ca.top_up()
+    assert not ca.is_busy()
+    assert am.stop(5000)
+
+
+def test_claim_ahead_exhausted_until_reset(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    fake = _FakeMarker([])
+    ca = fake.make(am, target=2)
+    with qtbot.waitSignal(ca.exhausted, timeout=5000):
+        ca.top_up()
+    assert ca.is_exhausted()
+    ca.top_up()
+    assert not ca.is_busy()
+    # the user changes their preferences, and now there is something
+    fake.available = ["0007g2"]
+    fake.prefs = {"tags": ["hard"], "min_paper_num": 5, "max_paper_num": 10}
+    with qtbot.waitSignal(ca.claimed, timeout=5000):
+        ca.reset()
+    assert fake.seen_prefs[-1]["tags"] == ["hard"]
+    assert fake.seen_prefs[-1]["min_paper_num"] == 5
+    assert am.stop(5000)
+
+
+def test_claim_ahead_disabled_and_refused(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    fake = _FakeMarker(["0001g2"])
+    ca = fake.make(am, target=1)
+    ca.set_enabled(False)
+    ca.top_up()
+    assert not ca.is_busy()
+
+    def _refuse(m, *args, **kwargs):
+        raise PlomNoPermission("not today")
+
+    ca._claim_fn = _refuse
+    with qtbot.waitSignal(ca.failed, timeout=5000) as blocker:
+        ca.set_enabled(True)
+    assert isinstance(blocker.args[0], PlomNoPermission)
+    # backs off rather than asking again immediately
+    assert ca.is_exhausted()
+    assert am.stop(5000)
+
+
+def test_claim_strategy_shards_cover_range() -> None:
+    s = ClaimStrategy(jitter=False)
+    s.max_papernum = 100
+    covered = []
+    for k in range(7):
+        s.set_shard(k, 7)
+        lo, hi = s.shard_range(None, None)
+        covered.extend(range(lo, hi + 1))
+    assert covered == list(range(1, 101))
+    # shards live within the user's preferred range
+    s.set_shard(1, 2)
+    assert s.shard_range(11, 20) == (16, 20)
+    # always fall back to the full range
+    assert s.ranges_to_try(11, 20) == [(16, 20), (11, 20)]
+
+
+def test_claim_strategy_shard_from_users() -> None:
+    s = ClaimStrategy()
+    s.set_shard_from_users("carol", ["bob", "alice", "carol", "bob"])
+    assert (s.shard_index, s.num_shards) == (2, 3)
+    s.set_shard_from_users("scanner", ["bob", "alice"])
+    assert s.num_shards == 1
+    s.max_papernum = 50
+    assert s.shard_range(None, None) is None
+
+
+def test_claim_strategy_backs_off_on_collisions() -> None:
+    server = StandInTaskServer(3, latency=0)
+    waits: list[float] = []
+    s = ClaimStrategy(jitter=False, sleep=waits.append)
+    real_claim = server.claim_task
+
+    # someone else gets there first, twice
+    def _claim_but_lose_twice(task, *, version):
+        if len(waits) < 2:
+            real_claim(task, version=version)
+        return real_claim(task, version=version)
+
+    server.claim_task = _claim_but_lose_twice  # type: ignore[method-assign]
+    task, *__ = s.claim(server, 1, 1, tags=[], min_paper_num=None, max_paper_num=None)
+    assert task == "0003g1"
+    assert waits == [s.base_delay, 2 * s.base_delay]
+    assert s.number_of_collisions == 2
+    assert s.collision_rate() == 2 / 3
+    # nothing left
+    assert (
+        s.claim(server, 1, 1, tags=[], min_paper_num=None, max_paper_num=None) is None
+    )
+
+
+def test_claim_strategy_collisions_counted_per_range() -> None:
+    server = StandInTaskServer(10, latency=0)
+    waits: list[float] = []
+    s = ClaimStrategy(jitter=False, sleep=waits.append)
+    s.max_papernum = 10
+    s.set_shard(1, 2)
+    real_claim = server.claim_task
+
+    # someone always beats us to the tasks in our shard
+    def _lose_in_shard(task, *, version):
+        if int(task[:4]) >= 6:
+            raise PlomTakenException(f"{task} taken")
+        return real_claim(task, version=version)
+
+    server.claim_task = _lose_in_shard  # type: ignore[method-assign]
+    task, *__ = s.claim(server, 1, 1, tags=[], min_paper_num=None, max_paper_num=None)
+    # after giving up on the shard, the full range still has tasks
+    assert task == "0001g1"
+    assert len(waits) == s.max_collisions
+    # without waiting, e.g., on the GUI thread
+    waits.clear()
+    task, *__ = s.claim(
+        server, 1, 1, tags=[], min_paper_num=None, max_paper_num=None, wait=False
+    )
+    assert task == "0002g1"
+    assert waits == []
+
+
+def test_claim_strategy_lost_every_race_is_not_exhausted() -> None:
+    server = StandInTaskServer(3, latency=0)
+    s = ClaimStrategy(jitter=False, sleep=lambda t: None)
+
+    def _always_lose(task, *, version):
+        raise PlomTakenException(f"{task} taken")
+
+    server.claim_task = _always_lose  # type: ignore[method-assign]
+    # tasks remain, so we don't say there are none
+    with pytest.raises(PlomTakenException):
+        s.claim(server, 1, 1, tags=[], min_paper_num=None, max_paper_num=None)
+    assert s.number_of_collisions == s.max_collisions
+    # not waiting, as on the GUI thread: only a few tries in all
+    s.set_shard(0, 2)
+    s.max_papernum = 3
+    with pytest.raises(PlomTakenException):
+        claim_next_task(
+            server,  # type: ignore[arg-type]
+            1,
+            1,
+            tags=[],
+            min_paper_num=None,
+            max_paper_num=None,
+            strategy=s,
+            wait=False,
+            attempts=5,
+        )
+    assert s.number_of_collisions == s.max_collisions + 5
+
+
+def test_claim_ahead_tries_again_after_losing_races(qtbot) -> None:
+    am = AsyncMessenger(_msgr())
+    fake = _FakeMarker(["0001g2"])
+    ca = fake.make(am, target=1, retry_taken_after=0.01)
+    real_claim = fake.claim
+    tries = []
+
+    def _lose_first(m, *args, **kwargs):
+        tries.append(1)
+        if len(tries) == 1:
+            raise PlomTakenException("others got there first")
+        return real_claim(m, *args, **kwargs)
+
+    ca._claim_fn = _lose_first
+    with qtbot.waitSignal(ca.claimed, timeout=5000):
+        ca.top_up()
+    assert not ca.is_exhausted()
+    assert fake.ready == ["0001g2"]
+    assert am.stop(5000)
+
+
+def test_simulated_contention_marks_everything() -> None:
+    for use_strategy in (False, True):
+        r = simulate_marking_contention(
+            20, 100, use_strategy=use_strategy, latency=0.001, marking_time=0.001
+        )
+        assert r["tasks_marked"] + r["tasks_left_behind"] == 100
+        if use_strategy:
+            assert r["tasks_left_behind"] == 0
@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from PyQt6.QtWidgets import QLineEdit
+
+from .classlist_index import ClasslistCompleter, ClasslistIndex, normalise
+
+classlist = [
+    "10000001: Doe, Jane",
+    "10000002: Doe, John",
+    "10000117: Côté, Zoë",
+    "10002000: Smith, Adam",
+    "12345678: Cotter, Ann",
+]
+
+
+def test_normalise() -> None:
+    assert normalise("12345678: Côté, Zoë") == "12345678 cote zoe"
+    assert normalise("  O'Brien-Smith  ") == "o brien smith"
+    assert normalise("") == ""
+
+
+def test_classlist_index_forgives_accents_and_typos() -> None:
+    idx = ClasslistIndex(classlist)
+    assert idx.search("cote")[0] == "10000117: Côté, Zoë"
+    assert idx.search("ZOE COTE")[0] == "10000117: Côté, Zoë"
+    # transposed letters
+    assert idx.search("coet")[0] == "10000117: Côté, Zoë"
+    assert idx.search("jnae doe")[0] == "10000001: Doe, Jane"
+    # the starts of words, in any order
+    assert idx.search("jo d")[0] == "10000002: Doe, John"
+    assert idx.search("ann co")[0] == "12345678: Cotter, Ann"
+    assert idx.search("") == []
+    assert idx.search("qqqq") == []
+
+
+def test_classlist_index_ids() -> None:
+    idx = ClasslistIndex(classlist)
+    assert idx.search("10002")[0] == "10002000: Smith, Adam"
+    assert idx.search("3456")[0] == "12345678: Cotter, Ann"
+    assert set(idx.search("doe")) >= {"10000001: Doe, Jane", "10000002: Doe, John"}
+    assert idx.search("doe", limit=1) in (
+        ["10000001: Doe, Jane"],
+        ["10000002: Doe, John"],
+    )
+    idx.add("99999999: Nobody, Special")
+    idx.add("99999999: Nobody, Special")
+    assert len(idx) == len(classlist) + 1
+    assert idx.search("9999") == ["99999999: Nobody, Special"]
+
+
+def test_classlist_completer_shows_ranked_matches(qtbot) -> None:
+    le = QLineEdit()
+    qtbot.addWidget(le)
+    c = ClasslistCompleter(ClasslistIndex(classlist), le)
+    le.setCompleter(c)
+    le.show()
+    qtbot.keyClicks(le, "zoe")
+    m = c.completionModel()
+    assert m.rowCount() >= 1
+    assert m.index(0, 0).data() == "10000117: Côté, Zoë"
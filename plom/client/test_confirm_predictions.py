@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from plom.messenger import Messenger
+
+from .async_messenger import AsyncMessenger
+from .confirm_predictions import (
+    ConfidentPrediction,
+    ConfirmPredictionsDialog,
+    confident_predictions,
+)
+from .downloader import Downloader
+
+
+def _pred(sid: str, certainty: float, predictor: str = "MLLAP") -> dict:
+    return {"student_id": sid, "certainty": certainty, "predictor": predictor}
+
+
+def test_confident_predictions() -> None:
+    sid_to_name = {"101": "Doe, Jane", "102": "Doe, John", "103": "Roe, Rick"}
+    predictions = {
+        "1": [_pred("101", 0.9), _pred("101", 0.8, "MLGreedy")],
+        # disagree
+        "2": [_pred("102", 0.9), _pred("103", 0.8, "MLGreedy")],
+        # not in classlist
+        "3": [_pred("999", 0.9)],
+        # prenamed but low certainty
+        "4": [_pred("102", 0.0, "prename")],
+        # not certain enough
+        "5": [_pred("104", 0.1)],
+        "6": [],
+    }
+    sid_to_name["104"] = "Poe, Pat"
+    r = confident_predictions(predictions, sid_to_name, min_certainty=0.3)
+    assert [x.papernum for x in r] == [1]
+    assert r[0] == ConfidentPrediction(1, "101", "Doe, Jane", 0.8, "MLLAP, MLGreedy")
+    # 102 is predicted for paper 2 as well, so needs a human
+    predictions["2"] = [_pred("103", 0.9)]
+    r = confident_predictions(predictions, sid_to_name, min_certainty=0.3)
+    assert [x.papernum for x in r] == [1, 2, 4]
+    r = confident_predictions(predictions, sid_to_name, exclude={1, 4})
+    assert [x.papernum for x in r] == [2]
+
+
+class _FakeQueue(QObject):
+    submitted = pyqtSignal(int)
+    failed = pyqtSignal(int, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.enqueued: list[tuple] = []
+
+    def enqueue(self, papernum, sid, sname, *, claim=False) -> None:
+        self.enqueued.append((papernum, sid, sname, claim))
+
+
+def test_confirm_predictions_dialog_approves_pages(qtbot, tmp_path) -> None:
+    m = Messenger("http://127.0.0.1:1")
+    m._start_session()
+    am = AsyncMessenger(m)
+    idq = _FakeQueue()
+    candidates = [
+        ConfidentPrediction(n, f"{n:08}", f"Student {n}", 0.5 + n / 100, "MLLAP")
+        for n in range(1, 31)
+    ]
+    d = ConfirmPredictionsDialog(
+        None,
+        candidates,
+        amsgr=am,
+        downloader=Downloader(tmp_path),
+        idq=idq,  # type: ignore[arg-type]
+        min_certainty=0.55,
+        page_size=10,
+    )
+    qtbot.addWidget(d)
+    # 4 of the candidates are not certain enough
+    assert len(d.candidates) == 26
+    assert d.num_pages() == 3
+    assert d.grid.count() == 10
+    d.grid.item(1).setCheckState(Qt.CheckState.Unchecked)
+    # nothing is approved until we've seen its ID page
+    d.approve_page()
+    assert idq.enqueued == []
+    assert d.grid.item(0).text().startswith("5")
+
+    def show_thumbnail(n: int) -> None:
+        # as if the ID page had been downloaded and made into a thumbnail
+        d._id_rows[n] = {"id": 10 * n, "md5": f"md5_{n}", "orientation": 0}
+        img = QImage(6, 8, QImage.Format.Format_RGB32)
+        img.fill(Qt.GlobalColor.white)
+        d.thumbnailer.cache.put(f"md5_{n}", img)
+        f = tmp_path / f"page{10 * n}.png"
+        img.save(str(f))
+        d._downloader.pagecache.set_page_image_path(10 * n, f)
+        d._page_image_arrived(10 * n, f"md5_{n}", str(f))
+
+    for n in range(5, 15):
+        if n != 9:
+            show_thumbnail(n)
+    d.approve_page()
+    assert [x[0] for x in idq.enqueued] == [5, 7, 8, 10, 11, 12, 13, 14]
+    # still waiting for paper 9
+    assert d.grid.item(0).text().startswith("5")
+    show_thumbnail(9)
+    d.approve_page()
+    assert [x[0] for x in idq.enqueued] == [5, 7, 8, 10, 11, 12, 13, 14, 9]
+    assert all(x[3] for x in idq.enqueued)
+    # moved on to the next page
+    assert d.grid.item(0).text().startswith("15")
+    idq.failed.emit(7, RuntimeError("oops"))
+    idq.submitted.emit(8)
+    assert d._status[7].startswith("Not identified")
+    assert d._status[8] == "identified"
+    d.show_page(0)
+    assert d.grid.item(1).checkState() == Qt.CheckState.Unchecked
+    d.reject()
+    assert am.stop(5000)
@@ -0,0 +1,295 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import hashlib
+import io
+import json
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from pytest import raises
+
+from plom.common.exceptions import PlomSeriousException
+from plom.messenger import Messenger
+
+from .downloader import Downloader, MessengerPool
+
+
+class _StandInServer:
+    """A tiny local stand-in for the image endpoints of a Plom server."""
+
+    def __init__(
+        self,
+        images: dict[int, bytes],
+        *,
+        batch: bool = True,
+        truncate_once: set[int] | None = None,
+        corrupt: set[int] | None = None,
+        truncate_batch: bool = False,
+    ) -> None:
+        self.images = images
+        self.batch = batch
+        # these images are cut off part way the first time they are sent
+        self.truncate_once = set(truncate_once or [])
+        # these images are always sent with the wrong contents
+        self.corrupt = set(corrupt or [])
+        # batches are cut off part way through the second image
+        self.truncate_batch = truncate_batch
+        self.requests: list[str] = []
+        self.range_requests: list[str] = []
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive connections
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                outer.requests.append(self.path)
+                # /MK/images/{id}/{md5}
+                parts = self.path.strip("/").split("/")
+                img_id = int(parts[2])
+                data = outer.images.get(img_id)
+                if data is None:
+                    self.send_error(404)
+                    return
+                if img_id in outer.corrupt:
+                    data = data[::-1]
+                rng = self.headers.get("Range")
+                if rng:
+                    outer.range_requests.append(rng)
+                    start = int(rng.removeprefix("bytes=").removesuffix("-"))
+                    self.send_response(206)
+                    self.send_header("Content-Length", str(len(data) - start))
+                    self.end_headers()
+                    self.wfile.write(data[start:])
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if img_id in outer.truncate_once:
+                    outer.truncate_once.remove(img_id)
+                    self.wfile.write(data[: len(data) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(data)
+
+            def do_POST(self):
+                outer.requests.append(self.path)
+                n = int(self.headers["Content-Length"])
+                payload = json.loads(self.rfile.read(n))
+                if not outer.batch or self.path != "/MK/images/batch":
+                    self.send_error(404)
+                    return
+                buf = io.BytesIO()
+                with tarfile.open(fileobj=buf, mode="w") as tar:
+                    for x in payload["images"]:
+                        data = outer.images[x["id"]]
+                        info = tarfile.TarInfo(f"{x['id']}.png")
+                        info.size = len(data)
+                        tar.addfile(info, io.BytesIO(data))
+                body = buf.getvalue()
+                if outer.truncate_batch:
+                    # the first image, and some of the second
+                    body = body[: 2 * 512 + 512 + 50000]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-tar")
+                self.send_header("Content-Length", str(len(buf.getvalue())))
+                self.end_headers()
+                self.wfile.write(body)
+                if outer.truncate_batch:
+                    self.close_connection = True
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def messenger(self) -> Messenger:
+        host, port = self.httpd.server_address[:2]
+        m = Messenger(f"http://{host}:{port}")
+        m._start_session()
+        m.user = "someone"
+        m.token = {"token": "1234"}
+        return m
+
+
+def _pagedata(images: dict[int, bytes]) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": k,
+            "md5": hashlib.md5(v).hexdigest(),
+            "server_path": f"page{k}.png",
+        }
+        for k, v in images.items()
+    ]
+
+
+_images = {k: f"not really an image {k}".encode() for k in (10, 11, 12)}
+
+
+def test_sync_downloads_batch(tmp_path) -> None:
+    with _StandInServer(_images) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        pagedata = dl.sync_downloads(_pagedata(_images))
+        assert server.requests == ["/MK/images/batch"]
+        for row in pagedata:
+            with open(row["filename"], "rb") as f:
+                assert f.read() == _images[row["id"]]
+        assert dl.get_stats()["cache_size"] == 3
+        dl.stop()
+
+
+def test_sync_downloads_batch_cut_off(tmp_path) -> None:
+    # big enough that we are part way through copying it when the stream ends
+    images = {10: b"small", 11: bytes(range(256)) * 400}
+    with _StandInServer(images, truncate_batch=True) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        pagedata = dl.sync_downloads(_pagedata(images))
+        for row in pagedata:
+            with open(row["filename"], "rb") as f:
+                assert f.read() == images[row["id"]]
+        # no partial download of the second image left behind
+        assert not list(tmp_path.rglob("downloading_*"))
+        dl.stop()
+
+
+def test_sync_downloads_fallback(tmp_path) -> None:
+    more_images = {13: b"foo", 14: b"bar"}
+    with _StandInServer({**_images, **more_images}, batch=False) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        pagedata = dl.sync_downloads(_pagedata(_images))
+        assert len(server.requests) == 1 + 3
+        for row in pagedata:
+            with open(row["filename"], "rb") as f:
+                assert f.read() == _images[row["id"]]
+        # we don't ask again
+        dl.sync_downloads(_pagedata(more_images))
+        assert len(server.requests) == 1 + 3 + 2
+        assert "/MK/images/batch" not in server.requests[4:]
+        dl.stop()
+
+
+def test_background_batch_download(qtbot, tmp_path) -> None:
+    with _StandInServer(_images) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        with qtbot.waitSignals([dl.download_finished] * 3, timeout=5000):
+            dl.download_batch_in_background_thread(_pagedata(_images))
+        assert server.requests == ["/MK/images/batch"]
+        assert dl.get_stats()["cache_size"] == 3
+        assert dl.stop(5000)
+
+
+def test_background_batch_fallback(qtbot, tmp_path) -> None:
+    with _StandInServer(_images, batch=False) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        with qtbot.waitSignals([dl.download_finished] * 3, timeout=5000):
+            dl.download_batch_in_background_thread(_pagedata(_images))
+        assert len(server.requests) == 1 + 3
+        assert dl.get_stats()["cache_size"] == 3
+        assert dl.stop(5000)
+
+
+def test_background_batch_finished_unknown_image(qtbot, tmp_path) -> None:
+    dl = Downloader(tmp_path)
+    with qtbot.waitSignal(dl.download_queue_changed, timeout=1000):
+        dl._batch_finished(True, [999])
+    assert dl.get_stats()["cache_size"] == 0
+
+
+def test_background_downloads_reuse_connections(qtbot, tmp_path) -> None:
+    images = {k: f"image {k}".encode() for k in range(20, 28)}
+    with _StandInServer(images) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        with qtbot.waitSignals([dl.download_finished] * len(images), timeout=5000):
+            for row in _pagedata(images):
+                dl.download_in_background_thread(row)
+        stats = dl.get_stats()
+        assert stats["msgr_clones"] <= 2
+        assert stats["msgr_clones"] + stats["msgr_reuses"] == len(images)
+        assert stats["connections_opened"] <= 2
+        assert stats["latency_mean"] > 0
+        dl.detach_messenger()
+        assert "msgr_clones" not in dl.get_stats()
+        assert dl.stop(5000)
+
+
+def test_messenger_pool_reuse_and_close() -> None:
+    m = Messenger("http://127.0.0.1:1")
+    m._start_session()
+    pool = MessengerPool(m, max_size=1)
+    with pool.messenger() as m1:
+        assert m1 is not m
+    with pool.messenger() as m2:
+        assert m2 is m1
+        # a second concurrent borrower gets a new one
+        with pool.messenger() as m3:
+            assert m3 is not m1
+    # but we don't keep more than max_size idle
+    assert not m1.isStarted()
+    assert m3.isStarted()
+    assert pool.get_stats()["msgr_clones"] == 2
+    assert pool.get_stats()["msgr_reuses"] == 1
+    pool.close()
+    assert not m3.isStarted()
+    assert m.isStarted()
+
+
+def test_sync_download_resumes_partial_transfer(tmp_path) -> None:
+    images = {30: bytes(range(256)) * 1000}
+    with _StandInServer(images, truncate_once={30}) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        (row,) = _pagedata(images)
+        row = dl.sync_download(row)
+        with open(row["filename"], "rb") as f:
+            assert f.read() == images[30]
+        # resumed from wherever we got to, not from the start
+        (rng,) = server.range_requests
+        assert 0 < int(rng.removeprefix("bytes=").removesuffix("-")) < len(images[30])
+        assert dl.pagecache.page_image_md5(30) == row["md5"]
+        dl.stop()
+
+
+def test_sync_download_detects_corruption(tmp_path) -> None:
+    images = {31: b"some image data"}
+    with _StandInServer(images, corrupt={31}) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        (row,) = _pagedata(images)
+        with raises(PlomSeriousException, match="md5sum"):
+            dl.sync_download(row)
+        assert not dl.pagecache.has_page_image(31)
+        # no partial files left around
+        assert [f.name for f in tmp_path.iterdir()] == ["placeholder.svg"]
+        dl.stop()
+
+
+def test_sync_download_not_streaming_detects_corruption(tmp_path) -> None:
+    images = {32: b"some image data"}
+    with _StandInServer(images, corrupt={32}) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger(), streaming=False)
+        (row,) = _pagedata(images)
+        with raises(PlomSeriousException, match="md5sum"):
+            dl.sync_download(row)
+        assert not dl.pagecache.has_page_image(32)
+        dl.stop()
+
+
+def test_background_download_corrupt_gives_up(qtbot, tmp_path) -> None:
+    images = {33: b"some image data"}
+    with _StandInServer(images, corrupt={33}) as server:
+        dl = Downloader(tmp_path, msgr=server.messenger())
+        with qtbot.waitSignals([dl.download_failed] * 3, timeout=5000):
+            dl.download_in_background_thread(_pagedata(images)[0])
+        qtbot.waitUntil(lambda: dl.get_stats()["fails"] == 1)
+        assert not dl.pagecache.has_page_image(33)
+        assert dl.stop(5000)
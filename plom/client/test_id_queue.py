@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from plom.common.exceptions import PlomConflict, PlomTakenException
+from plom.messenger import Messenger
+
+from .async_messenger import AsyncMessenger
+from .id_queue import IdentifyQueue, claim_next_id_paper
+
+
+class _StandInServer:
+    """A tiny local stand-in for the ID task endpoints of a Plom server."""
+
+    def __init__(self, unclaimed: list[int]) -> None:
+        self.unclaimed = unclaimed
+        # papernum -> student id
+        self.identified: dict[int, str] = {}
+        # papers that someone else claims just before we do
+        self.steal: set[int] = set()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code: int, body: object = None) -> None:
+                data = b"" if body is None else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/ID/tasks/available":
+                    if not outer.unclaimed:
+                        self._reply(204)
+                        return
+                    self._reply(200, outer.unclaimed[0])
+                    return
+                n = int(self.path.split("/")[-1])
+                pagedata = [
+                    {"pagename": "id", "id": 10 * n, "md5": "x", "orientation": 0},
+                    {"pagename": "t1", "id": 10 * n + 1, "md5": "y", "orientation": 0},
+                ]
+                self._reply(200, pagedata)
+
+            def do_PATCH(self):
+                n = int(self.path.split("/")[-1])
+                outer.unclaimed.remove(n)
+                if n in outer.steal:
+                    self._reply(409)
+                    return
+                self._reply(200)
+
+            def do_PUT(self):
+                n = int(self.path.split("/")[-1])
+                length = int(self.headers["Content-Length"])
+                sid = json.loads(self.rfile.read(length))["sid"]
+                if sid in outer.identified.values():
+                    self._reply(409)
+                    return
+                outer.identified[n] = sid
+                self._reply(200)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def messenger(self) -> Messenger:
+        host, port = self.httpd.server_address[:2]
+        m = Messenger(f"http://{host}:{port}")
+        m._start_session()
+        m.user = "someone"
+        m.token = {"token": "1234"}
+        return m
+
+
+def test_claim_next_id_paper_skips_taken() -> None:
+    with _StandInServer([3, 5, 8]) as server:
+        server.steal = {3}
+        m = server.messenger()
+        papernum, rows = claim_next_id_paper(m)
+        assert papernum == 5
+        assert [row["id"] for row in rows] == [50]
+        assert claim_next_id_paper(m)[0] == 8
+        assert claim_next_id_paper(m) is None
+
+
+def test_identify_queue_conflict_reported(qtbot) -> None:
+    with _StandInServer([]) as server:
+        am = AsyncMessenger(server.messenger())
+        idq = IdentifyQueue(am)
+        with qtbot.waitSignal(idq.submitted, timeout=5000) as blocker:
+            idq.enqueue(1, "12345678", "Doe, Jane")
+        assert blocker.args == [1]
+        with qtbot.waitSignal(idq.failed, timeout=5000) as blocker:
+            idq.enqueue(2, "12345678", "Doe, Jane")
+        assert blocker.args[0] == 2
+        assert isinstance(blocker.args[1], PlomConflict)
+        # a conflict is not retried
+        assert idq.number_of_retries == 0
+        assert idq.num_pending() == 0
+        assert server.identified == {1: "12345678"}
+        assert am.stop(5000)
+
+
+def test_identify_queue_newer_id_wins(qtbot) -> None:
+    with _StandInServer([]) as server:
+        am = AsyncMessenger(server.messenger())
+        idq = IdentifyQueue(am)
+        submitted = []
+        idq.submitted.connect(submitted.append)
+        idq.enqueue(1, "11111111", "Doe, Jane")
+        idq.enqueue(1, "22222222", "Doe, John")
+        assert idq.is_pending(1)
+        assert idq.wait(5)
+        assert submitted == [1]
+        assert server.identified == {1: "22222222"}
+        assert am.stop(5000)
+
+
+def test_identify_queue_retries_then_gives_up(qtbot) -> None:
+    # nothing is listening here
+    m = Messenger("http://127.0.0.1:1")
+    m._start_session()
+    m.user = "someone"
+    m.token = {"token": "1234"}
+    am = AsyncMessenger(m)
+    idq = IdentifyQueue(am, max_tries=3, retry_delay=10)
+    with qtbot.waitSignal(idq.failed, timeout=10000) as blocker:
+        idq.enqueue(4, "12345678", "Doe, Jane")
+    assert blocker.args[0] == 4
+    assert idq.number_of_retries == 2
+    assert idq.number_failed == 1
+    assert am.stop(5000)
+
+
+def test_identify_queue_claims_first(qtbot) -> None:
+    with _StandInServer([3, 4, 5]) as server:
+        server.steal = {4}
+        server.identified = {1: "33333333"}
+        am = AsyncMessenger(server.messenger())
+        idq = IdentifyQueue(am)
+        claimed = []
+        failed = {}
+        idq.claimed.connect(claimed.append)
+        idq.failed.connect(failed.__setitem__)
+        idq.enqueue(3, "11111111", "Doe, Jane", claim=True)
+        idq.enqueue(4, "22222222", "Doe, John", claim=True)
+        idq.enqueue(5, "33333333", "Smith, Adam", claim=True)
+        assert idq.wait(5)
+        assert server.identified == {1: "33333333", 3: "11111111"}
+        assert failed.keys() == {4, 5}
+        assert isinstance(failed[4], PlomTakenException)
+        # we claimed paper 5, but its student ID is already used
+        assert isinstance(failed[5], PlomConflict)
+        assert sorted(claimed) == [3, 5]
+        assert am.stop(5000)
@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from pathlib import Path
+
+from .offline import OfflineStore, offline_store_path
+
+
+def _fake_marking(tmp_path: Path, task: str) -> tuple[Path, Path]:
+    d = tmp_path / f"{task}_abc"
+    d.mkdir()
+    aname = d / f"G{task}.png"
+    pname = d / f"G{task}.plom"
+    aname.write_bytes(b"not really a png")
+    pname.write_text("{}")
+    return aname, pname
+
+
+def test_offline_store_empty(tmp_path) -> None:
+    s = OfflineStore(tmp_path / "offline")
+    assert s.get_rubrics() == []
+    assert s.get_tab_state() is None
+    assert not s.is_tab_state_dirty()
+    assert s.num_pending() == 0
+    assert s.pending_results() == []
+
+
+def test_offline_store_snapshots_survive_new_instance(tmp_path) -> None:
+    s = OfflineStore(tmp_path)
+    s.put_rubrics([{"rid": 1, "text": "hi"}])
+    s.put_tab_state({"shown": [1]}, dirty=False)
+    s2 = OfflineStore(tmp_path)
+    assert s2.get_rubrics() == [{"rid": 1, "text": "hi"}]
+    assert s2.get_tab_state() == {"shown": [1]}
+
+
+def test_offline_store_tab_state_dirty(tmp_path) -> None:
+    s = OfflineStore(tmp_path)
+    s.put_tab_state({"shown": [1]}, dirty=True)
+    assert s.is_tab_state_dirty()
+    s.put_tab_state({"shown": [1, 2]}, dirty=False)
+    assert not s.is_tab_state_dirty()
+
+
+def test_offline_store_queue_in_order(tmp_path) -> None:
+    s = OfflineStore(tmp_path / "offline")
+    for task in ("0001g2", "0003g2", "0002g2"):
+        a, p = _fake_marking(tmp_path, task)
+        s.enqueue_result(task, 3, a, p, 42.0, 2, 1, f"ic{task}")
+    assert s.num_pending() == 3
+    pending = s.pending_results()
+    assert [x[0] for x in pending] == ["0001g2", "0003g2", "0002g2"]
+    task, grade, aname, pname, mtime, qidx, ver, ic = pending[0]
+    assert grade == 3
+    assert mtime == 42.0
+    assert (qidx, ver) == (2, 1)
+    assert ic == "ic0001g2"
+    # files are copied into the store, with names the uploader expects
+    assert aname.parent.is_relative_to(tmp_path / "offline")
+    assert aname.stem == "G0001g2"
+    assert pname.name == "G0001g2.plom"
+    assert aname.read_bytes() == b"not really a png"
+
+
+def test_offline_store_remarking_replaces(tmp_path) -> None:
+    s = OfflineStore(tmp_path / "offline")
+    a, p = _fake_marking(tmp_path, "0001g2")
+    s.enqueue_result("0001g2", 3, a, p, 10, 2, 1, "ic")
+    a.write_bytes(b"second try")
+    s.enqueue_result("0001g2", 5, a, p, 20, 2, 1, "ic")
+    (r,) = s.pending_results()
+    assert r[1] == 5
+    assert r[2].read_bytes() == b"second try"
+
+
+def test_offline_store_discard(tmp_path) -> None:
+    s = OfflineStore(tmp_path / "offline")
+    for task in ("0001g2", "0002g2"):
+        a, p = _fake_marking(tmp_path, task)
+        s.enqueue_result(task, 1, a, p, 1, 2, 1, "ic")
+    s.discard_result("0001g2")
+    assert [x[0] for x in s.pending_results()] == ["0002g2"]
+    s.discard_result("0001g2")
+    assert s.num_pending() == 1
+
+
+def test_offline_store_remove_result_files(tmp_path) -> None:
+    s = OfflineStore(tmp_path / "offline")
+    a, p = _fake_marking(tmp_path, "0001g2")
+    s.enqueue_result("0001g2", 1, a, p, 1, 2, 1, "ic")
+    ((__, __, aname, *__),) = s.pending_results()
+    # still pending: keep the files
+    s.remove_result_files("0001g2")
+    assert aname.exists()
+    s.discard_result("0001g2")
+    assert aname.exists()
+    s.remove_result_files("0001g2")
+    assert not aname.exists()
+
+
+def test_offline_store_path_per_server_question_user(tmp_path) -> None:
+    p = offline_store_path(tmp_path, server="s", question_idx=1, username="u")
+    assert p.parent == tmp_path
+    assert p == offline_store_path(tmp_path, server="s", question_idx=1, username="u")
+    assert p != offline_store_path(tmp_path, server="s", question_idx=2, username="u")
+    assert p != offline_store_path(tmp_path, server="s", question_idx=1, username="v")
+    assert p != offline_store_path(tmp_path, server="t", question_idx=1, username="u")
@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from pathlib import Path
+
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import QDialog, QWidget
+
+from .pagerearranger import RearrangementViewer
+from .useful_classes import WarnMsg
+
+
+def test_dedupe_by_md5sum() -> None:
+    def row(name, md5, included, order, id):
+        return {
+            "pagename": name,
+            "md5": md5,
+            "included": included,
+            "order": order,
+            "id": id,
+        }
+
+    pagedata = [
+        row("h1.1", "e224", True, 1, 40),
+        row("h1.2", "9752", True, 2, 41),
+        row("h2.1", "e224", False, 1, 40),
+        row("h2.2", "9752", False, 2, 41),
+        row("h2.3", "abcd", False, 3, 42),
+        row("h3.1", "abcd", False, 1, 42),
+    ]
+    out = RearrangementViewer.dedupe_by_md5sum(pagedata)
+    assert [r["pagename"] for r in out] == [
+        "h1.1 (& h2.1)",
+        "h1.2 (& h2.2)",
+        "h2.3 (& h3.1)",
+    ]
+    assert [r["included"] for r in out] == [True, True, False]
+    assert [r["id"] for r in out] == [40, 41, 42]
+    # input is not modified
+    assert pagedata[0]["pagename"] == "h1.1"
+
+
+def test_dedupe_by_md5sum_abbreviates_many() -> None:
+    pagedata = [
+        {"pagename": f"p{n}", "md5": "same", "included": False} for n in range(6)
+    ]
+    (r,) = RearrangementViewer.dedupe_by_md5sum(pagedata)
+    assert r["pagename"] == "p0 (& p1, p2, 3 others)"
+
+
+def _png(tmp_path: Path, name: str) -> str:
+    img = QImage(60, 80, QImage.Format.Format_RGB32)
+    img.fill(QColor("white"))
+    f = tmp_path / name
+    assert img.save(str(f))
+    return str(f)
+
+
+def test_rearranger_fills_in_pages_as_they_download(
+    qtbot, tmp_path, monkeypatch
+) -> None:
+    warnings = []
+    monkeypatch.setattr(WarnMsg, "exec", lambda self: warnings.append(self))
+    placeholder = _png(tmp_path, "placeholder.png")
+    pagedata = [
+        {
+            "pagename": f"h1.{n}",
+            "md5": f"md5_{n}",
+            "included": True,
+            "order": n,
+            "id": 40 + n,
+            "orientation": 0,
+            "filename": placeholder,
+        }
+        for n in (1, 2)
+    ]
+    parent = QWidget()
+    qtbot.addWidget(parent)
+    d = RearrangementViewer(parent, 1, [], pagedata, downloading={41, 42})
+    d.thumbnailer.stop()
+    assert d.listB.getNameList() == ["h1.1", "h1.2"]
+    # cannot accept while pages are missing
+    d.doShuffle()
+    assert len(warnings) == 1
+    assert d.result() != QDialog.DialogCode.Accepted
+
+    # not one of ours, ignored
+    d.page_image_arrived(99, "md5_9", "/nonexistent")
+    for n in (1, 2):
+        f = _png(tmp_path, f"page{n}.png")
+        with qtbot.waitSignal(d.thumbnailer.thumbnail_ready, timeout=5000):
+            d.page_image_arrived(40 + n, f"md5_{n}", f)
+        assert d.listA.item_files[f"h1.{n}"] == f
+    d.doShuffle()
+    assert [r["filename"] for r in d.permute] == [
+        str(tmp_path / "page1.png"),
+        str(tmp_path / "page2.png"),
+    ]
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import logging
+import random
+import time
+from typing import Any
+
+from .rubric_search import RubricSearchIndex
+
+log = logging.getLogger("test")
+
+
+def _rubric(rid: int, text: str, **kwargs) -> dict[str, Any]:
+    r = {"rid": rid, "text": text, "display_delta": "+1", "tags": "", "meta": ""}
+    r.update(kwargs)
+    return r
+
+
+def test_search_ranks_text_over_meta_and_whole_words() -> None:
+    idx = RubricSearchIndex(lambda r: r["text"])
+    idx.rebuild(
+        [
+            _rubric(1, "nothing here", meta="see the integral"),
+            _rubric(2, "Integral diverges"),
+            _rubric(3, "integrals are hard"),
+            _rubric(4, "integral", display_delta="-½"),
+        ]
+    )
+    # whole words first, then shorter text
+    assert idx.search("integral") == [4, 2, 3, 1]
+    assert idx.search("INTÉGRAL div") == [2]
+    assert idx.search("integral", limit=2) == [4, 2]
+    assert idx.search("") == []
+    assert idx.search("nope") == []
+    idx.remove(4)
+    idx.update(_rubric(2, "converges"))
+    assert 4 not in idx and len(idx) == 3
+    assert idx.search("integral") == [3, 1]
+
+
+def test_search_many_rubrics() -> None:
+    rng = random.Random(42)
+    words = [
+        "".join(rng.choices("abcdefghijklmnop", k=rng.randint(2, 9)))
+        for _ in range(3000)
+    ]
+    rubrics = [_rubric(k, " ".join(rng.choices(words, k=12))) for k in range(5000)]
+    idx = RubricSearchIndex(lambda r: r["text"])
+    idx.rebuild(rubrics)
+    # warm up, sorting the vocabulary
+    idx.search("a")
+    t = time.perf_counter()
+    for q in ("a", "ab", "abc d", words[0], f"{words[1]} {words[2][:2]}"):
+        found = idx.search(q, limit=5000)
+        words_in = {k: rubrics[k]["text"].split() for k in found}
+        # every word of the query starts a word of every match
+        assert all(
+            any(w.startswith(qw) for w in words_in[k])
+            for k in found
+            for qw in q.split()
+        )
+    # these should each take a few milliseconds
+    log.info("5 searches of 5000 rubrics: %.3fs", time.perf_counter() - t)
+    expected = {k for k, r in enumerate(rubrics) if words[0] in r["text"].split()}
+    assert set(idx.search(words[0], limit=5000)) >= expected
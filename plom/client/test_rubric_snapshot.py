@@ -0,0 +1,39 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from pathlib import Path
+
+from .rubric_snapshot import RubricSnapshot
+
+
+def _snapshot(d: Path, **kwargs) -> RubricSnapshot:
+    key = {"server": "https://example.com", "question_idx": 1, "version": 1}
+    key.update(kwargs)
+    return RubricSnapshot(d, username="someone", **key)  # type: ignore[arg-type]
+
+
+def test_rubric_snapshot_roundtrip(tmp_path) -> None:
+    snap = _snapshot(tmp_path / "snaps")
+    assert snap.load() is None
+    rubrics = [{"rid": 1, "text": "hi", "revision": 3}]
+    snap.put_rubrics(rubrics)
+    assert snap.load() == (rubrics, None)
+    snap.put_tab_state({"shown": [1]})
+    assert snap.load() == (rubrics, {"shown": [1]})
+    # a new instance, as in a later session, sees the same
+    assert _snapshot(tmp_path / "snaps").load() == (rubrics, {"shown": [1]})
+
+
+def test_rubric_snapshot_keyed(tmp_path) -> None:
+    _snapshot(tmp_path).put_rubrics([{"rid": 1}])
+    assert _snapshot(tmp_path, question_idx=2).load() is None
+    assert _snapshot(tmp_path, version=2).load() is None
+    assert _snapshot(tmp_path, server="https://example.org").load() is None
+
+
+def test_rubric_snapshot_unreadable(tmp_path) -> None:
+    snap = _snapshot(tmp_path)
+    snap.put_rubrics([{"rid": 1}])
+    for f in tmp_path.glob("*.rubrics.json"):
+        f.write_text("{not json")
+    assert snap.load() is None
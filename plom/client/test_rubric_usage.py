@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import json
+from pathlib import Path
+from typing import Any
+
+from .rubric_usage import RubricUsage
+
+
+def _usage(d: Path, **kwargs) -> RubricUsage:
+    key = {"server": "https://example.com", "question_idx": 1}
+    key.update(kwargs)
+    return RubricUsage(d, username="someone", **key)  # type: ignore[arg-type]
+
+
+def _plom_data(*rids: int) -> dict[str, Any]:
+    items: list[list[Any]] = [["Tick", 10, 20]]
+    items.extend(["Rubric", 10, 20, {"rid": rid, "text": "hi"}] for rid in rids)
+    return {"sceneItems": items}
+
+
+def test_rubric_usage_counts_and_persists(tmp_path) -> None:
+    usage = _usage(tmp_path)
+    assert usage.counts() == {}
+    usage.record("0001g1", _plom_data(1, 2, 2))
+    usage.record("0002g1", _plom_data(2))
+    assert usage.counts() == {1: 1, 2: 3}
+    # re-marking a task replaces its counts
+    usage.record("0001g1", _plom_data(3))
+    assert usage.counts() == {2: 1, 3: 1}
+    # a later session sees the same, but not for another question
+    assert _usage(tmp_path).counts() == {2: 1, 3: 1}
+    assert _usage(tmp_path, question_idx=2).counts() == {}
+
+
+def test_rubric_usage_from_plom_file(tmp_path) -> None:
+    usage = _usage(tmp_path / "usage")
+    f = tmp_path / "G0001g1.plom"
+    f.write_text(json.dumps(_plom_data(5, 6)))
+    usage.record_plom_file("0001g1", f)
+    assert usage.counts() == {5: 1, 6: 1}
+    # unreadable files are ignored
+    f.write_text("{not json")
+    usage.record_plom_file("0001g1", f)
+    usage.record_plom_file("0002g1", tmp_path / "nonexistent.plom")
+    assert usage.counts() == {5: 1, 6: 1}
@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from pathlib import Path
+
+from PyQt6.QtGui import QColor, QImage
+from pytest import raises
+
+from .thumbnails import ThumbnailCache, Thumbnailer, read_thumbnail
+
+
+def _make_image(tmp_path: Path, w: int = 1200, h: int = 1600) -> Path:
+    img = QImage(w, h, QImage.Format.Format_RGB32)
+    img.fill(QColor("white"))
+    f = tmp_path / "page.png"
+    assert img.save(str(f))
+    return f
+
+
+def test_read_thumbnail_is_small(qtbot, tmp_path) -> None:
+    f = _make_image(tmp_path)
+    img = read_thumbnail(f, 200)
+    assert max(img.width(), img.height()) == 200
+    assert img.height() > img.width()
+
+
+def test_read_thumbnail_not_image(qtbot, tmp_path) -> None:
+    f = tmp_path / "foo.png"
+    f.write_text("not an image")
+    with raises(RuntimeError):
+        read_thumbnail(f)
+
+
+def test_thumbnail_cache_rotates_from_base() -> None:
+    c = ThumbnailCache()
+    assert c.get("abc", 90) is None
+    c.put("abc", QImage(30, 40, QImage.Format.Format_RGB32))
+    img = c.get("abc", 90)
+    assert img is not None
+    assert (img.width(), img.height()) == (40, 30)
+    assert c.has("abc", 90)
+    assert c.has("abc", -270)
+    assert len(c) == 2
+
+
+def test_thumbnail_cache_bounded() -> None:
+    c = ThumbnailCache(max_entries=3)
+    for n in range(5):
+        c.put(f"md5_{n}", QImage(3, 4, QImage.Format.Format_RGB32))
+    assert len(c) == 3
+    assert not c.has("md5_0")
+    assert c.has("md5_4")
+
+
+def test_thumbnail_cache_bounded_in_bytes() -> None:
+    img = QImage(30, 40, QImage.Format.Format_RGB32)
+    c = ThumbnailCache(max_bytes=3 * img.sizeInBytes())
+    for n in range(5):
+        c.put(f"md5_{n}", QImage(30, 40, QImage.Format.Format_RGB32))
+    assert len(c) == 3
+    assert c.nbytes() == 3 * img.sizeInBytes()
+    assert not c.has("md5_1")
+    assert c.has("md5_4")
+    # rotated copies count too
+    assert c.get("md5_4", 90) is not None
+    assert len(c) == 3
+    assert not c.has("md5_2")
+    c.put("md5_4", QImage(30, 40, QImage.Format.Format_RGB32))
+    assert c.nbytes() == 3 * img.sizeInBytes()
+    c.clear()
+    assert c.nbytes() == 0
+
+
+def test_thumbnail_cache_keeps_newest_even_if_too_big() -> None:
+    c = ThumbnailCache(max_bytes=100)
+    c.put("small", QImage(2, 2, QImage.Format.Format_RGB32))
+    c.put("big", QImage(30, 40, QImage.Format.Format_RGB32))
+    assert len(c) == 1
+    assert c.has("big")
+
+
+def test_thumbnailer_background(qtbot, tmp_path) -> None:
+    f = _make_image(tmp_path)
+    t = Thumbnailer(cache=ThumbnailCache())
+    with qtbot.waitSignal(t.thumbnail_ready, timeout=5000) as blocker:
+        assert not t.request("abc", f)
+    assert blocker.args == ["abc"]
+    assert t.request("abc", f)
+    assert t.cache.get("abc", 180) is not None
+    t.stop()
@@ -0,0 +1,182 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import json
+from pathlib import Path
+from typing import Any
+
+from .marker import MarkerClient
+
+
+class MockQApp:
+    downloader = None
+
+    def processEvents(self) -> None:
+        pass
+
+
+class MockMessenger:
+    username = "user0"
+
+
+class MockPageCache:
+    def __init__(self, tmp_path: Path) -> None:
+        self._dir = tmp_path
+        self._have: set[int] = set()
+
+    def has_page_image(self, img_id: int) -> bool:
+        return img_id in self._have
+
+    def page_image_path(self, img_id: int) -> Path:
+        return self._dir / f"page{img_id}.png"
+
+
+class MockDownloader:
+    """Records what would be downloaded, and "downloads" it immediately."""
+
+    def __init__(self, tmp_path: Path) -> None:
+        self.pagecache = MockPageCache(tmp_path)
+        self.batches: list[list[int]] = []
+
+    def download_batch_in_background_thread(self, rows: list[dict[str, Any]]) -> None:
+        self.batches.append([row["id"] for row in rows])
+        for row in rows:
+            self.pagecache.page_image_path(row["id"]).touch()
+            self.pagecache._have.add(row["id"])
+
+    def get_placeholder_path(self) -> str:
+        return "placeholder.png"
+
+
+def _make_marker(qtbot, tmp_path: Path) -> tuple[MarkerClient, MockDownloader]:
+    w = MarkerClient(MockQApp(), tmpdir=tmp_path)
+    w.downloader = MockDownloader(tmp_path)
+    w.msgr = MockMessenger()
+    w.question_idx = 1
+    w.version = 1
+    w.exam_spec = {
+        "name": "midterm",
+        "numberOfVersions": 1,
+        "numberOfQuestions": 1,
+        "question": {"1": {"label": "Q1"}},
+    }
+    w.prxM.setSourceModel(w.examModel)
+    w.ui.tableView.setModel(w.prxM)
+    w.ui.tableView.selectionModel().selectionChanged.connect(w.ensureAllDownloaded)
+    return w, w.downloader
+
+
+def _add_completed_task(
+    w: MarkerClient, task: str, img_ids: list[int], tags: list[str] = []
+) -> None:
+    src_img_data = [{"id": i, "md5": f"md5_{i}"} for i in img_ids]
+    w.examModel.add_task(
+        task,
+        src_img_data=src_img_data,
+        status="complete",
+        tags=tags,
+        username=w.msgr.username,
+    )
+    pname = w.workingDirectory / f"G{task}.plom"
+    with open(pname, "w") as f:
+        json.dump({"base_images": src_img_data}, f)
+    w.examModel.setAnnotatedFile(task, w.workingDirectory / f"G{task}.png", pname)
+
+
+def _select(w: MarkerClient, task: str) -> None:
+    w.ui.tableView.selectRow(w.prxM.rowFromTask(task))
+    assert w.get_current_task_id_or_none() == task
+
+
+def test_marker_selecting_completed_task_does_not_download_scans(
+    qtbot, tmp_path
+) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    _add_completed_task(w, "0001g1", [11, 12])
+    _select(w, "0001g1")
+    assert dl.batches == []
+
+
+def test_marker_selecting_untouched_task_downloads_scans(qtbot, tmp_path) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    w.examModel.add_task(
+        "0002g1", src_img_data=[{"id": 21, "md5": "md5_21"}], username="user0"
+    )
+    _select(w, "0002g1")
+    assert dl.batches == [[21]]
+
+
+def test_marker_dwelling_on_completed_task_downloads_scans(qtbot, tmp_path) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    w._remark_prefetch_delay_ms = 10
+    _add_completed_task(w, "0001g1", [11, 12])
+    _select(w, "0001g1")
+    assert dl.batches == []
+    qtbot.waitUntil(lambda: dl.batches == [[11, 12]], timeout=1000)
+    assert w._remark_likely("0001g1")
+
+
+def test_marker_moving_on_before_dwell_does_not_download_scans(qtbot, tmp_path) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    w._remark_prefetch_delay_ms = 50
+    _add_completed_task(w, "0001g1", [11])
+    _add_completed_task(w, "0002g1", [21])
+    _select(w, "0001g1")
+    w.ui.tableView.clearSelection()
+    qtbot.wait(150)
+    assert dl.batches == []
+
+
+def test_marker_recently_marked_task_downloads_scans(qtbot, tmp_path) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    _add_completed_task(w, "0001g1", [11, 12])
+    w.marking_history.append("0001g1")
+    assert w._remark_likely("0001g1")
+    _select(w, "0001g1")
+    assert dl.batches == [[11, 12]]
+
+
+def test_marker_task_tagged_for_user_downloads_scans(qtbot, tmp_path) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    _add_completed_task(w, "0001g1", [11], tags=["@user0"])
+    _add_completed_task(w, "0002g1", [21], tags=["@user1"])
+    assert w._remark_likely("0001g1")
+    assert not w._remark_likely("0002g1")
+    _select(w, "0002g1")
+    assert dl.batches == []
+    _select(w, "0001g1")
+    assert dl.batches == [[11]]
+
+
+def test_marker_opening_annotator_downloads_scans(qtbot, tmp_path) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    _add_completed_task(w, "0001g1", [11, 12])
+    _select(w, "0001g1")
+    assert dl.batches == []
+    data = w.get_data_for_annotator("0001g1")
+    assert dl.batches == [[11, 12]]
+    assert data is not None
+    src_img_data = data[10]
+    assert [Path(row["filename"]).name for row in src_img_data] == [
+        "page11.png",
+        "page12.png",
+    ]
+
+
+def test_marker_previously_annotated_trigger_follows_remark_likely(
+    qtbot, tmp_path
+) -> None:
+    w, dl = _make_marker(qtbot, tmp_path)
+    _add_completed_task(w, "0001g1", [11])
+    calls = []
+    w.get_downloads_for_src_img_data = lambda data, trigger=True: calls.append(trigger)
+
+    class MockAnnotations:
+        image = tmp_path / "annot.png"
+        plom_data = {"base_images": [{"id": 11, "md5": "md5_11"}]}
+
+    MockAnnotations.image.touch()
+    w._store_previously_annotated("0001g1", MockAnnotations())
+    w.marking_history.append("0001g1")
+    w._store_previously_annotated("0001g1", MockAnnotations())
+    assert calls == [False, True]
@@ -4,10 +4,12 @@
 from typing import Any
 
 from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QTextCharFormat
 from PyQt6.QtWidgets import QMessageBox
 from pytest import raises
 
 from .rubric_list import AddRubricDialog
+from .spelling import get_speller
 from .useful_classes import SimpleQuestion, WarnMsg
 
 
@@ -543,3 +545,27 @@ def test_AddRubricDialog_seeded_data_as_suggestion(qtbot) -> None:
     assert out["out_of"] == 3
     assert out["parameters"] == param_in
     assert out["tags"] == tags_in
+
+
+def test_AddRubricDialog_highlights_spelling(qtbot) -> None:
+    speller = get_speller()
+    speller.start_loading()
+    qtbot.waitUntil(speller.is_ready, timeout=10000)
+    d = AddRubricDialog(None, "user", 10, 1, "Q1", 1, 3, None)
+    qtbot.addWidget(d)
+    # all share the one spellchecker
+    assert d.hiliter.speller is speller
+    assert d.TE.speller is speller
+    d.TE.setPlainText("tex: a speling mistake\nDerivative")
+    squiggly = QTextCharFormat.UnderlineStyle.SpellCheckUnderline
+    block = d.TE.document().firstBlock()
+    underlined = [
+        (f.start, f.length)
+        for f in block.layout().formats()
+        if f.format.underlineStyle() == squiggly
+    ]
+    assert underlined == [(7, 7)]
+    block = block.next()
+    assert not any(
+        f.format.underlineStyle() == squiggly for f in block.layout().formats()
+    )
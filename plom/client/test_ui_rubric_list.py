@@ -0,0 +1,347 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+import logging
+import time
+from typing import Any
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QWidget
+
+from . import rubric_list
+from .async_messenger import MessengerCall
+from .rubric_list import RubricWidget, tab_layout
+from .rubric_render import RubricRenderCache
+from .rubric_store import RubricStore
+
+log = logging.getLogger("test")
+
+
+def _rubric(rid: int, text: str = "", **kwargs) -> dict[str, Any]:
+    r = {
+        "rid": rid,
+        "kind": "relative",
+        "value": 1,
+        "display_delta": "+1",
+        "text": text or f"rubric {rid}",
+        "parameters": [],
+        "tags": "",
+        "meta": "",
+        "versions": "",
+        "username": "someone",
+        "system_rubric": False,
+        "last_modified": "2026-01-01",
+    }
+    r.update(kwargs)
+    return r
+
+
+class MockAnnotator(QWidget):
+    """Just enough Annotator to hold a RubricWidget."""
+
+    username = "someone"
+    scene = None
+
+    def __init__(self, rubrics: list[dict[str, Any]]) -> None:
+        super().__init__()
+        self.server_rubrics = rubrics
+        self.saved_tab_states: list[dict[str, Any]] = []
+        self.snapshot: tuple[list[dict[str, Any]], dict[str, Any] | None] | None = None
+        self.fetch = MessengerCall(None, None)
+        self.usage: dict[int, int] = {}
+        self.prerendered: list[list[str]] = []
+
+    def getRubricsFromServer(self) -> list[dict[str, Any]]:
+        return self.server_rubrics
+
+    def getTabStateFromServer(self) -> dict[str, Any]:
+        return {}
+
+    def saveTabStateToServer(self, state: dict[str, Any]) -> None:
+        self.saved_tab_states.append(state)
+
+    def getRubricSnapshot(self):
+        return self.snapshot
+
+    def fetchRubricsInBackground(self) -> MessengerCall:
+        return self.fetch
+
+    def getRubricUsage(self) -> dict[int, int]:
+        return self.usage
+
+    def prerenderLatexInBackground(self, fragments: list[str]) -> None:
+        self.prerendered.append(fragments)
+
+
+def test_rubric_store() -> None:
+    rs = RubricStore([_rubric(3), _rubric(1), _rubric(2)])
+    assert len(rs) == 3
+    assert [r["rid"] for r in rs] == [3, 1, 2]
+    assert 1 in rs and 4 not in rs
+    assert rs.get(4) is None
+    rs.put(_rubric(1, "changed"))
+    rs.put(_rubric(4))
+    assert [r["rid"] for r in rs] == [3, 1, 2, 4]
+    assert rs[1]["text"] == "changed"
+    rs.replace_all([_rubric(5)])
+    assert rs.as_list() == [_rubric(5)]
+
+
+def test_rubric_store_diff_by_revision() -> None:
+    rs = RubricStore([_rubric(k, revision=0) for k in (1, 2, 3)])
+    assert not rs.diff(rs.as_list())
+    newer = [_rubric(1, revision=0), _rubric(2, "new", revision=1), _rubric(4)]
+    assert rs.diff(newer) == ([4], [2], [3])
+    # without revisions, compare everything
+    rs = RubricStore([_rubric(1), _rubric(2)])
+    assert rs.diff([_rubric(1), _rubric(2, "new")]) == ([], [2], [])
+
+
+def test_render_cache_by_revision_and_version() -> None:
+    cache = RubricRenderCache()
+    r = _rubric(1, "Use {x}", parameters=[["{x}", ["<a>", "b"]]], revision=0)
+    a = cache.get(r, 1)
+    assert a.text == "Use <a>"
+    assert "Use &lt;a&gt;" in a.html
+    assert cache.get(r, 1) is a
+    assert cache.get(r, 2).text == "Use b"
+    assert cache.get(dict(r, text="Try {x}", revision=1), 1).text == "Try <a>"
+    # without revisions, we must be told of changes
+    r = _rubric(2, "old")
+    assert cache.get(r, 1).text == "old"
+    cache.forget(2)
+    assert cache.get(_rubric(2, "new"), 1).text == "new"
+
+
+def test_rubric_tabs_from_state(qtbot) -> None:
+    parent = MockAnnotator(
+        [_rubric(k, tags="group:(a)" if k % 10 == 0 else "") for k in range(1, 2001)]
+    )
+    qtbot.addWidget(parent)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    assert w.tabS.get_rid_list() == list(range(1, 2001))
+    (gtab,) = w.get_group_tabs()
+    assert gtab.get_rid_list() == list(range(10, 2001, 10))
+
+    state = w.get_tab_rubric_lists()
+    state["hidden"] = [20, 5, 9999]
+    state["user_tabs"] = [{"name": "mine", "ids": [7, 5, 6, 7, 8888]}]
+    w.setRubricTabsFromState(state)
+    assert 5 not in w.tabS.get_rid_list()
+    assert 20 not in gtab.get_rid_list()
+    assert w.tabHide.get_rid_list() == [5, 20]
+    (utab,) = w.get_user_tabs()
+    # no dupes, nothing hidden, nothing unknown
+    assert utab.get_rid_list() == [7, 6]
+    assert w.tabS.selectRubricById(2000)
+    assert w.tabS.getCurrentRubricId() == 2000
+    assert not w.tabS.selectRubricById(5)
+
+    utab.append_by_rid(1000)
+    utab.append_by_rid(1000)
+    assert utab.get_rid_list() == [7, 6, 1000]
+    utab.remove_rubric_by_rid(6)
+    assert utab.get_rid_list() == [7, 1000]
+    utab.append_by_rid(6)
+    assert utab.get_rid_list() == [7, 1000, 6]
+    assert utab._get_row_from_rid(6) == 2
+
+    w.unhide_rubric_by_rid(5)
+    assert 5 in w.tabS.get_rid_list()
+    assert w.tabHide.get_rid_list() == [20]
+
+
+def test_rubric_tabs_share_one_model(qtbot) -> None:
+    parent = MockAnnotator([_rubric(k) for k in range(1, 11)])
+    qtbot.addWidget(parent)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    (utab,) = w.get_user_tabs()
+    utab.set_rubrics_by_rids(w.rubrics, [3, 1, 2])
+    assert utab.model().sourceModel() is w.tabS.model().sourceModel()
+
+    utab.move_rubric(2, before=3)
+    assert utab.get_rid_list() == [2, 3, 1]
+    assert utab.getCurrentRubricId() == 2
+    utab.move_rubric(2)
+    assert utab.get_rid_list() == [3, 1, 2]
+
+    # illegal rubrics are not shown, but are still in the tab
+    w.rubric_model.update_legality(lambda r: 0 if r["rid"] == 1 else 2)
+    assert utab.rowCount() == 2
+    assert utab.get_rid_list() == [3, 1, 2]
+    assert utab._get_row_from_rid(1) is None
+    assert utab._get_row_from_rid(2) == 1
+    # except in the hidden tab, so they can be unhidden
+    w.hide_rubric_by_rid(5)
+    w.rubric_model.update_legality(lambda r: 0 if r["rid"] in (1, 5) else 2)
+    assert w.tabHide.get_rid_list() == [5]
+    assert w.tabHide.rowCount() == 1
+    w.unhide_rubric_by_rid(5)
+    w.rubric_model.update_legality(lambda r: 0 if r["rid"] == 1 else 2)
+
+    # a changed rubric is updated in place, keeping the selection
+    w.tabS.selectRubricById(5)
+    parent.server_rubrics = [_rubric(k) for k in range(2, 11)]
+    parent.server_rubrics[3] = _rubric(5, "changed")
+    w.rubric_model.set_rubrics(parent.server_rubrics)
+    assert w.tabS.getCurrentRubricId() == 5
+    row = w.tabS._get_row_from_rid(5)
+    assert w.tabS.model().index(row, 3).data() == "changed"
+    assert utab.rowCount() == 2
+
+
+def test_refresh_rubrics_patches_changes(qtbot, monkeypatch) -> None:
+    dialogs = []
+    monkeypatch.setattr(
+        rubric_list.BigMessageDialog, "exec", lambda self: dialogs.append(self)
+    )
+    parent = MockAnnotator([_rubric(k, revision=0) for k in range(1, 11)])
+    qtbot.addWidget(parent)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    w.save_tab_state()
+    assert len(parent.saved_tab_states) == 1
+    w.tabS.selectRubricById(4)
+
+    # nothing changed: no need to save tabs
+    w.refreshRubrics()
+    assert len(parent.saved_tab_states) == 1
+    assert not dialogs
+
+    parent.server_rubrics = [_rubric(k, revision=0) for k in range(2, 12)]
+    parent.server_rubrics[4] = _rubric(6, "changed", revision=1)
+    w.refreshRubrics()
+    assert len(dialogs) == 1
+    assert w.rubrics[6]["text"] == "changed"
+    assert 1 not in w.tabS.get_rid_list()
+    assert 11 in w.tabS.get_rid_list()
+    assert w.tabS.getCurrentRubricId() == 4
+    assert len(parent.saved_tab_states) == 2
+
+
+def test_start_from_snapshot_then_check_with_server(qtbot) -> None:
+    parent = MockAnnotator([])
+    qtbot.addWidget(parent)
+    tabs = {
+        "shown": [2, 1],
+        "hidden": [],
+        "tab_order": [],
+        "user_tabs": [{"name": "mine", "ids": [1]}],
+    }
+    parent.snapshot = ([_rubric(1, revision=0), _rubric(2, revision=0)], tabs)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    assert w.tabS.get_rid_list() == [2, 1]
+    (utab,) = w.get_user_tabs()
+    assert utab.get_rid_list() == [1]
+
+    # the server has a changed rubric, and tabs changed by another client
+    server_tabs = dict(tabs, user_tabs=[{"name": "mine", "ids": [2, 1]}])
+    fresh = [_rubric(1, "changed", revision=1), _rubric(2, revision=0)]
+    parent.fetch.succeeded.emit((fresh, server_tabs))
+    assert w.rubrics[1]["text"] == "changed"
+    assert utab.get_rid_list() == [2, 1]
+    # the server already has those tabs
+    assert w._saved_tab_state == server_tabs
+
+
+def test_search_rubrics_and_use_result(qtbot) -> None:
+    parent = MockAnnotator(
+        [
+            _rubric(1, "Forgot the chain rule"),
+            _rubric(2, "chain rule applied twice", tags="calculus"),
+            _rubric(3, "Sign error"),
+            _rubric(4, "Use {x}", parameters=[["{x}", ["Cauchy", "Chebyshev"]]]),
+        ]
+    )
+    qtbot.addWidget(parent)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    assert w.search_rubrics("CHAIN ru") == [1, 2]
+    assert w.search_rubrics("calc") == [2]
+    assert w.search_rubrics("cheb") == []
+    w.setVersion(2, 2)
+    assert w.search_rubrics("cheb") == [4]
+
+    # the index follows changes to the rubrics
+    w.rubric_model.put(_rubric(3, "Sign error in the chain rule"))
+    w.rubric_model.put(_rubric(5, "chain"))
+    assert w.search_rubrics("chain") == [5, 1, 2, 3]
+    w.hide_rubric_by_rid(5)
+    assert w.search_rubrics("chain") == [1, 2, 3]
+
+    used = []
+    w.rubricSignal.connect(used.append)
+    w.searchE.setText("sign err")
+    assert w.showHideW.currentWidget() is w.groupSearch
+    assert w.tabSearch.get_rid_list() == [3]
+    qtbot.keyClick(w.searchE, Qt.Key.Key_Return)
+    assert [r["rid"] for r in used] == [3]
+    w.searchE.clear()
+    assert w.showHideW.currentIndex() == 0
+
+
+def test_frequent_tab_and_prerender(qtbot) -> None:
+    parent = MockAnnotator(
+        [_rubric(1), _rubric(2, "tex: $x^2$"), _rubric(3), _rubric(4, "tex: $y$")]
+    )
+    qtbot.addWidget(parent)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    assert w.tabFrequent.get_rid_list() == []
+    assert w.get_tab_rubric_lists()["tab_order"][:2] == ["All", "Frequent"]
+
+    # rubric 99 is no longer around
+    parent.usage = {1: 2, 2: 5, 3: 2, 99: 7}
+    w.update_frequent_tab()
+    assert w.tabFrequent.get_rid_list() == [2, 1, 3]
+    assert parent.prerendered[-1] == [
+        "\\color{blue}\n$x^2$",
+        "$x^2$",
+        "\\color{gray}\n$x^2$",
+    ]
+    w.hide_rubric_by_rid(2)
+    assert w.tabFrequent.get_rid_list() == [1, 3]
+
+
+def test_tab_layout() -> None:
+    current = ["All", "x", "(a)", "+d", "y", "-d"]
+    # dupes and unknown names are ignored; tabs not in the target
+    # stay after the tab they follow now
+    target = ["-d", "(a)", "-d", "nosuch", "All", "+d", "(a)"]
+    assert tab_layout(current, target) == ["-d", "(a)", "All", "x", "+d", "y"]
+    assert tab_layout(["x", "y", "A"], ["A"]) == ["x", "y", "A"]
+    assert tab_layout(current, []) == current
+    assert tab_layout(current, current[::-1]) == current[::-1]
+
+
+def test_tab_state_many_tabs(qtbot) -> None:
+    parent = MockAnnotator(
+        [_rubric(k, tags=f"group:g{k % 40:02}") for k in range(1, 2001)]
+    )
+    qtbot.addWidget(parent)
+    w = RubricWidget(parent)
+    w.setInitialRubrics()
+    state = w.get_tab_rubric_lists()
+    state["user_tabs"] = [
+        {"name": f"u{n}", "ids": list(range(n + 1, 2001, 50))} for n in range(60)
+    ]
+    state["hidden"] = list(range(1, 2001, 7))
+    w.setRubricTabsFromState(state)
+    state = w.get_tab_rubric_lists()
+    assert len(state["tab_order"]) == 4 + 40 + 60
+    state["tab_order"].reverse()
+    clicks = []
+    w.rubricSignal.connect(clicks.append)
+    t = time.perf_counter()
+    w.setRubricTabsFromState(state)
+    w.setRubricTabsFromState(state)
+    # each should take less than a tenth of a second
+    log.info("restoring the state of 104 tabs twice: %.3fs", time.perf_counter() - t)
+    new_state = w.get_tab_rubric_lists()
+    assert new_state["tab_order"] == state["tab_order"]
+    assert new_state["user_tabs"] == state["user_tabs"][::-1]
+    # the rubric was reselected once per call, not for every tab moved
+    assert len(clicks) == 2
@@ -0,0 +1,57 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+from pathlib import Path
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import QWidget
+
+from .annotation_cache import Annotations
+from .async_messenger import MessengerCall
+from .rubric_other_usage_dialog import RubricOtherUsageDialog
+
+
+class MockAnnotator(QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.fetches: dict[int, MessengerCall] = {}
+        self.viewed: list[tuple[int, bool]] = []
+
+    def fetchOtherAnnotationsInBackground(self, paper_number: int) -> MessengerCall:
+        self.fetches[paper_number] = MessengerCall(paper_number, None)
+        return self.fetches[paper_number]
+
+    def view_other_paper(self, paper_number, *, _parent=None, cached_ok=False):
+        self.viewed.append((paper_number, cached_ok))
+
+
+def test_other_usage_prefetches_thumbnails(qtbot, tmp_path: Path) -> None:
+    parent = MockAnnotator()
+    qtbot.addWidget(parent)
+    tasks = [
+        {"code": f"{n:04}g1", "assigned_user": "someone", "question_version": 1}
+        for n in (7, 3, 5)
+    ]
+    d = RubricOtherUsageDialog(parent, tasks, rubric=None)
+    qtbot.addWidget(d)
+    # all the annotations are asked for straight away
+    assert list(parent.fetches) == [3, 5, 7]
+    items = [d.list_widget.item(i) for i in range(d.list_widget.count())]
+    assert [it.data(Qt.ItemDataRole.UserRole) for it in items] == [3, 5, 7]
+
+    img = QImage(600, 800, QImage.Format.Format_RGB32)
+    img.fill(QColor("white"))
+    f = tmp_path / "0005_1_e2.png"
+    img.save(str(f))
+    a = Annotations(5, 1, 2, f, tmp_path / "0005_1_e2.plom", {})
+    parent.fetches[5].succeeded.emit(a)
+    qtbot.waitUntil(lambda: d.thumbnailer.cache.has("5_e2"), timeout=5000)
+    parent.fetches[7].failed.emit(RuntimeError("no such paper"))
+    assert "no such paper" in items[2].toolTip()
+
+    d.list_widget.setCurrentItem(items[1])
+    d.view_paper()
+    assert parent.viewed == [(5, True)]
+    d.reject()
+    assert all(c.is_cancelled() for c in parent.fetches.values())
@@ -0,0 +1,232 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2026 Colin B. Macdonald
+
+"""Make small icon-sized images of pages in background threads."""
+
+from collections import OrderedDict
+import logging
+from pathlib import Path
+
+from PyQt6.QtCore import (
+    QObject,
+    QRunnable,
+    QSize,
+    Qt,
+    QThreadPool,
+    pyqtSignal,
+    pyqtSlot,
+)
+from PyQt6.QtGui import QImage, QImageReader, QTransform
+
+log = logging.getLogger("thumbnails")
+
+# The longest side of a thumbnail in pixels.  Icons in the "Adjust pages"
+# dialog are typically 300-400 pixels so this leaves a bit of room.
+ThumbnailSize = 480
+
+
+class ThumbnailCache:
+    """An in-memory cache of page thumbnails keyed by md5sum and orientation.
+
+    The unrotated thumbnail of each page is stored once; rotated copies
+    are made from that small image (never from the full-sized page)
+    and also cached.  The cache is bounded, both in the number of
+    thumbnails and in their total size in bytes: least-recently-used
+    entries are discarded.  A full-sized thumbnail is roughly 700 KiB,
+    so the default allows about a hundred.
+
+    This class is not thread safe: it should only be used from the
+    GUI thread.  Workers do the decoding and hand back ``QImage``.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 << 20) -> None:
+        self._cache: OrderedDict[tuple[str, int], QImage] = OrderedDict()
+        self._bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def __len__(self) -> int:
+        """The number of thumbnails, including rotated copies."""
+        return len(self._cache)
+
+    def has(self, md5: str, angle: int = 0) -> bool:
+        return (md5, angle % 360) in self._cache
+
+    def get(self, md5: str, angle: int = 0) -> QImage | None:
+        """Get a thumbnail, possibly rotated, or None if we don't have it.
+
+        Args:
+            md5: the md5sum of the page.
+            angle: the orientation in degrees CCW.  If we have the
+                unrotated thumbnail we can make a rotated one cheaply.
+
+        Returns:
+            The image or None if we don't have the unrotated thumbnail.
+        """
+        angle = angle % 360
+        key = (md5, angle)
+        img = self._cache.get(key)
+        if img is not None:
+            self._cache.move_to_end(key)
+            return img
+        base = self._cache.get((md5, 0))
+        if base is None:
+            return None
+        rot = QTransform()
+        # 90 means CCW, but we have a minus sign b/c of a y-downward coordsys
+        rot.rotate(-angle)
+        img = base.transformed(rot)
+        self._insert(key, img)
+        return img
+
+    def put(self, md5: str, img: QImage) -> None:
+        """Store the unrotated thumbnail of a page."""
+        self._insert((md5, 0), img)
+
+    def nbytes(self) -> int:
+        """The total size of the thumbnails in bytes."""
+        return self._bytes
+
+    def _insert(self, key: tuple[str, int], img: QImage) -> None:
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._bytes -= old.sizeInBytes()
+        self._cache[key] = img
+        self._bytes += img.sizeInBytes()
+        # always keep the newest, even if it is too big by itself
+        while len(self._cache) > 1 and (
+            len(self._cache) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            __, dropped = self._cache.popitem(last=False)
+            self._bytes -= dropped.sizeInBytes()
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._bytes = 0
+
+
+# one cache shared by all dialogs so reopening "Adjust pages" is fast
+thumbnail_cache = ThumbnailCache()
+
+
+def read_thumbnail(filename: str | Path, size: int = ThumbnailSize) -> QImage:
+    """Read a thumbnail-sized image of a file on disc.
+
+    The decoder is asked for a reduced size directly, which for jpeg
+    is much faster than decoding the full-sized image and scaling.
+
+    Args:
+        filename: an image file.
+        size: the longest side of the result in pixels.
+
+    Returns:
+        The image, upright according to any exif metadata.
+
+    Raises:
+        RuntimeError: could not read the image.
+    """
+    qir = QImageReader(str(filename))
+    # deal with jpeg exif rotations
+    qir.setAutoTransform(True)
+    orig = qir.size()
+    if orig.isValid() and max(orig.width(), orig.height()) > size:
+        qir.setScaledSize(
+            orig.scaled(QSize(size, size), Qt.AspectRatioMode.KeepAspectRatio)
+        )
+    img = qir.read()
+    if img.isNull():
+        raise RuntimeError(f"Could not read an image from {filename}")
+    return img
+
+
+class _ThumbnailWorkerSignals(QObject):
+    thumbnail_ready = pyqtSignal(str, QImage)
+    thumbnail_failed = pyqtSignal(str, str)
+
+
+class _ThumbnailWorker(QRunnable):
+    def __init__(self, md5: str, filename: str | Path, size: int) -> None:
+        super().__init__()
+        self.md5 = md5
+        self.filename = filename
+        self.size = size
+        self.signals = _ThumbnailWorkerSignals()
+
+    @pyqtSlot()
+    def run(self) -> None:
+        try:
+            img = read_thumbnail(self.filename, self.size)
+        except RuntimeError as e:
+            log.warning("thumbnail failed for %s: %s", self.md5, e)
+            self.signals.thumbnail_failed.emit(self.md5, str(e))
+            return
+        self.signals.thumbnail_ready.emit(self.md5, img)
+
+
+class Thumbnailer(QObject):
+    """Generate thumbnails off the GUI thread and cache them.
+
+    Call :meth:`request` for each page you want; the ``thumbnail_ready``
+    signal fires (on the GUI thread) when the unrotated thumbnail is
+    available in the :class:`ThumbnailCache`.  Callers should then
+    use the cache's ``get`` to obtain a suitably rotated copy.
+
+    **Signals**:
+
+      * `thumbnail_ready(md5: str)`: a thumbnail is now in the cache.
+      * `thumbnail_failed(md5: str, msg: str)`: could not make a thumbnail.
+    """
+
+    thumbnail_ready = pyqtSignal(str)
+    thumbnail_failed = pyqtSignal(str, str)
+
+    def __init__(
+        self,
+        parent: QObject | None = None,
+        *,
+        cache: ThumbnailCache | None = None,
+        size: int = ThumbnailSize,
+    ) -> None:
+        super().__init__(parent)
+        self.cache = thumbnail_cache if cache is None else cache
+        self.size = size
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(2)
+        self._pending: set[str] = set()
+
+    def request(self, md5: str, filename: str | Path) -> bool:
+        """Ask for the thumbnail of an image file.
+
+        Args:
+            md5: the md5sum of the file, used as a key.
+            filename: where the image is on disc.
+
+        Returns:
+            True if the thumbnail is already in the cache (no signal will
+            be emitted), False if it has been enqueued (or already was).
+        """
+        if self.cache.has(md5):
+            return True
+        if md5 in self._pending:
+            return False
+        self._pending.add(md5)
+        worker = _ThumbnailWorker(md5, filename, self.size)
+        worker.signals.thumbnail_ready.connect(self._worker_delivers)
+        worker.signals.thumbnail_failed.connect(self._worker_failed)
+        self.threadpool.start(worker)
+        return False
+
+    def _worker_delivers(self, md5: str, img: QImage) -> None:
+        self._pending.discard(md5)
+        self.cache.put(md5, img)
+        self.thumbnail_ready.emit(md5)
+
+    def _worker_failed(self, md5: str, msg: str) -> None:
+        self._pending.discard(md5)
+        self.thumbnail_failed.emit(md5, msg)
+
+    def stop(self, timeout: int = -1) -> bool:
+        """Cancel enqueued thumbnails and wait for running ones to finish."""
+        self.threadpool.clear()
+        self._pending.clear()
+        return self.threadpool.waitForDone(timeout)
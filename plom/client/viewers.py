@@ -157,10 +157,25 @@ class WholeTestView(QDialog):
         self.setMinimumSize(500, 500)
         if not labels:
             labels = [f"{k + 1}" for k in range(len(filenames))]
+        self._tab_data = []
         for f, label in zip(filenames, labels):
             # Tab doesn't seem to have padding so compact=False
             tab = ImageViewWidget(self, [f], compact=False)
             self.pageTabs.addTab(tab, label)
+            self._tab_data.append(f)
+
+    def page_image_arrived(self, img_id: int, md5: str, filename: str) -> None:
+        """A page image has been downloaded: replace the placeholder with it.
+
+        Only pages given as dicts with an ``"id"`` key can be updated.
+        """
+        for n, f in enumerate(self._tab_data):
+            if not isinstance(f, dict) or f.get("id") != img_id:
+                continue
+            f["filename"] = filename
+            tab = self.pageTabs.widget(n)
+            assert isinstance(tab, ImageViewWidget)
+            tab.updateImage([f])
 
     def tabSelected(self, index):
         """Resize on change tab."""